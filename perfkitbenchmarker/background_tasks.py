@@ -55,10 +55,13 @@ import abc
 from collections import deque
 from concurrent import futures
 import ctypes
+import errno
+import fcntl
 import functools
 import logging
 import os
 import Queue
+import select
 import signal
 import threading
 import time
@@ -78,6 +81,10 @@ _LONG_TIMEOUT = 1000.
 _WAIT_MIN_RECHECK_DELAY = 0.001  # 1 ms
 _WAIT_MAX_RECHECK_DELAY = 0.050  # 50 ms
 
+# select() on pipes is not supported on Windows, so the event-driven task
+# managers are only used on other platforms. See _PipeSignaledSingleReaderQueue.
+_EVENT_DRIVEN_WAITS_SUPPORTED = os.name != 'nt'
+
 # Values sent to child threads that have special meanings.
 _THREAD_STOP_PROCESSING = 0
 _THREAD_WAIT_FOR_KEYBOARD_INTERRUPT = 1
@@ -187,6 +194,66 @@ class _NonPollingSingleReaderQueue(object):
     self._SignalAvailableItem()
 
 
+class _PipeSignaledSingleReaderQueue(object):
+  """Queue to which multiple threads write but from which only one thread reads.
+
+  Writers append to a deque and then write a byte to a pipe. The reader blocks
+  in select() on the read end of the pipe. Unlike Lock.acquire, select() can be
+  interrupted by a KeyboardInterrupt, and unlike _SingleReaderQueue, the reader
+  does not poll, so it consumes no CPU while waiting.
+
+  Writes to the pipe are non-blocking. A failed write means the pipe is full of
+  unread wakeup bytes, so the reader is already guaranteed to wake up.
+  """
+
+  def __init__(self):
+    self._deque = deque()
+    self._read_fd, self._write_fd = os.pipe()
+    for fd in (self._read_fd, self._write_fd):
+      fcntl.fcntl(fd, fcntl.F_SETFL,
+                  fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+  def _WaitForWakeup(self, timeout):
+    """Waits up to timeout seconds for a writer to signal, then drains the pipe.
+    """
+    try:
+      readable, _, _ = select.select([self._read_fd], [], [], timeout)
+    except select.error as e:
+      # A signal handler that did not raise an exception interrupted the wait.
+      if e.args[0] != errno.EINTR:
+        raise
+      return
+    if readable:
+      try:
+        while os.read(self._read_fd, 4096):
+          pass
+      except OSError as e:
+        if e.errno != errno.EAGAIN:
+          raise
+
+  def Get(self, timeout=None):
+    deadline = None if timeout is None else time.time() + timeout
+    while not self._deque:
+      remaining_time = (_LONG_TIMEOUT if deadline is None
+                        else deadline - time.time())
+      if remaining_time <= 0:
+        raise Queue.Empty
+      self._WaitForWakeup(remaining_time)
+    return self._deque.popleft()
+
+  def Put(self, item):
+    self._deque.append(item)
+    try:
+      os.write(self._write_fd, 'x')
+    except OSError as e:
+      if e.errno != errno.EAGAIN:
+        raise
+
+  def Close(self):
+    os.close(self._read_fd)
+    os.close(self._write_fd)
+
+
 class _BackgroundTaskThreadContext(object):
   """Thread-specific information that can be inherited by a background task.
 
@@ -335,7 +402,7 @@ class _BackgroundThreadTaskManager(_BackgroundTaskManager):
 
   def __init__(self, *args, **kwargs):
     super(_BackgroundThreadTaskManager, self).__init__(*args, **kwargs)
-    self._response_queue = _SingleReaderQueue()
+    self._response_queue = self._CreateResponseQueue()
     self._task_queues = []
     self._threads = []
     self._available_worker_ids = range(self._max_concurrency)
@@ -364,6 +431,10 @@ class _BackgroundThreadTaskManager(_BackgroundTaskManager):
     for thread in self._threads:
       _WaitForCondition(lambda: not thread.is_alive())
 
+  def _CreateResponseQueue(self):
+    """Returns the queue on which child threads report completed tasks."""
+    return _SingleReaderQueue()
+
   def StartTask(self, target, args, kwargs, thread_context):
     assert self._available_worker_ids, ('StartTask called when no threads were '
                                         'available')
@@ -391,6 +462,22 @@ class _BackgroundThreadTaskManager(_BackgroundTaskManager):
       _WaitForCondition(lambda: not thread.is_alive())
 
 
+class _EventDrivenThreadTaskManager(_BackgroundThreadTaskManager):
+  """Manages state for background tasks started in child threads.
+
+  Same as _BackgroundThreadTaskManager, except that the parent thread sleeps in
+  select() until a child thread reports a completed task rather than polling
+  for completions.
+  """
+
+  def __exit__(self, *args, **kwargs):
+    super(_EventDrivenThreadTaskManager, self).__exit__(*args, **kwargs)
+    self._response_queue.Close()
+
+  def _CreateResponseQueue(self):
+    return _PipeSignaledSingleReaderQueue()
+
+
 def _ExecuteProcessTask(task):
   """Function invoked in another process by _BackgroundProcessTaskManager.
 
@@ -471,8 +558,95 @@ class _BackgroundProcessTaskManager(_BackgroundTaskManager):
     self._executor.shutdown(wait=True)
 
 
+class _EventDrivenProcessTaskManager(_BackgroundProcessTaskManager):
+  """Manages states for background tasks started in child processes.
+
+  Same as _BackgroundProcessTaskManager, except that completions are delivered
+  by future done-callbacks to a _PipeSignaledSingleReaderQueue rather than
+  found by futures.wait, which polls when given a timeout.
+  """
+
+  def __init__(self, *args, **kwargs):
+    super(_EventDrivenProcessTaskManager, self).__init__(*args, **kwargs)
+    self._completed_futures = _PipeSignaledSingleReaderQueue()
+
+  def __exit__(self, *args, **kwargs):
+    try:
+      return super(_EventDrivenProcessTaskManager, self).__exit__(
+          *args, **kwargs)
+    finally:
+      self._completed_futures.Close()
+
+  def StartTask(self, target, args, kwargs, thread_context):
+    task = _BackgroundTask(target, args, kwargs, thread_context)
+    task_id = len(self.tasks)
+    self.tasks.append(task)
+    future = self._executor.submit(_ExecuteProcessTask, task)
+    self._active_futures[future] = task_id
+    future.add_done_callback(self._completed_futures.Put)
+
+  def AwaitAnyTask(self):
+    future = self._completed_futures.Get()
+    task_id = self._active_futures.pop(future)
+    task = self.tasks[task_id]
+    task.return_value, task.traceback = future.result()
+    return task_id
+
+
+def _GetThreadTaskManagerClass():
+  """Returns the task manager class used to run tasks in child threads."""
+  if _EVENT_DRIVEN_WAITS_SUPPORTED:
+    return _EventDrivenThreadTaskManager
+  return _BackgroundThreadTaskManager
+
+
+def _GetProcessTaskManagerClass():
+  """Returns the task manager class used to run tasks in child processes."""
+  if _EVENT_DRIVEN_WAITS_SUPPORTED:
+    return _EventDrivenProcessTaskManager
+  return _BackgroundProcessTaskManager
+
+
+def _GetDependents(dependencies):
+  """Inverts a list of task dependencies, validating that it is acyclic.
+
+  Args:
+    dependencies: list of iterables of ints. Element i contains the indices of
+        the tasks that must complete successfully before task i may start.
+
+  Returns:
+    list of lists of ints. Element i contains the indices of the tasks that
+    depend on task i.
+
+  Raises:
+    ValueError: If a dependency index is out of range or the dependencies
+        contain a cycle.
+  """
+  dependents = [[] for _ in dependencies]
+  unmet_counts = []
+  for index, task_dependencies in enumerate(dependencies):
+    task_dependencies = set(task_dependencies)
+    for dependency in task_dependencies:
+      if not 0 <= dependency < len(dependencies):
+        raise ValueError('Task {0} depends on nonexistent task {1}.'.format(
+            index, dependency))
+      dependents[dependency].append(index)
+    unmet_counts.append(len(task_dependencies))
+  ready = [i for i, count in enumerate(unmet_counts) if not count]
+  visited_count = 0
+  while ready:
+    visited_count += 1
+    for dependent in dependents[ready.pop()]:
+      unmet_counts[dependent] -= 1
+      if not unmet_counts[dependent]:
+        ready.append(dependent)
+  if visited_count != len(dependencies):
+    raise ValueError('Task dependencies contain a cycle.')
+  return dependents
+
+
 def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
-                      parallel_exception_class):
+                      parallel_exception_class, dependencies=None):
   """Executes function calls concurrently in separate threads or processes.
 
   Args:
@@ -484,6 +658,11 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
         returns a _TaskManager.
     parallel_exception_class: Type of exception to raise upon an exception in
         one of the called functions.
+    dependencies: Optional list with one element per entry of
+        target_arg_tuples. Element i is an iterable of the indices of the calls
+        that must complete successfully before call i is started. A call is
+        started as soon as its dependencies complete, and is skipped if any of
+        them fails. If omitted, calls are started in order.
 
   Returns:
     list of function return values in the order corresponding to the order of
@@ -492,37 +671,72 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
   Raises:
     parallel_exception_class: When an exception occurred in any of the called
         functions.
+    ValueError: If dependencies are invalid.
   """
   thread_context = _BackgroundTaskThreadContext()
   max_concurrency = min(max_concurrency, len(target_arg_tuples))
+  if dependencies is None:
+    dependencies = [()] * len(target_arg_tuples)
+  elif len(dependencies) != len(target_arg_tuples):
+    raise ValueError('Expected {0} dependency lists but got {1}.'.format(
+        len(target_arg_tuples), len(dependencies)))
+  dependents = _GetDependents(dependencies)
+  unmet_counts = [len(set(d)) for d in dependencies]
+  ready_indices = deque(i for i, count in enumerate(unmet_counts) if not count)
+  # Maps the task_id assigned by the task manager to the index of the call in
+  # target_arg_tuples.
+  task_indices = []
+  results = [None] * len(target_arg_tuples)
   error_strings = []
-  started_task_count = 0
+  finished_task_count = 0
   active_task_count = 0
   with get_task_manager(max_concurrency) as task_manager:
     try:
-      while started_task_count < len(target_arg_tuples) or active_task_count:
-        if (started_task_count < len(target_arg_tuples) and
-            active_task_count < max_concurrency):
+      while finished_task_count < len(target_arg_tuples):
+        if ready_indices and active_task_count < max_concurrency:
           # Start a new task.
-          target, args, kwargs = target_arg_tuples[started_task_count]
+          index = ready_indices.popleft()
+          target, args, kwargs = target_arg_tuples[index]
           task_manager.StartTask(target, args, kwargs, thread_context)
-          started_task_count += 1
+          task_indices.append(index)
           active_task_count += 1
           continue
 
         # Wait for a task to complete.
         task_id = task_manager.AwaitAnyTask()
+        index = task_indices[task_id]
         active_task_count -= 1
+        finished_task_count += 1
         # If the task failed, it may still be a long time until all remaining
         # tasks complete. Log the failure immediately before continuing to wait
         # for other tasks.
         stacktrace = task_manager.tasks[task_id].traceback
         if stacktrace:
           msg = ('Exception occurred while calling {0}:{1}{2}'.format(
-              _GetCallString(target_arg_tuples[task_id]), os.linesep,
+              _GetCallString(target_arg_tuples[index]), os.linesep,
               stacktrace))
           logging.error(msg)
           error_strings.append(msg)
+          # Skip everything that transitively depends on the failed call.
+          skipped_indices = list(dependents[index])
+          while skipped_indices:
+            skipped_index = skipped_indices.pop()
+            if unmet_counts[skipped_index] is None:
+              continue
+            unmet_counts[skipped_index] = None
+            finished_task_count += 1
+            msg = 'Skipped calling {0} because a dependency failed.'.format(
+                _GetCallString(target_arg_tuples[skipped_index]))
+            logging.error(msg)
+            error_strings.append(msg)
+            skipped_indices.extend(dependents[skipped_index])
+        else:
+          results[index] = task_manager.tasks[task_id].return_value
+          for dependent in dependents[index]:
+            if unmet_counts[dependent] is not None:
+              unmet_counts[dependent] -= 1
+              if not unmet_counts[dependent]:
+                ready_indices.append(dependent)
 
     except KeyboardInterrupt:
       logging.error(
@@ -538,12 +752,11 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
     raise parallel_exception_class(
         'The following exceptions occurred during parallel execution:'
         '{0}{1}'.format(os.linesep, os.linesep.join(error_strings)))
-  results = [task.return_value for task in task_manager.tasks]
-  assert len(target_arg_tuples) == len(results), (target_arg_tuples, results)
+  assert len(task_manager.tasks) == len(results), (target_arg_tuples, results)
   return results
 
 
-def RunParallelThreads(target_arg_tuples, max_concurrency):
+def RunParallelThreads(target_arg_tuples, max_concurrency, dependencies=None):
   """Executes function calls concurrently in separate threads.
 
   Args:
@@ -551,6 +764,11 @@ def RunParallelThreads(target_arg_tuples, max_concurrency):
         contains the function to call and the arguments to pass it.
     max_concurrency: int or None. The maximum number of concurrent new
         threads.
+    dependencies: Optional list with one element per entry of
+        target_arg_tuples. Element i is an iterable of the indices of the calls
+        that must complete successfully before call i is started. Each call is
+        started as soon as its dependencies have completed, and is skipped if
+        any of them fails.
 
   Returns:
     list of function return values in the order corresponding to the order of
@@ -558,11 +776,12 @@ def RunParallelThreads(target_arg_tuples, max_concurrency):
 
   Raises:
     errors.VmUtil.ThreadException: When an exception occurred in any of the
-        called functions.
+        called functions, or a call was skipped because a dependency failed.
+    ValueError: If dependencies are invalid.
   """
   return _RunParallelTasks(
-      target_arg_tuples, max_concurrency, _BackgroundThreadTaskManager,
-      errors.VmUtil.ThreadException)
+      target_arg_tuples, max_concurrency, _GetThreadTaskManagerClass(),
+      errors.VmUtil.ThreadException, dependencies=dependencies)
 
 
 def RunThreaded(target, thread_params, max_concurrent_threads=200):
@@ -648,7 +867,7 @@ def RunParallelProcesses(target_arg_tuples, max_concurrency):
   try:
     old_handler = signal.signal(signal.SIGINT, handle_sigint)
     ret_val = _RunParallelTasks(
-        target_arg_tuples, max_concurrency, _BackgroundProcessTaskManager,
+        target_arg_tuples, max_concurrency, _GetProcessTaskManagerClass(),
         errors.VmUtil.CalledProcessException)
   finally:
     if old_handler:
@@ -36,6 +36,8 @@ class BaseBackgroundWorkload(object):
   __metaclass__ = AutoRegisterBackgroundWorkloadMeta
 
   EXCLUDED_OS_TYPES = []
+  # PerfKit packages installed on the VM before Prepare is called.
+  PACKAGES = []
 
   @staticmethod
   def IsEnabled(vm):
@@ -62,17 +64,13 @@ class CpuWorkload(BaseBackgroundWorkload):
   """Workload that runs sysbench in the background."""
 
   EXCLUDED_OS_TYPES = os_types.WINDOWS_OS_TYPES
+  PACKAGES = ['sysbench']
 
   @staticmethod
   def IsEnabled(vm):
     """Returns true if this background workload is enabled on this VM."""
     return bool(vm.background_cpu_threads)
 
-  @staticmethod
-  def Prepare(vm):
-    """Prepares the background workload on this VM."""
-    vm.Install('sysbench')
-
   @staticmethod
   def Start(vm):
     """Starts the background workload on this VM."""
@@ -90,17 +88,13 @@ class NetworkWorkload(BaseBackgroundWorkload):
   """Workload that runs iperf in the background."""
 
   EXCLUDED_OS_TYPES = os_types.WINDOWS_OS_TYPES
+  PACKAGES = ['iperf']
 
   @staticmethod
   def IsEnabled(vm):
     """Returns true if this background workload is enabled on this VM."""
     return bool(vm.background_network_mbits_per_sec)
 
-  @staticmethod
-  def Prepare(vm):
-    """Prepares the background workload on this VM."""
-    vm.Install('iperf')
-
   @staticmethod
   def Start(vm):
     """Starts the background workload on this VM."""
@@ -183,9 +183,11 @@ def _GetBenchmarksFromUserConfig(user_config):
 
 
 def _GetConfigForAxis(benchmark_config, flag_config):
+  # The flags dict is only updated, so a shallow copy keeps the cached config
+  # flags intact without deep copying them for each combination.
   config = copy.copy(benchmark_config)
   config_local_flags = config.get('flags', {})
-  config['flags'] = copy.deepcopy(configs.GetConfigFlags())
+  config['flags'] = dict(configs.GetConfigFlags())
   config['flags'].update(config_local_flags)
   for setting in flag_config:
     config['flags'].update(setting)
@@ -16,6 +16,7 @@
 import contextlib
 import copy
 import copy_reg
+import functools
 import logging
 import os
 import pickle
@@ -30,6 +31,7 @@ from perfkitbenchmarker import disk
 from perfkitbenchmarker import dpb_service
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import golden_image
 from perfkitbenchmarker import managed_relational_db
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import provider_info
@@ -55,10 +57,34 @@ def UnPickleLock(locked, *args):
 
 copy_reg.pickle(thread.LockType, PickleLock)
 
+
+def _LogAndContinueOnError(function, action):
+  """Wraps a teardown function so that exceptions are logged, not raised.
+
+  Args:
+    function: Function that takes no arguments.
+    action: string. Describes the function in the logged message, e.g.
+        'deleting VMs'.
+
+  Returns:
+    A function that takes no arguments.
+  """
+  def Wrapped():
+    try:
+      function()
+    except Exception:
+      logging.exception('Got an exception %s. '
+                        'Attempting to continue tearing down.', action)
+  return Wrapped
+
+
 SUPPORTED = 'strict'
 NOT_EXCLUDED = 'permissive'
 SKIP_CHECK = 'none'
 
+# Maximum number of resources created or deleted concurrently.
+_MAX_RESOURCE_THREADS = 200
+
 FLAGS = flags.FLAGS
 
 flags.DEFINE_enum('cloud', providers.GCP, providers.VALID_CLOUDS,
@@ -114,6 +140,7 @@ class BenchmarkSpec(object):
     self.dpb_service = None
     self.container_cluster = None
     self.managed_relational_db = None
+    self.golden_images = golden_image.GoldenImageManager(self.name)
 
     self._zone_index = 0
 
@@ -319,25 +346,109 @@ class BenchmarkSpec(object):
     targets = [(vm.PrepareBackgroundWorkload, (), {}) for vm in self.vms]
     vm_util.RunParallelThreads(targets, len(targets))
 
-  def Provision(self):
-    """Prepares the VMs and networks necessary for the benchmark to run."""
-    # Sort networks into a guaranteed order of creation based on dict key.
-    # There is a finite limit on the number of threads that are created to
-    # provision networks. Until support is added to provision resources in an
-    # order based on dependencies, this key ordering can be used to avoid
-    # deadlock by placing dependent networks later and their dependencies
-    # earlier. As an example, AWS stores both per-region and per-zone objects
-    # in this dict, and each per-zone object depends on a corresponding
-    # per-region object, so the per-region objects are given keys that come
-    # first when sorted.
-    networks = [self.networks[key] for key in sorted(self.networks.iterkeys())]
-    vm_util.RunThreaded(lambda net: net.Create(), networks)
+  def CreateGoldenImages(self):
+    """Saves images of the VMs, with their packages, for use by later runs.
 
+    Only VMs that were looked up with --golden_images and whose image is
+    missing or out of date are saved, after installing the packages that the
+    benchmark installed on them in an earlier run.
+    """
+    self.golden_images.CreateImages(self.vm_groups)
+
+  def RecordGoldenImagePackages(self):
+    """Records the packages the benchmark installed, for CreateGoldenImages."""
+    self.golden_images.RecordPackages(self.vm_groups)
+
+  def _GetManagedResources(self):
+    """Returns the resources created by Provision and deleted by Delete.
+
+    Returns:
+      A list of (name, resource) tuples. Names are stable across runs so that
+      they can be used in sample metric names.
+    """
+    resources = []
     if self.container_cluster:
-      self.container_cluster.Create()
+      resources.append(('Container Cluster', self.container_cluster))
+    for key in sorted(self.networks.iterkeys()):
+      name = ' '.join(['Network'] + [str(part) for part in key])
+      resources.append((name, self.networks[key]))
+    for index, vm in enumerate(self.vms):
+      resources.append(('VM %d' % index, vm))
+    if self.spark_service:
+      resources.append(('Spark Service', self.spark_service))
+    if self.dpb_service:
+      resources.append(('Dpb Service', self.dpb_service))
+    if self.managed_relational_db:
+      resources.append(('Managed Relational Db', self.managed_relational_db))
+    return resources
+
+  @staticmethod
+  def _GetResourceDependencies(resources):
+    """Returns the dependencies among resources as lists of indices.
+
+    Args:
+      resources: list of (name, resource) tuples.
+
+    Returns:
+      A list with one element per resource. Element i is a list of the indices
+      of the resources that must be created before resource i. Dependencies on
+      objects that are not in 'resources' are dropped.
+    """
+    indices = {id(resource): i for i, (_, resource) in enumerate(resources)}
+    return [[indices[id(dependency)]
+             for dependency in resource.GetResourceDependencies()
+             if id(dependency) in indices]
+            for _, resource in resources]
+
+  @staticmethod
+  def _RunResourceGraph(operation, names, functions, dependencies, timer):
+    """Runs one function per resource as soon as its dependencies are done.
+
+    Args:
+      operation: string. 'Create' or 'Delete'. Prefixes the name of each
+          interval recorded in timer.
+      names: list of resource names.
+      functions: list of functions, one per resource, that take no arguments.
+      dependencies: list with one element per resource. Element i is a list of
+          the indices of the functions that must complete before function i.
+      timer: An IntervalTimer, or None. If provided, the runtime of each
+          function is measured.
+    """
+    def _Run(name, function):
+      if timer:
+        with timer.Measure('%s %s' % (operation, name)):
+          function()
+      else:
+        function()
+
+    targets = [(_Run, (name, function), {})
+               for name, function in zip(names, functions)]
+    if targets:
+      vm_util.RunParallelThreads(targets, _MAX_RESOURCE_THREADS,
+                                 dependencies=dependencies)
+
+  def Provision(self, timer=None):
+    """Prepares the VMs and networks necessary for the benchmark to run.
+
+    Resources are created concurrently as soon as all of the resources they
+    depend on (see BaseResource.GetResourceDependencies) have been created, so
+    the wall time of this method is that of the critical path.
+
+    Args:
+      timer: An optional IntervalTimer that measures the creation time of
+          each resource.
+    """
+    resources = self._GetManagedResources()
+    names = [name for name, _ in resources]
+    vm_ids = set(id(vm) for vm in self.vms)
+    functions = [functools.partial(self.PrepareVm, resource, timer=timer,
+                                   name=name)
+                 if id(resource) in vm_ids else resource.Create
+                 for name, resource in resources]
+    self._RunResourceGraph('Create', names, functions,
+                           self._GetResourceDependencies(resources), timer)
 
     if self.vms:
-      vm_util.RunThreaded(self.PrepareVm, self.vms)
       sshable_vms = [vm for vm in self.vms if vm.OS_TYPE != os_types.WINDOWS]
       sshable_vm_groups = {}
       for group_name, group_vms in self.vm_groups.iteritems():
@@ -345,31 +456,59 @@ class BenchmarkSpec(object):
             vm for vm in group_vms if vm.OS_TYPE != os_types.WINDOWS
         ]
       vm_util.GenerateSSHConfig(sshable_vms, sshable_vm_groups)
-    if self.spark_service:
-      self.spark_service.Create()
-    if self.dpb_service:
-      self.dpb_service.Create()
-    if self.managed_relational_db:
-      self.managed_relational_db.Create()
 
-  def Delete(self):
+  def Delete(self, timer=None):
+    """Deletes the resources created by Provision.
+
+    Resources are deleted in the reverse order of their dependencies, with
+    independent resources deleted concurrently. Failures to delete VMs,
+    firewalls and networks are logged so that teardown can continue.
+
+    Args:
+      timer: An optional IntervalTimer that measures the deletion time of
+          each resource.
+    """
     if self.deleted:
       return
 
-    if self.spark_service:
-      self.spark_service.Delete()
-    if self.dpb_service:
-      self.dpb_service.Delete()
-    if self.managed_relational_db:
-      self.managed_relational_db.Delete()
+    resources = self._GetManagedResources()
+    names = [name for name, _ in resources]
+    vm_ids = set(id(vm) for vm in self.vms)
+    network_ids = set(id(net) for net in self.networks.itervalues())
+    functions = []
+    for _, resource in resources:
+      if id(resource) in vm_ids:
+        functions.append(_LogAndContinueOnError(
+            functools.partial(self.DeleteVm, resource), 'deleting VMs'))
+      elif id(resource) in network_ids:
+        functions.append(_LogAndContinueOnError(resource.Delete,
+                                                'deleting networks'))
+      else:
+        functions.append(resource.Delete)
+    # A resource may only be deleted once everything that depends on it has
+    # been deleted.
+    dependencies = [[] for _ in resources]
+    resource_dependencies = self._GetResourceDependencies(resources)
+    for index, index_dependencies in enumerate(resource_dependencies):
+      for dependency in index_dependencies:
+        dependencies[dependency].append(index)
+    # Firewalls are disabled after the VMs are deleted but before the networks.
+    firewall_index = len(functions)
+    names.append('Firewalls')
+    functions.append(_LogAndContinueOnError(self._DisallowAllFirewallPorts,
+                                            'disabling firewalls'))
+    dependencies.append([i for i, (_, resource) in enumerate(resources)
+                         if id(resource) in vm_ids])
+    for index, (_, resource) in enumerate(resources):
+      if id(resource) in network_ids:
+        dependencies[index].append(firewall_index)
+
+    self._RunResourceGraph('Delete', names, functions, dependencies, timer)
 
-    if self.vms:
-      try:
-        vm_util.RunThreaded(self.DeleteVm, self.vms)
-      except Exception:
-        logging.exception('Got an exception deleting VMs. '
-                          'Attempting to continue tearing down.')
+    self.deleted = True
 
+  def _DisallowAllFirewallPorts(self):
+    """Closes all ports opened on the spec's firewalls."""
     for firewall in self.firewalls.itervalues():
       try:
         firewall.DisallowAllPorts()
@@ -377,17 +516,6 @@ class BenchmarkSpec(object):
         logging.exception('Got an exception disabling firewalls. '
                           'Attempting to continue tearing down.')
 
-    for net in self.networks.itervalues():
-      try:
-        net.Delete()
-      except Exception:
-        logging.exception('Got an exception deleting networks. '
-                          'Attempting to continue tearing down.')
-    if self.container_cluster:
-      self.container_cluster.Delete()
-
-    self.deleted = True
-
   def StartBackgroundWorkload(self):
     targets = [(vm.StartBackgroundWorkload, (), {}) for vm in self.vms]
     vm_util.RunParallelThreads(targets, len(targets))
@@ -420,11 +548,15 @@ class BenchmarkSpec(object):
 
     return vm_class(vm_spec)
 
-  def PrepareVm(self, vm):
+  def PrepareVm(self, vm, timer=None, name=None):
     """Creates a single VM and prepares a scratch disk if required.
 
     Args:
         vm: The BaseVirtualMachine object representing the VM.
+        timer: An optional IntervalTimer that measures each step of preparing
+            the scratch disks.
+        name: string. The name of the VM in the names of the measured
+            intervals, e.g. 'VM 0'.
     """
     vm_metadata = {
         'benchmark': self.name,
@@ -437,6 +569,11 @@ class BenchmarkSpec(object):
       key, value = item.split(':', 1)
       vm_metadata[key] = value
 
+    if FLAGS.golden_images:
+      group_name = next(name for name, vms in self.vm_groups.iteritems()
+                        if any(group_vm is vm for group_vm in vms))
+      self.golden_images.BeforeCreate(vm, group_name)
+
     vm.Create()
 
     logging.info('VM: %s', vm.ip_address)
@@ -445,10 +582,10 @@ class BenchmarkSpec(object):
     vm.WaitForBootCompletion()
     vm.AddMetadata(**vm_metadata)
     vm.OnStartup()
+    self.golden_images.AfterBoot(vm)
     if any((spec.disk_type == disk.LOCAL for spec in vm.disk_specs)):
       vm.SetupLocalDisks()
-    for disk_spec in vm.disk_specs:
-      vm.CreateScratchDisk(disk_spec)
+    vm.CreateScratchDisks(timer=timer, name=name)
 
     # This must come after Scratch Disk creation to support the
     # Containerized VM case
@@ -462,6 +599,7 @@ class BenchmarkSpec(object):
     """
     if vm.is_static and vm.install_packages:
       vm.PackageCleanup()
+    vm.CloseRemoteConnections()
     vm.Delete()
     vm.DeleteScratchDisks()
 
@@ -0,0 +1,397 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runs many local commands concurrently from a single thread.
+
+The CommandEngine starts each command as a child process whose stdout and
+stderr are pipes, and a single thread multiplexes the pipes of all running
+commands with poll(2). The output of a command is buffered in memory up to
+--command_output_spill_bytes per stream and spilled to a temporary file
+beyond that. Commands running past their deadline are killed by the same
+thread, so a command costs no thread of its own, whether its caller waits for
+it right away or collects many CommandFutures and waits for them later.
+"""
+
+import errno
+import fcntl
+import heapq
+import logging
+import os
+import select
+import subprocess
+import tempfile
+import threading
+import time
+
+from perfkitbenchmarker import flags
+
+flags.DEFINE_boolean('multiplex_commands', False,
+                     'Run the local commands issued by PKB, such as ssh and '
+                     'cloud CLI commands, from one thread that multiplexes '
+                     'their output, instead of one timer thread and two '
+                     'temporary files per command. Not supported on '
+                     'Windows.')
+flags.DEFINE_integer('command_output_spill_bytes', 1 << 20,
+                     'Size of the output of a stream of a local command '
+                     'beyond which it is written to a temporary file instead '
+                     'of being kept in memory.', lower_bound=0)
+
+FLAGS = flags.FLAGS
+
+_READ_SIZE = 1 << 16
+
+# How often processes are checked for exit while their pipes are open. Pipes
+# may outlive the process, e.g. when ssh forks a ControlPersist master that
+# inherits them.
+_EXIT_CHECK_INTERVAL = 0.5
+# How often processes whose pipes are closed are checked for exit.
+_REAP_INTERVAL = 0.01
+
+
+def IsSupported():
+  """Returns whether commands can be multiplexed on this platform."""
+  return hasattr(select, 'poll')
+
+
+class CommandFuture(object):
+  """The eventual result of an operation running in the background.
+
+  Callbacks added with AddDoneCallback run in the thread that completes the
+  future, which may be the CommandEngine thread, so they must not block.
+  """
+
+  def __init__(self):
+    self._done = threading.Event()
+    self._lock = threading.Lock()
+    self._callbacks = []
+    self._result = None
+    self._exception = None
+
+  def done(self):
+    """Returns whether the result or exception has been set."""
+    return self._done.is_set()
+
+  def _Complete(self, result, exception):
+    with self._lock:
+      self._result = result
+      self._exception = exception
+      self._done.set()
+      callbacks, self._callbacks = self._callbacks, []
+    for callback in callbacks:
+      self._RunCallback(callback)
+
+  def SetResult(self, result):
+    self._Complete(result, None)
+
+  def SetException(self, exception):
+    self._Complete(None, exception)
+
+  def _RunCallback(self, callback):
+    try:
+      callback(self)
+    except Exception:
+      logging.exception('Exception in command future callback.')
+
+  def AddDoneCallback(self, callback):
+    """Calls callback(future) when the future is done, or now if it is."""
+    with self._lock:
+      if not self._done.is_set():
+        self._callbacks.append(callback)
+        return
+    self._RunCallback(callback)
+
+  def Result(self, timeout=None):
+    """Waits for the future and returns its result or raises its exception.
+
+    Args:
+      timeout: float. Seconds to wait, or None to wait indefinitely.
+
+    Raises:
+      RuntimeError: if 'timeout' expires before the future is done.
+    """
+    # Event.wait without a timeout cannot be interrupted by signals in
+    # Python 2, so wait in slices.
+    deadline = None if timeout is None else time.time() + timeout
+    while not self._done.wait(1):
+      if deadline is not None and time.time() >= deadline:
+        raise RuntimeError('Timed out waiting for a command future.')
+    if self._exception is not None:
+      raise self._exception
+    return self._result
+
+
+class _OutputBuffer(object):
+  """Accumulates the output of a stream in memory, then in a temporary file."""
+
+  def __init__(self, spill_bytes):
+    self._spill_bytes = spill_bytes
+    self._chunks = []
+    self._size = 0
+    self._file = None
+
+  def Write(self, data):
+    if self._file is not None:
+      self._file.write(data)
+      return
+    self._chunks.append(data)
+    self._size += len(data)
+    if self._size > self._spill_bytes:
+      self._file = tempfile.TemporaryFile()
+      self._file.write(''.join(self._chunks))
+      self._chunks = []
+
+  def GetValue(self):
+    """Returns everything written, and releases the temporary file."""
+    if self._file is None:
+      return ''.join(self._chunks)
+    self._file.seek(0)
+    value = self._file.read()
+    self._file.close()
+    self._file = None
+    self._chunks = [value]
+    return value
+
+
+class RunningCommand(CommandFuture):
+  """A command started by a CommandEngine.
+
+  Its result is a (stdout, stderr, returncode) tuple. stdout and stderr are
+  decoded as ASCII, ignoring other characters.
+
+  Attributes:
+    cmd: list of strings. The command.
+    process: subprocess.Popen. The child process.
+    deadline: float or None. The time at which the command is killed.
+  """
+
+  def __init__(self, cmd, process, deadline, spill_bytes):
+    super(RunningCommand, self).__init__()
+    self.cmd = cmd
+    self.process = process
+    self.deadline = deadline
+    self.timeout = None
+    # Whether the process was seen to exit before the last poll.
+    self.exited = False
+    self._buffers = {process.stdout.fileno(): _OutputBuffer(spill_bytes),
+                     process.stderr.fileno(): _OutputBuffer(spill_bytes)}
+    self.open_fds = set(self._buffers)
+
+  def Write(self, fd, data):
+    self._buffers[fd].Write(data)
+
+  def Close(self, fd):
+    self.open_fds.discard(fd)
+
+  def Finish(self):
+    """Sets the result once the process has exited."""
+    stdout = self._buffers[self.process.stdout.fileno()].GetValue()
+    stderr = self._buffers[self.process.stderr.fileno()].GetValue()
+    for stream in (self.process.stdin, self.process.stdout,
+                   self.process.stderr):
+      stream.close()
+    self.SetResult((stdout.decode('ascii', 'ignore'),
+                    stderr.decode('ascii', 'ignore'),
+                    self.process.returncode))
+
+
+def _SetNonBlocking(fd):
+  flags_value = fcntl.fcntl(fd, fcntl.F_GETFL)
+  fcntl.fcntl(fd, fcntl.F_SETFL, flags_value | os.O_NONBLOCK)
+
+
+class CommandEngine(object):
+  """Runs commands as child processes multiplexed by a single thread."""
+
+  def __init__(self, spill_bytes):
+    self._spill_bytes = spill_bytes
+    self._lock = threading.Lock()
+    self._new_commands = []
+    self._thread = None
+    self._wake_read, self._wake_write = os.pipe()
+    for fd in (self._wake_read, self._wake_write):
+      _SetNonBlocking(fd)
+      fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+
+  def Start(self, cmd, env=None, timeout=None, cwd=None):
+    """Starts a command.
+
+    Args:
+      cmd: list of strings. The command, as given to subprocess.Popen.
+      env: dict or None. The environment of the command.
+      timeout: float or None. Seconds after which the command is killed.
+      cwd: string or None. The working directory of the command.
+
+    Returns:
+      A RunningCommand.
+    """
+    # close_fds keeps the pipes of the other commands, which are being
+    # created concurrently, from leaking into the child and delaying their
+    # end of file.
+    process = subprocess.Popen(cmd, env=env, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               cwd=cwd, close_fds=True)
+    deadline = None if timeout is None else time.time() + timeout
+    command = RunningCommand(cmd, process, deadline, self._spill_bytes)
+    command.timeout = timeout
+    for fd in command.open_fds:
+      _SetNonBlocking(fd)
+    with self._lock:
+      self._new_commands.append(command)
+      if self._thread is None:
+        self._thread = threading.Thread(target=self._Loop,
+                                        name='CommandEngine')
+        self._thread.daemon = True
+        self._thread.start()
+    self._Wake()
+    return command
+
+  def _Wake(self):
+    try:
+      os.write(self._wake_write, 'x')
+    except OSError as e:
+      # The pipe is full, so the thread will wake up anyway.
+      if e.errno != errno.EAGAIN:
+        raise
+
+  def _Loop(self):
+    running = set()
+    try:
+      self._Multiplex(running)
+    except Exception as e:  # pylint: disable=broad-except
+      logging.exception('CommandEngine failed. Killing its commands.')
+      with self._lock:
+        running.update(self._new_commands)
+        self._new_commands = []
+        # The next command starts a new thread.
+        self._thread = None
+      for command in running:
+        if command.process.poll() is None:
+          command.process.kill()
+          command.process.wait()
+        for stream in (command.process.stdin, command.process.stdout,
+                       command.process.stderr):
+          stream.close()
+        command.SetException(e)
+
+  def _Multiplex(self, running):
+    """Runs commands until an unexpected error occurs.
+
+    Args:
+      running: set. Filled with the commands taken from the queue of new
+          commands that have not completed yet.
+    """
+    poller = select.poll()
+    poller.register(self._wake_read, select.POLLIN)
+    commands_by_fd = {}
+    deadlines = []
+    while True:
+      with self._lock:
+        new_commands, self._new_commands = self._new_commands, []
+      for command in new_commands:
+        running.add(command)
+        for fd in command.open_fds:
+          poller.register(fd, select.POLLIN)
+          commands_by_fd[fd] = command
+        if command.deadline is not None:
+          heapq.heappush(deadlines, (command.deadline, id(command), command))
+
+      timeout = None
+      if running:
+        if any(command.exited or not command.open_fds
+               for command in running):
+          timeout = _REAP_INTERVAL
+        else:
+          timeout = _EXIT_CHECK_INTERVAL
+      while deadlines and deadlines[0][2].done():
+        heapq.heappop(deadlines)
+      if deadlines:
+        until_deadline = max(0, deadlines[0][0] - time.time())
+        timeout = (until_deadline if timeout is None
+                   else min(timeout, until_deadline))
+
+      try:
+        events = poller.poll(None if timeout is None else timeout * 1000)
+      except select.error as e:
+        if e.args[0] == errno.EINTR:
+          continue
+        raise
+
+      active = set()
+      for fd, _ in events:
+        if fd == self._wake_read:
+          try:
+            while os.read(self._wake_read, _READ_SIZE):
+              pass
+          except OSError as e:
+            if e.errno != errno.EAGAIN:
+              raise
+          continue
+        command = commands_by_fd[fd]
+        active.add(command)
+        try:
+          data = os.read(fd, _READ_SIZE)
+        except OSError as e:
+          if e.errno in (errno.EAGAIN, errno.EINTR):
+            continue
+          data = ''
+        if data:
+          command.Write(fd, data)
+        else:
+          poller.unregister(fd)
+          del commands_by_fd[fd]
+          command.Close(fd)
+
+      now = time.time()
+      while deadlines and deadlines[0][0] <= now:
+        _, _, command = heapq.heappop(deadlines)
+        if not command.done() and command.process.poll() is None:
+          logging.error('IssueCommand timed out after %d seconds. '
+                        'Killing command "%s".', command.timeout,
+                        ' '.join(command.cmd))
+          command.process.kill()
+
+      for command in list(running):
+        if not command.exited:
+          if command.process.poll() is None:
+            continue
+          command.exited = True
+          if command.open_fds:
+            # Poll once more, so that output written just before the exit is
+            # read.
+            continue
+        # All output written by the process itself has been read by now, so
+        # pipes without data are held open by other processes.
+        if command.open_fds and command in active:
+          continue
+        for fd in list(command.open_fds):
+          poller.unregister(fd)
+          del commands_by_fd[fd]
+          command.Close(fd)
+        running.remove(command)
+        try:
+          command.Finish()
+        except Exception as e:  # pylint: disable=broad-except
+          command.SetException(e)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def GetEngine():
+  """Returns the CommandEngine shared by the process."""
+  global _engine
+  with _engine_lock:
+    if _engine is None:
+      _engine = CommandEngine(FLAGS.command_output_spill_bytes)
+    return _engine
@@ -62,22 +62,37 @@ VM specs, disk specs, or any component of the benchmark configuration
 dictionary.
 """
 
-import contextlib2
 import copy
 import functools32
+import hashlib
 import logging
+import marshal
+import os
 import re
+import threading
 import yaml
 
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import temp_dir
 
 FLAGS = flags.FLAGS
 CONFIG_CONSTANTS = 'default_config_constants.yaml'
 FLAGS_KEY = 'flags'
 IMPORT_REGEX = re.compile('^#import (.*)')
 
+# Parsed YAML documents are cached in this subdirectory of the PKB version
+# directory under --temp_dir, and in memory, keyed by a hash of their text.
+# Changing the prefix invalidates the cache.
+_PARSED_YAML_DIR = 'parsed_configs'
+_PARSED_YAML_KEY_PREFIX = 'yaml-%s-marshal-%d\n' % (yaml.__version__,
+                                                    marshal.version)
+_IMMUTABLE_TYPES = (basestring, int, long, float, type(None))
+
+_parsed_yaml = {}
+_parsed_yaml_lock = threading.Lock()
+
 flags.DEFINE_string('benchmark_config_file', None,
                     'The file path to the user config file which will '
                     'override benchmark defaults. This should either be '
@@ -93,27 +108,116 @@ flags.DEFINE_multistring(
     'default.vm_count=4).')
 
 
-class _ConcatenatedFiles(object):
-  """Class that presents several files as a single object.
+def _CopyConfig(config):
+  """Returns a deep copy of a config.
+
+  Dicts, lists and immutable values, which make up parsed YAML, are copied
+  much faster than by copy.deepcopy. Other values are copied with it.
+  """
+  if type(config) is dict:
+    return {key: _CopyConfig(value) for key, value in config.iteritems()}
+  if type(config) is list:
+    return [_CopyConfig(value) for value in config]
+  if isinstance(config, _IMMUTABLE_TYPES):
+    return config
+  return copy.deepcopy(config)
+
 
-  The class exposes a single method (read) which is all that yaml
-  needs to interact with a stream.
+def _GetParsedYamlDir():
+  """Returns the directory of the parsed YAML cache files, or None.
 
-  Attributes:
-    files: A list of opened file objects.
-    current_file_index: The index of the current file that is being read from.
+  The files are only read from a directory that only the current user can
+  write to, since unmarshalling untrusted data is unsafe. They are not used
+  before flags are parsed, since --temp_dir is not known yet.
   """
+  if not FLAGS.is_parsed():
+    return None
+  path = os.path.join(temp_dir.GetVersionDirPath(), _PARSED_YAML_DIR)
+  try:
+    if not os.path.isdir(path):
+      os.makedirs(path, 0o700)
+    stat = os.stat(path)
+  except OSError as e:
+    logging.debug('Could not create the parsed config cache: %s', e)
+    return None
+  if hasattr(os, 'getuid') and (stat.st_uid != os.getuid() or
+                                stat.st_mode & 0o077):
+    logging.debug('Not using the parsed config cache %s, which other users '
+                  'can access.', path)
+    return None
+  return path
+
+
+def _ReadParsedYaml(key):
+  cache_dir = _GetParsedYamlDir()
+  if cache_dir is None:
+    return None
+  try:
+    with open(os.path.join(cache_dir, key), 'rb') as cache_file:
+      data = cache_file.read()
+    marshal.loads(data)
+  except IOError:
+    return None
+  except Exception as e:  # pylint: disable=broad-except
+    # A corrupt cache file is a cache miss.
+    logging.debug('Could not read the parsed config %s: %s', key, e)
+    return None
+  return data
+
+
+def _WriteParsedYaml(key, data):
+  """Writes a cache file atomically, so concurrent runs read whole files."""
+  cache_dir = _GetParsedYamlDir()
+  if cache_dir is None:
+    return
+  path = os.path.join(cache_dir, key)
+  temp_path = '%s.%d' % (path, os.getpid())
+  try:
+    with open(temp_path, 'wb') as cache_file:
+      cache_file.write(data)
+    os.rename(temp_path, path)
+  except (IOError, OSError) as e:
+    logging.debug('Could not cache a parsed config: %s', e)
 
-  def __init__(self, files):
-    self.files = files
-    self.current_file_index = 0
 
-  def read(self, length):
-    data = self.files[self.current_file_index].read(length)
-    while (not data) and (self.current_file_index + 1 < len(self.files)):
-      self.current_file_index += 1
-      data = self.files[self.current_file_index].read(length)
-    return data
+def _LoadYaml(text, name=None):
+  """Parses a YAML document, reusing the result of parsing the same text.
+
+  Results are kept marshalled, which unmarshals to a new copy much faster than
+  yaml.load parses the text. Documents with values that marshal cannot
+  represent, such as dates, are parsed every time.
+
+  Args:
+    text: str. The YAML document.
+    name: str or None. If given, only this top level key of the document is
+        returned, and cached.
+
+  Returns:
+    A new copy of the parsed document, or of its 'name' key.
+
+  Raises:
+    KeyError: if the document has no 'name' key.
+  """
+  if isinstance(text, unicode):
+    text = text.encode('utf-8')
+  key = hashlib.sha1('%s%s\n%s' % (_PARSED_YAML_KEY_PREFIX, name or '',
+                                   text)).hexdigest()
+  with _parsed_yaml_lock:
+    data = _parsed_yaml.get(key)
+  if data is None:
+    data = _ReadParsedYaml(key)
+    if data is None:
+      config = yaml.load(text)
+      if name is not None:
+        config = config[name]
+      try:
+        data = marshal.dumps(config)
+      except ValueError:
+        return config
+      _WriteParsedYaml(key, data)
+    with _parsed_yaml_lock:
+      _parsed_yaml[key] = data
+  return marshal.loads(data)
 
 
 def _GetImportFiles(config_file, imported_set=None):
@@ -152,10 +256,11 @@ def _GetImportFiles(config_file, imported_set=None):
 
 def _LoadUserConfig(path):
   """Loads a user config from the supplied path."""
-  config_files = _GetImportFiles(path)
-  with contextlib2.ExitStack() as stack:
-    files = [stack.enter_context(open(f)) for f in config_files]
-    return yaml.load(_ConcatenatedFiles(files))
+  texts = []
+  for config_file in _GetImportFiles(path):
+    with open(config_file) as f:
+      texts.append(f.read())
+  return _LoadYaml(''.join(texts))
 
 
 @functools32.lru_cache()
@@ -242,10 +347,15 @@ def MergeConfigs(default_config, override_config, warn_new_key=False):
     the override_config.
   """
   def _Merge(d1, d2):
-    merged_dict = copy.deepcopy(d1)
+    # Only the values that are not merged are copied, so that nested dicts
+    # are not copied again at each level.
+    merged_dict = copy.copy(d1)
+    for k, v in d1.iteritems():
+      if k not in d2:
+        merged_dict[k] = _CopyConfig(v)
     for k, v in d2.iteritems():
       if k not in d1:
-        merged_dict[k] = copy.deepcopy(v)
+        merged_dict[k] = _CopyConfig(v)
         if warn_new_key:
           logging.warning('The key "%s" was not in the default config, '
                           'but was in user overrides. This may indicate '
@@ -267,7 +377,8 @@ def LoadMinimalConfig(benchmark_config, benchmark_name):
 
   This function will prepend configs/default_config_constants.yaml to the
   benchmark config prior to loading it. This allows the config to use
-  references to anchors defined in the constants file.
+  references to anchors defined in the constants file. Parsed configs are
+  cached, so loading the same config again returns a copy without parsing it.
 
   Args:
     benchmark_config: str. The default config in YAML format.
@@ -281,7 +392,7 @@ def LoadMinimalConfig(benchmark_config, benchmark_name):
   yaml_config.append(benchmark_config)
 
   try:
-    config = yaml.load('\n'.join(yaml_config))
+    return _LoadYaml('\n'.join(yaml_config), benchmark_name)
   except yaml.parser.ParserError as e:
     raise errors.Config.ParseError(
         'Encountered a problem loading the default benchmark config. Please '
@@ -291,8 +402,6 @@ def LoadMinimalConfig(benchmark_config, benchmark_name):
         'Encountered a problem loading the default benchmark config. Please '
         'ensure that all references are defined. Error received:\n%s' % e)
 
-  return config[benchmark_name]
-
 
 def LoadConfig(benchmark_config, user_config, benchmark_name):
   """Loads a benchmark configuration.
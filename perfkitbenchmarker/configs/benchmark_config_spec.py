@@ -31,6 +31,7 @@ from perfkitbenchmarker import providers
 from perfkitbenchmarker import static_virtual_machine
 from perfkitbenchmarker import spark_service
 from perfkitbenchmarker import managed_relational_db
+from perfkitbenchmarker import module_index
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker.configs import option_decoders
 from perfkitbenchmarker.configs import spec
@@ -62,6 +63,10 @@ class FlagsDecoder(option_decoders.TypeVerifier):
     """
     config_flags = super(FlagsDecoder, self).Decode(value, component_full_name,
                                                     flag_values)
+    if config_flags:
+      # Flags of modules that have not been imported yet are not defined.
+      module_index.ImportModulesDefiningFlags(
+          key for key in config_flags if key not in flag_values)
     merged_flag_values = copy.deepcopy(flag_values)
     if config_flags:
       for key, value in config_flags.iteritems():
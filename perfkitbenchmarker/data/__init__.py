@@ -17,6 +17,8 @@ Due to license restrictions, not all software dependences can be shipped with
 PerfKitBenchmarker.
 Those that can be included in perfkitbenchmarker/data, or
  perfkitbenchmarker/scripts and are loaded via a PackageResourceLoader.
+The modules of the perfkitbenchmarker package itself are resources too, so that
+the standalone ones (e.g. stats_util.py) can be pushed to VMs next to scripts.
 
 Users can specify additional paths to search for required data files using the
 `--data_search_paths` flag.
@@ -150,10 +152,12 @@ DATA_PACKAGE_NAME = 'perfkitbenchmarker.data'
 YCSB_WORKLOAD_DIR_NAME = 'perfkitbenchmarker/data/ycsb'
 SCRIPT_PACKAGE_NAME = 'perfkitbenchmarker.scripts'
 CONFIG_PACKAGE_NAME = 'perfkitbenchmarker.configs'
+PKB_PACKAGE_NAME = 'perfkitbenchmarker'
 DEFAULT_RESOURCE_LOADERS = [PackageResourceLoader(DATA_PACKAGE_NAME),
                             FileResourceLoader(YCSB_WORKLOAD_DIR_NAME),
                             PackageResourceLoader(SCRIPT_PACKAGE_NAME),
-                            PackageResourceLoader(CONFIG_PACKAGE_NAME)]
+                            PackageResourceLoader(CONFIG_PACKAGE_NAME),
+                            PackageResourceLoader(PKB_PACKAGE_NAME)]
 
 
 def _GetResourceLoaders():
@@ -22,6 +22,7 @@ import logging
 
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import resource
+from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.configs import option_decoders
 from perfkitbenchmarker.configs import spec
 
@@ -285,7 +286,10 @@ class BaseDisk(resource.BaseResource):
 
 
 class StripedDisk(BaseDisk):
-  """Object representing several disks striped together."""
+  """Object representing several disks striped together.
+
+  The member disks are created, deleted, attached and detached concurrently.
+  """
 
   is_striped = True
 
@@ -301,17 +305,13 @@ class StripedDisk(BaseDisk):
     self.disks = disks
 
   def _Create(self):
-    for disk in self.disks:
-      disk.Create()
+    vm_util.RunThreaded(lambda disk: disk.Create(), self.disks)
 
   def _Delete(self):
-    for disk in self.disks:
-      disk.Delete()
+    vm_util.RunThreaded(lambda disk: disk.Delete(), self.disks)
 
   def Attach(self, vm):
-    for disk in self.disks:
-      disk.Attach(vm)
+    vm_util.RunThreaded(lambda disk: disk.Attach(vm), self.disks)
 
   def Detach(self):
-    for disk in self.disks:
-      disk.Detach()
+    vm_util.RunThreaded(lambda disk: disk.Detach(), self.disks)
@@ -0,0 +1,370 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Boots VMs from images of VMs prepared by earlier runs.
+
+With --golden_images, the PerfKit packages installed on the first VM of each
+VM group by the prepare phase are recorded locally. The next run of the same
+benchmark installs the recorded packages on the first VM of the group before
+the benchmark's Prepare function runs, and saves its boot disk as a provider
+image, together with a manifest of the packages installed on it. Only package
+installation is captured, not the state left by Prepare, such as generated
+data or started services.
+
+Later runs boot the VMs of the group from that image, and vm.Install skips the
+packages of the manifest whose module, and the modules of whose declared
+dependencies, have not changed since the image was created. Packages that
+changed, or that were recorded after the image was created, are installed
+again, and the image is then replaced.
+
+Images are named after a digest of the benchmark name, the VM group name, the
+cloud, the location of the image, the OS type and the image the VM would
+otherwise boot from. Providers implement BaseImageProvider to look up, create
+and delete images.
+"""
+
+import abc
+import collections
+import hashlib
+import inspect
+import json
+import logging
+import os
+import posixpath
+import threading
+import time
+
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import linux_packages
+from perfkitbenchmarker import os_types
+from perfkitbenchmarker import temp_dir
+from perfkitbenchmarker import vm_util
+
+flags.DEFINE_boolean('golden_images', False,
+                     'Boot VMs from images of VMs prepared by earlier runs of '
+                     'the same benchmark, and create or update those images '
+                     'before the benchmark prepares the VMs. Packages '
+                     'installed on an image are not installed again.')
+flags.DEFINE_string('golden_image_prefix', 'pkb-golden',
+                    'Prefix of the names of the images created by '
+                    '--golden_images.')
+
+FLAGS = flags.FLAGS
+
+# File on the image listing the packages installed on it.
+MANIFEST_PATH = posixpath.join(linux_packages.INSTALL_DIR,
+                               'golden_image.json')
+
+# Local directory recording the packages installed on the VMs of each golden
+# image by the last run.
+_PACKAGE_RECORDS_DIR = 'golden_images'
+
+# Images are only created for OS types whose packages are installed on the
+# boot disk of the VM.
+_SUPPORTED_OS_TYPES = frozenset([os_types.DEBIAN, os_types.RHEL])
+
+_IMAGE_PROVIDER_REGISTRY = {}
+
+GoldenImage = collections.namedtuple('GoldenImage', ['name', 'image_id'])
+
+
+def GetImageProviderClass(cloud):
+  """Returns the BaseImageProvider subclass of 'cloud', or None."""
+  return _IMAGE_PROVIDER_REGISTRY.get(cloud)
+
+
+class AutoRegisterImageProviderMeta(abc.ABCMeta):
+  """Metaclass which registers image providers by their CLOUD."""
+
+  def __init__(cls, name, bases, dct):
+    super(AutoRegisterImageProviderMeta, cls).__init__(name, bases, dct)
+    if cls.CLOUD is not None:
+      _IMAGE_PROVIDER_REGISTRY[cls.CLOUD] = cls
+
+
+class BaseImageProvider(object):
+  """Looks up, creates and deletes the golden images of a cloud."""
+
+  __metaclass__ = AutoRegisterImageProviderMeta
+
+  CLOUD = None
+
+  def GetSourceImage(self, vm):
+    """Returns a string identifying the image 'vm' boots from by default."""
+    return vm.image or type(vm).__name__
+
+  def GetImageLocation(self, vm):
+    """Returns the location whose VMs can boot from the images of 'vm'.
+
+    Images are looked up and created separately for each location.
+    """
+    return vm.zone
+
+  @abc.abstractmethod
+  def FindImage(self, vm, name):
+    """Looks up the latest image named 'name' usable by 'vm'.
+
+    Args:
+      vm: The BaseVirtualMachine that would boot from the image.
+      name: string. The name of the golden image.
+
+    Returns:
+      A GoldenImage, or None if there is no such image.
+    """
+    raise NotImplementedError()
+
+  @abc.abstractmethod
+  def CreateImage(self, vm, name):
+    """Creates an image of the boot disk of 'vm' and waits until it is ready.
+
+    The existing images named 'name' are kept, so that they can be deleted
+    once the new image is ready. Providers whose image names are unique
+    give the new image a name from GetImageVersionName.
+
+    Returns:
+      The created GoldenImage.
+    """
+    raise NotImplementedError()
+
+  @abc.abstractmethod
+  def DeleteImage(self, vm, image):
+    """Deletes a GoldenImage returned by FindImage or CreateImage."""
+    raise NotImplementedError()
+
+  @abc.abstractmethod
+  def UseImage(self, vm, image):
+    """Makes 'vm', which has not been created yet, boot from 'image'."""
+    raise NotImplementedError()
+
+
+def GetImageVersionName(name):
+  """Returns a unique name for a new image of the golden image 'name'."""
+  return '%s-%s' % (name, time.strftime('%Y%m%d%H%M%S', time.gmtime()))
+
+
+def GetPackageDigest(package_name):
+  """Returns a digest of the modules of a package and its dependencies.
+
+  The digest changes whenever the module of the package, or of one of its
+  transitive declared dependencies, changes.
+  """
+  try:
+    package_names = linux_packages.ResolveDependencies([package_name])
+  except (KeyError, ValueError):
+    package_names = [package_name]
+  digest = hashlib.sha256()
+  for name in package_names:
+    try:
+      source = inspect.getsource(linux_packages.PACKAGES[name])
+    except (KeyError, IOError, TypeError):
+      source = name
+    digest.update(source)
+  return digest.hexdigest()[:16]
+
+
+def _GetPackageRecordPath(name):
+  """Returns the path of the local record of the packages of an image."""
+  return os.path.join(temp_dir.GetVersionDirPath(), _PACKAGE_RECORDS_DIR,
+                      name + '.json')
+
+
+def _ReadPackageRecord(name):
+  """Returns the packages recorded for the image 'name', or None."""
+  try:
+    with open(_GetPackageRecordPath(name)) as record_file:
+      return json.load(record_file)
+  except (IOError, ValueError):
+    return None
+
+
+def _WritePackageRecord(name, package_names):
+  """Records the packages to install on the next image named 'name'."""
+  path = _GetPackageRecordPath(name)
+  try:
+    os.makedirs(os.path.dirname(path))
+  except OSError:
+    if not os.path.isdir(os.path.dirname(path)):
+      raise
+  with open(path, 'w') as record_file:
+    json.dump(sorted(package_names), record_file)
+
+
+class GoldenImageManager(object):
+  """Finds and creates the golden images of the VMs of a benchmark.
+
+  Attributes:
+    benchmark_name: string. Part of the names of the images.
+  """
+
+  def __init__(self, benchmark_name):
+    self.benchmark_name = benchmark_name
+    self._lock = threading.Lock()
+    self._providers = {}
+    # Maps image names to the GoldenImage found, or None.
+    self._images = {}
+    # Maps VM names to the name of their image.
+    self._image_names = {}
+    # Maps VM names to the packages restored from the manifest of their image.
+    self._restored_packages = {}
+
+  def _GetProvider(self, vm):
+    """Returns the BaseImageProvider for 'vm', or None if it has none."""
+    if (vm.is_static or not vm.install_packages or
+        vm.OS_TYPE not in _SUPPORTED_OS_TYPES):
+      return None
+    with self._lock:
+      if vm.CLOUD not in self._providers:
+        provider_class = GetImageProviderClass(vm.CLOUD)
+        self._providers[vm.CLOUD] = provider_class and provider_class()
+      return self._providers[vm.CLOUD]
+
+  def GetImageName(self, vm, group_name):
+    """Returns the name of the golden image of a VM."""
+    provider = self._GetProvider(vm)
+    key = [self.benchmark_name, group_name, vm.CLOUD,
+           provider.GetImageLocation(vm), vm.OS_TYPE,
+           provider.GetSourceImage(vm)]
+    digest = hashlib.sha256(json.dumps(key)).hexdigest()[:24]
+    return '%s-%s' % (FLAGS.golden_image_prefix, digest)
+
+  def BeforeCreate(self, vm, group_name):
+    """Makes a VM boot from its golden image if there is one.
+
+    Args:
+      vm: The BaseVirtualMachine, before it is created.
+      group_name: string. The name of the VM group of 'vm'.
+    """
+    provider = self._GetProvider(vm)
+    if provider is None:
+      return
+    name = self.GetImageName(vm, group_name)
+    self._image_names[vm.name] = name
+    with self._lock:
+      if name not in self._images:
+        self._images[name] = provider.FindImage(vm, name)
+      image = self._images[name]
+    if image is None:
+      logging.info('Golden image %s not found. %s boots from %s.',
+                   name, vm.name, vm.image)
+      return
+    logging.info('Booting %s from golden image %s.', vm.name, name)
+    provider.UseImage(vm, image)
+    vm.golden_image = name
+
+  def AfterBoot(self, vm):
+    """Records the packages installed on the golden image of a booted VM."""
+    if not vm.golden_image:
+      return
+    stdout, _ = vm.RemoteCommand('cat %s' % MANIFEST_PATH,
+                                 ignore_failure=True)
+    try:
+      manifest = json.loads(stdout)
+    except ValueError:
+      logging.warning('Golden image %s has no package manifest.',
+                      vm.golden_image)
+      manifest = {}
+    restored = [package_name
+                for package_name, digest in manifest.iteritems()
+                if package_name in linux_packages.PACKAGES and
+                GetPackageDigest(package_name) == digest]
+    stale = sorted(set(manifest) - set(restored))
+    if stale:
+      logging.info('Packages changed since golden image %s was created: %s',
+                   vm.golden_image, ', '.join(stale))
+    vm.MarkPackagesInstalled(restored)
+    self._restored_packages[vm.name] = set(restored)
+
+  def _GetPackagesToInstall(self, vm):
+    """Returns the recorded packages that the image of 'vm' lacks, or None.
+
+    None means that no image needs to be created, because no packages have
+    been recorded yet or because the image has all of them.
+    """
+    recorded = _ReadPackageRecord(self._image_names[vm.name])
+    if not recorded:
+      return None
+    missing = sorted(set(recorded) & set(linux_packages.PACKAGES) -
+                     self._restored_packages.get(vm.name, set()))
+    if vm.golden_image and not missing:
+      return None
+    return missing
+
+  def _CreateImage(self, vm, package_names):
+    """Replaces the golden image of 'vm' after installing packages on it."""
+    provider = self._GetProvider(vm)
+    name = self._image_names[vm.name]
+    logging.info('Installing %s on %s for golden image %s.',
+                 ', '.join(package_names), vm.name, name)
+    vm.InstallMany(package_names)
+    manifest = {package_name: GetPackageDigest(package_name)
+                for package_name in vm.GetInstalledPackages()}
+    vm.RemoteCommand("echo '%s' > %s && sync" % (json.dumps(manifest),
+                                                 MANIFEST_PATH))
+    logging.info('Creating golden image %s from %s.', name, vm.name)
+    image = provider.CreateImage(vm, name)
+    # The old image is only deleted once the new one is ready, so that a
+    # failure to create it leaves the old image in place.
+    old_image = self._images.get(name)
+    self._images[name] = image
+    if old_image is not None:
+      logging.info('Deleting the previous golden image %s (%s).', name,
+                   old_image.image_id)
+      provider.DeleteImage(vm, old_image)
+
+  def _GetImageVms(self, vm_groups):
+    """Returns the VMs that golden images are created from, one per group."""
+    return [group_vms[0]
+            for _, group_vms in sorted(vm_groups.iteritems())
+            if group_vms and group_vms[0].name in self._image_names]
+
+  def CreateImages(self, vm_groups):
+    """Creates the missing and out of date golden images.
+
+    The image of each VM group is created from its first VM, after
+    installing the packages recorded by RecordPackages in an earlier run.
+    Failures are logged, since the benchmark can run without the images.
+
+    Args:
+      vm_groups: dict mapping VM group names to lists of VMs, after they have
+          booted and before the benchmark prepares them.
+    """
+    targets = []
+    for vm in self._GetImageVms(vm_groups):
+      package_names = self._GetPackagesToInstall(vm)
+      if package_names is not None:
+        targets.append(((vm, package_names), {}))
+
+    def _CreateImageAndLogErrors(vm, package_names):
+      try:
+        self._CreateImage(vm, package_names)
+      except Exception:
+        logging.exception('Failed to create the golden image of %s.', vm.name)
+
+    if targets:
+      vm_util.RunThreaded(_CreateImageAndLogErrors, targets)
+
+  def RecordPackages(self, vm_groups):
+    """Records the packages installed on the VMs that images are created from.
+
+    The next run installs the recorded packages on the new images.
+
+    Args:
+      vm_groups: dict mapping VM group names to lists of VMs, after the
+          benchmark has prepared them.
+    """
+    for vm in self._GetImageVms(vm_groups):
+      try:
+        _WritePackageRecord(self._image_names[vm.name],
+                            vm.GetInstalledPackages())
+      except (IOError, OSError):
+        logging.exception('Failed to record the packages of %s.', vm.name)
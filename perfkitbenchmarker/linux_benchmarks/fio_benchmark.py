@@ -150,8 +150,6 @@ flags.DEFINE_integer('fio_log_avg_msec', 1000,
                      'log an entry for every IO that completes, this can grow '
                      'very quickly in size and can cause performance overhead.',
                      lower_bound=0)
-flags.DEFINE_boolean('fio_hist_log', False,
-                     'Whether to collect clat histogram.')
 flags.DEFINE_integer('fio_log_hist_msec', 1000,
                      'Same as fio_log_avg_msec, but logs entries for '
                      'completion latency histograms. If set to 0, histogram '
@@ -35,6 +35,7 @@ from perfkitbenchmarker import data
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import sample
+from perfkitbenchmarker import stats_util
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import netperf
 
@@ -142,35 +143,8 @@ def _HistogramStatsCalculator(histogram, percentiles=PERCENTILES):
   Returns:
     A dict mapping stat names to their values.
   """
-  stats = {}
-
-  # Histogram data in list form sorted by key
-  by_value = sorted([(value, count) for value, count in histogram.items()],
-                    key=lambda x: x[0])
-  total_count = sum(histogram.values())
-
-  cur_value_index = 0  # Current index in by_value
-  cur_index = 0  # Number of values we've passed so far
-  for p in percentiles:
-    index = int(float(total_count) * float(p) / 100.0)
-    index = min(index, total_count - 1)  # Handle 100th percentile
-    for value, count in by_value[cur_value_index:]:
-      if cur_index + count > index:
-        stats['p%s' % str(p)] = by_value[cur_value_index][0]
-        break
-      else:
-        cur_index += count
-        cur_value_index += 1
-
-  # Compute stddev
-  value_sum = float(sum([value * count for value, count in histogram.items()]))
-  average = value_sum / float(total_count)
-  if total_count > 1:
-    total_of_squares = sum([(value - average) ** 2 * count
-                            for value, count in histogram.items()])
-    stats['stddev'] = (total_of_squares / (total_count - 1)) ** 0.5
-  else:
-    stats['stddev'] = 0
+  stats = stats_util.SummarizeHistogram(histogram, percentiles)
+  del stats['average']
   return stats
 
 
@@ -242,10 +216,9 @@ def _ParseNetperfOutput(stdout, metadata, benchmark_name,
     # latency in microseconds with only 2 significant figures and "count" is the
     # number of response times that fell in that latency range.
     latency_hist = netperf.ParseHistogram(stdout)
-    hist_metadata = {'histogram': json.dumps(latency_hist)}
-    hist_metadata.update(metadata)
     latency_samples.append(sample.Sample(
-        '%s_Latency_Histogram' % benchmark_name, 0, 'us', hist_metadata))
+        '%s_Latency_Histogram' % benchmark_name, 0, 'us', metadata,
+        histogram=sample.Histogram.FromDict(latency_hist)))
   if unit != MBPS:
     for metric_key, metric_name in [
         ('50th Percentile Latency Microseconds', 'p50'),
@@ -369,10 +342,9 @@ def RunNetperf(vm, benchmark_name, server_ip, num_streams):
       for histogram in latency_histograms:
         latency_histogram.update(histogram)
       # Create a sample for the aggregate latency histogram
-      hist_metadata = {'histogram': json.dumps(latency_histogram)}
-      hist_metadata.update(metadata)
       samples.append(sample.Sample(
-          '%s_Latency_Histogram' % benchmark_name, 0, 'us', hist_metadata))
+          '%s_Latency_Histogram' % benchmark_name, 0, 'us', metadata,
+          histogram=sample.Histogram.FromDict(latency_histogram)))
       # Calculate stats on aggregate latency histogram
       latency_stats = _HistogramStatsCalculator(latency_histogram, [50, 90, 99])
       # Create samples for the latency stats
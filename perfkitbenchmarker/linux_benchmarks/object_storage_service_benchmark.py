@@ -28,6 +28,9 @@ category:
   b: List-after-write and list-after-update consistency measurement.
   c: Single stream large object upload and download, measures throughput.
 
+The API tests install numpy on every client VM with pip, since the API test
+script computes its statistics and writes its results with numpy.
+
 Documentation: https://goto.google.com/perfkitbenchmarker-storage
 """
 
@@ -49,6 +52,7 @@ from perfkitbenchmarker import flags
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import object_storage_service
 from perfkitbenchmarker import sample
+from perfkitbenchmarker import stream_columns
 from perfkitbenchmarker import temp_dir
 from perfkitbenchmarker import units
 from perfkitbenchmarker import vm_util
@@ -146,6 +150,15 @@ flags.DEFINE_boolean('object_storage_dont_delete_bucket', False,
 flags.DEFINE_string('object_storage_worker_output', None,
                     'If set, the worker threads\' output will be written to the'
                     'path provided.')
+flags.DEFINE_enum('object_storage_worker_output_format', 'json',
+                  ['json', 'columns'],
+                  'How the multistream workers send the records of their '
+                  'operations back. json: as JSON on stdout. columns: as a '
+                  'compressed binary file of per-stream columns that is '
+                  'copied from the VMs and memory-mapped, which takes far '
+                  'less time and memory for millions of operations. The '
+                  'object_storage_worker_output file is written in the same '
+                  'format.')
 flags.DEFINE_float('object_storage_latency_histogram_interval', None,
                    'If set, a latency histogram sample will be created with '
                    'buckets of the specified interval in seconds. Individual '
@@ -195,6 +208,10 @@ API_TEST_SCRIPT_FILES = ['object_storage_api_tests.py',
                          'azure_flags.py',
                          's3_flags.py']
 
+# PKB modules that the API test script imports, sent to the remote VM with it.
+# They may only import numpy and the standard library (see stats_util).
+API_TEST_MODULE_FILES = ['stats_util.py', 'stream_columns.py']
+
 # Various constants to name the result metrics.
 THROUGHPUT_UNIT = 'Mbps'
 LATENCY_UNIT = 'seconds'
@@ -254,12 +271,23 @@ MULTISTREAM_DELAY_CONSTANT = 10.0 * units.second
 # benchmark. This is the filename.
 OBJECTS_WRITTEN_FILE = 'pkb-objects-written'
 
+# With --object_storage_worker_output_format=columns, the multistream
+# benchmarks write the records of their operations to this file in the VM's
+# /tmp.
+WORKER_OUTPUT_FILE = 'pkb-worker-output.gz'
+JSON_WORKER_OUTPUT = 'json'
+COLUMNS_WORKER_OUTPUT = 'columns'
+
 # If the gap between different stream starts and ends is above a
 # certain proportion of the total time, we log a warning because we
 # are throwing out a lot of information. We also put the warning in
 # the sample metadata.
 MULTISTREAM_STREAM_GAP_THRESHOLD = 0.2
 
+# Up to this many object sizes, multi-stream records are grouped by size with
+# one comparison per size rather than by sorting all records.
+_MAX_SIZES_TO_GROUP_BY_MASK = 32
+
 # The API test script uses different names for providers than this
 # script :(
 STORAGE_TO_API_SCRIPT_DICT = {
@@ -372,18 +400,22 @@ def _ProcessMultiStreamResults(start_times, latencies, sizes, operation,
       FLAGS.object_storage_multistream_objects_per_stream)
   metadata['object_naming'] = FLAGS.object_storage_object_naming_scheme
 
-  num_records = sum((len(start_time) for start_time in start_times))
+  num_records = sum(len(start_time) for start_time in start_times)
   logging.info('Processing %s total operation records', num_records)
 
-  stop_times = [start_time + latency
-                for start_time, latency in zip(start_times, latencies)]
-
-  last_start_time = max((start_time[0] for start_time in start_times))
-  first_stop_time = min((stop_time[-1] for stop_time in stop_times))
+  # The operations of a stream are sequential, so each stream's start and
+  # stop times are sorted and only its first and last records are needed to
+  # find when it started and stopped.
+  first_start_times = np.array([start_time[0] for start_time in start_times])
+  last_stop_times = np.array([start_time[-1] + latency[-1] for
+                              start_time, latency in zip(start_times,
+                                                         latencies)])
+  last_start_time = first_start_times.max()
+  first_stop_time = last_stop_times.min()
 
   # Compute how well our synchronization worked
-  first_start_time = min((start_time[0] for start_time in start_times))
-  last_stop_time = max((stop_time[-1] for stop_time in stop_times))
+  first_start_time = first_start_times.min()
+  last_stop_time = last_stop_times.max()
   start_gap = last_start_time - first_start_time
   stop_gap = last_stop_time - first_stop_time
   if ((start_gap + stop_gap) / (last_stop_time - first_start_time) <
@@ -402,18 +434,19 @@ def _ProcessMultiStreamResults(start_times, latencies, sizes, operation,
 
   # Find the indexes in each stream where all streams are active,
   # following Python's [inclusive, exclusive) index convention.
-  active_start_indexes = []
-  for start_time in start_times:
-    for i in xrange(len(start_time)):
-      if start_time[i] >= last_start_time:
-        active_start_indexes.append(i)
-        break
+  active_start_indexes = [
+      np.searchsorted(start_time, last_start_time, side='left')
+      for start_time in start_times]
   active_stop_indexes = []
-  for stop_time in stop_times:
-    for i in xrange(len(stop_time) - 1, -1, -1):
-      if stop_time[i] <= first_stop_time:
-        active_stop_indexes.append(i + 1)
-        break
+  for start_time, latency in zip(start_times, latencies):
+    # Every operation but the last one that started by first_stop_time also
+    # stopped by then, because it stopped before the next one started.
+    stop_index = np.searchsorted(start_time, first_stop_time, side='right')
+    if (stop_index and
+        start_time[stop_index - 1] + latency[stop_index - 1] >
+        first_stop_time):
+      stop_index -= 1
+    active_stop_indexes.append(stop_index)
   active_latencies = [
       latencies[i][active_start_indexes[i]:active_stop_indexes[i]]
       for i in xrange(num_streams)]
@@ -446,6 +479,13 @@ def _ProcessMultiStreamResults(start_times, latencies, sizes, operation,
       LATENCY_UNIT,
       distribution_metadata)
 
+  active_by_size = _GroupBySize(all_active_sizes, all_active_latencies,
+                                all_sizes)
+  histogram_interval = FLAGS.object_storage_latency_histogram_interval
+  if histogram_interval:
+    latencies_by_size = _GroupBySize(np.concatenate(sizes),
+                                     np.concatenate(latencies), all_sizes)
+
   # Publish by-size and full-distribution stats even if there's only
   # one size in the distribution, because it simplifies postprocessing
   # of results.
@@ -456,37 +496,32 @@ def _ProcessMultiStreamResults(start_times, latencies, sizes, operation,
                  operation, size)
     _AppendPercentilesToResults(
         results,
-        all_active_latencies[all_active_sizes == size],
+        active_by_size[size],
         latency_prefix,
         LATENCY_UNIT,
         this_size_metadata)
     # Build the object latency histogram if user requested it
-    if FLAGS.object_storage_latency_histogram_interval:
-      histogram_interval = FLAGS.object_storage_latency_histogram_interval
-      hist_latencies = [[l for l, s in zip(*w_l_s) if s == size]
-                        for w_l_s in zip(latencies, sizes)]
-      max_latency = max([max(l) for l in hist_latencies])
-      # Note that int() floors for us
-      num_histogram_buckets = int(max_latency / histogram_interval) + 1
-      histogram_buckets = [0 for _ in range(num_histogram_buckets)]
-      for worker_latencies in hist_latencies:
-        for latency in worker_latencies:
-          # Note that int() floors for us
-          histogram_buckets[int(latency / histogram_interval)] += 1
-      histogram_str = ','.join([str(c) for c in histogram_buckets])
+    if histogram_interval and len(latencies_by_size[size]):
+      # Note that astype(int) floors the non-negative bucket numbers.
+      histogram_buckets = np.bincount(
+          (latencies_by_size[size] / histogram_interval).astype(int))
       histogram_metadata = this_size_metadata.copy()
       histogram_metadata['interval'] = histogram_interval
-      histogram_metadata['histogram'] = histogram_str
+      histogram_metadata['histogram'] = ','.join(
+          str(c) for c in histogram_buckets)
       results.append(sample.Sample(
           'Multi-stream %s latency histogram' % operation,
           0.0, 'histogram', metadata=histogram_metadata))
 
   # Throughput metrics
-  total_active_times = [np.sum(latency) for latency in active_latencies]
-  active_durations = [stop_times[i][active_stop_indexes[i] - 1] -
-                      start_times[i][active_start_indexes[i]]
-                      for i in xrange(num_streams)]
-  total_active_sizes = [np.sum(size) for size in active_sizes]
+  total_active_times = np.array([np.sum(latency)
+                                 for latency in active_latencies])
+  active_durations = np.array([
+      start_times[i][active_stop_indexes[i] - 1] +
+      latencies[i][active_stop_indexes[i] - 1] -
+      start_times[i][active_start_indexes[i]]
+      for i in xrange(num_streams)])
+  total_active_sizes = np.array([np.sum(size) for size in active_sizes])
   # 'net throughput (with gap)' is computed by taking the throughput
   # for each stream (total # of bytes transmitted / (stop_time -
   # start_time)) and then adding the per-stream throughputs. 'net
@@ -495,18 +530,15 @@ def _ProcessMultiStreamResults(start_times, latencies, sizes, operation,
   # we only divide by the time that stream was actually transmitting.
   results.append(sample.Sample(
       'Multi-stream ' + operation + ' net throughput',
-      np.sum((size / active_time * 8
-              for size, active_time
-              in zip(total_active_sizes, total_active_times))),
+      np.sum(total_active_sizes / total_active_times * 8),
       'bit / second', metadata=distribution_metadata))
   results.append(sample.Sample(
       'Multi-stream ' + operation + ' net throughput (with gap)',
-      np.sum((size / duration * 8
-              for size, duration in zip(total_active_sizes, active_durations))),
+      np.sum(total_active_sizes / active_durations * 8),
       'bit / second', metadata=distribution_metadata))
   results.append(sample.Sample(
       'Multi-stream ' + operation + ' net throughput (simplified)',
-      sum([np.sum(size) for size in sizes]) /
+      sum(np.sum(size) for size in sizes) /
       (last_stop_time - first_start_time) * 8,
       'bit / second', metadata=distribution_metadata))
 
@@ -521,9 +553,7 @@ def _ProcessMultiStreamResults(start_times, latencies, sizes, operation,
       'operation / second', metadata=distribution_metadata))
 
   # Statistics about benchmarking overhead
-  gap_time = sum((active_duration - active_time
-                  for active_duration, active_time
-                  in zip(active_durations, total_active_times)))
+  gap_time = np.sum(active_durations - total_active_times)
   results.append(sample.Sample(
       'Multi-stream ' + operation + ' total gap time',
       gap_time, 'second', metadata=distribution_metadata))
@@ -533,6 +563,33 @@ def _ProcessMultiStreamResults(start_times, latencies, sizes, operation,
       'percent', metadata=distribution_metadata))
 
 
+def _GroupBySize(record_sizes, values, all_sizes):
+  """Splits per-record values by the object size of each record.
+
+  Args:
+    record_sizes: numpy array. The object size of each record.
+    values: numpy array of the same length. A value for each record.
+    all_sizes: sequence of integers. The object sizes to group by.
+
+  Returns:
+    A dict mapping each size in all_sizes to a numpy array of the values of
+    the records with that size, in no particular order.
+  """
+  if len(all_sizes) <= _MAX_SIZES_TO_GROUP_BY_MASK:
+    # A comparison per size is much cheaper than sorting when there are few.
+    return {size: values[record_sizes == size] for size in all_sizes}
+  # After sorting by size, the records of each size form one contiguous slice.
+  order = np.argsort(record_sizes)
+  sorted_sizes = record_sizes[order]
+  sorted_values = values[order]
+  groups = {}
+  for size in all_sizes:
+    begin, end = (np.searchsorted(sorted_sizes, size, side='left'),
+                  np.searchsorted(sorted_sizes, size, side='right'))
+    groups[size] = sorted_values[begin:end]
+  return groups
+
+
 def _DistributionToBackendFormat(dist):
   """Convert an object size distribution to the format needed by the backend.
 
@@ -776,11 +833,14 @@ def ListConsistencyBenchmark(results, metadata, vm, command_builder,
                                    metadata)
 
 
-def LoadWorkerOutput(output):
+def LoadWorkerOutput(output, output_format=JSON_WORKER_OUTPUT):
   """Load output from worker processes to our internal format.
 
   Args:
-    output: list of strings. The stdouts of all worker processes.
+    output: list of strings. The stdouts of all worker processes if
+      output_format is JSON_WORKER_OUTPUT, or the paths of their uncompressed
+      columns files if it is COLUMNS_WORKER_OUTPUT.
+    output_format: JSON_WORKER_OUTPUT or COLUMNS_WORKER_OUTPUT.
 
   Returns:
     A tuple of start_time, latency, size. Each of these is a list of
@@ -791,7 +851,8 @@ def LoadWorkerOutput(output):
 
     start_time holds POSIX timestamps, stored as np.float64. latency
     holds times in seconds, stored as np.float64. size holds sizes in
-    bytes, stored as np.int64.
+    bytes, stored as np.int64. Arrays loaded from columns files are
+    memory-mapped.
 
     Example:
       start_time[i]  latency[i]  size[i]
@@ -810,6 +871,15 @@ def LoadWorkerOutput(output):
   latencies = []
   sizes = []
 
+  if output_format == COLUMNS_WORKER_OUTPUT:
+    for path in output:
+      _, worker_start_times, worker_latencies, worker_sizes = (
+          stream_columns.LoadStreams(path))
+      start_times.extend(worker_start_times)
+      latencies.extend(worker_latencies)
+      sizes.extend(worker_sizes)
+    return start_times, latencies, sizes
+
   for worker_out in output:
     json_out = json.loads(worker_out)
 
@@ -858,6 +928,56 @@ def _RunMultiStreamProcesses(vms, command_builder, cmd_args, streams_per_vm):
   return output
 
 
+def _PullWorkerOutput(vms, remote_path, operation):
+  """Copies the columns files written by the workers to the local machine.
+
+  Args:
+    vms: the VMs the benchmark ran on.
+    remote_path: the path of the compressed columns file on each VM.
+    operation: 'upload' or 'download'.
+
+  Returns:
+    A list with the path of the uncompressed columns file of each VM.
+  """
+  paths = [vm_util.PrependTempDir('%s-worker-output-%s' % (operation, vm_idx))
+           for vm_idx in xrange(len(vms))]
+
+  def PullOne(vm_idx):
+    compressed_path = paths[vm_idx] + '.gz'
+    vms[vm_idx].PullFile(compressed_path, remote_path)
+    stream_columns.DecompressFile(compressed_path, paths[vm_idx])
+    os.remove(compressed_path)
+
+  vm_util.RunThreaded(PullOne, range(len(vms)))
+  return paths
+
+
+def _WriteWorkerOutput(output, output_format, path):
+  """Writes the output of all workers to a single file.
+
+  Args:
+    output: the worker output, as passed to LoadWorkerOutput.
+    output_format: JSON_WORKER_OUTPUT or COLUMNS_WORKER_OUTPUT.
+    path: the file to write. JSON output is written as a JSON list of the
+      stdouts of the workers, columns output as one columns file with the
+      streams of all of them.
+  """
+  if output_format == JSON_WORKER_OUTPUT:
+    with open(path, 'w') as out_file:
+      out_file.write(json.dumps(output))
+    return
+  streams = []
+  for output_path in output:
+    stream_nums, start_times, latencies, sizes = stream_columns.LoadStreams(
+        output_path)
+    streams.extend(
+        {'stream_num': stream_num, 'start_times': stream_start_times,
+         'latencies': stream_latencies, 'sizes': stream_sizes}
+        for stream_num, stream_start_times, stream_latencies, stream_sizes
+        in zip(stream_nums, start_times, latencies, sizes))
+  stream_columns.WriteStreamsFile(path, streams)
+
+
 def _MultiStreamOneWay(results, metadata, vms, command_builder,
                        service, bucket_name, operation):
   """Measures multi-stream latency and throughput in one direction.
@@ -911,15 +1031,28 @@ def _MultiStreamOneWay(results, metadata, vms, command_builder,
     raise Exception('Value of operation must be \'upload\' or \'download\'.'
                     'Value is: \'' + operation + '\'')
 
+  output_format = FLAGS.object_storage_worker_output_format
+  if output_format == COLUMNS_WORKER_OUTPUT:
+    worker_output_file = posixpath.join(vm_util.VM_TMP_DIR,
+                                        WORKER_OUTPUT_FILE)
+    cmd_args.append('--worker_output_file=%s' % worker_output_file)
+
   output = _RunMultiStreamProcesses(vms, command_builder, cmd_args,
                                     streams_per_vm)
-  start_times, latencies, sizes = LoadWorkerOutput(output)
-  if FLAGS.object_storage_worker_output:
-    with open(FLAGS.object_storage_worker_output, 'w') as out_file:
-      out_file.write(json.dumps(output))
-  _ProcessMultiStreamResults(start_times, latencies, sizes, operation,
-                             list(size_distribution.iterkeys()), results,
-                             metadata=metadata)
+  if output_format == COLUMNS_WORKER_OUTPUT:
+    output = _PullWorkerOutput(vms, worker_output_file, operation)
+  try:
+    start_times, latencies, sizes = LoadWorkerOutput(output, output_format)
+    if FLAGS.object_storage_worker_output:
+      _WriteWorkerOutput(output, output_format,
+                         FLAGS.object_storage_worker_output)
+    _ProcessMultiStreamResults(start_times, latencies, sizes, operation,
+                               list(size_distribution.iterkeys()), results,
+                               metadata=metadata)
+  finally:
+    if output_format == COLUMNS_WORKER_OUTPUT:
+      for path in output:
+        os.remove(path)
 
   # Write the objects written file if the flag is set and this is an upload
   objects_written_path_local = FLAGS.object_storage_objects_written_file
@@ -1184,11 +1317,10 @@ def CLIThroughputBenchmark(output_results, metadata, vm, command_builder,
 
 
 def PrepareVM(vm, service):
-  vm.Install('pip')
+  vm.InstallMany(['pip', 'openssl'])
   vm.RemoteCommand('sudo pip install python-gflags==2.0')
   vm.RemoteCommand('sudo pip install pyyaml')
-
-  vm.Install('openssl')
+  vm.RemoteCommand('sudo pip install numpy')
 
   # Prepare data on vm, create a run directory in temporary directory, and add
   # permission.
@@ -1205,6 +1337,8 @@ def PrepareVM(vm, service):
     path = data.ResourcePath(os.path.join(API_TEST_SCRIPTS_DIR, file_name))
     logging.info('Uploading %s to %s', path, vm)
     vm.PushFile(path, '/tmp/run/')
+  for file_name in API_TEST_MODULE_FILES:
+    vm.PushFile(data.ResourcePath(file_name), '/tmp/run/')
 
   service.PrepareVM(vm)
 
@@ -1216,6 +1350,8 @@ def CleanupVM(vm, service):
   objects_written_file = posixpath.join(vm_util.VM_TMP_DIR,
                                         OBJECTS_WRITTEN_FILE)
   vm.RemoteCommand('rm -f %s' % objects_written_file)
+  vm.RemoteCommand('rm -f %s' % posixpath.join(vm_util.VM_TMP_DIR,
+                                               WORKER_OUTPUT_FILE))
 
 
 def Prepare(benchmark_spec):
@@ -113,6 +113,8 @@ _SPECCPU2006_DIR = 'cpu2006'
 _SPECCPU2006_ISO = 'cpu2006-1.2.iso'
 _SPECCPU2006_TAR = 'cpu2006v1.2.tgz'
 _TAR_REQUIRED_MEMBERS = 'cpu2006', 'cpu2006/bin/runspec'
+# Lines of runspec output that are logged while it runs.
+_RUNSPEC_PROGRESS_PREFIXES = 'Running', 'Success', 'Error'
 
 
 def GetConfig(user_config):
@@ -245,12 +247,10 @@ def Prepare(benchmark_spec):
   vm = benchmark_spec.vms[0]
   speccpu_vm_state = _SpecCpu2006SpecificState()
   setattr(vm, _BENCHMARK_SPECIFIC_VM_STATE_ATTR, speccpu_vm_state)
-  vm.Install('wget')
-  vm.Install('build_tools')
-  vm.Install('fortran')
+  packages = ['wget', 'build_tools', 'fortran', 'numactl']
   if FLAGS.runspec_enable_32bit:
-    vm.Install('multilib')
-  vm.Install('numactl')
+    packages.append('multilib')
+  vm.InstallMany(packages)
   scratch_dir = vm.GetScratchDir()
   vm.RemoteCommand('chmod 777 {0}'.format(scratch_dir))
   speccpu_vm_state.spec_dir = posixpath.join(scratch_dir, _SPECCPU2006_DIR)
@@ -516,7 +516,12 @@ def Run(benchmark_spec):
   cmd = ' && '.join((
       'cd {0}'.format(speccpu_vm_state.spec_dir), '. ./shrc', './bin/relocate',
       '. ./shrc', 'rm -rf result', runspec_cmd))
-  vm.RobustRemoteCommand(cmd)
+
+  def _LogProgress(stream, line):
+    if stream == 'stdout' and line.startswith(_RUNSPEC_PROGRESS_PREFIXES):
+      logging.info('runspec: %s', line.rstrip())
+
+  vm.RobustRemoteCommandStream(cmd, _LogProgress)
   logging.info('SPEC CPU2006 Results:')
   return _ParseOutput(vm, speccpu_vm_state.spec_dir)
 
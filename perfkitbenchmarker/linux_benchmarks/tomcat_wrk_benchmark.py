@@ -97,8 +97,7 @@ def _PrepareServer(vm):
 def _PrepareClient(vm):
   """Install wrk on the client VM."""
   _IncreaseMaxOpenFiles(vm)
-  vm.Install('curl')
-  vm.Install('wrk')
+  vm.InstallMany(['curl', 'wrk'])
 
 
 def Prepare(benchmark_spec):
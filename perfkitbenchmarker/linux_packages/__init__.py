@@ -28,6 +28,17 @@ uninstall function.  If the package manually places files in other locations
 
 Package installation should persist across reboots.
 
+Packages may also declare what they install, so that several packages can be
+installed at once with vm.InstallMany:
+  DEPENDENCIES: list of the names of the PerfKit packages the package
+      installs with vm.Install.
+  APT_PACKAGES, YUM_PACKAGES: strings. The OS packages the package installs
+      with vm.InstallPackages, separated by spaces. They are installed in a
+      single package manager transaction before any of the packages. OS
+      packages that need another repository, such as EPEL, are not declared.
+The install functions should install exactly what is declared, by using the
+declarations. tests/linux_packages/package_declarations_test.py checks this.
+
 All functions in each package module should be prefixed with the type of package
 manager, and all functions should accept a BaseVirtualMachine object as their
 only arguments.
@@ -36,21 +47,20 @@ See perfkitbenchmarker/package_managers.py for more information on how to use
 packages in benchmarks.
 """
 
-from perfkitbenchmarker import import_util
+from perfkitbenchmarker import module_index
 
 
 # Place to install stuff. Persists across reboots.
 INSTALL_DIR = '/opt/pkb'
 
 
-def _LoadPackages():
-  packages = dict([(module.__name__.split('.')[-1], module) for module in
-                   import_util.LoadModulesForPath(__path__, __name__)])
-  packages.update(packages['docker'].CreateImagePackages())
-  return packages
+def _GetDockerImagePackages():
+  return dict(PACKAGES['docker'].CreateImagePackages())
 
 
-PACKAGES = _LoadPackages()
+# Package modules are imported on first access. See module_index.
+PACKAGES = module_index.LazyModuleDict(
+    __name__, extra_items=_GetDockerImagePackages)
 
 
 def GetPipPackageVersion(vm, package_name):
@@ -65,3 +75,62 @@ def GetPipPackageVersion(vm, package_name):
   """
   version, _ = vm.RemoteCommand('pip show %s |grep Version' % package_name)
   return version
+
+
+def GetDependencies(package_name):
+  """Returns the declared dependencies of a package."""
+  return getattr(PACKAGES[package_name], 'DEPENDENCIES', [])
+
+
+def ResolveDependencies(package_names):
+  """Returns packages and their transitive dependencies, dependencies first.
+
+  Args:
+    package_names: iterable of PerfKit package names.
+
+  Returns:
+    A list of package names without duplicates, in which every package comes
+    after its declared dependencies.
+
+  Raises:
+    KeyError: if a package does not exist.
+    ValueError: if the declared dependencies contain a cycle.
+  """
+  ordered = []
+  # Packages whose dependencies are being visited.
+  visiting = set()
+
+  def Visit(package_name, path):
+    if package_name in ordered:
+      return
+    if package_name in visiting:
+      raise ValueError('Package dependencies contain a cycle: %s' %
+                       ' -> '.join(path + [package_name]))
+    visiting.add(package_name)
+    for dependency in GetDependencies(package_name):
+      Visit(dependency, path + [package_name])
+    visiting.remove(package_name)
+    ordered.append(package_name)
+
+  for package_name in package_names:
+    Visit(package_name, [])
+  return ordered
+
+
+def GetOsPackages(package_names, attribute):
+  """Returns the OS packages declared by PerfKit packages.
+
+  Args:
+    package_names: iterable of PerfKit package names.
+    attribute: string. The attribute of the package modules listing the OS
+        packages, e.g. 'APT_PACKAGES'.
+
+  Returns:
+    A list of OS package names without duplicates.
+  """
+  os_packages = []
+  for package_name in package_names:
+    for os_package in getattr(PACKAGES[package_name], attribute, '').split():
+      if os_package not in os_packages:
+        os_packages.append(os_package)
+  return os_packages
@@ -20,6 +20,7 @@ import logging
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import package_cache
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import INSTALL_DIR
 
@@ -43,14 +44,20 @@ flags.DEFINE_integer('aerospike_transaction_threads_per_queue', 4,
                      'Number of threads per transaction queue.')
 
 
+def _Build(vm):
+  """Builds the Aerospike server in AEROSPIKE_DIR."""
+  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, AEROSPIKE_DIR))
+  vm.RemoteCommand('cd {0} && git checkout {1} && git submodule update --init '
+                   '&& make'.format(AEROSPIKE_DIR, GIT_TAG))
+
+
 def _Install(vm):
   """Installs the Aerospike server on the VM."""
   vm.Install('build_tools')
   vm.Install('lua5_1')
   vm.Install('openssl')
-  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, AEROSPIKE_DIR))
-  vm.RemoteCommand('cd {0} && git checkout {1} && git submodule update --init '
-                   '&& make'.format(AEROSPIKE_DIR, GIT_TAG))
+  package_cache.BuildOnce(vm, 'aerospike_server', GIT_TAG, AEROSPIKE_DIR,
+                          _Build)
 
 
 def YumInstall(vm):
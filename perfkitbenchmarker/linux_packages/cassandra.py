@@ -28,6 +28,7 @@ from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import os_types
+from perfkitbenchmarker import package_cache
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import INSTALL_DIR
 from perfkitbenchmarker.linux_packages.ant import ANT_HOME_DIR
@@ -69,12 +70,8 @@ def CheckPrerequisites():
     data.ResourcePath(resource)
 
 
-def _Install(vm):
-  """Installs Cassandra from a tarball."""
-  vm.Install('ant')
-  vm.Install('build_tools')
-  vm.Install('openjdk')
-  vm.Install('curl')
+def _Build(vm):
+  """Builds Cassandra in CASSANDRA_DIR."""
   vm.RemoteCommand(
       'cd {0}; git clone {1}; cd {2}; git checkout {3}; {4}/bin/ant'.format(
           INSTALL_DIR,
@@ -82,10 +79,18 @@ def _Install(vm):
           CASSANDRA_DIR,
           CASSANDRA_VERSION,
           ANT_HOME_DIR))
+
+
+def _Install(vm):
+  """Installs Cassandra from a tarball."""
+  vm.Install('ant')
+  vm.Install('build_tools')
+  vm.Install('openjdk')
+  package_cache.BuildOnce(vm, 'cassandra', CASSANDRA_VERSION, CASSANDRA_DIR,
+                          _Build)
   # Add JNA
-  vm.RemoteCommand('cd {0} && curl -LJO {1}'.format(
-      posixpath.join(CASSANDRA_DIR, 'lib'),
-      JNA_JAR_URL))
+  package_cache.FetchFile(vm, JNA_JAR_URL,
+                          posixpath.join(CASSANDRA_DIR, 'lib'))
 
 
 def YumInstall(vm):
@@ -15,10 +15,12 @@
 
 """Module containing curl installation and cleanup functions."""
 
+APT_PACKAGES = YUM_PACKAGES = 'curl'
+
 
 def _Install(vm):
   """Installs the curl package on the VM."""
-  vm.InstallPackages('curl')
+  vm.InstallPackages(APT_PACKAGES)
 
 
 def YumInstall(vm):
@@ -19,17 +19,59 @@ import csv
 import itertools
 import numpy as np
 
+# Number of data rows converted to floats at once by ParseCsvFile.
+_CHUNK_ROWS = 4096
 
-def ParseCsvFile(fp):
-  """Parse dstat results file in csv format.
+# Number of header lines preceding the data rows of dstat CSV output.
+HEADER_LINES = 7
+
+
+def ParseCsvRows(lines, num_columns, first_row_index=0):
+  """Converts data lines of a dstat CSV file to an array of floats.
 
   Args:
-    file: string. Name of the file.
+    lines: list of strings. Data rows of the CSV file.
+    num_columns: int. Number of columns each row must have.
+    first_row_index: int. Index of the first row among all data rows, used in
+        error messages.
 
   Returns:
-    A tuple of list of dstat labels and ndarray containing parsed data.
+    An ndarray with one row per line.
+
+  Raises:
+    ValueError: if a row does not have num_columns values.
+  """
+  rows = []
+  for i, line in enumerate(lines):
+    row = line.rstrip('\r\n')
+    # Remove the trailing comma
+    if row.endswith(','):
+      row = row[:-1]
+    if row.count(',') + 1 != num_columns:
+      raise ValueError(('Number of labels ({}) does not match number of '
+                        'columns ({}) in row {}:\n{}').format(
+                            num_columns, row.count(',') + 1,
+                            first_row_index + i, line))
+    rows.append(row)
+  # Converting the whole chunk with one call is much faster than converting
+  # every field with float().
+  data = np.fromstring(','.join(rows), dtype=float, sep=',')
+  if data.size != len(rows) * num_columns:
+    raise ValueError('Found empty or non-numeric values in rows {} to {}.'
+                     .format(first_row_index, first_row_index + len(rows) - 1))
+  return data.reshape(len(rows), num_columns)
+
+
+def ParseCsvHeaders(lines):
+  """Parse the header lines of dstat results in csv format.
+
+  Args:
+    lines: iterable of the HEADER_LINES header lines of the dstat output.
+
+  Returns:
+    A list of dstat labels, one per column.
   """
-  reader = csv.reader(fp)
+  reader = csv.reader(lines)
   headers = list(itertools.islice(reader, 5))
   if len(headers) != 5:
     raise ValueError(
@@ -58,23 +100,36 @@ def ParseCsvFile(fp):
             len(categories), len(labels), categories, labels))
 
   # Generate new column names
-  labels = ['%s__%s' % x for x in zip(labels, categories)]
+  return ['%s__%s' % x for x in zip(labels, categories)]
 
-  data = []
-  for i, row in enumerate(reader):
-    # Remove the trailing comma
-    if len(row) == len(labels) + 1:
-      if row[-1]:
-        raise ValueError(('Expected the last element of row {0} to be empty,'
-                          ' found {1}').format(row, row[-1]))
-      row = row[:-1]
 
-    if len(labels) != len(row):
-      raise ValueError(('Number of labels ({}) does not match number of '
-                        'columns ({}) in row {}:\n{}').format(
-                            len(labels), len(row), i, row))
-    data.append(row)
-  return labels, np.array(data, dtype=float)
+def ParseCsvFile(fp):
+  """Parse dstat results file in csv format.
+
+  Data rows are converted to floats in chunks, so the file is never held in
+  memory as Python strings.
+
+  Args:
+    fp: iterable of lines. The dstat CSV file.
+
+  Returns:
+    A tuple of list of dstat labels and ndarray containing parsed data.
+  """
+  fp = iter(fp)
+  # Only the header lines need a CSV parser; data rows are plain numbers.
+  labels = ParseCsvHeaders(itertools.islice(fp, HEADER_LINES))
+
+  chunks = []
+  num_rows = 0
+  while True:
+    lines = list(itertools.islice(fp, _CHUNK_ROWS))
+    if not lines:
+      break
+    chunks.append(ParseCsvRows(lines, len(labels), num_rows))
+    num_rows += len(lines)
+  if not chunks:
+    return labels, np.zeros((0, len(labels)))
+  return labels, np.concatenate(chunks)
 
 
 def _Install(vm):
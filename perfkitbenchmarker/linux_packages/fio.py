@@ -16,16 +16,24 @@
 import csv
 import ConfigParser
 import io
-import json
 import time
 
-from collections import Counter
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import package_cache
 from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import INSTALL_DIR
 
+# Defined here rather than in fio_benchmark because the package reads it, and
+# other benchmarks install the package without importing fio_benchmark.
+flags.DEFINE_boolean('fio_hist_log', False,
+                     'Whether to collect clat histogram.')
+
+DEPENDENCIES = ['build_tools', 'python', 'pip']
+APT_PACKAGES = 'libaio-dev libaio1 bc zlib1g-dev'
+YUM_PACKAGES = 'libaio-devel libaio bc zlib-devel'
+
 FIO_DIR = '%s/fio' % INSTALL_DIR
 GIT_REPO = 'http://git.kernel.dk/fio.git'
 GIT_TAG = 'fio-2.17'
@@ -48,16 +56,24 @@ HIST_BUCKET_START_IDX = 3
 FIO_HIST_LOG_PARSER_PATCH = 'fiologparser_hist.patch'
 FIO_HIST_LOG_PARSER_PATH = '%s/tools/hist' % FIO_DIR
 FIO_HIST_LOG_PARSER = 'fiologparser_hist.py'
+# fio's finest latency bins are one microsecond wide, so their mean values
+# are multiples of half a microsecond.
+HIST_BIN_RESOLUTION = 0.5
+
+
+def _Build(vm):
+  """Builds fio in FIO_DIR."""
+  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, FIO_DIR))
+  vm.RemoteCommand('cd {0} && git checkout {1}'.format(FIO_DIR, GIT_TAG))
+  vm.RemoteCommand('cd {0} && ./configure && make'.format(FIO_DIR))
 
 
 def _Install(vm):
   """Installs the fio package on the VM."""
-  for p in ['build_tools', 'python', 'pip']:
+  for p in DEPENDENCIES:
     vm.Install(p)
   vm.RemoteCommand('sudo pip install pandas numpy')
-  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, FIO_DIR))
-  vm.RemoteCommand('cd {0} && git checkout {1}'.format(FIO_DIR, GIT_TAG))
-  vm.RemoteCommand('cd {0} && ./configure && make'.format(FIO_DIR))
+  package_cache.BuildOnce(vm, 'fio', GIT_TAG, FIO_DIR, _Build)
   if flags.FLAGS.fio_hist_log:
     vm.PushDataFile(FIO_HIST_LOG_PARSER_PATCH)
     vm.RemoteCommand(
@@ -70,13 +86,13 @@ def _Install(vm):
 
 def YumInstall(vm):
   """Installs the fio package on the VM."""
-  vm.InstallPackages('libaio-devel libaio bc zlib-devel')
+  vm.InstallPackages(YUM_PACKAGES)
   _Install(vm)
 
 
 def AptInstall(vm):
   """Installs the fio package on the VM."""
-  vm.InstallPackages('libaio-dev libaio1 bc zlib1g-dev')
+  vm.InstallPackages(APT_PACKAGES)
   _Install(vm)
 
 
@@ -289,20 +305,15 @@ def _ParseHistogram(hist, mean_bin_vals, metric_prefix='',
       # Use (data direction, block size) as key
       key = (DATA_DIRECTION[int(r[1])], int(r[2]))
 
-      hist_list = []
-      for idx, v in enumerate(r[HIST_BUCKET_START_IDX:]):
-        if int(v):
-          hist_list.append((mean_bin_vals[idx], int(v)))
-      todict = dict(hist_list)
+      counts = [int(v) for v in r[HIST_BUCKET_START_IDX:]]
       if key not in aggregates:
-        aggregates[key] = Counter()
-      aggregates[key].update(todict)
+        aggregates[key] = sample.Histogram(resolution=HIST_BIN_RESOLUTION)
+      aggregates[key].Add(mean_bin_vals[:len(counts)], counts)
   samples = []
   for (rw, bs) in aggregates.keys():
-    metadata = {'histogram': json.dumps(aggregates[(rw, bs)])}
-    metadata.update(additional_metadata)
     samples.append(
         sample.Sample(
             ':'.join([metric_prefix, str(bs), rw, 'histogram']),
-            0, 'us', metadata))
+            0, 'us', dict(additional_metadata),
+            histogram=aggregates[(rw, bs)]))
   return samples
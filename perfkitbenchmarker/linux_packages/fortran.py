@@ -14,6 +14,9 @@
 
 """Module containing fortran installation and cleanup functions."""
 
+APT_PACKAGES = 'gfortran'
+YUM_PACKAGES = 'gcc-gfortran libgfortran'
+
 
 def GetLibPath(vm):
   """Get fortran library path."""
@@ -23,9 +26,9 @@ def GetLibPath(vm):
 
 def YumInstall(vm):
   """Installs the fortran package on the VM."""
-  vm.InstallPackages('gcc-gfortran libgfortran')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the fortan package on the VM."""
-  vm.InstallPackages('gfortran')
+  vm.InstallPackages(APT_PACKAGES)
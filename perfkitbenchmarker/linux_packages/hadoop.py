@@ -24,6 +24,7 @@ import re
 import time
 
 from perfkitbenchmarker import data
+from perfkitbenchmarker import package_cache
 from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import INSTALL_DIR
@@ -56,10 +57,7 @@ def CheckPrerequisites():
 
 def _Install(vm):
   vm.Install('openjdk')
-  vm.Install('curl')
-  vm.RemoteCommand(('mkdir {0} && curl -L {1} | '
-                    'tar -C {0} --strip-components=1 -xzf -').format(
-                        HADOOP_DIR, HADOOP_URL))
+  package_cache.FetchArchive(vm, HADOOP_URL, HADOOP_DIR)
 
 
 def YumInstall(vm):
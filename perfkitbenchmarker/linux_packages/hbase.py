@@ -24,6 +24,7 @@ import re
 import urllib2
 
 from perfkitbenchmarker import data
+from perfkitbenchmarker import package_cache
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import hadoop
 from perfkitbenchmarker.linux_packages import INSTALL_DIR
@@ -60,11 +61,7 @@ def CheckPrerequisites():
 
 def _Install(vm):
   vm.Install('hadoop')
-  vm.Install('curl')
-  hbase_url = _GetHBaseURL()
-  vm.RemoteCommand(('mkdir {0} && curl -L {1} | '
-                    'tar -C {0} --strip-components=1 -xzf -').format(
-                        HBASE_DIR, hbase_url))
+  package_cache.FetchArchive(vm, _GetHBaseURL(), HBASE_DIR)
 
 
 def YumInstall(vm):
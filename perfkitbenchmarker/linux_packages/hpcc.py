@@ -22,6 +22,7 @@ http://icl.cs.utk.edu/hpcc/
 
 import re
 
+from perfkitbenchmarker import package_cache
 from perfkitbenchmarker.linux_packages import openblas
 from perfkitbenchmarker.linux_packages import INSTALL_DIR
 
@@ -33,13 +34,9 @@ HPCC_MAKEFILE = 'Make.' + MAKE_FLAVOR
 HPCC_MAKEFILE_PATH = HPCC_DIR + '/hpl/' + HPCC_MAKEFILE
 
 
-def _Install(vm):
-  """Installs the HPCC package on the VM."""
-  vm.Install('wget')
-  vm.Install('openmpi')
-  vm.Install('openblas')
-  vm.RemoteCommand('wget %s -P %s' % (HPCC_URL, INSTALL_DIR))
-  vm.RemoteCommand('cd %s && tar xvfz %s' % (INSTALL_DIR, HPCC_TAR))
+def _Build(vm):
+  """Builds HPCC in HPCC_DIR."""
+  package_cache.FetchArchive(vm, HPCC_URL, HPCC_DIR)
   vm.RemoteCommand(
       'cp %s/hpl/setup/%s %s' % (HPCC_DIR, HPCC_MAKEFILE, HPCC_MAKEFILE_PATH))
   sed_cmd = (
@@ -52,6 +49,13 @@ def _Install(vm):
   vm.RemoteCommand('cd %s; make arch=Linux_PII_CBLAS' % HPCC_DIR)
 
 
+def _Install(vm):
+  """Installs the HPCC package on the VM."""
+  vm.Install('openmpi')
+  vm.Install('openblas')
+  package_cache.BuildOnce(vm, 'hpcc', HPCC_TAR, HPCC_DIR, _Build)
+
+
 def YumInstall(vm):
   """Installs the HPCC package on the VM."""
   _Install(vm)
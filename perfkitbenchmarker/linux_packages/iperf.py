@@ -19,6 +19,10 @@ import re
 
 from perfkitbenchmarker import errors
 
+# RHEL installs are not declared, because they need the EPEL repository. The
+# package has the same name there.
+APT_PACKAGES = 'iperf'
+
 IPERF_EL6_RPM = ('http://pkgs.repoforge.org/iperf/'
                  'iperf-2.0.4-1.el6.rf.x86_64.rpm')
 IPERF_EL7_RPM = ('http://pkgs.repoforge.org/iperf/'
@@ -27,7 +31,7 @@ IPERF_EL7_RPM = ('http://pkgs.repoforge.org/iperf/'
 
 def _Install(vm):
   """Installs the iperf package on the VM."""
-  vm.InstallPackages('iperf')
+  vm.InstallPackages(APT_PACKAGES)
 
 
 def YumInstall(vm):
@@ -14,6 +14,7 @@
 
 import os
 
+from perfkitbenchmarker import package_cache
 from perfkitbenchmarker.linux_packages import INSTALL_DIR
 
 URL = 'https://www.kernel.org/pub/linux/kernel/v4.x/linux-4.4.25.tar.gz'
@@ -24,10 +25,8 @@ KERNEL_TARBALL = os.path.join(INSTALL_DIR, TARBALL)
 
 def _Install(vm):
   vm.Install('build_tools')
-  vm.Install('wget')
   vm.InstallPackages('bc')
-  vm.RemoteCommand('mkdir -p {0} && '
-                   'cd {0} && wget {1}'.format(INSTALL_DIR, URL))
+  package_cache.FetchFile(vm, URL, INSTALL_DIR)
 
 
 def AptInstall(vm):
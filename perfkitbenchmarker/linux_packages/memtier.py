@@ -15,8 +15,13 @@
 
 """Module containing memtier installation and cleanup functions."""
 
+import functools
+
+from perfkitbenchmarker import package_cache
 from perfkitbenchmarker.linux_packages import INSTALL_DIR
 
+# curl downloads libevent on RHEL when --package_cache is not set.
+DEPENDENCIES = ['build_tools', 'curl']
 GIT_REPO = 'https://github.com/RedisLabs/memtier_benchmark'
 GIT_TAG = '1.2.0'
 LIBEVENT_TAR = 'libevent-2.0.21-stable.tar.gz'
@@ -28,31 +33,35 @@ APT_PACKAGES = ('autoconf automake libpcre3-dev '
 YUM_PACKAGES = 'zlib-devel pcre-devel libmemcached-devel'
 
 
+def _Build(vm, pkg_config=''):
+  """Builds memtier in MEMTIER_DIR."""
+  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, MEMTIER_DIR))
+  vm.RemoteCommand('cd {0} && git checkout {1}'.format(MEMTIER_DIR, GIT_TAG))
+  vm.RemoteCommand('cd {0} && autoreconf -ivf && {1} ./configure && '
+                   'make'.format(MEMTIER_DIR, pkg_config))
+
+
 def YumInstall(vm):
   """Installs the memtier package on the VM."""
-  vm.Install('build_tools')
+  for package in DEPENDENCIES:
+    vm.Install(package)
   vm.InstallPackages(YUM_PACKAGES)
-  vm.Install('wget')
-  vm.RemoteCommand('wget {0} -P {1}'.format(LIBEVENT_URL, INSTALL_DIR))
-  vm.RemoteCommand('cd {0} && tar xvzf {1}'.format(INSTALL_DIR,
-                                                   LIBEVENT_TAR))
+  package_cache.FetchArchive(vm, LIBEVENT_URL, LIBEVENT_DIR)
   vm.RemoteCommand('cd {0} && ./configure && sudo make install'.format(
       LIBEVENT_DIR))
-  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, MEMTIER_DIR))
-  vm.RemoteCommand('cd {0} && git checkout {1}'.format(MEMTIER_DIR, GIT_TAG))
   pkg_config = 'PKG_CONFIG_PATH=/usr/local/lib/pkgconfig:${PKG_CONFIG_PATH}'
-  vm.RemoteCommand('cd {0} && autoreconf -ivf && {1} ./configure && '
-                   'sudo make install'.format(MEMTIER_DIR, pkg_config))
+  package_cache.BuildOnce(vm, 'memtier', GIT_TAG, MEMTIER_DIR,
+                          functools.partial(_Build, pkg_config=pkg_config))
+  vm.RemoteCommand('cd {0} && sudo make install'.format(MEMTIER_DIR))
 
 
 def AptInstall(vm):
   """Installs the memtier package on the VM."""
-  vm.Install('build_tools')
+  for package in DEPENDENCIES:
+    vm.Install(package)
   vm.InstallPackages(APT_PACKAGES)
-  vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, MEMTIER_DIR))
-  vm.RemoteCommand('cd {0} && git checkout {1}'.format(MEMTIER_DIR, GIT_TAG))
-  vm.RemoteCommand('cd {0} && autoreconf -ivf && ./configure && '
-                   'sudo make install'.format(MEMTIER_DIR))
+  package_cache.BuildOnce(vm, 'memtier', GIT_TAG, MEMTIER_DIR, _Build)
+  vm.RemoteCommand('cd {0} && sudo make install'.format(MEMTIER_DIR))
 
 
 def _Uninstall(vm):
@@ -15,20 +15,27 @@
 
 """Module containing multichase installation and cleanup functions."""
 
+from perfkitbenchmarker import package_cache
+
 GIT_PATH = 'https://github.com/google/multichase'
 GIT_VERSION = '8a00c4006d253c6aa5079f5e702279ee20e0df68'
 INSTALL_PATH = 'multichase'
 
 
+def _Build(vm):
+  """Builds multichase in INSTALL_PATH."""
+  vm.RemoteCommand('git clone --recursive {git_path} {dir}'.format(
+      dir=INSTALL_PATH, git_path=GIT_PATH))
+  vm.RemoteCommand('cd {dir} && git checkout {version} && make'.format(
+      dir=INSTALL_PATH, version=GIT_VERSION))
+
+
 def _Install(vm):
   """Installs the multichase package on the VM."""
   vm.Install('build_tools')
   vm.RemoteCommand('rm -rf {path} && mkdir -p {path}'.format(
       path=INSTALL_PATH))
-  vm.RemoteCommand('git clone --recursive {git_path} {dir}'.format(
-      dir=INSTALL_PATH, git_path=GIT_PATH))
-  vm.RemoteCommand('cd {dir} && git checkout {version} && make'.format(
-      dir=INSTALL_PATH, version=GIT_VERSION))
+  package_cache.BuildOnce(vm, 'multichase', GIT_VERSION, INSTALL_PATH, _Build)
 
 
 def YumInstall(vm):
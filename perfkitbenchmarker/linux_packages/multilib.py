@@ -14,12 +14,15 @@
 
 """Module containing multilib installation and cleanup functions."""
 
+APT_PACKAGES = 'gcc-multilib g++-multilib'
+YUM_PACKAGES = 'glibc-devel.i686 libstdc++-devel.i686'
+
 
 def YumInstall(vm):
   """Installs multilib packages on the VM."""
-  vm.InstallPackages('glibc-devel.i686 libstdc++-devel.i686')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs multilib packages on the VM."""
-  vm.InstallPackages('gcc-multilib g++-multilib')
+  vm.InstallPackages(APT_PACKAGES)
@@ -14,10 +14,12 @@
 
 """Module containing numactl installation and cleanup functions."""
 
+APT_PACKAGES = YUM_PACKAGES = 'numactl'
+
 
 def _Install(vm):
   """Installs the numactl package on the VM."""
-  vm.InstallPackages('numactl')
+  vm.InstallPackages(APT_PACKAGES)
 
 
 def YumInstall(vm):
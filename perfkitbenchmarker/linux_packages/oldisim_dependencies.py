@@ -16,10 +16,12 @@
 
 import os
 
-YUM_PACKAGES = ('bc gengetopt libevent-devel '
-                'google-perftools-devel scons')
+# Not declared as YUM_PACKAGES, because they need the EPEL repository.
+YUM_EPEL_PACKAGES = ('bc gengetopt libevent-devel '
+                     'google-perftools-devel scons')
 APT_PACKAGES = ('bc gengetopt libevent-dev '
                 'libgoogle-perftools-dev scons')
+DEPENDENCIES = ['build_tools']
 
 OLDISIM_GIT = 'https://github.com/GoogleCloudPlatform/oldisim.git'
 OLDISIM_DIR = 'oldisim'
@@ -28,7 +30,8 @@ BINARY_BASE = 'release/workloads/search'
 
 
 def _Install(vm, packages):
-  vm.Install('build_tools')
+  for package in DEPENDENCIES:
+    vm.Install(package)
   vm.InstallPackages(packages)
   vm.RemoteCommand('git clone --recursive %s' % OLDISIM_GIT)
   vm.RemoteCommand('cd %s && git checkout %s && '
@@ -39,7 +42,7 @@ def _Install(vm, packages):
 def YumInstall(vm):
   """Installs oldisim dependencies on the VM."""
   vm.InstallEpelRepo()
-  _Install(vm, YUM_PACKAGES)
+  _Install(vm, YUM_EPEL_PACKAGES)
 
 
 def AptInstall(vm):
@@ -15,12 +15,15 @@
 
 """Module containing python 2.7 installation and cleanup functions."""
 
+APT_PACKAGES = 'python2.7'
+YUM_PACKAGES = 'python-2.7.5'
+
 
 def YumInstall(vm):
   """Installs the package on the VM."""
-  vm.InstallPackages('python-2.7.5')
+  vm.InstallPackages(YUM_PACKAGES)
 
 
 def AptInstall(vm):
   """Installs the package on the VM."""
-  vm.InstallPackages('python2.7')
+  vm.InstallPackages(APT_PACKAGES)
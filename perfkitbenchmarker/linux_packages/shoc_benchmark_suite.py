@@ -27,6 +27,7 @@ SHOC_DIR = '%s/shoc' % INSTALL_DIR
 SHOC_BIN_DIR = os.path.join(SHOC_DIR, 'bin')
 SHOC_PATCH = 'shoc_config.patch'
 APT_PACKAGES = 'wget automake git zip libopenmpi-dev'
+DEPENDENCIES = ['cuda_toolkit_8']
 
 
 def _IsShocInstalled(vm):
@@ -46,7 +47,8 @@ def AptInstall(vm):
     return
 
   vm.InstallPackages(APT_PACKAGES)
-  vm.Install('cuda_toolkit_8')
+  for package in DEPENDENCIES:
+    vm.Install(package)
 
   vm.RemoteCommand('cd %s && git clone %s' % (INSTALL_DIR, SHOC_GIT_URL))
   vm.RemoteCommand(('cd %s && ./configure '
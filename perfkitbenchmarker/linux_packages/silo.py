@@ -22,14 +22,17 @@ GIT_TAG = '62d2d498984bf69d3b46a74e310e1fd12fd1f692'
 SILO_DIR = '%s/silo' % INSTALL_DIR
 APT_PACKAGES = ('libjemalloc-dev libnuma-dev libdb++-dev '
                 'libmysqld-dev libaio-dev libssl-dev')
-YUM_PACKAGES = ('jemalloc-devel numactl-devel libdb-cxx-devel mysql-devel '
-                'libaio-devel openssl-devel')
+# Not declared as YUM_PACKAGES, because they need the EPEL repository.
+YUM_EPEL_PACKAGES = ('jemalloc-devel numactl-devel libdb-cxx-devel '
+                     'mysql-devel libaio-devel openssl-devel')
+DEPENDENCIES = ['build_tools']
 
 
 def _Install(vm):
   """Installs the Silo package on the VM."""
   nthreads = vm.num_cpus * 2
-  vm.Install('build_tools')
+  for package in DEPENDENCIES:
+    vm.Install(package)
   vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, SILO_DIR))
   vm.RemoteCommand('cd {0} && git checkout {1}'.format(SILO_DIR,
                                                        GIT_TAG))
@@ -48,7 +51,7 @@ def _Install(vm):
 def YumInstall(vm):
   """Installs the Silo package on the VM."""
   vm.InstallEpelRepo()
-  vm.InstallPackages(YUM_PACKAGES)
+  vm.InstallPackages(YUM_EPEL_PACKAGES)
   _Install(vm)
 
 
@@ -15,10 +15,14 @@
 
 """Module containing sysbench installation and cleanup functions."""
 
+# RHEL installs are not declared, because they need the EPEL repository. The
+# package has the same name there.
+APT_PACKAGES = 'sysbench'
+
 
 def _Install(vm):
   """Installs the sysbench package on the VM."""
-  vm.InstallPackages('sysbench')
+  vm.InstallPackages(APT_PACKAGES)
 
 
 def YumInstall(vm):
@@ -15,10 +15,12 @@
 
 """Module containing wget installation and cleanup functions."""
 
+APT_PACKAGES = YUM_PACKAGES = 'wget'
+
 
 def _Install(vm):
   """Installs the wget package on the VM."""
-  vm.InstallPackages('wget')
+  vm.InstallPackages(APT_PACKAGES)
 
 
 def YumInstall(vm):
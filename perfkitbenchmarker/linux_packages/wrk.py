@@ -27,6 +27,8 @@ from perfkitbenchmarker import sample
 from perfkitbenchmarker.linux_packages import INSTALL_DIR
 
 
+DEPENDENCIES = ['build_tools', 'curl', 'openssl']
+
 WRK_URL = 'https://github.com/wg/wrk/archive/4.0.1.tar.gz'
 WRK_DIR = posixpath.join(INSTALL_DIR, 'wrk')
 WRK_PATH = posixpath.join(WRK_DIR, 'wrk')
@@ -44,9 +46,8 @@ _CSV_PREFIX = '==CSV==\n'
 
 
 def _Install(vm):
-  vm.Install('build_tools')
-  vm.Install('curl')
-  vm.Install('openssl')
+  for package in DEPENDENCIES:
+    vm.Install(package)
 
   vm.RemoteCommand(('mkdir -p {0} && curl -L {1} '
                     '| tar --strip-components=1 -C {0} -xzf -').format(
@@ -35,12 +35,10 @@ By default, this runs YCSB workloads A and B against the database, 32 threads
 per client VM, with an initial database size of 1GB (1k records).
 Each workload runs for at most 30 minutes.
 """
-import bisect
 import collections
 import copy
-import csv
+import cStringIO
 import io
-import itertools
 import math
 import re
 import logging
@@ -49,10 +47,13 @@ import os
 import posixpath
 import time
 
+import numpy as np
+
 from perfkitbenchmarker import data
 from perfkitbenchmarker import events
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import sample
+from perfkitbenchmarker import stats_util
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import INSTALL_DIR
 
@@ -89,6 +90,9 @@ AGGREGATE_OPERATORS = {
 flags.DEFINE_boolean('ycsb_histogram', False, 'Include individual '
                      'histogram results from YCSB (will increase sample '
                      'count).')
+flags.DEFINE_boolean('ycsb_histogram_sample', False, 'Include a single sample '
+                     'with the latency histogram of each YCSB operation in '
+                     'its histogram field.')
 flags.DEFINE_boolean('ycsb_load_samples', True, 'Include samples '
                      'from pre-populating database.')
 flags.DEFINE_boolean('ycsb_include_individual_results', False,
@@ -169,9 +173,21 @@ def AptInstall(vm):
   _Install(vm)
 
 
-def ParseResults(ycsb_result_string, data_type='histogram'):
+def _IsResultLine(line):
+  """Returns True for lines of the form '[OPERATION], ...'."""
+  end = line.find(']')
+  return (line.startswith('[') and end > 1 and line[1:end].isalpha() and
+          line[1:end].isupper())
+
+
+def ParseResults(ycsb_result, data_type='histogram'):
   """Parse YCSB results.
 
+  The results are parsed in a single pass over the lines, so output can be
+  parsed as it arrives from a VM, or from a file, without being held in
+  memory. The header lines may be interleaved with other lines, as happens
+  when YCSB prints them to stderr and the results to stdout.
+
   Example input:
 
     YCSB Client 0.1
@@ -191,7 +207,8 @@ def ParseResults(ycsb_result_string, data_type='histogram'):
     ...
 
   Args:
-    ycsb_result_string: str. Text output from YCSB.
+    ycsb_result: str or iterable of lines (e.g. a file object). Text output
+        from YCSB.
     data_type: Either 'histogram' or 'timeseries'.
 
   Returns:
@@ -201,89 +218,96 @@ def ParseResults(ycsb_result_string, data_type='histogram'):
       groups: list of operation group descriptions, each with schema:
         group: group name (e.g., update, insert, overall)
         statistics: dict mapping from statistic name to value
-        histogram: list of (ms_lower_bound, count) tuples, e.g.:
-          [(0, 530), (19, 1)]
-        indicates that 530 ops took between 0ms and 1ms, and 1 took between
-        19ms and 20ms. Empty bins are not reported.
-  """
-
-  # TODO: YCSB 0.9.0 output client and command line string to stderr, so
-  # we need to support it in the future.
-  lines = []
-  client_string = 'YCSB'
-  command_line = 'unknown'
-  fp = io.BytesIO(ycsb_result_string)
-  result_string = next(fp).strip()
-
-  def IsHeadOfResults(line):
-      return line.startswith('YCSB Client 0.') or line.startswith('[OVERALL]')
-
-  while not IsHeadOfResults(result_string):
-    result_string = next(fp).strip()
-
-  if result_string.startswith('YCSB Client 0.'):
-    client_string = result_string
-    command_line = next(fp).strip()
-    if not command_line.startswith('Command line:'):
-      raise IOError('Unexpected second line: {0}'.format(command_line))
-  elif result_string.startswith('[OVERALL]'):  # YCSB > 0.7.0.
-    lines.append(result_string)
-  else:
-    # Received unexpected header
-    raise IOError('Unexpected header: {0}'.format(client_string))
+        histogram: sample.Histogram of operation latencies in ms, counted in
+          1ms buckets. The bucket for 0 holds the operations that took
+          between 0ms and 1ms, and so on. Only present for the 'histogram'
+          data type.
+        timeseries: list of (ms_offset, latency) tuples. Only present for the
+          'timeseries' data type.
 
-  # Some databases print additional output to stdout.
-  # YCSB results start with [<OPERATION_NAME>];
-  # filter to just those lines.
-  def LineFilter(line):
-    return re.search(r'^\[[A-Z]+\]', line) is not None
-  lines = itertools.chain(lines, itertools.ifilter(LineFilter, fp))
-
-  r = csv.reader(lines)
-
-  by_operation = itertools.groupby(r, operator.itemgetter(0))
+  Raises:
+    IOError: if the output does not contain YCSB results.
+  """
+  if isinstance(ycsb_result, basestring):
+    ycsb_result = cStringIO.StringIO(ycsb_result)
 
   result = collections.OrderedDict([
-      ('client', client_string),
-      ('command_line', command_line),
+      ('client', 'YCSB'),
+      ('command_line', 'unknown'),
       ('groups', collections.OrderedDict())])
+  found_header = False
 
-  for operation, lines in by_operation:
-    operation = operation[1:-1].lower()
+  # Histogram buckets and counts of each operation, converted to numpy arrays
+  # once all lines have been read.
+  buckets = collections.defaultdict(list)
+  counts = collections.defaultdict(list)
 
+  # Some databases print additional output to stdout.
+  # YCSB results start with [<OPERATION_NAME>];
+  # filter to just those lines.
+  for line in ycsb_result:
+    if not _IsResultLine(line):
+      line = line.strip()
+      if not found_header and line.startswith('YCSB Client 0.'):
+        result['client'] = line
+        found_header = True
+      elif (result['command_line'] == 'unknown' and
+            line.startswith('Command line:')):
+        result['command_line'] = line
+      continue
+    operation, name, val = line.split(',')
+    operation = operation.strip()[1:-1].lower()
     if operation == 'cleanup':
       continue
-
-    op_result = {
-        'group': operation,
-        data_type: [],
-        'statistics': {}
-    }
-    for _, name, val in lines:
-      name = name.strip()
-      val = val.strip()
-      # Drop ">" from ">1000"
-      if name.startswith('>'):
-        name = name[1:]
-      val = float(val) if '.' in val or 'nan' in val.lower() else int(val)
-      if name.isdigit():
-        if val:
-          op_result[data_type].append((int(name), val))
+    op_result = result['groups'].get(operation)
+    if op_result is None:
+      op_result = result['groups'][operation] = {
+          'group': operation,
+          'statistics': {}
+      }
+      if data_type != 'histogram':
+        op_result[data_type] = []
+
+    name = name.strip()
+    val = val.strip()
+    # Drop ">" from ">1000"
+    if name.startswith('>'):
+      name = name[1:]
+    val = float(val) if '.' in val or 'nan' in val.lower() else int(val)
+    if name.isdigit():
+      if not val:
+        continue
+      if data_type == 'histogram':
+        buckets[operation].append(int(name))
+        counts[operation].append(val)
       else:
-        if '(us)' in name:
-          name = name.replace('(us)', '(ms)')
-          val /= 1000.0
-        op_result['statistics'][name] = val
-
-    result['groups'][operation] = op_result
+        op_result[data_type].append((int(name), val))
+    else:
+      if '(us)' in name:
+        name = name.replace('(us)', '(ms)')
+        val /= 1000.0
+      op_result['statistics'][name] = val
+
+  if not found_header and not result['groups']:
+    raise IOError('No YCSB results found.')
+
+  if data_type == 'histogram':
+    for operation, op_result in result['groups'].iteritems():
+      histogram = sample.Histogram()
+      histogram.Add(np.array(buckets[operation], dtype=float),
+                    np.array(counts[operation], dtype=np.int64))
+      op_result['histogram'] = histogram
   return result
 
 
-def _CumulativeSum(xs):
-  total = 0
-  for x in xs:
-    total += x
-    yield total
+def _RunAndParseResults(vm, command):
+  """Runs a YCSB command on a VM and parses its results as they arrive.
+
+  YCSB versions greater than 0.7.0 print part of the results to stderr, so
+  the lines of both streams are parsed in the order they are received.
+  """
+  return ParseResults(
+      data for _, data in vm.IterRobustRemoteCommand(command, lines=True))
 
 
 def _WeightedQuantile(x, weights, p):
@@ -304,45 +328,33 @@ def _WeightedQuantile(x, weights, p):
     ValueError: When 'x' and 'weights' are not the same length, or 'p' is not in
       the interval [0, 1].
   """
-  if len(x) != len(weights):
-    raise ValueError('Lengths do not match: {0} != {1}'.format(
-        len(x), len(weights)))
   if p < 0 or p > 1:
     raise ValueError('Invalid quantile: {0}'.format(p))
-  n = sum(weights)
-  target = n * float(p)
-  cumulative = list(_CumulativeSum(weights))
-
-  # Find the first cumulative weight >= target
-  i = bisect.bisect_left(cumulative, target)
-  if i == len(x):
-    return x[-1]
-  else:
-    return x[i]
+  return stats_util.WeightedPercentiles(
+      x, weights, [p * 100], method=stats_util.CUMULATIVE_WEIGHT)[0]
 
 
 def _PercentilesFromHistogram(ycsb_histogram, percentiles=_DEFAULT_PERCENTILES):
   """Calculate percentiles for from a YCSB histogram.
 
   Args:
-    ycsb_histogram: List of (time_ms, frequency) tuples.
+    ycsb_histogram: sample.Histogram of latencies in ms.
     percentiles: iterable of floats, in the interval [0, 100].
 
   Returns:
     dict, mapping from percentile to value.
   """
-  result = collections.OrderedDict()
-  histogram = sorted(ycsb_histogram)
+  labels = []
   for percentile in percentiles:
     if percentile < 0 or percentile > 100:
       raise ValueError('Invalid percentile: {0}'.format(percentile))
     if math.modf(percentile)[0] < 1e-7:
       percentile = int(percentile)
-    label = 'p{0}'.format(percentile)
-    latencies, freqs = zip(*histogram)
-    time_ms = _WeightedQuantile(latencies, freqs, percentile * 0.01)
-    result[label] = time_ms
-  return result
+    labels.append('p{0}'.format(percentile))
+  latencies, freqs = ycsb_histogram.Buckets()
+  values = stats_util.WeightedPercentiles(
+      latencies, freqs, percentiles, method=stats_util.CUMULATIVE_WEIGHT)
+  return collections.OrderedDict(zip(labels, values))
 
 
 def _CombineResults(result_list, combine_histograms=True):
@@ -351,6 +363,8 @@ def _CombineResults(result_list, combine_histograms=True):
   Reduces a list of YCSB results (the output of ParseResults)
   into a single result. Histogram bin counts, operation counts, and throughput
   are summed; RunTime is replaced by the maximum runtime of any result.
+  The histograms of each group are summed in one pass over all results. The
+  input results are not modified.
 
   Args:
     result_list: List of ParseResults outputs.
@@ -359,31 +373,34 @@ def _CombineResults(result_list, combine_histograms=True):
   Returns:
     A dictionary, as returned by ParseResults.
   """
-  def DropUnaggregated(result):
-    """Remove statistics which 'operators' specify should not be combined."""
-    drop_keys = {k for k, v in AGGREGATE_OPERATORS.iteritems() if v is None}
-    for group in result['groups'].itervalues():
-      for k in drop_keys:
-        group['statistics'].pop(k, None)
-
-  def CombineHistograms(hist1, hist2):
-    h1 = dict(hist1)
-    h2 = dict(hist2)
-    keys = sorted(frozenset(h1) | frozenset(h2))
-    result = []
-    for k in keys:
-      result.append((k, h1.get(k, 0) + h2.get(k, 0)))
-    return result
-
-  result = copy.deepcopy(result_list[0])
-  DropUnaggregated(result)
+  def CopyGroup(group, drop_unaggregated):
+    """Copies a group without its histogram."""
+    group = group.copy()
+    group.pop('histogram', None)
+    statistics = group['statistics']
+    if drop_unaggregated:
+      # Remove statistics which 'operators' specify should not be combined.
+      statistics = {k: v for k, v in statistics.iteritems()
+                    if AGGREGATE_OPERATORS.get(k, True) is not None}
+    group['statistics'] = dict(statistics)
+    return group
+
+  first = result_list[0]
+  result = first.copy()
+  result['groups'] = collections.OrderedDict(
+      (group_name, CopyGroup(group, True))
+      for group_name, group in first['groups'].iteritems())
+  histograms = collections.defaultdict(list)
+  for group_name, group in first['groups'].iteritems():
+    histograms[group_name].append(group.get('histogram'))
 
   for indiv in result_list[1:]:
     for group_name, group in indiv['groups'].iteritems():
+      histograms[group_name].append(group.get('histogram'))
       if group_name not in result['groups']:
         logging.warn('Found result group "%s" in individual YCSB result, '
                      'but not in accumulator.', group_name)
-        result['groups'][group_name] = copy.deepcopy(group)
+        result['groups'][group_name] = CopyGroup(group, False)
         continue
 
       # Combine reported statistics.
@@ -391,35 +408,36 @@ def _CombineResults(result_list, combine_histograms=True):
       # Otherwise, the aggregated value is either:
       # * The value in 'indiv', if the statistic is not present in 'result' or
       # * AGGREGATE_OPERATORS[statistic](result_value, indiv_value)
+      statistics = result['groups'][group_name]['statistics']
       for k, v in group['statistics'].iteritems():
         if k not in AGGREGATE_OPERATORS:
           logging.warn('No operator for "%s". Skipping aggregation.', k)
           continue
         elif AGGREGATE_OPERATORS[k] is None:  # Drop
-          result['groups'][group_name]['statistics'].pop(k, None)
+          statistics.pop(k, None)
           continue
-        elif k not in result['groups'][group_name]['statistics']:
+        elif k not in statistics:
           logging.warn('Found statistic "%s.%s" in individual YCSB result, '
                        'but not in accumulator.', group_name, k)
-          result['groups'][group_name]['statistics'][k] = copy.deepcopy(v)
+          statistics[k] = v
           continue
 
         op = AGGREGATE_OPERATORS[k]
-        result['groups'][group_name]['statistics'][k] = (
-            op(result['groups'][group_name]['statistics'][k], v))
+        statistics[k] = op(statistics[k], v)
 
-      if combine_histograms:
-        result['groups'][group_name]['histogram'] = CombineHistograms(
-            result['groups'][group_name]['histogram'],
-            group['histogram'])
-      else:
-        result['groups'][group_name].pop('histogram', None)
     result['client'] = ' '.join((result['client'], indiv['client']))
     result['command_line'] = ';'.join((result['command_line'],
                                        indiv['command_line']))
     if 'target' in result and 'target' in indiv:
       result['target'] += indiv['target']
 
+  # A single result keeps its histogram, as it did before combining.
+  if combine_histograms or len(result_list) == 1:
+    for group_name, group in result['groups'].iteritems():
+      group_histograms = [h for h in histograms[group_name] if h is not None]
+      if group_histograms:
+        group['histogram'] = sample.Histogram.Combine(group_histograms)
+
   return result
 
 
@@ -448,12 +466,15 @@ def _ParseWorkload(contents):
   return result
 
 
-def _CreateSamples(ycsb_result, include_histogram=True, **kwargs):
+def _CreateSamples(ycsb_result, include_histogram=True,
+                   include_histogram_sample=False, **kwargs):
   """Create PKB samples from a YCSB result.
 
   Args:
     ycsb_result: dict. Result of ParseResults.
     include_histogram: bool. If True, include records for each histogram bin.
+    include_histogram_sample: bool. If True, include a sample with the latency
+        histogram of each group.
     **kwargs: Base metadata for each sample.
 
   Returns:
@@ -478,17 +499,24 @@ def _CreateSamples(ycsb_result, include_histogram=True, **kwargs):
         unit = m.group(2)
       yield sample.Sample(' '.join([group_name, statistic]), value, unit, meta)
 
-    if group['histogram']:
-      percentiles = _PercentilesFromHistogram(group['histogram'])
-      for label, value in percentiles.iteritems():
-        yield sample.Sample(' '.join([group_name, label, 'latency']),
-                            value, 'ms', meta)
+    histogram = group.get('histogram')
+    if histogram is None or not histogram.count:
+      continue
+
+    percentiles = _PercentilesFromHistogram(histogram)
+    for label, value in percentiles.iteritems():
+      yield sample.Sample(' '.join([group_name, label, 'latency']),
+                          value, 'ms', meta)
 
     if include_histogram:
-      for time_ms, count in group['histogram']:
+      for time_ms, count in zip(*histogram.Buckets()):
         yield sample.Sample(
-            '{0}_latency_histogram_{1}_ms'.format(group_name, time_ms),
-            count, 'count', meta)
+            '{0}_latency_histogram_{1}_ms'.format(group_name, int(time_ms)),
+            int(count), 'count', meta)
+
+    if include_histogram_sample:
+      yield sample.Sample('{0}_latency_histogram'.format(group_name),
+                          histogram.count, 'count', meta, histogram=histogram)
 
 
 class YCSBExecutor(object):
@@ -572,8 +600,7 @@ class YCSBExecutor(object):
       param, value = pv.split('=', 1)
       kwargs[param] = value
     command = self._BuildCommand('load', **kwargs)
-    stdout, stderr = vm.RobustRemoteCommand(command)
-    return ParseResults(str(stderr + stdout))
+    return _RunAndParseResults(vm, command)
 
   def _LoadThreaded(self, vms, workload_file, **kwargs):
     """Runs "Load" in parallel for each VM in VMs.
@@ -639,12 +666,14 @@ class YCSBExecutor(object):
         samples.extend(_CreateSamples(
             result, result_type='individual', result_index=i,
             include_histogram=FLAGS.ycsb_histogram,
+            include_histogram_sample=FLAGS.ycsb_histogram_sample,
             **workload_meta))
 
     combined = _CombineResults(results)
     samples.extend(_CreateSamples(
         combined, result_type='combined',
         include_histogram=FLAGS.ycsb_histogram,
+        include_histogram_sample=FLAGS.ycsb_histogram_sample,
         **workload_meta))
 
     return samples
@@ -655,11 +684,7 @@ class YCSBExecutor(object):
       param, value = pv.split('=', 1)
       kwargs[param] = value
     command = self._BuildCommand('run', **kwargs)
-    # YCSB version greater than 0.7.0 output some of the
-    # info we need to stderr. So we have to combine these 2
-    # output to get expected results.
-    stdout, stderr = vm.RobustRemoteCommand(command)
-    return ParseResults(str(stderr + stdout))
+    return _RunAndParseResults(vm, command)
 
   def _RunThreaded(self, vms, **kwargs):
     """Run a single workload using `vms`."""
@@ -756,12 +781,14 @@ class YCSBExecutor(object):
                 result_type='individual',
                 result_index=i,
                 include_histogram=FLAGS.ycsb_histogram,
+                include_histogram_sample=FLAGS.ycsb_histogram_sample,
                 **client_meta))
 
         combined = _CombineResults(results)
         all_results.extend(_CreateSamples(
             combined, result_type='combined',
             include_histogram=FLAGS.ycsb_histogram,
+            include_histogram_sample=FLAGS.ycsb_histogram_sample,
             **client_meta))
 
     return all_results
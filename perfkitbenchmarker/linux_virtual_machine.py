@@ -31,11 +31,13 @@ import os
 import pipes
 import posixpath
 import re
+import subprocess
 import threading
 import time
 import uuid
 import yaml
 
+from perfkitbenchmarker import command_engine
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
@@ -68,6 +70,15 @@ EXECUTE_COMMAND = 'execute_command.py'
 # then copies the stdout and stderr, exiting with the status of the command run
 # by EXECUTE_COMMAND.
 WAIT_FOR_COMMAND = 'wait_for_command.py'
+# Exit status of WAIT_FOR_COMMAND --follow if the output files of the command
+# do not exist. Retrying cannot help then.
+_FOLLOW_FILES_MISSING_EXIT_CODE = 3
+# Bytes of stderr kept by IterRobustRemoteCommand for its error message.
+_STDERR_TAIL_SIZE = 4096
+
+flags.DEFINE_integer('max_concurrent_package_installs', 4,
+                     'Maximum number of PerfKit packages that InstallMany '
+                     'installs concurrently on a VM.', lower_bound=1)
 
 flags.DEFINE_bool('setup_remote_firewall', False,
                   'Whether PKB should configure the firewall of each remote'
@@ -91,6 +102,51 @@ flags.DEFINE_list('set_files', [],
                   'the benchmark.')
 
 
+def _GetRemoteCommandErrorText(command, ssh_cmd, stdout, stderr, retcode):
+  """Returns the message of the error raised when a remote command fails."""
+  return ('Got non-zero return code (%s) executing %s\n'
+          'Full command: %s\nSTDOUT: %sSTDERR: %s' %
+          (retcode, command, ' '.join(ssh_cmd), stdout, stderr))
+
+
+def _ReadFollowRecords(pipe):
+  """Parses the records written by WAIT_FOR_COMMAND --follow.
+
+  Args:
+    pipe: file object. The stdout of WAIT_FOR_COMMAND.
+
+  Yields:
+    ('stdout', data) and ('stderr', data) tuples, then ('status', returncode)
+    once the command has completed. Stops early if the pipe is closed
+    mid-stream, e.g. because the ssh connection failed.
+
+  Raises:
+    RemoteCommandError: If a record header cannot be parsed.
+  """
+  while True:
+    header = pipe.readline()
+    if not header.endswith('\n'):
+      return
+    try:
+      record_type, value = header.split()
+      value = int(value)
+    except ValueError:
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Unexpected record header from %s --follow: %r' % (
+              WAIT_FOR_COMMAND, header))
+    if record_type == 'X':
+      yield 'status', value
+      return
+    if record_type not in ('O', 'E'):
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Unexpected record type from %s --follow: %r' % (
+              WAIT_FOR_COMMAND, header))
+    data = pipe.read(value)
+    if len(data) < value:
+      return
+    yield ('stdout' if record_type == 'O' else 'stderr'), data
+
+
 class BaseLinuxMixin(virtual_machine.BaseOsMixin):
   """Class that holds Linux related VM methods and attributes."""
 
@@ -99,6 +155,10 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
   # Serializing calls to ssh with the -t option fixes the problem.
   _pseudo_tty_lock = threading.Lock()
 
+  # Attribute of package modules declaring the OS packages they install with
+  # the VM's package manager. See perfkitbenchmarker.linux_packages.
+  _OS_PACKAGES_ATTRIBUTE = None
+
   def __init__(self):
     super(BaseLinuxMixin, self).__init__()
     self.ssh_port = DEFAULT_SSH_PORT
@@ -108,6 +168,74 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     self._remote_command_script_upload_lock = threading.Lock()
     self._has_remote_command_script = False
 
+    # Number of SSH/SCP invocations that were multiplexed over an existing
+    # master connection ('reused') vs. those that had to perform a full
+    # handshake ('new'). Only tracked when --ssh_reuse_connections is set.
+    self.ssh_connection_counts = {'new': 0, 'reused': 0}
+    self._ssh_connection_counts_lock = threading.Lock()
+
+    # Package managers fail when invoked concurrently on the same VM, so
+    # their invocations are serialized.
+    self._package_manager_lock = threading.RLock()
+    # OS packages installed with InstallPackages. Requests to install them
+    # again, e.g. after InstallMany, do not invoke the package manager.
+    self._installed_os_packages = set()
+    # Locks held while a PerfKit package is installed, keyed by package name.
+    self._package_locks = {}
+    self._package_locks_lock = threading.Lock()
+
+  def _GetPackageLock(self, package_name):
+    """Returns the lock held while 'package_name' is installed."""
+    with self._package_locks_lock:
+      return self._package_locks.setdefault(package_name, threading.Lock())
+
+  def _InstallOsPackages(self, packages, install):
+    """Invokes the package manager unless all packages are installed.
+
+    Args:
+      packages: string. OS packages separated by spaces.
+      install: function that installs 'packages' with the package manager.
+    """
+    names = set(packages.split())
+    with self._package_manager_lock:
+      if names and names <= self._installed_os_packages:
+        return
+      install()
+      self._installed_os_packages.update(names)
+
+  def InstallMany(self, package_names):
+    """Installs several PerfKit packages and their dependencies.
+
+    The OS packages declared by the packages and their dependencies (see
+    perfkitbenchmarker.linux_packages) are installed in a single package
+    manager transaction. The PerfKit packages are then installed concurrently,
+    each one after its declared dependencies.
+
+    Args:
+      package_names: list of PerfKit package names.
+    """
+    if not self.install_packages:
+      return
+    package_names = [
+        name for name in linux_packages.ResolveDependencies(package_names)
+        if name not in self._installed_packages]
+    if not package_names:
+      return
+    if self._OS_PACKAGES_ATTRIBUTE:
+      os_packages = linux_packages.GetOsPackages(package_names,
+                                                 self._OS_PACKAGES_ATTRIBUTE)
+      if os_packages:
+        self.InstallPackages(' '.join(os_packages))
+    indices = {name: i for i, name in enumerate(package_names)}
+    dependencies = [
+        [indices[dependency]
+         for dependency in linux_packages.GetDependencies(name)
+         if dependency in indices]
+        for name in package_names]
+    vm_util.RunParallelThreads(
+        [(self.Install, (name,), {}) for name in package_names],
+        FLAGS.max_concurrent_package_installs, dependencies=dependencies)
+
   def _CreateVmTmpDir(self):
         self.RemoteCommand('mkdir -p %s' % vm_util.VM_TMP_DIR)
 
@@ -123,28 +251,17 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
                                             os.path.basename(f)))
         self._has_remote_command_script = True
 
-  def RobustRemoteCommand(self, command, should_log=False):
-    """Runs a command on the VM in a more robust way than RemoteCommand.
-
-    Executes a command via a pair of scripts on the VM:
-
-    * EXECUTE_COMMAND, which runs 'command' in a nohupped background process.
-    * WAIT_FOR_COMMAND, which waits on a file lock held by EXECUTE_COMMAND until
-      'command' completes, then returns with the stdout, stderr, and exit status
-      of 'command'.
-
-    Temporary SSH failures (where ssh returns a 255) while waiting for the
-    command to complete will be tolerated and safely retried.
+  def _StartRobustRemoteCommand(self, command):
+    """Starts a command on the VM via EXECUTE_COMMAND.
 
-    If should_log is True, log the command's output at the info
-    level. If False, log the command's output at the debug level.
+    Returns:
+      The path on the VM, without extension, of the wrapper log ('.log') and
+      of the stdout, stderr and status files of the command.
     """
     self._PushRobustCommandScripts()
 
     execute_path = os.path.join(vm_util.VM_TMP_DIR,
                                 os.path.basename(EXECUTE_COMMAND))
-    wait_path = os.path.join(vm_util.VM_TMP_DIR,
-                             os.path.basename(WAIT_FOR_COMMAND))
 
     uid = uuid.uuid4()
     file_base = os.path.join(vm_util.VM_TMP_DIR, 'cmd%s' % uid)
@@ -165,6 +282,31 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     start_command = '%s 1> %s 2>&1 &' % (' '.join(start_command),
                                          wrapper_log)
     self.RemoteCommand(start_command)
+    return file_base
+
+  def RobustRemoteCommand(self, command, should_log=False):
+    """Runs a command on the VM in a more robust way than RemoteCommand.
+
+    Executes a command via a pair of scripts on the VM:
+
+    * EXECUTE_COMMAND, which runs 'command' in a nohupped background process.
+    * WAIT_FOR_COMMAND, which waits on a file lock held by EXECUTE_COMMAND until
+      'command' completes, then returns with the stdout, stderr, and exit status
+      of 'command'.
+
+    Temporary SSH failures (where ssh returns a 255) while waiting for the
+    command to complete will be tolerated and safely retried.
+
+    If should_log is True, log the command's output at the info
+    level. If False, log the command's output at the debug level.
+    """
+    file_base = self._StartRobustRemoteCommand(command)
+    wrapper_log = file_base + '.log'
+    stdout_file = file_base + '.stdout'
+    stderr_file = file_base + '.stderr'
+    status_file = file_base + '.status'
+    wait_path = os.path.join(vm_util.VM_TMP_DIR,
+                             os.path.basename(WAIT_FOR_COMMAND))
 
     wait_command = ['python', wait_path, '--stdout', stdout_file,
                     '--stderr', stderr_file,
@@ -180,6 +322,117 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
                      'Wrapper script log:\n%s', stdout)
       raise
 
+  def IterRobustRemoteCommand(self, command, lines=False,
+                              ignore_failure=False, poll_interval=1):
+    """Runs a command like RobustRemoteCommand, yielding output as it arrives.
+
+    WAIT_FOR_COMMAND follows the stdout and stderr files of the command and
+    sends what is appended to them over a long-lived ssh connection. When the
+    connection fails, it is reopened at the offsets received so far, so no
+    output is lost or repeated. Output is not accumulated, so memory use does
+    not grow with the length of the output.
+
+    Args:
+      command: A valid bash command.
+      lines: bool. If True, yield complete lines, including their trailing
+          newline, instead of chunks of arbitrary size. A last line without
+          a newline is yielded when the command completes.
+      ignore_failure: bool. Whether to ignore a non-zero exit status.
+      poll_interval: float. Seconds between checks for new output on the VM.
+
+    Yields:
+      (stream, data) tuples, where stream is 'stdout' or 'stderr'.
+
+    Raises:
+      RemoteCommandError: If the command exits with a non-zero status and
+          ignore_failure is False, if its output files do not exist, if the
+          output is malformed, or if the output cannot be followed after
+          SSH_RETRIES consecutive failed connections.
+    """
+    file_base = self._StartRobustRemoteCommand(command)
+    files = [file_base + ext
+             for ext in ('.stdout', '.stderr', '.status', '.log')]
+    wait_path = os.path.join(vm_util.VM_TMP_DIR,
+                             os.path.basename(WAIT_FOR_COMMAND))
+    offsets = {'stdout': 0, 'stderr': 0}
+    partial_lines = {'stdout': '', 'stderr': ''}
+    # The end of stderr, for the error message.
+    stderr_tail = ''
+    returncode = None
+    failures = 0
+    try:
+      while returncode is None:
+        follow_command = ('python %s --stdout %s --stderr %s --status %s '
+                          '--follow --stdout-offset %d --stderr-offset %d '
+                          '--poll-interval %s' % (
+                              wait_path, files[0], files[1], files[2],
+                              offsets['stdout'], offsets['stderr'],
+                              poll_interval))
+        process = self.StartRemoteCommand(follow_command)
+        received = False
+        try:
+          for stream, data in _ReadFollowRecords(process.stdout):
+            if stream == 'status':
+              returncode = data
+              break
+            received = True
+            offsets[stream] += len(data)
+            if stream == 'stderr':
+              stderr_tail = (stderr_tail + data)[-_STDERR_TAIL_SIZE:]
+            if not lines:
+              yield stream, data
+              continue
+            split = (partial_lines[stream] + data).split('\n')
+            partial_lines[stream] = split.pop()
+            for line in split:
+              yield stream, line + '\n'
+        finally:
+          if process.poll() is None:
+            process.terminate()
+          follow_returncode = process.wait()
+        if (returncode is None and
+            follow_returncode == _FOLLOW_FILES_MISSING_EXIT_CODE):
+          raise errors.VirtualMachine.RemoteCommandError(
+              'The output files of "%s" do not exist on %s.' % (command, self))
+        if returncode is None:
+          failures = 0 if received else failures + 1
+          if failures >= SSH_RETRIES:
+            raise errors.VirtualMachine.RemoteCommandError(
+                'Lost the output of "%s" on %s after %d attempts.' % (
+                    command, self, failures))
+          logging.warning('Lost the output of "%s" on %s. Resuming at stdout '
+                          'offset %d and stderr offset %d.', command, self,
+                          offsets['stdout'], offsets['stderr'])
+          time.sleep(poll_interval)
+
+      for stream in ('stdout', 'stderr'):
+        if partial_lines[stream]:
+          yield stream, partial_lines[stream]
+    finally:
+      # The files are removed even if the output could not be followed to
+      # the end, or the caller stopped iterating.
+      self.RemoteCommand('rm -f %s' % ' '.join(files), ignore_failure=True)
+    if returncode and not ignore_failure:
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Got non-zero return code (%s) executing %s\nEnd of STDERR: %s' % (
+              returncode, command, stderr_tail))
+
+  def RobustRemoteCommandStream(self, command, callback, lines=True,
+                                ignore_failure=False):
+    """Runs a command like RobustRemoteCommand, passing output to a callback.
+
+    Args:
+      command: A valid bash command.
+      callback: function called with (stream, data) as output arrives, where
+          stream is 'stdout' or 'stderr'. See IterRobustRemoteCommand.
+      lines: bool. Whether data is a complete line rather than a chunk.
+      ignore_failure: bool. Whether to ignore a non-zero exit status.
+    """
+    output = self.IterRobustRemoteCommand(command, lines=lines,
+                                          ignore_failure=ignore_failure)
+    for stream, data in output:
+      callback(stream, data)
+
   def SetupRemoteFirewall(self):
     """Sets up IP table configurations on the VM."""
     self.RemoteHostCommand('sudo iptables -A INPUT -j ACCEPT')
@@ -286,21 +539,56 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     """
     pass
 
+  def _GetFormatDiskCommand(self, device_path):
+    # Some images may automount one local disk, but we don't
+    # want to fail if this wasn't the case.
+    return ('[[ -d /mnt ]] && sudo umount /mnt; '
+            'sudo mke2fs -F -E lazy_itable_init=0,discard -O '
+            '^has_journal -t ext4 -b 4096 %s' % device_path)
+
+  def _GetMountDiskCommand(self, device_path, mount_path):
+    return ('sudo mkdir -p {1};sudo mount -o discard {0} {1};'
+            'sudo chown -R $USER:$USER {1};').format(device_path, mount_path)
+
+  def _GetStripeDisksCommand(self, devices, striped_device):
+    return ('yes | sudo mdadm --create %s --level=stripe --raid-devices='
+            '%s %s' % (striped_device, len(devices), ' '.join(devices)))
+
   @vm_util.Retry()
   def FormatDisk(self, device_path):
     """Formats a disk attached to the VM."""
-    # Some images may automount one local disk, but we don't
-    # want to fail if this wasn't the case.
-    fmt_cmd = ('[[ -d /mnt ]] && sudo umount /mnt; '
-               'sudo mke2fs -F -E lazy_itable_init=0,discard -O '
-               '^has_journal -t ext4 -b 4096 %s' % device_path)
-    self.RemoteHostCommand(fmt_cmd)
+    self.RemoteHostCommand(self._GetFormatDiskCommand(device_path))
 
   def MountDisk(self, device_path, mount_path):
     """Mounts a formatted disk in the VM."""
-    mnt_cmd = ('sudo mkdir -p {1};sudo mount -o discard {0} {1};'
-               'sudo chown -R $USER:$USER {1};').format(device_path, mount_path)
-    self.RemoteHostCommand(mnt_cmd)
+    self.RemoteHostCommand(self._GetMountDiskCommand(device_path, mount_path))
+
+  @vm_util.Retry()
+  def SetUpDisk(self, device_path, mount_path=None, striped_devices=None):
+    """Stripes, formats and mounts a disk with a single remote command.
+
+    Args:
+      device_path: string. The path of the device to set up.
+      mount_path: string or None. Where to mount the device after formatting
+          it. If None, the device is neither formatted nor mounted.
+      striped_devices: list of device paths, or None. If given, they are
+          striped together to create 'device_path' first, unless a retry finds
+          it already created.
+    """
+    commands = []
+    if striped_devices:
+      self.Install('mdadm')
+      commands.append('[[ -b {0} ]] || ({1})'.format(
+          device_path,
+          self._GetStripeDisksCommand(striped_devices, device_path)))
+    if mount_path:
+      commands.append(self._GetFormatDiskCommand(device_path))
+      commands.append(self._GetMountDiskCommand(device_path, mount_path))
+    if commands:
+      # The script stops at the first command that fails, so that e.g. a disk
+      # that could not be formatted is not mounted.
+      self.RemoteHostCommand(' && '.join(
+          '{ %s; }' % command.rstrip(';') for command in commands))
 
   def RemoteCopy(self, file_path, remote_path='', copy_to=True):
     self.RemoteHostCopy(file_path, remote_path, copy_to)
@@ -325,8 +613,10 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     remote_location = '%s@%s:%s' % (
         self.user_name, self.ip_address, remote_path)
+    control_path = self._GetSshControlPath()
     scp_cmd = ['scp', '-P', str(self.ssh_port), '-pr']
-    scp_cmd.extend(vm_util.GetSshOptions(self.ssh_private_key))
+    scp_cmd.extend(vm_util.GetSshOptions(self.ssh_private_key, control_path))
+    self._CountSshConnection(control_path)
     if copy_to:
       scp_cmd.extend([file_path, remote_location])
     else:
@@ -376,41 +666,149 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     Raises:
       RemoteCommandError: If there was a problem establishing the connection.
     """
+    return self.RemoteHostCommandAsync(
+        command, should_log=should_log, retries=retries,
+        ignore_failure=ignore_failure, login_shell=login_shell,
+        suppress_warning=suppress_warning, timeout=timeout).Result()
+
+  def RemoteHostCommandAsync(self, command,
+                             should_log=False, retries=SSH_RETRIES,
+                             ignore_failure=False, login_shell=False,
+                             suppress_warning=False, timeout=None):
+    """Starts a command on the VM without waiting for it.
+
+    With --multiplex_commands, no thread is used while the command runs, so
+    many commands can be issued at once, e.g. one per VM of a large group:
+
+      futures = [vm.RemoteHostCommandAsync('uptime') for vm in vms]
+      results = [future.Result() for future in futures]
+
+    Args:
+      See RemoteHostCommand.
+
+    Returns:
+      A command_engine.CommandFuture whose result is the tuple of stdout and
+      stderr returned by RemoteHostCommand, or which raises the exception
+      RemoteHostCommand would raise.
+    """
     if vm_util.RunningOnWindows():
       # Multi-line commands passed to ssh won't work on Windows unless the
       # newlines are escaped.
       command = command.replace('\n', '\\n')
 
-    user_host = '%s@%s' % (self.user_name, self.ip_address)
-    ssh_cmd = ['ssh', '-A', '-p', str(self.ssh_port), user_host]
-    ssh_cmd.extend(vm_util.GetSshOptions(self.ssh_private_key))
-    try:
-      if login_shell:
-        ssh_cmd.extend(['-t', '-t', 'bash -l -c "%s"' % command])
-        self._pseudo_tty_lock.acquire()
+    control_path = self._GetSshControlPath()
+    ssh_cmd = self._GetSshCommand(control_path)
+    if login_shell:
+      ssh_cmd.extend(['-t', '-t', 'bash -l -c "%s"' % command])
+      self._pseudo_tty_lock.acquire()
+    else:
+      ssh_cmd.append(command)
+
+    future = command_engine.CommandFuture()
+    attempts = [0]
+
+    def _IssueSsh():
+      attempts[0] += 1
+      self._CountSshConnection(control_path)
+      vm_util.IssueCommandAsync(
+          ssh_cmd, force_info_log=should_log,
+          suppress_warning=suppress_warning,
+          timeout=timeout).AddDoneCallback(_OnSshDone)
+
+    def _OnSshDone(ssh_future):
+      try:
+        stdout, stderr, retcode = ssh_future.Result()
+        # Retry on 255 because this indicates an SSH failure.
+        if retcode == 255 and attempts[0] < retries:
+          _IssueSsh()
+          return
+      except Exception as e:  # pylint: disable=broad-except
+        _Complete(None, e)
+        return
+      if retcode and not ignore_failure:
+        _Complete(None, errors.VirtualMachine.RemoteCommandError(
+            _GetRemoteCommandErrorText(command, ssh_cmd, stdout, stderr,
+                                       retcode)))
       else:
-        ssh_cmd.append(command)
-
-      for _ in range(retries):
-        stdout, stderr, retcode = vm_util.IssueCommand(
-            ssh_cmd, force_info_log=should_log,
-            suppress_warning=suppress_warning,
-            timeout=timeout)
-        if retcode != 255:  # Retry on 255 because this indicates an SSH failure
-          break
-    finally:
+        _Complete((stdout, stderr), None)
+
+    def _Complete(result, exception):
       if login_shell:
         self._pseudo_tty_lock.release()
+      if exception is None:
+        future.SetResult(result)
+      else:
+        future.SetException(exception)
+
+    try:
+      _IssueSsh()
+    except Exception as e:  # pylint: disable=broad-except
+      _Complete(None, e)
+    except BaseException:
+      if login_shell and not future.done():
+        self._pseudo_tty_lock.release()
+      raise
+    return future
 
-    if retcode:
-      full_cmd = ' '.join(ssh_cmd)
-      error_text = ('Got non-zero return code (%s) executing %s\n'
-                    'Full command: %s\nSTDOUT: %sSTDERR: %s' %
-                    (retcode, command, full_cmd, stdout, stderr))
-      if not ignore_failure:
-        raise errors.VirtualMachine.RemoteCommandError(error_text)
+  def StartRemoteCommand(self, command):
+    """Starts a command on the VM without waiting for it to complete.
 
-    return stdout, stderr
+    Unlike RemoteCommand, the output of the command can be read while it is
+    running, e.g. to stream the output of a long-running monitoring tool. The
+    command runs until it exits or the returned process is terminated.
+
+    Args:
+      command: A valid bash command.
+
+    Returns:
+      The subprocess.Popen object of the ssh process. Its stdout is a pipe
+      receiving the stdout of the command. Its stderr is discarded.
+    """
+    control_path = self._GetSshControlPath()
+    ssh_cmd = self._GetSshCommand(control_path) + [command]
+    self._CountSshConnection(control_path)
+    logging.info('Starting on %s: %s', self, command)
+    with open(os.devnull, 'r+') as devnull:
+      return subprocess.Popen(ssh_cmd, stdin=devnull, stdout=subprocess.PIPE,
+                              stderr=devnull, close_fds=True)
+
+  def _GetSshCommand(self, control_path):
+    """Returns the ssh command line, without the command to run on the VM."""
+    user_host = '%s@%s' % (self.user_name, self.ip_address)
+    ssh_cmd = ['ssh', '-A', '-p', str(self.ssh_port), user_host]
+    ssh_cmd.extend(vm_util.GetSshOptions(self.ssh_private_key, control_path))
+    return ssh_cmd
+
+  def _GetSshControlPath(self):
+    """Returns the ControlMaster socket path for this VM, or None."""
+    return vm_util.GetSshControlPath(self.user_name, self.ip_address,
+                                     self.ssh_port)
+
+  def _CountSshConnection(self, control_path):
+    """Records whether an SSH invocation will reuse a master connection.
+
+    Args:
+      control_path: The ControlMaster socket path passed to ssh/scp, or None
+          if connections are not being reused.
+    """
+    if not control_path:
+      return
+    key = 'reused' if os.path.exists(control_path) else 'new'
+    with self._ssh_connection_counts_lock:
+      self.ssh_connection_counts[key] += 1
+
+  def CloseRemoteConnections(self):
+    """Closes the persistent SSH master connection to the VM, if any."""
+    control_path = self._GetSshControlPath()
+    if not control_path or not os.path.exists(control_path):
+      return
+    logging.info('SSH connections to %s: %s new, %s reused.', self,
+                 self.ssh_connection_counts['new'],
+                 self.ssh_connection_counts['reused'])
+    user_host = '%s@%s' % (self.user_name, self.ip_address)
+    exit_cmd = ['ssh', '-O', 'exit', '-p', str(self.ssh_port),
+                '-o', 'ControlPath=%s' % control_path, user_host]
+    vm_util.IssueCommand(exit_cmd, suppress_warning=True, timeout=30)
 
   def _Reboot(self):
     """OS-specific implementation of reboot command"""
@@ -586,17 +984,32 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     self.scratch_disks.append(data_disk)
 
+    if not self._DeferScratchDisk(disk_spec, data_disk):
+      self._PrepareScratchDisk(disk_spec, data_disk)
+
+  def _PrepareScratchDisk(self, disk_spec, data_disk, timer=None, name=None):
+    """Creates, attaches, stripes, formats and mounts a scratch disk.
+
+    The disks of a striped disk are created and attached concurrently, and the
+    disk is striped, formatted and mounted with a single remote command.
+    """
+    def _Step(step, function, *args, **kwargs):
+      if timer:
+        with timer.Measure('%s %s' % (step, name)):
+          function(*args, **kwargs)
+      else:
+        function(*args, **kwargs)
+
     if data_disk.disk_type != disk.LOCAL:
-      data_disk.Create()
-      data_disk.Attach(self)
+      _Step('Create', data_disk.Create)
+      _Step('Attach', data_disk.Attach, self)
 
+    striped_devices = None
     if data_disk.is_striped:
-      device_paths = [d.GetDevicePath() for d in data_disk.disks]
-      self.StripeDisks(device_paths, data_disk.GetDevicePath())
-
-    if disk_spec.mount_point:
-      self.FormatDisk(data_disk.GetDevicePath())
-      self.MountDisk(data_disk.GetDevicePath(), disk_spec.mount_point)
+      striped_devices = [d.GetDevicePath() for d in data_disk.disks]
+    if striped_devices or disk_spec.mount_point:
+      _Step('Set Up', self.SetUpDisk, data_disk.GetDevicePath(),
+            mount_path=disk_spec.mount_point, striped_devices=striped_devices)
 
   def StripeDisks(self, devices, striped_device):
     """Raids disks together using mdadm.
@@ -606,9 +1019,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       striped_device: The path to the device that will be created.
     """
     self.Install('mdadm')
-    stripe_cmd = ('yes | sudo mdadm --create %s --level=stripe --raid-devices='
-                  '%s %s' % (striped_device, len(devices), ' '.join(devices)))
-    self.RemoteHostCommand(stripe_cmd)
+    self.RemoteHostCommand(self._GetStripeDisksCommand(devices, striped_device))
 
   def BurnCpu(self, burn_cpu_threads=None, burn_cpu_seconds=None):
     """Burns vm cpu for some amount of time and dirty cache.
@@ -645,6 +1056,7 @@ class RhelMixin(BaseLinuxMixin):
   """Class holding RHEL specific VM methods and attributes."""
 
   OS_TYPE = os_types.RHEL
+  _OS_PACKAGES_ATTRIBUTE = 'YUM_PACKAGES'
 
   def OnStartup(self):
     """Eliminates the need to have a tty to run sudo commands."""
@@ -686,6 +1098,8 @@ class RhelMixin(BaseLinuxMixin):
 
   def RestorePackages(self):
     """Restores the currently installed packages to those snapshotted."""
+    with self._package_manager_lock:
+      self._installed_os_packages.clear()
     self.RemoteCommand(
         'rpm -qa | grep --fixed-strings --line-regexp --invert-match --file '
         '%s/rpm_package_list | xargs --no-run-if-empty sudo rpm -e' %
@@ -699,26 +1113,30 @@ class RhelMixin(BaseLinuxMixin):
 
   def InstallPackages(self, packages):
     """Installs packages using the yum package manager."""
-    self.RemoteCommand('sudo yum install -y %s' % packages)
+    self._InstallOsPackages(
+        packages,
+        lambda: self.RemoteCommand('sudo yum install -y %s' % packages))
 
   def InstallPackageGroup(self, package_group):
     """Installs a 'package group' using the yum package manager."""
-    self.RemoteCommand('sudo yum groupinstall -y "%s"' % package_group)
+    with self._package_manager_lock:
+      self.RemoteCommand('sudo yum groupinstall -y "%s"' % package_group)
 
   def Install(self, package_name):
     """Installs a PerfKit package on the VM."""
     if not self.install_packages:
       return
-    if package_name not in self._installed_packages:
-      package = linux_packages.PACKAGES[package_name]
-      if hasattr(package, 'YumInstall'):
-        package.YumInstall(self)
-      elif hasattr(package, 'Install'):
-        package.Install(self)
-      else:
-        raise KeyError('Package %s has no install method for RHEL.' %
-                       package_name)
-      self._installed_packages.add(package_name)
+    with self._GetPackageLock(package_name):
+      if package_name not in self._installed_packages:
+        package = linux_packages.PACKAGES[package_name]
+        if hasattr(package, 'YumInstall'):
+          package.YumInstall(self)
+        elif hasattr(package, 'Install'):
+          package.Install(self)
+        else:
+          raise KeyError('Package %s has no install method for RHEL.' %
+                         package_name)
+        self._installed_packages.add(package_name)
 
   def Uninstall(self, package_name):
     """Uninstalls a PerfKit package on the VM."""
@@ -727,6 +1145,10 @@ class RhelMixin(BaseLinuxMixin):
       package.YumUninstall(self)
     elif hasattr(package, 'Uninstall'):
       package.Uninstall(self)
+    # The package may have removed OS packages, which must be installed again
+    # the next time they are requested.
+    with self._package_manager_lock:
+      self._installed_os_packages.clear()
 
   def GetPathToConfig(self, package_name):
     """Returns the path to the config file for PerfKit packages.
@@ -762,6 +1184,7 @@ class DebianMixin(BaseLinuxMixin):
   """Class holding Debian specific VM methods and attributes."""
 
   OS_TYPE = os_types.DEBIAN
+  _OS_PACKAGES_ATTRIBUTE = 'APT_PACKAGES'
 
   def __init__(self, *args, **kwargs):
     super(DebianMixin, self).__init__(*args, **kwargs)
@@ -794,6 +1217,8 @@ class DebianMixin(BaseLinuxMixin):
 
   def RestorePackages(self):
     """Restores the currently installed packages to those snapshotted."""
+    with self._package_manager_lock:
+      self._installed_os_packages.clear()
     self.RemoteCommand('sudo dpkg --clear-selections')
     self.RemoteCommand(
         'sudo dpkg --set-selections < %s/dpkg_selections'
@@ -806,9 +1231,13 @@ class DebianMixin(BaseLinuxMixin):
     return self.TryRemoteCommand('apt-get install --just-print %s' % package,
                                  suppress_warning=True)
 
-  @vm_util.Retry()
   def InstallPackages(self, packages):
     """Installs packages using the apt package manager."""
+    self._InstallOsPackages(packages, lambda: self._AptInstall(packages))
+
+  @vm_util.Retry()
+  def _AptInstall(self, packages):
+    """Runs apt-get install. Must be called with the package manager lock."""
     if not self._apt_updated:
       self.AptUpdate()
       self._apt_updated = True
@@ -832,20 +1261,22 @@ class DebianMixin(BaseLinuxMixin):
     if not self.install_packages:
       return
 
-    if not self._apt_updated:
-      self.AptUpdate()
-      self._apt_updated = True
+    with self._package_manager_lock:
+      if not self._apt_updated:
+        self.AptUpdate()
+        self._apt_updated = True
 
-    if package_name not in self._installed_packages:
-      package = linux_packages.PACKAGES[package_name]
-      if hasattr(package, 'AptInstall'):
-        package.AptInstall(self)
-      elif hasattr(package, 'Install'):
-        package.Install(self)
-      else:
-        raise KeyError('Package %s has no install method for Debian.' %
-                       package_name)
-      self._installed_packages.add(package_name)
+    with self._GetPackageLock(package_name):
+      if package_name not in self._installed_packages:
+        package = linux_packages.PACKAGES[package_name]
+        if hasattr(package, 'AptInstall'):
+          package.AptInstall(self)
+        elif hasattr(package, 'Install'):
+          package.Install(self)
+        else:
+          raise KeyError('Package %s has no install method for Debian.' %
+                         package_name)
+        self._installed_packages.add(package_name)
 
   def Uninstall(self, package_name):
     """Uninstalls a PerfKit package on the VM."""
@@ -854,6 +1285,10 @@ class DebianMixin(BaseLinuxMixin):
       package.AptUninstall(self)
     elif hasattr(package, 'Uninstall'):
       package.Uninstall(self)
+    # The package may have removed OS packages, which must be installed again
+    # the next time they are requested.
+    with self._package_manager_lock:
+      self._installed_os_packages.clear()
 
   def GetPathToConfig(self, package_name):
     """Returns the path to the config file for PerfKit packages.
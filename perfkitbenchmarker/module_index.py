@@ -0,0 +1,422 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Imports benchmark and package modules only when they are used.
+
+The modules of the packages in LAZY_PACKAGES are not imported when their
+package is. Instead, an index records for each module the flags it defines
+and, for benchmarks, the benchmark name and a summary of its default config.
+pkb imports the modules defining the flags given on the command line before
+parsing it, and the other modules are imported on first access through
+LazyModuleDict and LazyModuleList, e.g. when a benchmark is selected or a
+package is installed.
+
+The index is read before the command line is parsed, so it is stored in a
+directory of the current user under the system temporary directory, in a file
+named after the location of PKB. It is rebuilt for a package when its
+directory or one of its module files is added, removed or modified, which
+imports all of the modules of that package once.
+"""
+
+import collections
+import getpass
+import hashlib
+import importlib
+import json
+import logging
+import os
+import pkgutil
+import tempfile
+import threading
+
+from perfkitbenchmarker import flags
+
+# Packages are indexed in this order, so that flags defined by a package
+# module are attributed to it rather than to the first benchmark importing it.
+LAZY_PACKAGES = ('perfkitbenchmarker.linux_packages',
+                 'perfkitbenchmarker.linux_benchmarks',
+                 'perfkitbenchmarker.windows_benchmarks')
+
+# Changing this invalidates existing index files.
+_FORMAT_VERSION = 2
+
+# Flags that print help while the command line is parsed, or after it is.
+_HELP_FLAGS = frozenset(['help', 'h', '?', 'helpshort', 'helpfull', 'helpxml',
+                         'helpmatch'])
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _GetUserName():
+  try:
+    return getpass.getuser()
+  except Exception:  # pylint: disable=broad-except
+    # getpass.getuser raises various errors when no user name is found.
+    return 'unknown'
+
+
+_INDEX_PATH = os.path.join(
+    tempfile.gettempdir(), 'perfkitbenchmarker-%s' % _GetUserName(),
+    'module_index-%s.json' % hashlib.sha1(_PACKAGE_DIR).hexdigest()[:12])
+
+_index = None
+_index_lock = threading.RLock()
+
+
+def _GetFileSignature(path):
+  """Returns the modification time and size of a file, or None."""
+  try:
+    stat = os.stat(path)
+  except OSError:
+    return None
+  return [stat.st_mtime, stat.st_size]
+
+
+def _GetPackageSignature(package_name):
+  """Returns a value that changes whenever the package's modules change.
+
+  The signature lists the modification times of the package's directories
+  and [module name, file signature] lists for its modules. Like
+  import_util.LoadModulesForPath, subpackage modules are skipped. The
+  signature of a file is None if it cannot be examined, e.g. when PKB runs
+  from a zip file.
+  """
+  package = importlib.import_module(package_name)
+  directories = [[path, _GetFileSignature(path)] for path in package.__path__]
+  modules = []
+  for importer, name, is_package in pkgutil.iter_modules(package.__path__):
+    if '.' in name:
+      continue
+    path = getattr(importer, 'path', None)
+    signature = None
+    if path is not None:
+      signature = _GetFileSignature(
+          os.path.join(path, name, '__init__.py') if is_package
+          else os.path.join(path, name + '.py'))
+    modules.append([name, signature])
+  return {'directories': directories, 'modules': modules}
+
+
+def _SummarizeBenchmark(module):
+  """Returns the index entry fields describing a benchmark module."""
+  # Imported here because configs is not needed unless the index is rebuilt.
+  from perfkitbenchmarker import configs  # pylint: disable=g-import-not-at-top
+  config = configs.LoadMinimalConfig(module.BENCHMARK_CONFIG,
+                                     module.BENCHMARK_NAME)
+  total_vm_count = 0
+  variable_vm_count = False
+  scratch_disk = False
+  for group in config.get('vm_groups', {}).itervalues():
+    group_vm_count = group.get('vm_count', 1)
+    if group_vm_count is None:
+      variable_vm_count = True
+    else:
+      total_vm_count += group_vm_count
+    if group.get('disk_spec'):
+      scratch_disk = True
+  return {'benchmark_name': module.BENCHMARK_NAME,
+          'description': config['description'],
+          'vm_count': 'variable' if variable_vm_count else total_vm_count,
+          'scratch_disk': scratch_disk}
+
+
+def _IndexPackage(package_name, modules):
+  """Imports the modules of a package and returns their index entries."""
+  logging.info('Indexing the modules of %s.', package_name)
+  entries = {}
+  defined_flags = set(flags.FLAGS)
+  for name in modules:
+    full_name = '%s.%s' % (package_name, name)
+    module = importlib.import_module(full_name)
+    # Flags defined while importing the module, including by modules it
+    # imports, plus those it defined if it had already been imported.
+    new_flags = set(flags.FLAGS) - defined_flags
+    new_flags.update(
+        flag.name
+        for flag in flags.FLAGS.flags_by_module_dict().get(full_name, []))
+    defined_flags.update(new_flags)
+    entry = {'flags': sorted(new_flags)}
+    if hasattr(module, 'BENCHMARK_NAME'):
+      entry.update(_SummarizeBenchmark(module))
+    entries[name] = entry
+  return entries
+
+
+def _ReadIndexFile():
+  try:
+    with open(_INDEX_PATH) as index_file:
+      index = json.load(index_file)
+  except (IOError, ValueError):
+    return {}
+  if index.get('format') != _FORMAT_VERSION:
+    return {}
+  return index.get('packages', {})
+
+
+def _WriteIndexFile(packages):
+  """Writes the index atomically, so concurrent runs read whole files."""
+  temp_path = '%s.%d' % (_INDEX_PATH, os.getpid())
+  try:
+    if not os.path.isdir(os.path.dirname(_INDEX_PATH)):
+      os.makedirs(os.path.dirname(_INDEX_PATH), 0o700)
+    with open(temp_path, 'w') as index_file:
+      json.dump({'format': _FORMAT_VERSION, 'packages': packages},
+                index_file)
+    os.rename(temp_path, _INDEX_PATH)
+  except (IOError, OSError) as e:
+    logging.debug('Could not write the module index: %s', e)
+
+
+def _GetIndex():
+  """Returns the index, rebuilding the parts of it that are out of date.
+
+  Returns:
+    dict mapping the names of LAZY_PACKAGES to dicts mapping the names of
+    their modules to index entries.
+  """
+  global _index
+  with _index_lock:
+    if _index is None:
+      packages = _ReadIndexFile()
+      updated = False
+      for package_name in LAZY_PACKAGES:
+        signature = _GetPackageSignature(package_name)
+        package = packages.get(package_name)
+        if package is None or package['signature'] != signature:
+          module_names = [name for name, _ in signature['modules']]
+          packages[package_name] = {
+              'signature': signature,
+              'modules': _IndexPackage(package_name, module_names)}
+          updated = True
+      if updated:
+        _WriteIndexFile(packages)
+      _index = {package_name: packages[package_name]['modules']
+                for package_name in LAZY_PACKAGES}
+    return _index
+
+
+def GetModuleNames(package_name):
+  """Returns the sorted names of the modules of a package in LAZY_PACKAGES."""
+  return sorted(_GetIndex()[package_name])
+
+
+def GetBenchmarkSummaries(package_name):
+  """Returns the benchmarks of a package without importing their modules.
+
+  Returns:
+    list of dicts with keys 'benchmark_name', 'description', 'vm_count'
+    (an int, or 'variable') and 'scratch_disk' (a bool), sorted by module
+    name.
+  """
+  entries = _GetIndex()[package_name]
+  return [entries[name] for name in sorted(entries)
+          if 'benchmark_name' in entries[name]]
+
+
+def ImportModulesDefiningFlags(flag_names):
+  """Imports the indexed modules that define any of 'flag_names'."""
+  flag_names = set(flag_names) - set(flags.FLAGS)
+  if not flag_names:
+    return
+  for package_name, entries in _GetIndex().iteritems():
+    for name, entry in sorted(entries.iteritems()):
+      if flag_names.intersection(entry['flags']):
+        importlib.import_module('%s.%s' % (package_name, name))
+
+
+def ImportAllModules():
+  """Imports all of the modules of LAZY_PACKAGES, e.g. to show their help."""
+  for package_name in LAZY_PACKAGES:
+    for name in GetModuleNames(package_name):
+      importlib.import_module('%s.%s' % (package_name, name))
+
+
+def _ReadFlagFile(path, seen):
+  """Returns the arguments in a --flagfile, following nested flag files."""
+  if path in seen:
+    return []
+  seen.add(path)
+  try:
+    with open(path) as flag_file:
+      lines = [line.strip() for line in flag_file]
+  except IOError:
+    # The flags parser reports the error.
+    return []
+  args = []
+  for line in lines:
+    if line and not line.startswith(('#', '//')):
+      args.extend(_ExpandFlagFiles([line], seen))
+  return args
+
+
+def _ExpandFlagFiles(args, seen):
+  expanded = []
+  for i, arg in enumerate(args):
+    if arg.startswith(('--flagfile=', '-flagfile=')):
+      expanded.extend(_ReadFlagFile(arg.split('=', 1)[1], seen))
+    elif arg in ('--flagfile', '-flagfile') and i + 1 < len(args):
+      expanded.extend(_ReadFlagFile(args[i + 1], seen))
+    else:
+      expanded.append(arg)
+  return expanded
+
+
+def GetFlagNames(argv):
+  """Returns the names of the flags that may be given in 'argv'.
+
+  Both 'name' and 'noname' are returned for --noname, since it may negate a
+  boolean flag or set a flag called 'noname'.
+
+  Args:
+    argv: list of strings. The command line, starting with the program name.
+  """
+  names = set()
+  for arg in _ExpandFlagFiles(argv[1:], set()):
+    if arg == '--':
+      break
+    if not arg.startswith('-') or arg == '-':
+      continue
+    name = arg.lstrip('-').split('=', 1)[0]
+    names.add(name)
+    if name.startswith('no'):
+      names.add(name[2:])
+  return names
+
+
+def IsHelpRequested(argv):
+  """Returns whether 'argv' asks for help on the flags."""
+  return bool(_HELP_FLAGS.intersection(GetFlagNames(argv)))
+
+
+def ImportModulesForArgv(argv):
+  """Imports the modules defining the flags in 'argv' before it is parsed.
+
+  When help is requested, all modules are imported, so that it lists all
+  flags.
+  """
+  if IsHelpRequested(argv):
+    ImportAllModules()
+  else:
+    ImportModulesDefiningFlags(GetFlagNames(argv))
+
+
+class LazyModuleDict(collections.MutableMapping):
+  """Maps names to the modules of a package, importing each on first access.
+
+  Entries can be added, replaced and removed, e.g. by mock.patch.dict, without
+  affecting the modules.
+  """
+
+  def __init__(self, package_name, key=None, extra_items=None):
+    """Initializes the dict.
+
+    Args:
+      package_name: string. A package in LAZY_PACKAGES.
+      key: string or None. The index entry field naming each module, e.g.
+          'benchmark_name'. By default, modules are named after their module.
+          Modules whose entry lacks the field are left out.
+      extra_items: function returning a dict of additional items, called on
+          first access to an item that is not a module.
+    """
+    self._package_name = package_name
+    self._key = key
+    self._extra_items_function = extra_items
+    self._extra_items = None
+    self._lock = threading.RLock()
+    self._items = {}
+    self._removed = set()
+
+  def _GetModuleNames(self):
+    """Returns a dict mapping keys to module names."""
+    entries = _GetIndex()[self._package_name]
+    if self._key is None:
+      return {name: name for name in entries}
+    return {entry[self._key]: name for name, entry in entries.iteritems()
+            if self._key in entry}
+
+  def _GetExtraItems(self):
+    with self._lock:
+      if self._extra_items is None:
+        self._extra_items = (self._extra_items_function()
+                             if self._extra_items_function else {})
+      return self._extra_items
+
+  def __getitem__(self, key):
+    with self._lock:
+      if key in self._items:
+        return self._items[key]
+      if key in self._removed:
+        raise KeyError(key)
+      module_names = self._GetModuleNames()
+      if key in module_names:
+        value = importlib.import_module(
+            '%s.%s' % (self._package_name, module_names[key]))
+      else:
+        value = self._GetExtraItems()[key]
+      self._items[key] = value
+      return value
+
+  def __setitem__(self, key, value):
+    with self._lock:
+      self._items[key] = value
+      self._removed.discard(key)
+
+  def __delitem__(self, key):
+    with self._lock:
+      if key not in self:
+        raise KeyError(key)
+      self._items.pop(key, None)
+      self._removed.add(key)
+
+  def __contains__(self, key):
+    with self._lock:
+      if key in self._items:
+        return True
+      if key in self._removed:
+        return False
+      return key in self._GetModuleNames() or key in self._GetExtraItems()
+
+  def __iter__(self):
+    with self._lock:
+      keys = set(self._GetModuleNames())
+      if self._extra_items_function:
+        keys.update(self._GetExtraItems())
+      keys.update(self._items)
+      keys.difference_update(self._removed)
+    return iter(sorted(keys))
+
+  def __len__(self):
+    return sum(1 for _ in self)
+
+
+class LazyModuleList(collections.Sequence):
+  """The modules of a package in name order, imported on first access."""
+
+  def __init__(self, package_name):
+    self._package_name = package_name
+
+  def __getitem__(self, index):
+    names = GetModuleNames(self._package_name)[index]
+    if isinstance(index, slice):
+      return [importlib.import_module('%s.%s' % (self._package_name, name))
+              for name in names]
+    return importlib.import_module('%s.%s' % (self._package_name, names))
+
+  def __len__(self):
+    return len(GetModuleNames(self._package_name))
+
+  def __add__(self, other):
+    return list(self) + list(other)
+
+  def __radd__(self, other):
+    return list(other) + list(self)
@@ -0,0 +1,370 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Caches package downloads and builds on the controller.
+
+Without the cache, every VM downloads the artifacts of a package from the
+internet and builds them from source on its own. With --package_cache, each
+artifact is downloaded once by the controller, and each build is performed on
+the first VM that installs the package. The result is stored on the controller
+and copied to the other VMs with PushFile.
+
+Entries are identified by a key, a list of strings such as the URL and version
+of the artifact, and stored under the SHA-256 digest of their contents:
+
+  <cache dir>/keys/<SHA-256 of the key>.json: the key, the digest and the
+      file name of the entry.
+  <cache dir>/objects/<SHA-256 of the contents>: the contents.
+
+A directory with this layout, e.g. the cache directory of an earlier run, can
+be used as a mirror with --package_mirror, either as a file:// URL or served
+over HTTP. Entries missing from the cache are looked up in the mirror before
+they are downloaded or built.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import posixpath
+import shutil
+import tempfile
+import threading
+import urllib2
+import urlparse
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import vm_util
+
+flags.DEFINE_boolean('package_cache', False,
+                     'Download package artifacts and build packages from '
+                     'source once per run instead of once per VM, and copy '
+                     'the results to the VMs from the controller.')
+flags.DEFINE_string('package_cache_dir', None,
+                    'Directory in which --package_cache stores artifacts and '
+                    'builds. Set it to reuse them across runs. Default: run '
+                    'temporary directory.')
+flags.DEFINE_string('package_mirror', None,
+                    'URL (file:// or http://) of a directory with the layout '
+                    'of --package_cache_dir in which --package_cache looks up '
+                    'artifacts and builds before downloading or building them.')
+
+FLAGS = flags.FLAGS
+
+# Number of bytes hashed or copied at once.
+_CHUNK_SIZE = 1 << 20
+
+
+class CorruptEntryError(errors.Error):
+  """Raised when the contents of a cache entry do not match its digest."""
+  pass
+
+
+def _KeyDigest(key):
+  """Returns the SHA-256 digest identifying a key."""
+  return hashlib.sha256(json.dumps(list(key))).hexdigest()
+
+
+def _FunctionDigest(function):
+  """Returns a SHA-256 digest of the source of a function.
+
+  Arguments bound with functools.partial are part of the digest, so that a
+  change to the build steps invalidates cached builds.
+  """
+  bound_args = ()
+  if isinstance(function, functools.partial):
+    bound_args = (function.args, sorted((function.keywords or {}).items()))
+    function = function.func
+  try:
+    source = inspect.getsource(function)
+  except (IOError, TypeError):
+    # The source of e.g. builtins and mocks is not available.
+    source = getattr(function, '__name__', type(function).__name__)
+  return hashlib.sha256(source + repr(bound_args)).hexdigest()
+
+
+def _CopyAndHash(source, destination):
+  """Copies a file object to another and returns the SHA-256 of its contents."""
+  sha256 = hashlib.sha256()
+  while True:
+    chunk = source.read(_CHUNK_SIZE)
+    if not chunk:
+      return sha256.hexdigest()
+    sha256.update(chunk)
+    destination.write(chunk)
+
+
+class ArtifactCache(object):
+  """Content-addressed store of package artifacts on the controller.
+
+  Entries are written to temporary files that are renamed into place, so that
+  readers never observe a partially written entry.
+  """
+
+  def __init__(self, directory, mirror=None):
+    """Initializes the cache.
+
+    Args:
+      directory: string. Local directory holding the entries.
+      mirror: string or None. URL of a directory with the same layout in
+          which entries missing from 'directory' are looked up.
+    """
+    self.directory = directory
+    self.mirror = mirror.rstrip('/') + '/' if mirror else None
+    for subdirectory in ('keys', 'objects'):
+      path = os.path.join(directory, subdirectory)
+      if not os.path.isdir(path):
+        os.makedirs(path)
+
+  def _KeyPath(self, key_digest):
+    return os.path.join(self.directory, 'keys', key_digest + '.json')
+
+  def _ObjectPath(self, digest):
+    return os.path.join(self.directory, 'objects', digest)
+
+  def _StoreObject(self, source):
+    """Stores the contents of a file object and returns their digest."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.join(self.directory,
+                                                      'objects'))
+    try:
+      with os.fdopen(fd, 'wb') as destination:
+        digest = _CopyAndHash(source, destination)
+      os.rename(temp_path, self._ObjectPath(digest))
+    except:
+      os.remove(temp_path)
+      raise
+    return digest
+
+  def _StoreIndex(self, key, digest, file_name):
+    """Maps 'key' to the object with 'digest'."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.join(self.directory, 'keys'))
+    with os.fdopen(fd, 'w') as f:
+      json.dump({'key': list(key), 'sha256': digest, 'file_name': file_name},
+                f)
+    os.rename(temp_path, self._KeyPath(_KeyDigest(key)))
+
+  def _Lookup(self, key):
+    """Returns the local path and file name of an entry, or (None, None)."""
+    key_path = self._KeyPath(_KeyDigest(key))
+    if not os.path.exists(key_path):
+      return None, None
+    with open(key_path) as f:
+      index = json.load(f)
+    object_path = self._ObjectPath(index['sha256'])
+    if not os.path.exists(object_path):
+      return None, None
+    return object_path, index['file_name']
+
+  def _FetchFromMirror(self, key):
+    """Copies an entry from the mirror. Returns whether it was found."""
+    key_url = urlparse.urljoin(self.mirror,
+                               'keys/%s.json' % _KeyDigest(key))
+    try:
+      index = json.load(urllib2.urlopen(key_url))
+    except (IOError, ValueError):
+      return False
+    response = urllib2.urlopen(
+        urlparse.urljoin(self.mirror, 'objects/' + index['sha256']))
+    digest = self._StoreObject(response)
+    if digest != index['sha256']:
+      os.remove(self._ObjectPath(digest))
+      raise CorruptEntryError(
+          'Mirror entry for %s has digest %s instead of %s.' %
+          (key, digest, index['sha256']))
+    self._StoreIndex(key, digest, index['file_name'])
+    logging.info('Copied %s from package mirror %s.', key, self.mirror)
+    return True
+
+  def Get(self, key):
+    """Returns the local path and file name of an entry.
+
+    Args:
+      key: sequence of strings identifying the entry.
+
+    Returns:
+      A (path, file name) tuple, or (None, None) if neither the cache nor the
+      mirror holds the entry.
+    """
+    path, file_name = self._Lookup(key)
+    if path is None and self.mirror and self._FetchFromMirror(key):
+      path, file_name = self._Lookup(key)
+    return path, file_name
+
+  def Put(self, key, path, file_name=None):
+    """Stores a local file as the entry of 'key'.
+
+    Args:
+      key: sequence of strings identifying the entry.
+      path: string. The file to store. It is copied.
+      file_name: string. The name of the file when copied to VMs. Defaults to
+          the base name of 'path'.
+
+    Returns:
+      The local path of the stored contents.
+    """
+    with open(path, 'rb') as source:
+      digest = self._StoreObject(source)
+    self._StoreIndex(key, digest, file_name or os.path.basename(path))
+    return self._ObjectPath(digest)
+
+  def Download(self, key, url, file_name):
+    """Downloads 'url' as the entry of 'key' and returns its local path."""
+    logging.info('Downloading %s to the package cache.', url)
+    digest = self._StoreObject(urllib2.urlopen(url))
+    self._StoreIndex(key, digest, file_name)
+    return self._ObjectPath(digest)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+# Locks serializing the creation of each entry, keyed by key digest.
+_entry_locks = {}
+
+
+def _GetCache():
+  global _cache
+  with _cache_lock:
+    if _cache is None:
+      directory = (FLAGS.package_cache_dir or
+                   os.path.join(vm_util.GetTempDir(), 'package_cache'))
+      _cache = ArtifactCache(directory, FLAGS.package_mirror)
+    return _cache
+
+
+def _EntryLock(key):
+  with _cache_lock:
+    return _entry_locks.setdefault(_KeyDigest(key), threading.Lock())
+
+
+def _PushEntry(vm, path, file_name):
+  """Copies a cache entry to the VM's temporary directory.
+
+  Returns:
+    The path of the copy on the VM.
+  """
+  remote_path = posixpath.join(vm_util.VM_TMP_DIR, file_name)
+  vm.RemoteCommand('mkdir -p %s' % vm_util.VM_TMP_DIR)
+  vm.PushFile(path, remote_path)
+  return remote_path
+
+
+def FetchFile(vm, url, remote_dir, version=None, file_name=None):
+  """Places the file at 'url' in a directory on the VM.
+
+  With --package_cache, the controller downloads the file once and copies it
+  to every VM. Otherwise the VM downloads it with curl.
+
+  Args:
+    vm: The VM that needs the file.
+    url: string. The URL of the file.
+    remote_dir: string. The directory on the VM. It is created if needed.
+    version: string. Version of the file, for URLs that do not identify the
+        contents by themselves. Part of the cache key.
+    file_name: string. Name of the file on the VM. Defaults to the last
+        component of the URL.
+
+  Returns:
+    The path of the file on the VM.
+  """
+  file_name = file_name or posixpath.basename(urlparse.urlparse(url).path)
+  remote_path = posixpath.join(remote_dir, file_name)
+  if not FLAGS.package_cache:
+    vm.Install('curl')
+    vm.RemoteCommand('mkdir -p {0} && curl -fsSL -o {1} {2}'.format(
+        remote_dir, remote_path, url))
+    return remote_path
+
+  key = ['url', url, version or '']
+  cache = _GetCache()
+  with _EntryLock(key):
+    path, _ = cache.Get(key)
+    if path is None:
+      path = cache.Download(key, url, file_name)
+  vm.RemoteCommand('mkdir -p %s' % remote_dir)
+  vm.PushFile(path, remote_path)
+  return remote_path
+
+
+def FetchArchive(vm, url, remote_dir, version=None, strip_components=1):
+  """Extracts the tarball at 'url' into a directory on the VM.
+
+  Args:
+    vm: The VM that needs the archive.
+    url: string. The URL of the gzip-compressed tarball.
+    remote_dir: string. The directory to extract the archive into. It is
+        created if needed.
+    version: string. See FetchFile.
+    strip_components: int. Number of leading path components to remove from
+        the names of the files in the archive.
+  """
+  archive = FetchFile(vm, url, vm_util.VM_TMP_DIR, version=version)
+  vm.RemoteCommand(
+      'mkdir -p {0} && tar -C {0} --strip-components={1} -xzf {2} && '
+      'rm {2}'.format(remote_dir, strip_components, archive))
+
+
+def BuildOnce(vm, name, version, remote_dir, build):
+  """Builds a package from source once and copies the result to other VMs.
+
+  With --package_cache, the first VM to install the package runs 'build' and
+  the resulting directory is archived into the cache. VMs installing the
+  package later, including VMs of other benchmarks in the same run, extract
+  the archive instead of building. Packages must install the build's system
+  dependencies on every VM, and run steps such as 'make install' that modify
+  other directories after BuildOnce returns.
+
+  Args:
+    vm: The VM that needs the package.
+    name: string. The name of the package.
+    version: string. The version being built, e.g. a git tag or commit.
+    remote_dir: string. The directory on the VM that 'build' populates.
+    build: function taking the VM as its only argument. Builds the package
+        in 'remote_dir'.
+  """
+  if not FLAGS.package_cache:
+    build(vm)
+    return
+
+  # Builds are only reused on VMs with the same OS and architecture, and only
+  # as long as the build steps are unchanged.
+  architecture, _ = vm.RemoteCommand('uname -m')
+  key = ['build', name, version, vm.OS_TYPE, architecture.strip(),
+         _FunctionDigest(build)]
+  file_name = '%s-%s.tar.gz' % (name, _KeyDigest(key)[:16])
+  parent = posixpath.dirname(remote_dir.rstrip('/')) or '.'
+  base = posixpath.basename(remote_dir.rstrip('/'))
+  cache = _GetCache()
+  with _EntryLock(key):
+    path, _ = cache.Get(key)
+    if path is None:
+      build(vm)
+      remote_path = posixpath.join(vm_util.VM_TMP_DIR, file_name)
+      vm.RemoteCommand('mkdir -p {0} && tar -C {1} -czf {2} {3}'.format(
+          vm_util.VM_TMP_DIR, parent, remote_path, base))
+      local_dir = tempfile.mkdtemp(dir=cache.directory)
+      try:
+        vm.PullFile(local_dir, remote_path)
+        cache.Put(key, os.path.join(local_dir, file_name))
+      finally:
+        shutil.rmtree(local_dir)
+      vm.RemoteCommand('rm %s' % remote_path)
+      logging.info('Stored build of %s %s from %s in the package cache.',
+                   name, version, vm)
+      return
+  logging.info('Installing cached build of %s %s on %s.', name, version, vm)
+  remote_path = _PushEntry(vm, path, file_name)
+  vm.RemoteCommand('mkdir -p {0} && tar -C {0} -xzf {1} && rm {1}'.format(
+      parent, remote_path))
@@ -71,7 +71,6 @@ from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import benchmark_sets
 from perfkitbenchmarker import benchmark_spec
 from perfkitbenchmarker import benchmark_status
-from perfkitbenchmarker import configs
 from perfkitbenchmarker import context
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
@@ -80,12 +79,16 @@ from perfkitbenchmarker import flags
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import linux_benchmarks
 from perfkitbenchmarker import log_util
+from perfkitbenchmarker import module_index
 from perfkitbenchmarker import os_types
+from perfkitbenchmarker import publisher
+from perfkitbenchmarker import rate_limiter
 from perfkitbenchmarker import requirements
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import spark_service
 from perfkitbenchmarker import stages
 from perfkitbenchmarker import static_virtual_machine
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker import timing_util
 from perfkitbenchmarker import traces
 from perfkitbenchmarker import version
@@ -427,7 +430,7 @@ def DoProvisionPhase(spec, timer):
   events.benchmark_start.send(benchmark_spec=spec)
   try:
     with timer.Measure('Resource Provisioning'):
-      spec.Provision()
+      spec.Provision(timer)
   finally:
     # Also pickle the spec after the resources are created so that
     # we have a record of things like AWS ids. Otherwise we won't
@@ -446,8 +449,13 @@ def DoPreparePhase(spec, timer):
   logging.info('Preparing benchmark %s', spec.name)
   with timer.Measure('BenchmarkSpec Prepare'):
     spec.Prepare()
+  if FLAGS.golden_images:
+    with timer.Measure('Golden Image Creation'):
+      spec.CreateGoldenImages()
   with timer.Measure('Benchmark Prepare'):
     spec.BenchmarkPrepare(spec)
+  if FLAGS.golden_images:
+    spec.RecordGoldenImagePackages()
   spec.StartBackgroundWorkload()
 
 
@@ -524,7 +532,7 @@ def DoTeardownPhase(spec, timer):
   logging.info('Tearing down resources for benchmark %s', spec.name)
 
   with timer.Measure('Resource Teardown'):
-    spec.Delete()
+    spec.Delete(timer)
 
 
 def RunBenchmark(spec, collector):
@@ -592,6 +600,10 @@ def RunBenchmark(spec, collector):
       finally:
         if stages.TEARDOWN in FLAGS.run_stage:
           spec.Delete()
+          status_poller.ClearPollers()
+        # Add samples of the throttling of cloud API calls, including the
+        # calls that deleted the resources.
+        collector.AddSamples(rate_limiter.GetSamples(), spec.name, spec)
         events.benchmark_end.send(benchmark_spec=spec)
         # Pickle spec to save final resource state.
         spec.Pickle()
@@ -637,7 +649,11 @@ def RunBenchmarkTask(spec):
     spec: BenchmarkSpec. The spec to call RunBenchmark with.
 
   Returns:
-    A tuple of BenchmarkSpec, list of samples.
+    A tuple of BenchmarkSpec and the unpublished samples as returned by
+    SampleCollector.ExportSamples. With --stream_samples, the samples are
+    passed back through a spill file named after the spec's UUID, which the
+    parent process reads as it is written, instead of being pickled in the
+    result.
   """
   if _TEARDOWN_EVENT.is_set():
     return spec, []
@@ -648,7 +664,7 @@ def RunBenchmarkTask(spec):
   if FLAGS.run_processes > 1:
     spec.config.flags['run_uri'] = FLAGS.run_uri + str(spec.sequence_number)
 
-  collector = SampleCollector()
+  collector = SampleCollector(spill_name=spec.uuid)
   try:
     RunBenchmark(spec, collector)
   except BaseException as e:
@@ -663,7 +679,7 @@ def RunBenchmarkTask(spec):
     # We need to return both the spec and samples so that we know
     # the status of the test and can publish any samples that
     # haven't yet been published.
-    return spec, collector.samples
+    return spec, collector.ExportSamples()
 
 
 def _LogCommandLineFlags():
@@ -735,18 +751,26 @@ def RunBenchmarks():
   """
   benchmark_specs = _CreateBenchmarkSpecs()
   collector = SampleCollector()
+  publish_interval = 0
+  if FLAGS.stream_samples:
+    # Publish the samples of the benchmark processes as they are spilled.
+    for spec in benchmark_specs:
+      collector.ImportSamples(publisher.SampleSpillFile(
+          publisher.GetSpillFilePath(spec.uuid)))
+    publish_interval = FLAGS.sample_publish_interval
 
   try:
     tasks = [(RunBenchmarkTask, (spec,), {})
              for spec in benchmark_specs]
-    spec_sample_tuples = background_tasks.RunParallelProcesses(
-        tasks, FLAGS.run_processes)
+    with collector.PublishingPeriodically(publish_interval):
+      spec_sample_tuples = background_tasks.RunParallelProcesses(
+          tasks, FLAGS.run_processes)
     benchmark_specs, sample_lists = zip(*spec_sample_tuples)
     for sample_list in sample_lists:
-      collector.samples.extend(sample_list)
+      collector.ImportSamples(sample_list)
 
   finally:
-    if collector.samples:
+    if collector.HasUnpublishedSamples():
       collector.PublishSamples()
 
     if benchmark_specs:
@@ -757,6 +781,8 @@ def RunBenchmarks():
     logging.info('Completion statuses can be found at: %s',
                  vm_util.PrependTempDir(COMPLETION_STATUS_FILE_NAME))
 
+    vm_util.CloseSshConnections()
+
 
   if stages.TEARDOWN not in FLAGS.run_stage:
     logging.info(
@@ -782,39 +808,31 @@ def RunBenchmarks():
 
 
 def _GenerateBenchmarkDocumentation():
-  """Generates benchmark documentation to show in --help."""
-  benchmark_docs = []
-  for benchmark_module in (linux_benchmarks.BENCHMARKS +
-                           windows_benchmarks.BENCHMARKS):
-    benchmark_config = configs.LoadMinimalConfig(
-        benchmark_module.BENCHMARK_CONFIG, benchmark_module.BENCHMARK_NAME)
-    vm_groups = benchmark_config.get('vm_groups', {})
-    total_vm_count = 0
-    vm_str = ''
-    scratch_disk_str = ''
-    for group in vm_groups.itervalues():
-      group_vm_count = group.get('vm_count', 1)
-      if group_vm_count is None:
-        vm_str = 'variable'
-      else:
-        total_vm_count += group_vm_count
-      if group.get('disk_spec'):
-        scratch_disk_str = ' with scratch volume(s)'
+  """Generates benchmark documentation to show in --help.
 
-    name = benchmark_module.BENCHMARK_NAME
-    if benchmark_module in windows_benchmarks.BENCHMARKS:
-      name += ' (Windows)'
-    benchmark_docs.append('%s: %s (%s VMs%s)' %
-                          (name,
-                           benchmark_config['description'],
-                           vm_str or total_vm_count,
-                           scratch_disk_str))
+  The benchmarks are described from the module index, so that their configs
+  are not loaded again when the index is up to date.
+  """
+  benchmark_docs = []
+  for package, suffix in ((linux_benchmarks, ''),
+                          (windows_benchmarks, ' (Windows)')):
+    for summary in module_index.GetBenchmarkSummaries(package.__name__):
+      benchmark_docs.append('%s%s: %s (%s VMs%s)' %
+                            (summary['benchmark_name'], suffix,
+                             summary['description'],
+                             summary['vm_count'],
+                             ' with scratch volume(s)'
+                             if summary['scratch_disk'] else ''))
   return '\n\t'.join(benchmark_docs)
 
 
 def Main():
   log_util.ConfigureBasicLogging()
-  _InjectBenchmarkInfoIntoDocumentation()
+  # Only the modules defining the flags on the command line are imported
+  # before parsing it, unless help is requested.
+  module_index.ImportModulesForArgv(sys.argv)
+  if module_index.IsHelpRequested(sys.argv):
+    _InjectBenchmarkInfoIntoDocumentation()
   _ParseFlags()
   if FLAGS.helpmatch:
     _PrintHelp(FLAGS.helpmatch)
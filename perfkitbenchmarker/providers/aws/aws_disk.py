@@ -28,6 +28,7 @@ import threading
 
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import providers
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.configs import option_decoders
 from perfkitbenchmarker.providers.aws import util
@@ -144,6 +145,27 @@ class AwsDiskSpec(disk.BaseDiskSpec):
     return result
 
 
+class AwsVolumeStatusPoller(status_poller.BaseStatusPoller):
+  """Describes the volumes of a region with one describe-volumes call."""
+
+  # AWS rejects filters with more than 200 values.
+  MAX_BATCH_SIZE = 200
+
+  def __init__(self, region):
+    super(AwsVolumeStatusPoller, self).__init__(region)
+    self.region = region
+
+  def _ListStatuses(self, keys):
+    describe_cmd = util.AWS_PREFIX + [
+        'ec2',
+        'describe-volumes',
+        '--region=%s' % self.region,
+        '--filter=Name=volume-id,Values=%s' % ','.join(keys)]
+    stdout, _ = util.IssueRetryableCommand(describe_cmd)
+    response = json.loads(stdout)
+    return {volume['VolumeId']: volume for volume in response['Volumes']}
+
+
 class AwsDisk(disk.BaseDisk):
   """Object representing an Aws Disk."""
 
@@ -196,18 +218,11 @@ class AwsDisk(disk.BaseDisk):
 
   def _Exists(self):
     """Returns true if the disk exists."""
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-volumes',
-        '--region=%s' % self.region,
-        '--filter=Name=volume-id,Values=%s' % self.id]
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    volumes = response['Volumes']
-    assert len(volumes) < 2, 'Too many volumes.'
-    if not volumes:
+    poller = status_poller.GetPoller(AwsVolumeStatusPoller, self.region)
+    volume = poller.GetStatus(self.id)
+    if not volume:
       return False
-    status = volumes[0]['State']
+    status = volume['State']
     assert status in VOLUME_KNOWN_STATUSES, status
     return status in VOLUME_EXISTS_STATUSES
 
@@ -111,6 +111,10 @@ class AwsDpbEmr(dpb_service.BaseDpbService):
     self.emr_release_label = FLAGS.dpb_emr_release_label
 
 
+  def GetResourceDependencies(self):
+    """Returns the network that must be created before the cluster."""
+    return [self.network] if self.network else []
+
   def _CreateLogBucket(self):
     bucket_name = 's3://pkb-{0}-emr'.format(FLAGS.run_uri)
     cmd = self.cmd_prefix + ['s3', 'mb', bucket_name]
@@ -120,6 +120,10 @@ class AwsEMR(spark_service.BaseSparkService):
       self.network = None
     self.bucket_to_delete = None
 
+  def GetResourceDependencies(self):
+    """Returns the network that must be created before the cluster."""
+    return [self.network] if self.network else []
+
   def _CreateLogBucket(self):
     bucket_name = 's3://pkb-{0}-emr'.format(FLAGS.run_uri)
     cmd = self.cmd_prefix + ['s3', 'mb', bucket_name]
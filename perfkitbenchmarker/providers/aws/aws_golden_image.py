@@ -0,0 +1,106 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Golden images stored as AMIs owned by the account, one per region."""
+
+import json
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import golden_image
+from perfkitbenchmarker import providers
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.providers.aws import util
+
+# Creating an AMI snapshots the whole boot volume.
+_CREATE_TIMEOUT = 1800
+
+
+class ImageNotReadyError(Exception):
+  """Raised while an AMI is pending."""
+  pass
+
+
+class AwsImageProvider(golden_image.BaseImageProvider):
+  """Creates golden images from the root volumes of EC2 instances."""
+
+  CLOUD = providers.AWS
+
+  def GetSourceImage(self, vm):
+    # The default image is only resolved when the VM is created.
+    return vm.image or vm.IMAGE_NAME_FILTER or type(vm).__name__
+
+  def GetImageLocation(self, vm):
+    # AMIs can only be used in the region they were created in.
+    return vm.region
+
+  def _DescribeImages(self, vm, *filters):
+    describe_cmd = util.AWS_PREFIX + [
+        'ec2',
+        'describe-images',
+        '--region=%s' % vm.region,
+        '--owners=self',
+        '--filters'] + list(filters)
+    stdout, _ = util.IssueRetryableCommand(describe_cmd)
+    return json.loads(stdout)['Images']
+
+  def FindImage(self, vm, name):
+    # AMI names are unique, so each image of a golden image has a name
+    # starting with the name of the golden image.
+    images = self._DescribeImages(vm, 'Name=name,Values=%s-*' % name,
+                                  'Name=state,Values=available')
+    if not images:
+      return None
+    latest = max(images, key=lambda image: image['CreationDate'])
+    return golden_image.GoldenImage(name, latest['ImageId'])
+
+  @vm_util.Retry(poll_interval=15, timeout=_CREATE_TIMEOUT, log_errors=False,
+                 retryable_exceptions=(ImageNotReadyError,))
+  def _WaitUntilAvailable(self, vm, image_id):
+    images = self._DescribeImages(vm, 'Name=image-id,Values=%s' % image_id)
+    state = images[0]['State'] if images else 'missing'
+    if state == 'pending':
+      raise ImageNotReadyError('AMI %s is pending.' % image_id)
+    if state != 'available':
+      raise errors.Resource.CreationError(
+          'AMI %s is %s instead of available.' % (image_id, state))
+
+  def CreateImage(self, vm, name):
+    create_cmd = util.AWS_PREFIX + [
+        'ec2',
+        'create-image',
+        '--region=%s' % vm.region,
+        '--instance-id=%s' % vm.id,
+        '--name=%s' % golden_image.GetImageVersionName(name),
+        '--no-reboot']
+    stdout, _ = util.IssueRetryableCommand(create_cmd)
+    image_id = json.loads(stdout)['ImageId']
+    self._WaitUntilAvailable(vm, image_id)
+    return golden_image.GoldenImage(name, image_id)
+
+  def DeleteImage(self, vm, image):
+    images = self._DescribeImages(vm, 'Name=image-id,Values=%s' %
+                                  image.image_id)
+    snapshot_ids = [mapping['Ebs']['SnapshotId']
+                    for i in images for mapping in i['BlockDeviceMappings']
+                    if 'Ebs' in mapping]
+    util.IssueRetryableCommand(util.AWS_PREFIX + [
+        'ec2', 'deregister-image', '--region=%s' % vm.region,
+        '--image-id=%s' % image.image_id])
+    # Deregistering an AMI keeps the snapshots of its volumes.
+    for snapshot_id in snapshot_ids:
+      util.IssueRetryableCommand(util.AWS_PREFIX + [
+          'ec2', 'delete-snapshot', '--region=%s' % vm.region,
+          '--snapshot-id=%s' % snapshot_id])
+
+  def UseImage(self, vm, image):
+    vm.image = image.image_id
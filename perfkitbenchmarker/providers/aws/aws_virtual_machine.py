@@ -32,6 +32,7 @@ from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import linux_virtual_machine
 from perfkitbenchmarker import resource
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import windows_virtual_machine
@@ -170,6 +171,38 @@ def IsPlacementGroupCompatible(machine_type):
   return prefix in PLACEMENT_GROUP_PREFIXES
 
 
+class AwsInstanceStatusPoller(status_poller.BaseStatusPoller):
+  """Describes the instances of a region with one describe-instances call.
+
+  Instances are looked up by the value of an instance filter, e.g. their
+  client token or instance ID, and their status is the instance description
+  returned by the AWS CLI.
+  """
+
+  # Maps supported filter names to the field of an instance they match.
+  _FILTER_FIELDS = {'client-token': 'ClientToken', 'instance-id': 'InstanceId'}
+  # AWS rejects filters with more than 200 values.
+  MAX_BATCH_SIZE = 200
+
+  def __init__(self, region, filter_name):
+    super(AwsInstanceStatusPoller, self).__init__(region, filter_name)
+    self.region = region
+    self.filter_name = filter_name
+
+  def _ListStatuses(self, keys):
+    describe_cmd = util.AWS_PREFIX + [
+        'ec2',
+        'describe-instances',
+        '--region=%s' % self.region,
+        '--filter=Name=%s,Values=%s' % (self.filter_name, ','.join(keys))]
+    stdout, _ = util.IssueRetryableCommand(describe_cmd)
+    response = json.loads(stdout)
+    field = self._FILTER_FIELDS[self.filter_name]
+    return {instance[field]: instance
+            for reservation in response['Reservations']
+            for instance in reservation['Instances']}
+
+
 class AwsDedicatedHost(resource.BaseResource):
   """Object representing an AWS host.
 
@@ -586,35 +619,33 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
       vm_util.IssueCommand(cancel_cmd)
 
 
-  def _Exists(self):
-    """Returns true if the VM exists."""
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-instances',
-        '--region=%s' % self.region]
-
+  def _GetInstance(self):
+    """Returns the AWS CLI description of the instance or None if not found."""
     if self.use_spot_instance:
-      if self.id:
-        describe_cmd.append('--instance-id=%s' % self.id)
-      else:
-        return False
-    else:
-      describe_cmd.append(
-          '--filter=Name=client-token,Values=%s' % self.client_token)
+      if not self.id:
+        return None
+      poller = status_poller.GetPoller(AwsInstanceStatusPoller, self.region,
+                                       'instance-id')
+      return poller.GetStatus(self.id)
+    poller = status_poller.GetPoller(AwsInstanceStatusPoller, self.region,
+                                     'client-token')
+    return poller.GetStatus(self.client_token)
 
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    reservations = response['Reservations']
-    assert len(reservations) < 2, 'Too many reservations.'
-    if not reservations:
+  def _Exists(self):
+    """Returns true if the VM exists."""
+    instance = self._GetInstance()
+    if not instance:
       return False
-    instances = reservations[0]['Instances']
-    assert len(instances) == 1, 'Wrong number of instances.'
-    status = instances[0]['State']['Name']
-    self.id = instances[0]['InstanceId']
+    status = instance['State']['Name']
+    self.id = instance['InstanceId']
     assert status in INSTANCE_KNOWN_STATUSES, status
     return status in INSTANCE_EXISTS_STATUSES
 
+  def _IsReady(self):
+    """Returns true if the VM is running."""
+    instance = self._GetInstance()
+    return bool(instance) and instance['State']['Name'] == 'running'
+
   def CreateScratchDisk(self, disk_spec):
     """Create a VM's scratch disk.
 
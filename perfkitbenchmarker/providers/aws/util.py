@@ -19,6 +19,7 @@ import string
 
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import rate_limiter
 from perfkitbenchmarker import vm_util
 
 AWS_PATH = 'aws'
@@ -78,7 +79,9 @@ def AddDefaultTags(resource_id, region):
   AddTags(resource_id, region, **tags)
 
 
-@vm_util.Retry()
+@vm_util.Retry(poll_interval=vm_util.RETRYABLE_COMMAND_POLL_INTERVAL,
+               max_poll_interval=vm_util.RETRYABLE_COMMAND_MAX_POLL_INTERVAL,
+               api=rate_limiter.GetCommandApi)
 def IssueRetryableCommand(cmd, env=None):
   """Tries running the provided command until it succeeds or times out.
 
@@ -97,7 +100,7 @@ def IssueRetryableCommand(cmd, env=None):
   stdout, stderr, retcode = vm_util.IssueCommand(cmd, env=env)
   if retcode:
     raise errors.VmUtil.CalledProcessException(
-        'Command returned a non-zero exit code.\n')
+        'Command returned a non-zero exit code.\n%s' % stderr)
   if stderr:
     raise errors.VmUtil.CalledProcessException(
         'The command had output on stderr:\n%s' % stderr)
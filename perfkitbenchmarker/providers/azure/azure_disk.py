@@ -21,7 +21,6 @@ See http://msdn.microsoft.com/en-us/library/azure/dn790303.aspx for more
 information about azure disks.
 """
 
-import json
 import threading
 
 from perfkitbenchmarker import disk
@@ -134,15 +133,8 @@ class AzureDisk(disk.BaseDisk):
     if self._deleted:
       return False
 
-    stdout, _, _ = vm_util.IssueCommand(
-        [azure.AZURE_PATH, 'disk', 'show',
-         '--output', 'json',
-         '--name', self.name] + self.resource_group.args)
-    try:
-      json.loads(stdout)
-      return True
-    except:
-      return False
+    return azure_network.GetResourceStatus(
+        self.resource_group, ('disk',), self.name) is not None
 
   def Attach(self, vm):
     """Attaches the disk to a VM.
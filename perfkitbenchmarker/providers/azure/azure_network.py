@@ -29,6 +29,7 @@ from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import network
 from perfkitbenchmarker import resource
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import providers
 from perfkitbenchmarker.providers import azure
@@ -99,6 +100,51 @@ class AzureResourceGroup(resource.BaseResource):
          '--yes', '--name', self.name])
 
 
+class AzureStatusPoller(status_poller.BaseStatusPoller):
+  """Lists the resources of one type in a resource group with one call.
+
+  Resources are looked up by name, and their status is the resource
+  description returned by the Azure CLI. As with the show commands this
+  replaces, a list command that fails finds no resources rather than raising.
+
+  Attributes:
+    resource_group_name: string. The resource group containing the resources.
+    command: tuple of strings. The Azure CLI command group of the resource
+        type, e.g. ('vm',) or ('network', 'nic').
+  """
+
+  def __init__(self, resource_group_name, command):
+    super(AzureStatusPoller, self).__init__(resource_group_name, command)
+    self.resource_group_name = resource_group_name
+    self.command = command
+
+  def _ListStatuses(self, keys):
+    stdout, _, _ = vm_util.IssueCommand(
+        [azure.AZURE_PATH] + list(self.command) +
+        ['list', '--output', 'json',
+         '--resource-group', self.resource_group_name])
+    try:
+      items = json.loads(stdout)
+    except ValueError:
+      return {}
+    keys = set(keys)
+    return {item['name']: item for item in items if item['name'] in keys}
+
+
+def GetResourceStatus(resource_group, command, name):
+  """Returns the description of a resource, or None if it does not exist.
+
+  Args:
+    resource_group: AzureResourceGroup containing the resource.
+    command: tuple of strings. The Azure CLI command group of the resource
+        type, e.g. ('vm',) or ('network', 'nic').
+    name: string. The name of the resource.
+  """
+  poller = status_poller.GetPoller(AzureStatusPoller, resource_group.name,
+                                   command)
+  return poller.GetStatus(name)
+
+
 class AzureAvailSet(resource.BaseResource):
   """Object representing an Azure Availability Set."""
 
@@ -63,15 +63,8 @@ class AzurePublicIPAddress(resource.BaseResource):
     if self._deleted:
       return False
 
-    stdout, _, _ = vm_util.IssueCommand(
-        [azure.AZURE_PATH, 'network', 'public-ip', 'show',
-         '--output', 'json',
-         '--name', self.name] + self.resource_group.args)
-    try:
-      json.loads(stdout)
-      return True
-    except:
-      return False
+    return azure_network.GetResourceStatus(
+        self.resource_group, ('network', 'public-ip'), self.name) is not None
 
   def GetIPAddress(self):
     stdout, _ = vm_util.IssueRetryableCommand(
@@ -109,17 +102,8 @@ class AzureNIC(resource.BaseResource):
   def _Exists(self):
     if self._deleted:
       return False
-    # Same deal as AzurePublicIPAddress. 'show' doesn't error out if
-    # the resource doesn't exist, but no-op 'set' does.
-    stdout, _, _ = vm_util.IssueCommand(
-        [azure.AZURE_PATH, 'network', 'nic', 'show',
-         '--output', 'json',
-         '--name', self.name] + self.resource_group.args)
-    try:
-      json.loads(stdout)
-      return True
-    except:
-      return False
+    return azure_network.GetResourceStatus(
+        self.resource_group, ('network', 'nic'), self.name) is not None
 
   def GetInternalIP(self):
     """Grab some data."""
@@ -214,16 +198,8 @@ class AzureVirtualMachine(virtual_machine.BaseVirtualMachine):
     """Returns True if the VM exists."""
     if self._deleted:
       return False
-    show_cmd = [
-        azure.AZURE_PATH, 'vm', 'show', '--output', 'json',
-        '--name', self.name
-    ] + self.resource_group.args
-    stdout, _, _ = vm_util.IssueCommand(show_cmd)
-    try:
-      json.loads(stdout)
-      return True
-    except:
-      return False
+    return azure_network.GetResourceStatus(
+        self.resource_group, ('vm',), self.name) is not None
 
   def _Delete(self):
     # The VM will be deleted when the resource group is.
@@ -17,10 +17,9 @@ Disks can be created, deleted, attached to VMs, and detached from VMs.
 Use 'gcloud compute disk-types list' to determine valid disk types.
 """
 
-import json
-
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker.providers.gcp import util
 from perfkitbenchmarker.providers import GCP
 
@@ -87,13 +86,9 @@ class GceDisk(disk.BaseDisk):
 
   def _Exists(self):
     """Returns true if the disk exists."""
-    cmd = util.GcloudCommand(self, 'compute', 'disks', 'describe', self.name)
-    stdout, _, _ = cmd.Issue(suppress_warning=True)
-    try:
-      json.loads(stdout)
-    except ValueError:
-      return False
-    return True
+    poller = status_poller.GetPoller(util.GceStatusPoller, self.project,
+                                     self.zone, 'disks')
+    return poller.GetStatus(self.name) is not None
 
   def Attach(self, vm):
     """Attaches the disk to a VM.
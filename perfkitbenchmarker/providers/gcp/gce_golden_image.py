@@ -0,0 +1,73 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Golden images stored as GCE image families in the project of the VMs."""
+
+import json
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import golden_image
+from perfkitbenchmarker import providers
+from perfkitbenchmarker.providers.gcp import util
+
+# Creating an image copies the whole boot disk.
+_CREATE_TIMEOUT = 1800
+
+
+class GceImageProvider(golden_image.BaseImageProvider):
+  """Creates golden images from the boot disks of GCE VMs."""
+
+  CLOUD = providers.GCP
+
+  def GetSourceImage(self, vm):
+    return '%s/%s' % (vm.image_project or '', vm.image)
+
+  def GetImageLocation(self, vm):
+    # Images are global resources, usable in every zone of the project.
+    return vm.project
+
+  def _ImagesCommand(self, vm, *args):
+    cmd = util.GcloudCommand(vm, 'compute', 'images', *args)
+    # Images are global resources.
+    cmd.flags['zone'] = []
+    return cmd
+
+  def FindImage(self, vm, name):
+    # The images of a golden image form an image family named after it.
+    stdout, _, retcode = self._ImagesCommand(
+        vm, 'describe-from-family', name).Issue(suppress_warning=True)
+    if retcode:
+      return None
+    return golden_image.GoldenImage(name, json.loads(stdout)['name'])
+
+  def CreateImage(self, vm, name):
+    image_name = golden_image.GetImageVersionName(name)
+    cmd = self._ImagesCommand(vm, 'create', image_name)
+    cmd.flags['family'] = name
+    # The boot disk is named after the VM. --force allows creating the image
+    # while the VM is running.
+    cmd.flags['source-disk'] = vm.name
+    cmd.flags['source-disk-zone'] = vm.zone
+    cmd.flags['force'] = True
+    _, stderr, retcode = cmd.Issue(timeout=_CREATE_TIMEOUT)
+    if retcode:
+      raise errors.Resource.CreationError(
+          'Failed to create image %s: %s' % (image_name, stderr))
+    return golden_image.GoldenImage(name, image_name)
+
+  def DeleteImage(self, vm, image):
+    self._ImagesCommand(vm, 'delete', image.image_id).Issue()
+
+  def UseImage(self, vm, image):
+    vm.image = image.image_id
+    vm.image_project = vm.project
@@ -39,6 +39,7 @@ from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import linux_virtual_machine as linux_vm
 from perfkitbenchmarker import providers
 from perfkitbenchmarker import resource
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import windows_virtual_machine
@@ -531,14 +532,9 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
 
   def _Exists(self):
     """Returns true if the VM exists."""
-    getinstance_cmd = util.GcloudCommand(self, 'compute', 'instances',
-                                         'describe', self.name)
-    stdout, _, _ = getinstance_cmd.Issue(suppress_warning=True)
-    try:
-      json.loads(stdout)
-    except ValueError:
-      return False
-    return True
+    poller = status_poller.GetPoller(util.GceStatusPoller, self.project,
+                                     self.zone, 'instances')
+    return poller.GetStatus(self.name) is not None
 
   def CreateScratchDisk(self, disk_spec):
     """Create a VM's scratch disk.
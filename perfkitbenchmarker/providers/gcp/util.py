@@ -18,6 +18,7 @@ import functools32
 
 from collections import OrderedDict
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker import vm_util
 
 FLAGS = flags.FLAGS
@@ -124,3 +125,39 @@ class GcloudCommand(object):
     if hasattr(resource, 'zone') and resource.zone:
       self.flags['zone'] = resource.zone
     self.additional_flags.extend(FLAGS.additional_gcloud_flags or ())
+
+
+class GceStatusPoller(status_poller.BaseStatusPoller):
+  """Lists the resources of one collection in a zone with one gcloud call.
+
+  Resources are looked up by name, and their status is the resource
+  description returned by gcloud. As with the describe commands this replaces,
+  a list command that fails finds no resources rather than raising.
+
+  Attributes:
+    project: string. The project the resources belong to.
+    zone: string. The zone the resources are in.
+    collection: string. The gcloud compute collection, e.g. 'instances' or
+        'disks'.
+  """
+
+  # Keeps the length of the filter expression reasonable.
+  MAX_BATCH_SIZE = 100
+
+  def __init__(self, project, zone, collection):
+    super(GceStatusPoller, self).__init__(project, zone, collection)
+    self.project = project
+    self.zone = zone
+    self.collection = collection
+
+  def _ListStatuses(self, keys):
+    cmd = GcloudCommand(self, 'compute', self.collection, 'list')
+    # List commands take the zones to search rather than a single zone.
+    cmd.flags['zones'] = cmd.flags.pop('zone')
+    cmd.flags['filter'] = 'name=(%s)' % ' '.join(keys)
+    stdout, _, _ = cmd.Issue(suppress_warning=True)
+    try:
+      items = json.loads(stdout)
+    except ValueError:
+      return {}
+    return {item['name']: item for item in items}
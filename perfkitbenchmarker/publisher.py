@@ -17,8 +17,9 @@
 """Classes to collect and publish performance samples to various sinks."""
 
 import abc
+import base64
 import collections
-import copy
+import contextlib
 import csv
 import fcntl
 import httplib
@@ -28,16 +29,24 @@ import json
 import logging
 import math
 import operator
+import os
 import pprint
+import Queue
+import random
+import re
 import sys
+import threading
 import time
 import urllib
+import urlparse
 import uuid
+import zlib
 
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import log_util
+from perfkitbenchmarker import results_store
 from perfkitbenchmarker import version
 from perfkitbenchmarker import vm_util
 
@@ -79,6 +88,17 @@ flags.DEFINE_string(
     'csv_path',
     None,
     'A path to write CSV-format results')
+flags.DEFINE_string(
+    'sqlite_path',
+    None,
+    'A path to an indexed SQLite store of results to add samples to. It is '
+    'created if it does not exist, and can be queried with '
+    '"python -m perfkitbenchmarker.results_store".')
+flags.DEFINE_list(
+    'sqlite_indexed_metadata',
+    list(results_store.DEFAULT_INDEXED_METADATA_KEYS),
+    'Metadata keys indexed in the --sqlite_path store, in addition to those '
+    'it already indexes.')
 
 flags.DEFINE_string(
     'bigquery_table',
@@ -111,6 +131,30 @@ flags.DEFINE_string(
 
 flags.DEFINE_string('es_type', 'result', 'Elasticsearch document type')
 
+flags.DEFINE_integer(
+    'es_bulk_size', 0,
+    'Number of samples indexed per Elasticsearch _bulk API request, over '
+    'HTTP connections reused across requests, without the "elasticsearch" '
+    'package. The default of 0 indexes samples one at a time with the '
+    '"elasticsearch" package.',
+    lower_bound=0)
+
+flags.DEFINE_integer(
+    'es_bulk_parallelism', 4,
+    'Number of Elasticsearch _bulk API requests in flight at once.',
+    lower_bound=1)
+
+flags.DEFINE_boolean(
+    'es_gzip', False,
+    'Compress Elasticsearch _bulk API requests with gzip. Requires '
+    'http.compression to be enabled on the Elasticsearch server.')
+
+flags.DEFINE_integer(
+    'es_max_retries', 5,
+    'Number of times samples rejected by Elasticsearch with a retryable '
+    'error, and requests that fail, are retried with exponential backoff.',
+    lower_bound=0)
+
 flags.DEFINE_multistring(
     'metadata',
     [],
@@ -127,10 +171,55 @@ flags.DEFINE_string(
     'influx_db_name', 'perfkit',
     'Name of Influx DB database that you wish to publish to or create')
 
+flags.DEFINE_integer(
+    'influx_max_batch_bytes', 1024 * 1024,
+    'Maximum size in bytes of the line protocol written to Influx DB per '
+    'request. Samples are buffered until the buffer is full or all samples '
+    'passed to the publisher are formatted.', lower_bound=1)
+
+flags.DEFINE_boolean(
+    'influx_gzip', False, 'Compress Influx DB write requests with gzip.')
+
+flags.DEFINE_integer(
+    'influx_max_retries', 5,
+    'Number of times Influx DB write requests that fail or return a retryable '
+    'error are retried with exponential backoff.', lower_bound=0)
+
+flags.DEFINE_enum(
+    'influx_precision', 'n', ['n', 'u', 'ms', 's'],
+    'Precision of the sample timestamps written to Influx DB: nanoseconds, '
+    'microseconds, milliseconds or seconds.')
+
+flags.DEFINE_boolean(
+    'stream_samples', False,
+    'If true, samples are appended to a spill file in the run\'s temporary '
+    'directory as they are collected instead of being held in memory, and are '
+    'handed to publishers in batches of --sample_publish_batch_size. Use this '
+    'to bound memory usage of long --run_stage_time loops and benchmarks that '
+    'produce many samples.')
+flags.DEFINE_integer(
+    'sample_publish_batch_size', 1000,
+    'Maximum number of samples handed to publishers at once when '
+    '--stream_samples is set.', lower_bound=1)
+flags.DEFINE_float(
+    'sample_publish_interval', 60,
+    'Seconds between publishing the samples that benchmark processes have '
+    'spilled so far when --stream_samples is set, so that samples are '
+    'published while the benchmarks run. 0 publishes them only once all '
+    'benchmarks have finished.', lower_bound=0)
+
 DEFAULT_JSON_OUTPUT_NAME = 'perfkitbenchmarker_results.json'
 DEFAULT_CREDENTIALS_JSON = 'credentials.json'
 GCS_OBJECT_NAME_LENGTH = 20
 
+# Multipliers converting timestamps in seconds to each Influx DB precision.
+INFLUX_PRECISIONS = {'n': 10 ** 9, 'u': 10 ** 6, 'ms': 10 ** 3, 's': 1}
+# Test of the samples InfluxDBPublisher writes about its own throughput.
+INFLUX_STATS_TEST = 'influxdb_publisher'
+# Characters escaped with a backslash in Influx DB tag keys and values.
+_INFLUX_TAG_KEY_SPECIAL_CHARS_RE = re.compile(r'[, =]')
+_INFLUX_TAG_VALUE_SPECIAL_CHARS_RE = re.compile(r'[, ]')
+
 
 def GetLabelsFromDict(metadata):
   """Converts a metadata dictionary to a string of labels.
@@ -190,6 +279,8 @@ class DefaultMetadataProvider(MetadataProvider):
       metadata[name_prefix + 'cloud'] = vm.CLOUD
       metadata[name_prefix + 'zone'] = vm.zone
       metadata[name_prefix + 'image'] = vm.image
+      if vm.golden_image:
+        metadata[name_prefix + 'golden_image'] = vm.golden_image
       for k, v in vm.GetMachineTypeDict().iteritems():
         metadata[name_prefix + k] = v
       metadata[name_prefix + 'vm_count'] = len(vms)
@@ -245,9 +336,10 @@ class SamplePublisher(object):
   def PublishSamples(self, samples):
     """Publishes 'samples'.
 
-    PublishSamples will be called exactly once. Calling
-    SamplePublisher.PublishSamples multiple times may result in data being
-    overwritten.
+    PublishSamples is called once per batch of new samples: once per run
+    unless samples are published incrementally (see --publish_after_run and
+    --stream_samples). Each call receives only samples that have not been
+    published before.
 
     Args:
       samples: list of dicts to publish.
@@ -260,7 +352,7 @@ class CSVPublisher(SamplePublisher):
   """Publisher which writes results in CSV format to a specified path.
 
   The default field names are written first, followed by all unique metadata
-  keys found in the data.
+  keys found in the data. Sample histograms are not written.
   """
 
   _DEFAULT_FIELDS = ('timestamp', 'test', 'metric', 'value', 'unit',
@@ -269,23 +361,73 @@ class CSVPublisher(SamplePublisher):
 
   def __init__(self, path):
     self._path = path
+    # Metadata keys in the header of the file, or None before the first call.
+    self._meta_keys = None
 
   def PublishSamples(self, samples):
     samples = list(samples)
     # Union of all metadata keys.
-    meta_keys = sorted(
-        set(key for sample in samples for key in sample['metadata']))
+    meta_keys = set(key for sample in samples for key in sample['metadata'])
 
     logging.info('Writing CSV results to %s', self._path)
-    with open(self._path, 'w') as fp:
-      writer = csv.DictWriter(fp, list(self._DEFAULT_FIELDS) + meta_keys)
-      writer.writeheader()
+    if self._meta_keys is None:
+      self._meta_keys = sorted(meta_keys)
+      self._WriteRows('w', samples)
+    elif meta_keys.issubset(self._meta_keys):
+      self._WriteRows('a', samples)
+    else:
+      # The header needs new columns, so rewrite the rows published so far.
+      old_path = self._path + '.old'
+      os.rename(self._path, old_path)
+      self._meta_keys = sorted(meta_keys.union(self._meta_keys))
+      with open(old_path) as fp:
+        self._WriteRows('w', itertools.chain(
+            csv.DictReader(fp), self._Flatten(samples)), flatten=False)
+      os.remove(old_path)
+
+  def _Flatten(self, samples):
+    for sample in samples:
+      d = {}
+      d.update(sample)
+      d.update(d.pop('metadata'))
+      d.pop('histogram', None)
+      yield d
 
-      for sample in samples:
-        d = {}
-        d.update(sample)
-        d.update(d.pop('metadata'))
-        writer.writerow(d)
+  def _WriteRows(self, mode, samples, flatten=True):
+    with open(self._path, mode) as fp:
+      writer = csv.DictWriter(fp, list(self._DEFAULT_FIELDS) + self._meta_keys)
+      if mode == 'w':
+        writer.writeheader()
+      writer.writerows(self._Flatten(samples) if flatten else samples)
+
+
+class SQLitePublisher(SamplePublisher):
+  """Publisher which adds samples to an indexed SQLite store of results.
+
+  See results_store for the schema and the query API.
+
+  Attributes:
+    path: string. The path of the SQLite database.
+    indexed_metadata_keys: list of strings. Metadata keys to index. Defaults
+        to results_store.DEFAULT_INDEXED_METADATA_KEYS.
+  """
+
+  def __init__(self, path, indexed_metadata_keys=None):
+    self.path = path
+    if indexed_metadata_keys is None:
+      indexed_metadata_keys = results_store.DEFAULT_INDEXED_METADATA_KEYS
+    self.indexed_metadata_keys = indexed_metadata_keys
+
+  def __repr__(self):
+    return '<{0} path="{1}">'.format(type(self).__name__, self.path)
+
+  def PublishSamples(self, samples):
+    logging.info('Writing results to SQLite store %s', self.path)
+    store = results_store.ResultsStore(self.path, self.indexed_metadata_keys)
+    try:
+      store.AddSamples(samples)
+    finally:
+      store.Close()
 
 
 class PrettyPrintStreamPublisher(SamplePublisher):
@@ -470,6 +612,8 @@ class NewlineDelimitedJSONPublisher(SamplePublisher):
         if self.collapse_labels:
           sample['labels'] = GetLabelsFromDict(sample.pop('metadata', {}))
         fp.write(json.dumps(sample) + '\n')
+    # Later batches of the same run must not overwrite this one.
+    self.mode = self.mode.replace('w', 'a')
 
 
 class BigQueryPublisher(SamplePublisher):
@@ -527,8 +671,10 @@ class BigQueryPublisher(SamplePublisher):
                          self._credentials_file,
                          '--service_account_private_key_file=' +
                          self.service_account_private_key_file])
+      # Tables created before samples had histograms have no column for them.
       load_cmd.extend(['load',
                        '--source_format=NEWLINE_DELIMITED_JSON',
+                       '--ignore_unknown_values',
                        self.bigquery_table,
                        tf.name])
       vm_util.IssueRetryableCommand(load_cmd)
@@ -575,19 +721,172 @@ class CloudStoragePublisher(SamplePublisher):
       vm_util.IssueRetryableCommand(copy_cmd)
 
 
+# Delays in seconds before retrying failed HTTP requests.
+_HTTP_RETRY_DELAY = 1
+_HTTP_MAX_RETRY_DELAY = 30
+
+
+def _IsRetryableHttpStatus(status):
+  """Returns whether a request that returned 'status' may succeed if retried."""
+  return status == 429 or status >= 500
+
+
+def _SleepBeforeRetry(attempt):
+  """Sleeps before a retry, exponentially longer for each attempt."""
+  delay = min(_HTTP_MAX_RETRY_DELAY, _HTTP_RETRY_DELAY * 2 ** (attempt - 1))
+  time.sleep(delay * random.uniform(0.5, 1))
+
+
+def _GzipCompress(data):
+  """Returns 'data' compressed in the gzip format."""
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+  return compressor.compress(data) + compressor.flush()
+
+
+class _HttpConnectionPool(object):
+  """Reuses HTTP connections to one server across requests and threads.
+
+  Idle connections are kept open, so that consecutive requests do not pay for
+  a new TCP (and TLS) handshake each. A connection that fails is closed rather
+  than returned to the pool.
+
+  Credentials in the user information of the server URI are sent with each
+  request in a basic Authorization header.
+
+  Attributes:
+    host: string. The host and port of the server.
+    path_prefix: string. The path of the server URI, prepended to the paths
+        of requests.
+  """
+
+  def __init__(self, uri, timeout=60):
+    if '://' not in uri:
+      uri = 'http://' + uri
+    parsed = urlparse.urlparse(uri)
+    self.host = parsed.netloc.rpartition('@')[2]
+    self._authorization = None
+    if parsed.username is not None:
+      credentials = '%s:%s' % (urllib.unquote(parsed.username),
+                               urllib.unquote(parsed.password or ''))
+      self._authorization = 'Basic ' + base64.b64encode(credentials)
+    self.path_prefix = parsed.path.rstrip('/')
+    self._connection_class = (httplib.HTTPSConnection
+                              if parsed.scheme == 'https'
+                              else httplib.HTTPConnection)
+    self._timeout = timeout
+    self._idle = Queue.LifoQueue()
+
+  def Request(self, method, path, body=None, headers=None):
+    """Sends a request on an idle connection, or on a new one if none is idle.
+
+    Args:
+      method: string. The HTTP method.
+      path: string. The request path, relative to the server URI.
+      body: string or None. The request body.
+      headers: dict or None. The request headers.
+
+    Returns:
+      (status, body) tuple of the response.
+
+    Raises:
+      IOError or httplib.HTTPException: if the request fails.
+    """
+    try:
+      conn = self._idle.get_nowait()
+    except Queue.Empty:
+      conn = self._connection_class(self.host, timeout=self._timeout)
+    try:
+      headers = dict(headers or {})
+      if self._authorization:
+        headers['Authorization'] = self._authorization
+      conn.request(method, self.path_prefix + path, body, headers)
+      response = conn.getresponse()
+      response_body = response.read()
+    except:
+      conn.close()
+      raise
+    if response.will_close:
+      conn.close()
+    else:
+      self._idle.put(conn)
+    return response.status, response_body
+
+  def RequestWithRetries(self, method, path, body=None, headers=None,
+                         max_retries=5):
+    """Sends a request, retrying failures and responses with retryable errors.
+
+    Args:
+      method: string. The HTTP method.
+      path: string. The request path, relative to the server URI.
+      body: string or None. The request body.
+      headers: dict or None. The request headers.
+      max_retries: int. Number of times the request may be retried.
+
+    Returns:
+      (status, body) tuple of the last response.
+
+    Raises:
+      IOError or httplib.HTTPException: if the last attempt failed.
+    """
+    for attempt in xrange(max_retries + 1):
+      if attempt:
+        _SleepBeforeRetry(attempt)
+      try:
+        status, response_body = self.Request(method, path, body, headers)
+      except (IOError, httplib.HTTPException) as e:
+        if attempt == max_retries:
+          raise
+        logging.warning('Request %s %s to %s failed: %s', method, path,
+                        self.host, e)
+        continue
+      if not _IsRetryableHttpStatus(status):
+        break
+      logging.warning('Request %s %s to %s returned %d.', method, path,
+                      self.host, status)
+    return status, response_body
+
+  def Close(self):
+    """Closes the idle connections."""
+    while True:
+      try:
+        self._idle.get_nowait().close()
+      except Queue.Empty:
+        return
+
+
 class ElasticsearchPublisher(SamplePublisher):
   """Publish samples to an Elasticsearch server. Index and document type
   will be created if they do not exist.
 
+  With a bulk_size, samples are indexed with the _bulk API in batches of
+  bulk_size, up to parallelism batches at once, over connections reused
+  across requests. Samples that Elasticsearch rejects with a retryable error
+  (429 or 5xx), and requests that fail, are retried with exponential backoff.
+  Without a bulk_size, samples are indexed one at a time with the
+  "elasticsearch" package.
+
   Attributes:
     es_uri: String. e.g. "http://localhost:9200"
     es_index: String. Default "perfkit"
     es_type: String. Default "result"
+    bulk_size: int. Number of samples per _bulk request, or 0.
+    parallelism: int. Number of _bulk requests in flight at once.
+    gzip: boolean. Whether to compress _bulk requests with gzip.
+    max_retries: int. Number of times failed samples and requests are retried.
   """
-  def __init__(self, es_uri=None, es_index=None, es_type=None):
+
+  def __init__(self, es_uri=None, es_index=None, es_type=None, bulk_size=0,
+               parallelism=1, gzip=False, max_retries=5):
     self.es_uri = es_uri
     self.es_index = es_index.lower()
     self.es_type = es_type
+    self.bulk_size = bulk_size
+    self.parallelism = parallelism
+    self.gzip = gzip
+    self.max_retries = max_retries
+    self._client = None
+    self._pool = None
+    self._index_exists = False
     self.mapping = {
         "mappings": {
             "result": {
@@ -619,31 +918,152 @@ class ElasticsearchPublisher(SamplePublisher):
         }
     }
 
+  def __repr__(self):
+    return '<{0} es_uri="{1}" es_index="{2}">'.format(
+        type(self).__name__, self.es_uri, self.es_index)
+
   def PublishSamples(self, samples):
     """Publish samples to Elasticsearch service"""
-    try:
-      from elasticsearch import Elasticsearch
-    except ImportError:
-      raise ImportError('The "elasticsearch" package is required to use '
-                        'the Elasticsearch publisher. Please make sure it '
-                        'is installed.')
-
-    es = Elasticsearch([self.es_uri])
-    if not es.indices.exists(index=self.es_index):
-      es.indices.create(index=self.es_index, body=self.mapping)
-      logging.info('Create index %s and default mappings', self.es_index)
+    if self.bulk_size:
+      self._BulkPublishSamples(samples)
+      return
+    if self._client is None:
+      try:
+        from elasticsearch import Elasticsearch
+      except ImportError:
+        raise ImportError('The "elasticsearch" package is required to use '
+                          'the Elasticsearch publisher without --es_bulk_size. '
+                          'Please make sure it is installed.')
+      self._client = Elasticsearch([self.es_uri])
+    es = self._client
+    if not self._index_exists:
+      if not es.indices.exists(index=self.es_index):
+        es.indices.create(index=self.es_index, body=self.mapping)
+        logging.info('Create index %s and default mappings', self.es_index)
+      self._index_exists = True
     for s in samples:
-      sample = copy.deepcopy(s)
-      # Make timestamp understandable by ES and human.
-      sample['timestamp'] = self._FormatTimestampForElasticsearch(
-          sample['timestamp']
-      )
-      # Keys cannot have dots for ES
-      sample = self._deDotKeys(sample)
       # Add sample to the "perfkit index" of "result type" and using sample_uri
       # as each ES's document's unique _id
       es.create(index=self.es_index, doc_type=self.es_type,
-                id=sample['sample_uri'], body=json.dumps(sample))
+                id=s['sample_uri'], body=json.dumps(self._FormatSample(s)))
+
+  def _BulkPublishSamples(self, samples):
+    """Indexes samples with parallel _bulk API requests."""
+    if self._pool is None:
+      self._pool = _HttpConnectionPool(self.es_uri)
+    if not self._index_exists:
+      self._CreateIndex()
+    samples = list(samples)
+    batches = [((samples[i:i + self.bulk_size],), {})
+               for i in xrange(0, len(samples), self.bulk_size)]
+    failures = sum(vm_util.RunThreaded(
+        self._IndexBatch, batches, max_concurrent_threads=self.parallelism))
+    if failures:
+      logging.error('Failed to index %d of %d samples in Elasticsearch index '
+                    '%s.', failures, len(samples), self.es_index)
+    else:
+      logging.info('Indexed %d samples in Elasticsearch index %s.',
+                   len(samples), self.es_index)
+
+  def _CreateIndex(self):
+    """Creates the index with the default mappings if it does not exist."""
+    path = '/' + urllib.quote(self.es_index)
+    status, _ = self._pool.RequestWithRetries(
+        'HEAD', path, max_retries=self.max_retries)
+    if status == 404:
+      status, body = self._pool.RequestWithRetries(
+          'PUT', path, json.dumps(self.mapping),
+          {'Content-Type': 'application/json'}, self.max_retries)
+      if status == 200:
+        logging.info('Create index %s and default mappings', self.es_index)
+      elif 'already_exists' not in body:
+        # Another publisher may have created the index concurrently.
+        raise httplib.HTTPException(
+            'Could not create Elasticsearch index %s: %d %s' %
+            (self.es_index, status, body))
+    elif status != 200:
+      raise httplib.HTTPException(
+          'Could not look up Elasticsearch index %s: %d' %
+          (self.es_index, status))
+    self._index_exists = True
+
+  def _IndexBatch(self, samples):
+    """Indexes samples with _bulk API requests.
+
+    Samples that are rejected with a retryable error are sent again in a new
+    request, until max_retries is reached.
+
+    Args:
+      samples: list of sample dicts.
+
+    Returns:
+      The number of samples that could not be indexed.
+    """
+    docs = [(s['sample_uri'], json.dumps(self._FormatSample(s)))
+            for s in samples]
+    headers = {'Content-Type': 'application/x-ndjson'}
+    if self.gzip:
+      headers['Content-Encoding'] = 'gzip'
+    failures = 0
+    for attempt in xrange(self.max_retries + 1):
+      if attempt:
+        _SleepBeforeRetry(attempt)
+      body = self._BulkBody(docs)
+      if self.gzip:
+        body = _GzipCompress(body)
+      try:
+        status, response_body = self._pool.RequestWithRetries(
+            'POST', '/_bulk', body, headers, self.max_retries)
+      except (IOError, httplib.HTTPException) as e:
+        logging.error('Could not index samples in Elasticsearch: %s', e)
+        return failures + len(docs)
+      if status != 200:
+        logging.error('Could not index samples in Elasticsearch: %d %s',
+                      status, response_body[:1000])
+        return failures + len(docs)
+      response = json.loads(response_body)
+      if not response.get('errors'):
+        return failures
+      retry_docs = []
+      for doc, item in zip(docs, response['items']):
+        result = item.values()[0]
+        item_status = result.get('status', 200)
+        # A sample created by an earlier attempt whose response was lost
+        # conflicts with itself.
+        if item_status < 300 or (attempt and item_status == 409):
+          continue
+        if _IsRetryableHttpStatus(item_status):
+          retry_docs.append(doc)
+        else:
+          failures += 1
+          logging.error('Elasticsearch rejected sample %s: %s', doc[0],
+                        result.get('error'))
+      if not retry_docs:
+        return failures
+      logging.warning('Elasticsearch rejected %d samples with retryable '
+                      'errors.', len(retry_docs))
+      docs = retry_docs
+    return failures + len(docs)
+
+  def _BulkBody(self, docs):
+    """Returns the body of a _bulk request creating (sample_uri, json) docs."""
+    lines = []
+    for sample_uri, doc in docs:
+      lines.append(json.dumps({'create': {'_index': self.es_index,
+                                          '_type': self.es_type,
+                                          '_id': sample_uri}}))
+      lines.append(doc)
+    lines.append('')
+    return '\n'.join(lines)
+
+  def _FormatSample(self, sample):
+    """Returns a copy of a sample in the form stored in Elasticsearch."""
+    # Keys cannot have dots for ES
+    formatted = self._deDotKeys(sample)
+    # Make timestamp understandable by ES and human.
+    formatted['timestamp'] = self._FormatTimestampForElasticsearch(
+        sample['timestamp'])
+    return formatted
 
   def _FormatTimestampForElasticsearch(self, epoch_us):
     """Convert the floating epoch timestamp in micro seconds epoch_us to
@@ -655,48 +1075,153 @@ class ElasticsearchPublisher(SamplePublisher):
     return new_ts
 
   def _deDotKeys(self, res):
-    """Recursively replace dot with underscore in all keys in a dictionary."""
-    for key, value in res.items():
-      if isinstance(value, dict):
-        self._deDotKeys(value)
-      new_key = key.replace('.', '_')
-      if new_key != key:
-        res[new_key] = res.pop(key)
-    return res
+    """Recursively copies a dictionary, replacing dots in keys with
+    underscores. Values that are not dictionaries are not copied.
+    """
+    return {
+        key.replace('.', '_'):
+        self._deDotKeys(value) if isinstance(value, dict) else value
+        for key, value in res.iteritems()}
 
 
 class InfluxDBPublisher(SamplePublisher):
   """Publisher writes samples to InfluxDB.
 
+  Samples are formatted in the line protocol into a buffer of at most
+  max_batch_bytes, which is written to InfluxDB when it is full and at the end
+  of each call to PublishSamples. How long samples wait to be published
+  during a run is bounded by how often the collector publishes them (see
+  --publish_after_run and --sample_publish_interval). Writes reuse kept-alive
+  connections, may be compressed with gzip, and are retried with exponential
+  backoff when they fail or InfluxDB returns a retryable error.
+
+  After each call that published samples, the number of samples written and
+  failed and the samples written per second are written to InfluxDB as
+  samples of the test INFLUX_STATS_TEST.
+
   Attributes:
     influx_uri: Takes in type string. Consists of the Influx DB address and
       port.Expects the format hostname:port
     influx_db_name: Takes in tupe string.
       Consists of the name of Influx DB database that you wish to publish to or
       create.
+    max_batch_bytes: int. Maximum size of the body of a write request.
+    gzip: boolean. Whether to compress write requests with gzip.
+    max_retries: int. Number of times a failed write is retried.
+    precision: string. Precision of the sample timestamps, one of
+      INFLUX_PRECISIONS.
+    stats: dict. Number of samples and bytes written, failed samples, write
+      requests and seconds spent publishing since the publisher was created.
   """
 
-  def __init__(self, influx_uri=None, influx_db_name=None):
+  def __init__(self, influx_uri=None, influx_db_name=None,
+               max_batch_bytes=1024 * 1024, gzip=False, max_retries=5,
+               precision='n'):
     # set to default above in flags unless changed
     self.influx_uri = influx_uri
     self.influx_db_name = influx_db_name
+    self.max_batch_bytes = max_batch_bytes
+    self.gzip = gzip
+    self.max_retries = max_retries
+    self.precision = precision
+    self.stats = dict.fromkeys(
+        ('samples', 'bytes', 'failed_samples', 'requests', 'seconds'), 0)
+    self._timestamp_multiplier = INFLUX_PRECISIONS[precision]
+    self._pool = None
+    self._db_created = False
+
+  def __repr__(self):
+    return '<{0} influx_uri="{1}" influx_db_name="{2}">'.format(
+        type(self).__name__, self.influx_uri, self.influx_db_name)
 
   def PublishSamples(self, samples):
-    formated_samples = []
-    for sample in samples:
-      formated_samples.append(self._ConstructSample(sample))
-    self._Publish(formated_samples)
+    start = time.time()
+    stats = dict(self.stats)
+    try:
+      self._CreateDB()
+    except (IOError, httplib.HTTPException) as http_exception:
+      logging.error('Error connecting to the database:  %s', http_exception)
+      self.stats['failed_samples'] += len(samples)
+    else:
+      self._Publish(self._ConstructSample(sample) for sample in samples)
+    self.stats['seconds'] += time.time() - start
+    delta = {key: self.stats[key] - stats[key] for key in self.stats}
+    logging.info(
+        'Wrote %d samples (%d bytes in %d requests) to InfluxDB in %.3f '
+        'seconds (%.1f samples/s).', delta['samples'], delta['bytes'],
+        delta['requests'], delta['seconds'], self._GetThroughput(delta))
+    if self._db_created and (delta['samples'] or delta['failed_samples']):
+      self._WriteStatsSamples(delta)
 
   def _Publish(self, formated_samples):
+    """Writes lines of the line protocol to InfluxDB in batches."""
+    batch = []
+    batch_bytes = 0
+    for line in formated_samples:
+      if batch and batch_bytes + len(line) > self.max_batch_bytes:
+        self._WriteBatch(batch)
+        batch = []
+        batch_bytes = 0
+      batch.append(line)
+      # Counts the newline that separates it from the next line.
+      batch_bytes += len(line) + 1
+    if batch:
+      self._WriteBatch(batch)
+
+  def _GetThroughput(self, stats):
+    """Returns the samples written per second according to 'stats'."""
+    return stats['samples'] / stats['seconds'] if stats['seconds'] else 0
+
+  def _GetStatsSamples(self, stats):
+    """Returns sample dicts of the samples written and failed in 'stats'."""
+    metadata = {'influx_db_name': self.influx_db_name,
+                'bytes': stats['bytes'],
+                'requests': stats['requests'],
+                'seconds': stats['seconds'],
+                'gzip': self.gzip,
+                'precision': self.precision}
+    timestamp = time.time()
+    return [{'test': INFLUX_STATS_TEST, 'metric': metric, 'value': value,
+             'unit': unit, 'metadata': metadata, 'timestamp': timestamp,
+             'official': FLAGS.official, 'owner': FLAGS.owner,
+             'run_uri': FLAGS.run_uri, 'sample_uri': str(uuid.uuid4()),
+             'product_name': FLAGS.product_name}
+            for metric, value, unit in (
+                ('Influx DB Publish Throughput', self._GetThroughput(stats),
+                 'samples/s'),
+                ('Influx DB Published Samples', stats['samples'], 'count'),
+                ('Influx DB Failed Samples', stats['failed_samples'],
+                 'count'))]
+
+  def _WriteStatsSamples(self, stats):
+    """Writes samples of the publishing 'stats' to InfluxDB.
+
+    They are not counted in self.stats, so they do not skew the throughput.
+    """
+    lines = [self._ConstructSample(sample)
+             for sample in self._GetStatsSamples(stats)]
+    try:
+      self._WriteData('\n'.join(lines))
+    except (IOError, httplib.HTTPException) as http_exception:
+      logging.warning('Could not write the publishing statistics to the '
+                      'database:  %s', http_exception)
+
+  def _WriteBatch(self, lines):
+    """Writes lines to InfluxDB, counting them as written or failed."""
+    body = '\n'.join(lines)
+    self.stats['requests'] += 1
     try:
-      self._CreateDB()
-      body = '\n'.join(formated_samples)
       self._WriteData(body)
     except (IOError, httplib.HTTPException) as http_exception:
-      logging.error('Error connecting to the database:  %s', http_exception)
+      logging.error('Error writing %d samples to the database:  %s',
+                    len(lines), http_exception)
+      self.stats['failed_samples'] += len(lines)
+    else:
+      self.stats['samples'] += len(lines)
+      self.stats['bytes'] += len(body)
 
   def _ConstructSample(self, sample):
-    timestamp = str(int((10 ** 9) * sample['timestamp']))
+    timestamp = str(int(self._timestamp_multiplier * sample['timestamp']))
     measurement = 'perfkitbenchmarker'
 
     tag_set_metadata = ''
@@ -721,46 +1246,120 @@ class InfluxDBPublisher(SamplePublisher):
     for k, v in sample.iteritems():
       if v == '':
         v = '\\"\\"'
-      v = str(v)
-      v = v.replace(',', '\,')
-      v = v.replace(' ', '\ ')
-      key_value_pairs.append('%s=%s' % (k, v))
+      key_value_pairs.append('%s=%s' % (
+          _INFLUX_TAG_KEY_SPECIAL_CHARS_RE.sub(r'\\\g<0>', k),
+          _INFLUX_TAG_VALUE_SPECIAL_CHARS_RE.sub(r'\\\g<0>', str(v))))
     return key_value_pairs
 
+  def _GetPool(self):
+    if self._pool is None:
+      self._pool = _HttpConnectionPool(self.influx_uri)
+    return self._pool
+
   def _CreateDB(self):
     """This method is idempotent. If the DB already exists it will simply
-    return a 200 code without re-creating it.
+    return a 200 code without re-creating it. It is only called once per
+    publisher.
     """
+    if self._db_created:
+      return
     successful_http_request_codes = [200, 202, 204]
     header = {'Content-type': 'application/x-www-form-urlencoded',
               'Accept': 'text/plain'}
     params = urllib.urlencode({'q': 'CREATE DATABASE ' + self.influx_db_name})
-    conn = httplib.HTTPConnection(self.influx_uri)
-    conn.request('POST', '/query?' + params, headers=header)
-    response = conn.getresponse()
-    conn.close()
-    if response.status in successful_http_request_codes:
+    status, body = self._GetPool().RequestWithRetries(
+        'POST', '/query?' + params, headers=header,
+        max_retries=self.max_retries)
+    if status in successful_http_request_codes:
       logging.debug('Success! %s DB Created', self.influx_db_name)
+      self._db_created = True
     else:
       logging.error('%d Request could not be completed due to: %s',
-                    response.status, response.reason)
+                    status, body)
       raise httplib.HTTPException
 
   def _WriteData(self, data):
     successful_http_request_codes = [200, 202, 204]
-    params = data
     header = {"Content-type": "application/octet-stream"}
-    conn = httplib.HTTPConnection(self.influx_uri)
-    conn.request('POST', '/write?' + 'db=' + self.influx_db_name, params,
-                 headers=header)
-    response = conn.getresponse()
-    conn.close()
-    if response.status in successful_http_request_codes:
+    if self.gzip:
+      header['Content-Encoding'] = 'gzip'
+      body = _GzipCompress(data)
+    else:
+      body = data
+    params = urllib.urlencode([('db', self.influx_db_name),
+                               ('precision', self.precision)])
+    status, response_body = self._GetPool().RequestWithRetries(
+        'POST', '/write?' + params, body, headers=header,
+        max_retries=self.max_retries)
+    if status in successful_http_request_codes:
       logging.debug('Writing samples to publisher: writing samples.')
     else:
       logging.error('%d Request could not be completed due to: %s %s',
-                    response.status, response.reason, data)
-      raise httplib.HTTPException
+                    status, response_body, data[:1000])
+      raise httplib.HTTPException('Influx DB returned %d' % status)
+
+
+def GetSpillFilePath(name):
+  """Returns the path of the spill file named 'name' in the run directory."""
+  return vm_util.PrependTempDir('samples-%s.json' % name)
+
+
+class SampleSpillFile(object):
+  """An append-only file of annotated samples, one JSON object per line.
+
+  Only the path and the read position are pickled, so a spill file written
+  in a child process can be handed to the parent process cheaply.
+
+  Attributes:
+    path: string. Path of the file.
+    offset: int. Number of bytes of the file that have already been read.
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self.offset = 0
+
+  def Append(self, samples):
+    """Appends sample dicts to the file."""
+    with open(self.path, 'ab') as fp:
+      for sample in samples:
+        fp.write(json.dumps(sample) + '\n')
+
+  def HasUnreadSamples(self):
+    """Returns True if samples were appended after the last read batch."""
+    return (os.path.exists(self.path) and
+            os.path.getsize(self.path) > self.offset)
+
+  def ReadBatches(self, batch_size):
+    """Yields the unread samples in lists of at most batch_size samples.
+
+    The read position only moves past a batch once the next batch is
+    requested (or the generator finishes), so a batch whose consumer raised an
+    exception is read again by the next call. Only one batch is held in memory
+    at a time.
+
+    Args:
+      batch_size: int. Maximum number of samples per batch.
+    """
+    if not os.path.exists(self.path):
+      return
+    with open(self.path, 'rb') as fp:
+      fp.seek(self.offset)
+      batch = []
+      batch_bytes = 0
+      while True:
+        line = fp.readline()
+        # A line without a newline is still being written.
+        if line.endswith('\n'):
+          batch.append(json.loads(line))
+          batch_bytes += len(line)
+        if batch and (len(batch) == batch_size or not line.endswith('\n')):
+          yield batch
+          self.offset += batch_bytes
+          batch = []
+          batch_bytes = 0
+        if not line.endswith('\n'):
+          break
 
 
 class SampleCollector(object):
@@ -769,8 +1368,17 @@ class SampleCollector(object):
   Supports incorporating additional metadata into samples, and publishing
   results via any number of SamplePublishers.
 
+  If --stream_samples is set, samples are appended to a SampleSpillFile as
+  they are added rather than kept in memory, and PublishSamples reads them
+  back in batches. Publishing is synchronous, so the next batch is only read
+  once every publisher has consumed the previous one. The collector of the
+  parent process can read the spill files of benchmark processes while they
+  are still being written (see PublishingPeriodically).
+
   Attributes:
     samples: A list of Sample objects.
+    spill_file: SampleSpillFile that added samples are appended to, or None
+      if samples are kept in memory.
     metadata_providers: A list of MetadataProvider objects. Metadata providers
       to use.  Defaults to DEFAULT_METADATA_PROVIDERS.
     publishers: A list of SamplePublisher objects to publish to.
@@ -782,8 +1390,22 @@ class SampleCollector(object):
     run_uri: A unique tag for the run.
   """
   def __init__(self, metadata_providers=None, publishers=None,
-               publishers_from_flags=True, add_default_publishers=True):
+               publishers_from_flags=True, add_default_publishers=True,
+               spill_name=None):
+    """Initializes the collector.
+
+    Args:
+      spill_name: string or None. With --stream_samples, the name of the
+          spill file (see GetSpillFilePath). Defaults to a random name.
+    """
     self.samples = []
+    self.spill_file = None
+    # Spill files whose unread samples are published by PublishSamples.
+    self._spill_files = []
+    if FLAGS.stream_samples:
+      self.spill_file = SampleSpillFile(
+          GetSpillFilePath(spill_name or uuid.uuid4().hex))
+      self._spill_files.append(self.spill_file)
 
     if metadata_providers is not None:
       self.metadata_providers = metadata_providers
@@ -836,14 +1458,22 @@ class SampleCollector(object):
                                               gsutil_path=FLAGS.gsutil_path))
     if FLAGS.csv_path:
       publishers.append(CSVPublisher(FLAGS.csv_path))
+    if FLAGS.sqlite_path:
+      publishers.append(SQLitePublisher(
+          FLAGS.sqlite_path,
+          indexed_metadata_keys=FLAGS.sqlite_indexed_metadata))
 
     if FLAGS.es_uri:
-      publishers.append(ElasticsearchPublisher(es_uri=FLAGS.es_uri,
-                                               es_index=FLAGS.es_index,
-                                               es_type=FLAGS.es_type))
+      publishers.append(ElasticsearchPublisher(
+          es_uri=FLAGS.es_uri, es_index=FLAGS.es_index, es_type=FLAGS.es_type,
+          bulk_size=FLAGS.es_bulk_size, parallelism=FLAGS.es_bulk_parallelism,
+          gzip=FLAGS.es_gzip, max_retries=FLAGS.es_max_retries))
     if FLAGS.influx_uri:
-      publishers.append(InfluxDBPublisher(influx_uri=FLAGS.influx_uri,
-                                          influx_db_name=FLAGS.influx_db_name))
+      publishers.append(InfluxDBPublisher(
+          influx_uri=FLAGS.influx_uri, influx_db_name=FLAGS.influx_db_name,
+          max_batch_bytes=FLAGS.influx_max_batch_bytes,
+          gzip=FLAGS.influx_gzip, max_retries=FLAGS.influx_max_retries,
+          precision=FLAGS.influx_precision))
 
     return publishers
 
@@ -855,6 +1485,7 @@ class SampleCollector(object):
       benchmark: string. The name of the benchmark.
       benchmark_spec: BenchmarkSpec. Benchmark specification.
     """
+    annotated_samples = []
     for s in samples:
       # Annotate the sample.
       sample = dict(s.asdict())
@@ -869,14 +1500,86 @@ class SampleCollector(object):
       sample['owner'] = FLAGS.owner
       sample['run_uri'] = benchmark_spec.uuid
       sample['sample_uri'] = str(uuid.uuid4())
-      self.samples.append(sample)
+      annotated_samples.append(sample)
+    if self.spill_file:
+      self.spill_file.Append(annotated_samples)
+    else:
+      self.samples.extend(annotated_samples)
+
+  def ExportSamples(self):
+    """Returns the unpublished samples in a form accepted by ImportSamples.
+
+    Used to hand the samples collected in a child process to the collector of
+    the parent process. When streaming, this is the spill file rather than the
+    samples themselves.
+    """
+    return self.spill_file or self.samples
+
+  def ImportSamples(self, exported_samples):
+    """Adds samples returned by another collector's ExportSamples.
+
+    Args:
+      exported_samples: A list of annotated sample dicts or a SampleSpillFile.
+    """
+    if isinstance(exported_samples, SampleSpillFile):
+      # The spill file may already be read, see PublishingPeriodically.
+      if not any(spill_file.path == exported_samples.path
+                 for spill_file in self._spill_files):
+        self._spill_files.append(exported_samples)
+    else:
+      self.samples.extend(exported_samples)
+
+  def HasUnpublishedSamples(self):
+    """Returns True if there are samples that have not been published."""
+    return bool(self.samples) or any(
+        spill_file.HasUnreadSamples() for spill_file in self._spill_files)
 
   def PublishSamples(self):
     """Publish samples via all registered publishers."""
-    for publisher in self.publishers:
-      publisher.PublishSamples(self.samples)
+    for spill_file in self._spill_files:
+      for batch in spill_file.ReadBatches(FLAGS.sample_publish_batch_size):
+        self._PublishBatch(batch)
+    if self.samples or not self._spill_files:
+      self._PublishBatch(self.samples)
     self.samples = []
 
+  @contextlib.contextmanager
+  def PublishingPeriodically(self, interval):
+    """Publishes samples every 'interval' seconds while in the context.
+
+    Samples are published by a thread, so that the samples that benchmark
+    processes append to spill files imported with ImportSamples are
+    published while the processes run, rather than when they exit. Other
+    methods of the collector must not be called in the context.
+
+    Args:
+      interval: float. Seconds between publishing. 0 disables publishing.
+    """
+    if not interval:
+      yield
+      return
+    stop = threading.Event()
+
+    def _PublishUntilStopped():
+      while not stop.wait(interval):
+        try:
+          self.PublishSamples()
+        except Exception:
+          logging.exception('Error publishing samples.')
+
+    thread = threading.Thread(target=_PublishUntilStopped)
+    thread.daemon = True
+    thread.start()
+    try:
+      yield
+    finally:
+      stop.set()
+      thread.join()
+
+  def _PublishBatch(self, samples):
+    for publisher in self.publishers:
+      publisher.PublishSamples(samples)
+
 
 def RepublishJSONSamples(path):
   """Read samples from a JSON file and re-export them.
@@ -0,0 +1,309 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Process-wide rate limits and retry budgets for cloud APIs.
+
+Calls made through functions decorated with vm_util.Retry(api=...), and the
+commands issued by vm_util.IssueCommand within LimitingCommands, such as the
+readiness and existence checks of resources, share one ApiLimiter per API,
+e.g. 'aws:ec2' or 'gcloud:compute'. With --api_rate_limit, the limiter spaces
+the calls of all threads with a token bucket, so that hundreds of threads
+creating resources do not hit the API at once. It bounds retries with a retry
+budget: each call earns
+--retry_budget_ratio of a retry, on top of --retry_budget_min_rate retries per
+second. Retries beyond the budget wait for it to refill, or give up when the
+Retry deadline would pass first.
+
+The time spent waiting, the retries and the throttling errors returned by the
+APIs are reported as samples by GetSamples.
+"""
+
+import collections
+import contextlib
+import os
+import re
+import threading
+import time
+
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import sample
+
+flags.DEFINE_float('api_rate_limit', 0,
+                   'Calls per second that PKB makes to each cloud API through '
+                   'retried CLI commands and resource status checks, shared '
+                   'by all threads. 0 means unlimited.', lower_bound=0)
+flags.DEFINE_integer('api_rate_limit_burst', 20,
+                     'Number of calls to a cloud API that may be made at once '
+                     'before --api_rate_limit applies, and number of retries '
+                     'that may be made at once before the retry budget '
+                     'applies.', lower_bound=1)
+flags.DEFINE_list('api_rate_limits', [],
+                  'Overrides --api_rate_limit for some APIs, as a list of '
+                  'API=RATE pairs. APIs are named after the CLI and its '
+                  'first command, e.g. aws:ec2=5,gcloud:compute=20.')
+flags.DEFINE_float('retry_budget_ratio', 0.2,
+                   'Fraction of a retry earned by each call to a cloud API. '
+                   'Retries beyond the budget wait for it to refill.',
+                   lower_bound=0)
+flags.DEFINE_float('retry_budget_min_rate', 1,
+                   'Retries per second of a cloud API that are always within '
+                   'the retry budget.', lower_bound=0)
+
+
+def _ValidateApiRateLimits(pairs):
+  for pair in pairs or []:
+    name, _, rate = pair.rpartition('=')
+    try:
+      if not name or float(rate) < 0:
+        return False
+    except ValueError:
+      return False
+  return True
+
+
+flags.register_validator(
+    'api_rate_limits', _ValidateApiRateLimits,
+    'Values must be API=RATE pairs, with non-negative rates.')
+
+
+FLAGS = flags.FLAGS
+
+# Matches the errors with which cloud APIs reject calls made too quickly.
+_THROTTLING_ERROR_RE = re.compile(
+    r'RequestLimitExceeded|Throttl|rate ?limit|TooManyRequests|'
+    r'quota exceeded', re.IGNORECASE)
+
+_STATS_FIELDS = ('calls', 'retries', 'throttling_errors',
+                 'retry_budget_exhausted', 'wait_time')
+
+
+class TokenBucket(object):
+  """A token bucket from which callers take tokens, waiting if it is empty.
+
+  Waiting callers reserve their token before sleeping, so they are spaced
+  1 / rate seconds apart instead of all waking up when a token is added.
+
+  Attributes:
+    rate: float. Tokens added per second.
+    capacity: float. Maximum number of tokens.
+  """
+
+  def __init__(self, rate, capacity):
+    self.rate = rate
+    self.capacity = capacity
+    self._tokens = float(capacity)
+    self._last_refill = time.time()
+    self._lock = threading.Lock()
+
+  def _Refill(self, now):
+    self._tokens = min(self.capacity,
+                       self._tokens + (now - self._last_refill) * self.rate)
+    self._last_refill = now
+
+  def Deposit(self, tokens):
+    """Adds tokens to the bucket, e.g. to earn retries with calls."""
+    with self._lock:
+      self._Refill(time.time())
+      self._tokens = min(self.capacity, self._tokens + tokens)
+
+  def Acquire(self, deadline=None):
+    """Takes a token, waiting until one is available.
+
+    Args:
+      deadline: float or None. Time after which not to wait for a token.
+
+    Returns:
+      The number of seconds waited, or None if no token would be available
+      before 'deadline'. In that case no token is taken.
+    """
+    with self._lock:
+      now = time.time()
+      self._Refill(now)
+      wait = 0
+      if self._tokens < 1:
+        if not self.rate:
+          return None
+        wait = (1 - self._tokens) / self.rate
+      if deadline is not None and now + wait > deadline:
+        return None
+      self._tokens -= 1
+    if wait:
+      time.sleep(wait)
+    return wait
+
+
+class ApiLimiter(object):
+  """Limits the calls and retries of one API, and counts them.
+
+  Attributes:
+    api: string. The name of the API.
+  """
+
+  def __init__(self, api, rate, burst, retry_ratio, retry_min_rate):
+    self.api = api
+    self._calls = TokenBucket(rate, burst) if rate else None
+    self._retries = TokenBucket(retry_min_rate, burst)
+    self._retry_ratio = retry_ratio
+    self._lock = threading.Lock()
+    self._stats = dict.fromkeys(_STATS_FIELDS, 0)
+
+  def _Count(self, field, value=1):
+    with self._lock:
+      self._stats[field] += value
+
+  def BeforeCall(self, retry=False, deadline=None):
+    """Waits until the API may be called.
+
+    Args:
+      retry: bool. Whether the call retries a failed call, in which case it
+          also waits for the retry budget.
+      deadline: float or None. Time after which not to wait for a retry.
+
+    Returns:
+      True if the API may be called, False if a retry could not be made
+      before 'deadline'.
+    """
+    waited = 0
+    if retry:
+      wait = self._retries.Acquire(deadline)
+      if wait is None:
+        self._Count('retry_budget_exhausted')
+        return False
+      waited += wait
+      self._Count('retries')
+    else:
+      self._retries.Deposit(self._retry_ratio)
+    if self._calls is not None:
+      waited += self._calls.Acquire()
+    self._Count('calls')
+    if waited:
+      self._Count('wait_time', waited)
+    return True
+
+  def RecordError(self, error):
+    """Records a failed call, noting whether the API throttled it."""
+    if _THROTTLING_ERROR_RE.search(str(error)):
+      self._Count('throttling_errors')
+
+  def PopStats(self):
+    """Returns and resets the counters of the limiter."""
+    with self._lock:
+      stats, self._stats = self._stats, dict.fromkeys(_STATS_FIELDS, 0)
+    return stats
+
+
+_limiters = collections.OrderedDict()
+_limiters_lock = threading.Lock()
+# Whether vm_util.IssueCommand calls of the current thread are limited.
+_thread_state = threading.local()
+
+
+def _GetRate(api):
+  for pair in FLAGS.api_rate_limits or []:
+    name, _, rate = pair.rpartition('=')
+    if name == api:
+      return float(rate)
+  return FLAGS.api_rate_limit
+
+
+def GetApiLimiter(api):
+  """Returns the ApiLimiter shared by the process for 'api'."""
+  with _limiters_lock:
+    if api not in _limiters:
+      _limiters[api] = ApiLimiter(
+          api, _GetRate(api), FLAGS.api_rate_limit_burst or 1,
+          FLAGS.retry_budget_ratio or 0, FLAGS.retry_budget_min_rate or 0)
+    return _limiters[api]
+
+
+@contextlib.contextmanager
+def LimitingCommands(limit=True):
+  """Sets whether the commands issued by the current thread are limited.
+
+  Within the context, vm_util.IssueCommand calls BeforeCommand. Retry(api=...)
+  turns limiting off while calling the function it wraps, which it has
+  already limited.
+
+  Args:
+    limit: bool. Whether to limit the commands.
+  """
+  previous = getattr(_thread_state, 'limit', False)
+  _thread_state.limit = limit
+  try:
+    yield
+  finally:
+    _thread_state.limit = previous
+
+
+def BeforeCommand(cmd):
+  """Waits until a CLI command may be issued, if commands are limited.
+
+  Args:
+    cmd: list of strings. The command, as given to subprocess.Popen.
+
+  Returns:
+    The ApiLimiter of the command's API, to record its errors with, or None if
+    the commands of the current thread are not limited.
+  """
+  if not getattr(_thread_state, 'limit', False):
+    return None
+  limiter = GetApiLimiter(GetCommandApi(cmd))
+  limiter.BeforeCall()
+  return limiter
+
+
+def GetCommandApi(cmd, *args, **kwargs):
+  """Returns the API called by a CLI command, e.g. 'aws:ec2'.
+
+  The API is named after the program and its first positional argument.
+  Options before it are assumed to take a value unless given as --opt=value.
+  Extra arguments are ignored, so this can be passed as the 'api' of
+  vm_util.Retry for functions taking the command as first argument.
+
+  Args:
+    cmd: list of strings. The command, as given to subprocess.Popen.
+  """
+  del args, kwargs  # Unused.
+  program = os.path.basename(cmd[0]) if cmd else ''
+  i = 1
+  while i < len(cmd) and cmd[i].startswith('-'):
+    i += 1 if '=' in cmd[i] else 2
+  if i < len(cmd):
+    return '%s:%s' % (program, cmd[i])
+  return program
+
+
+def GetSamples():
+  """Returns samples of the throttling of each API since the last call.
+
+  Only APIs whose calls were retried, throttled or delayed have samples.
+  """
+  samples = []
+  with _limiters_lock:
+    limiters = list(_limiters.values())
+  for limiter in limiters:
+    stats = limiter.PopStats()
+    if not (stats['retries'] or stats['throttling_errors'] or
+            stats['retry_budget_exhausted'] or stats['wait_time']):
+      continue
+    metadata = {'api': limiter.api,
+                'api_calls': stats['calls'],
+                'retry_budget_exhausted': stats['retry_budget_exhausted']}
+    samples.extend([
+        sample.Sample('API Rate Limit Wait Time', stats['wait_time'],
+                      'seconds', dict(metadata)),
+        sample.Sample('API Retries', stats['retries'], 'count',
+                      dict(metadata)),
+        sample.Sample('API Throttling Errors', stats['throttling_errors'],
+                      'count', dict(metadata))])
+  return samples
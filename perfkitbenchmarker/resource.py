@@ -23,6 +23,7 @@ import abc
 import time
 
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import rate_limiter
 from perfkitbenchmarker import vm_util
 
 
@@ -85,6 +86,18 @@ class BaseResource(object):
     """
     return True
 
+  def GetResourceDependencies(self):
+    """Returns the objects that must be created before this resource.
+
+    Used by BenchmarkSpec to create independent resources concurrently and to
+    delete resources in the reverse order. Dependencies that are not managed
+    by the BenchmarkSpec are ignored.
+
+    Returns:
+      A list of resources or networks.
+    """
+    return []
+
   def _PostCreate(self):
     """Method that will be called once after _CreateReource is called.
 
@@ -110,6 +123,11 @@ class BaseResource(object):
     """
     pass
 
+  def _CheckExists(self):
+    """Returns _Exists(), issuing its commands within the API rate limits."""
+    with rate_limiter.LimitingCommands():
+      return self._Exists()
+
   @vm_util.Retry(retryable_exceptions=(errors.Resource.RetryableCreationError,))
   def _CreateResource(self):
     """Reliably creates the underlying resource."""
@@ -119,7 +137,7 @@ class BaseResource(object):
       self.create_start_time = time.time()
     self._Create()
     try:
-      if not self._Exists():
+      if not self._CheckExists():
         raise errors.Resource.RetryableCreationError(
             'Creation of %s failed.' % type(self).__name__)
     except NotImplementedError:
@@ -135,7 +153,7 @@ class BaseResource(object):
       self.delete_start_time = time.time()
     self._Delete()
     try:
-      if self._Exists():
+      if self._CheckExists():
         raise errors.Resource.RetryableDeletionError(
             'Deletion of %s failed.' % type(self).__name__)
     except NotImplementedError:
@@ -148,11 +166,17 @@ class BaseResource(object):
 
     # A more general solution would allow the retry interval to be set as a
     # property of the class.  We don't currently need that.
-    @vm_util.Retry(poll_interval=5, fuzz=0,
+    # Readiness is polled with exponential backoff and jitter, so that the
+    # many resources created at once do not poll their API in lockstep.
+    @vm_util.Retry(poll_interval=2, max_poll_interval=15,
                    retryable_exceptions=(
                        errors.Resource.RetryableCreationError,))
     def WaitUntilReady():
-      if not self._IsReady():
+      # Readiness checks are polled often, so they share the rate limits of
+      # the cloud APIs with the other calls.
+      with rate_limiter.LimitingCommands():
+        ready = self._IsReady()
+      if not ready:
         raise errors.Resource.RetryableCreationError('Not yet ready')
 
     if self.user_managed:
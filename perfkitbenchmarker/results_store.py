@@ -0,0 +1,508 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""An indexed SQLite store of published samples, and a CLI to query it.
+
+Samples are stored one per row of the 'samples' table, with their metadata as
+a JSON object. The values of selected metadata keys (see
+ResultsStore.AddIndexedMetadataKeys) are also stored in the 'metadata' table,
+so that samples can be filtered and grouped by them with indexes. Samples are
+indexed by test, metric, run_uri and timestamp, which keeps lookups fast in
+stores holding years of results.
+
+The store can be written by publisher.SQLitePublisher (--sqlite_path) or
+filled from the newline-delimited JSON files written by
+publisher.NewlineDelimitedJSONPublisher, and queried from Python:
+
+  store = results_store.ResultsStore('results.db')
+  store.Query(test='iperf', metric='Throughput', metadata={'cloud': 'GCP'})
+  store.Aggregate(['metadata.machine_type'], test='iperf',
+                  metric='Throughput', start_time=time.time() - 86400 * 30)
+
+or from the command line:
+
+  python -m perfkitbenchmarker.results_store --db results.db \\
+      import perfkitbenchmarker_results.json
+  python -m perfkitbenchmarker.results_store --db results.db \\
+      query --test iperf --metadata cloud=GCP --since 2017-01-01
+  python -m perfkitbenchmarker.results_store --db results.db \\
+      aggregate --group_by test,metric,metadata.cloud --test iperf
+"""
+
+import argparse
+import calendar
+import json
+import math
+import sqlite3
+import sys
+import time
+
+# Metadata keys indexed in new stores.
+DEFAULT_INDEXED_METADATA_KEYS = ('cloud', 'machine_type', 'zone')
+
+# Columns of the samples table, other than the row id and metadata.
+SAMPLE_COLUMNS = ('sample_uri', 'run_uri', 'test', 'metric', 'value', 'unit',
+                  'timestamp', 'official', 'owner', 'product_name')
+
+# Aggregates computed for each group by ResultsStore.Aggregate.
+AGGREGATES = ('count', 'mean', 'stddev', 'min', 'max')
+
+_METADATA_PREFIX = 'metadata.'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+  id INTEGER PRIMARY KEY,
+  sample_uri TEXT UNIQUE,
+  run_uri TEXT,
+  test TEXT,
+  metric TEXT,
+  value REAL,
+  unit TEXT,
+  timestamp REAL,
+  official INTEGER,
+  owner TEXT,
+  product_name TEXT,
+  metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS samples_test_metric_timestamp
+  ON samples (test, metric, timestamp);
+CREATE INDEX IF NOT EXISTS samples_run_uri ON samples (run_uri);
+CREATE INDEX IF NOT EXISTS samples_timestamp ON samples (timestamp);
+CREATE TABLE IF NOT EXISTS metadata (
+  sample_id INTEGER NOT NULL REFERENCES samples (id),
+  key TEXT NOT NULL,
+  value TEXT,
+  PRIMARY KEY (sample_id, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metadata_key_value
+  ON metadata (key, value, sample_id);
+CREATE TABLE IF NOT EXISTS indexed_metadata_keys (
+  key TEXT PRIMARY KEY
+);
+"""
+
+
+def _MetadataText(value):
+  """Returns the text stored and matched for a metadata value.
+
+  Values are converted the way publisher.GetLabelsFromDict converts them, so
+  that samples published directly and imported from collapsed labels match
+  the same filters.
+  """
+  if isinstance(value, unicode):
+    return value
+  return str(value).decode('utf-8', 'replace')
+
+
+def _SplitLabels(labels):
+  """Parses labels in the '|key:value|,|key:value|' form into a dict."""
+  result = {}
+  if not labels:
+    return result
+  for item in labels[1:-1].split('|,|'):
+    key, _, value = item.partition(':')
+    result[key] = value
+  return result
+
+
+def _AsList(value):
+  if value is None or isinstance(value, (list, tuple, set)):
+    return value
+  return [value]
+
+
+class _StdDevAggregate(object):
+  """SQLite aggregate of the population standard deviation of values.
+
+  Uses Welford's online algorithm, which unlike sqrt(E[x^2] - E[x]^2) does
+  not lose the variance of large values with a small spread to rounding.
+  """
+
+  def __init__(self):
+    self._count = 0
+    self._mean = 0.0
+    self._m2 = 0.0
+
+  def step(self, value):
+    if value is None:
+      return
+    self._count += 1
+    delta = value - self._mean
+    self._mean += delta / self._count
+    self._m2 += delta * (value - self._mean)
+
+  def finalize(self):
+    if not self._count:
+      return None
+    return math.sqrt(self._m2 / self._count)
+
+
+class ResultsStore(object):
+  """An indexed SQLite store of samples.
+
+  Attributes:
+    path: string. Path of the SQLite database, or ':memory:'.
+  """
+
+  def __init__(self, path, indexed_metadata_keys=DEFAULT_INDEXED_METADATA_KEYS):
+    """Opens the store at 'path', creating it if it does not exist.
+
+    Args:
+      path: string. Path of the SQLite database.
+      indexed_metadata_keys: iterable of strings. Metadata keys to index in
+          addition to those the store already indexes.
+    """
+    self.path = path
+    self._conn = sqlite3.connect(path)
+    self._conn.row_factory = sqlite3.Row
+    self._conn.create_aggregate('pkb_stddev', 1, _StdDevAggregate)
+    if path != ':memory:':
+      self._conn.execute('PRAGMA journal_mode=WAL')
+    self._conn.execute('PRAGMA synchronous=NORMAL')
+    with self._conn:
+      self._conn.executescript(_SCHEMA)
+    self.AddIndexedMetadataKeys(indexed_metadata_keys)
+
+  def Close(self):
+    self._conn.close()
+
+  def GetIndexedMetadataKeys(self):
+    """Returns the set of indexed metadata keys."""
+    return {row['key'] for row in
+            self._conn.execute('SELECT key FROM indexed_metadata_keys')}
+
+  def AddIndexedMetadataKeys(self, keys):
+    """Indexes metadata keys, including in the samples already stored."""
+    new_keys = set(keys) - self.GetIndexedMetadataKeys()
+    if not new_keys:
+      return
+    with self._conn:
+      self._conn.executemany('INSERT INTO indexed_metadata_keys VALUES (?)',
+                             [(key,) for key in new_keys])
+      rows = []
+      samples = self._conn.execute('SELECT id, metadata FROM samples')
+      for sample_id, metadata in samples:
+        metadata = json.loads(metadata)
+        rows.extend((sample_id, key, _MetadataText(metadata[key]))
+                    for key in new_keys if key in metadata)
+      self._conn.executemany('INSERT INTO metadata VALUES (?, ?, ?)', rows)
+
+  def AddSamples(self, samples):
+    """Adds samples to the store.
+
+    Samples whose sample_uri is already in the store are skipped, so the same
+    results can be imported more than once.
+
+    Args:
+      samples: iterable of sample dicts, as given to publishers. Their
+          metadata is either a 'metadata' dict or collapsed 'labels'.
+
+    Returns:
+      The number of samples added.
+    """
+    indexed_keys = self.GetIndexedMetadataKeys()
+    insert_sample = (
+        'INSERT OR IGNORE INTO samples (%s, metadata) VALUES (%s)' %
+        (', '.join(SAMPLE_COLUMNS), ', '.join('?' * (len(SAMPLE_COLUMNS) + 1))))
+    added = 0
+    # The samples of a run usually share their labels, whose metadata is
+    # then only parsed and encoded once.
+    last_labels, last_metadata = None, ({}, '{}')
+    with self._conn:
+      cursor = self._conn.cursor()
+      for sample in samples:
+        metadata = sample.get('metadata')
+        if metadata is not None:
+          metadata_json = json.dumps(metadata)
+        elif sample.get('labels') == last_labels:
+          metadata, metadata_json = last_metadata
+        else:
+          last_labels = sample.get('labels')
+          metadata = _SplitLabels(last_labels)
+          metadata_json = json.dumps(metadata)
+          last_metadata = metadata, metadata_json
+        values = [sample.get(column) for column in SAMPLE_COLUMNS]
+        values.append(metadata_json)
+        cursor.execute(insert_sample, values)
+        if not cursor.rowcount:
+          continue
+        added += 1
+        sample_id = cursor.lastrowid
+        cursor.executemany(
+            'INSERT INTO metadata VALUES (?, ?, ?)',
+            [(sample_id, key, _MetadataText(metadata[key]))
+             for key in indexed_keys if key in metadata])
+    return added
+
+  def ImportJSONFile(self, path):
+    """Adds the samples of a newline-delimited JSON results file.
+
+    Returns:
+      The number of samples added.
+    """
+    with open(path) as json_file:
+      return self.AddSamples(json.loads(line) for line in json_file
+                             if line.strip())
+
+  def _Where(self, test, metric, run_uri, start_time, end_time, metadata):
+    """Returns the WHERE clause and its parameters selecting samples.
+
+    Returns:
+      (clause, params, unindexed_metadata) tuple. 'unindexed_metadata' holds
+      the metadata filters that the clause does not apply.
+    """
+    conditions = []
+    params = []
+    for column, values in (('test', test), ('metric', metric),
+                           ('run_uri', run_uri)):
+      values = _AsList(values)
+      if values is not None:
+        conditions.append('s.%s IN (%s)' %
+                          (column, ', '.join('?' * len(values))))
+        params.extend(values)
+    if start_time is not None:
+      conditions.append('s.timestamp >= ?')
+      params.append(start_time)
+    if end_time is not None:
+      conditions.append('s.timestamp < ?')
+      params.append(end_time)
+    unindexed_metadata = {}
+    indexed_keys = self.GetIndexedMetadataKeys()
+    for key, values in sorted((metadata or {}).iteritems()):
+      values = _AsList(values)
+      if key not in indexed_keys:
+        unindexed_metadata[key] = {_MetadataText(v) for v in values}
+        continue
+      conditions.append(
+          's.id IN (SELECT sample_id FROM metadata WHERE key = ? AND '
+          'value IN (%s))' % ', '.join('?' * len(values)))
+      params.append(key)
+      params.extend(_MetadataText(v) for v in values)
+    clause = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    return clause, params, unindexed_metadata
+
+  def Query(self, test=None, metric=None, run_uri=None, start_time=None,
+            end_time=None, metadata=None, limit=None):
+    """Returns the samples matching all the given filters.
+
+    Args:
+      test: string, list of strings or None. Names of the benchmarks.
+      metric: string, list of strings or None. Names of the metrics.
+      run_uri: string, list of strings or None. Run URIs.
+      start_time: float or None. Minimum timestamp in seconds since the epoch.
+      end_time: float or None. Timestamp before which samples were published.
+      metadata: dict or None. Maps metadata keys to a value or list of values
+          they must match, compared as text. Keys that are not indexed are
+          matched after the other filters are applied.
+      limit: int or None. Maximum number of samples returned.
+
+    Returns:
+      List of sample dicts, ordered by timestamp, with 'metadata' dicts.
+    """
+    where, params, unindexed_metadata = self._Where(
+        test, metric, run_uri, start_time, end_time, metadata)
+    query = 'SELECT * FROM samples s%s ORDER BY s.timestamp, s.id' % where
+    if limit is not None and not unindexed_metadata:
+      query += ' LIMIT %d' % limit
+    samples = []
+    for row in self._conn.execute(query, params):
+      sample = {column: row[column] for column in SAMPLE_COLUMNS}
+      sample['metadata'] = json.loads(row['metadata'])
+      if any(_MetadataText(sample['metadata'].get(key)) not in values
+             for key, values in unindexed_metadata.iteritems()):
+        continue
+      samples.append(sample)
+      if limit is not None and len(samples) == limit:
+        break
+    return samples
+
+  def Aggregate(self, group_by, test=None, metric=None, run_uri=None,
+                start_time=None, end_time=None, metadata=None):
+    """Summarizes the values of the samples matching the filters.
+
+    Args:
+      group_by: list of strings. Sample columns (see SAMPLE_COLUMNS) and
+          indexed metadata keys prefixed with 'metadata.' to group samples by.
+      test, metric, run_uri, start_time, end_time, metadata: Filters, as for
+          Query. Metadata keys must be indexed.
+
+    Returns:
+      List of dicts, one per group ordered by group, mapping each 'group_by'
+      key to its value and each of AGGREGATES to the aggregate of the values.
+
+    Raises:
+      ValueError: if a group or metadata filter is not a column or an indexed
+          metadata key.
+    """
+    where, params, unindexed_metadata = self._Where(
+        test, metric, run_uri, start_time, end_time, metadata)
+    if unindexed_metadata:
+      raise ValueError('Cannot aggregate samples filtered by metadata keys '
+                       'that are not indexed: %s' %
+                       ', '.join(sorted(unindexed_metadata)))
+    indexed_keys = self.GetIndexedMetadataKeys()
+    joins = []
+    join_params = []
+    group_columns = []
+    for i, key in enumerate(group_by):
+      if key in SAMPLE_COLUMNS:
+        group_columns.append('s.%s' % key)
+      elif (key.startswith(_METADATA_PREFIX) and
+            key[len(_METADATA_PREFIX):] in indexed_keys):
+        joins.append(' LEFT JOIN metadata m%d ON m%d.sample_id = s.id AND '
+                     'm%d.key = ?' % (i, i, i))
+        join_params.append(key[len(_METADATA_PREFIX):])
+        group_columns.append('m%d.value' % i)
+      else:
+        indexed_groups = [_METADATA_PREFIX + k for k in sorted(indexed_keys)]
+        raise ValueError('Cannot group samples by %s. Group by one of %s or '
+                         'an indexed metadata key: %s.' %
+                         (key, ', '.join(SAMPLE_COLUMNS),
+                          ', '.join(indexed_groups)))
+    columns = group_columns + [
+        'COUNT(s.value)', 'AVG(s.value)', 'pkb_stddev(s.value)',
+        'MIN(s.value)', 'MAX(s.value)']
+    query = 'SELECT %s FROM samples s%s%s' % (', '.join(columns),
+                                              ''.join(joins), where)
+    if group_columns:
+      query += ' GROUP BY %s ORDER BY %s' % ((', '.join(group_columns),) * 2)
+    results = []
+    for row in self._conn.execute(query, join_params + params):
+      row = tuple(row)
+      result = dict(zip(group_by, row))
+      count, mean, stddev, minimum, maximum = row[len(group_by):]
+      if not count:
+        continue
+      result.update(count=count, mean=mean, stddev=stddev, min=minimum,
+                    max=maximum)
+      results.append(result)
+    return results
+
+
+def _ParseTime(value):
+  """Parses seconds since the epoch or a UTC 'YYYY-MM-DD[ HH:MM[:SS]]' date."""
+  try:
+    return float(value)
+  except ValueError:
+    pass
+  for time_format in ('%Y-%m-%d', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S'):
+    try:
+      return calendar.timegm(time.strptime(value, time_format))
+    except ValueError:
+      pass
+  raise argparse.ArgumentTypeError(
+      'Expected seconds since the epoch or YYYY-MM-DD[ HH:MM[:SS]]: %r' % value)
+
+
+def _ParseMetadata(parser, pairs):
+  """Parses KEY=VALUE pairs into a dict of lists of values.
+
+  Exits through parser.error if a pair has no '='.
+  """
+  metadata = {}
+  for pair in pairs or []:
+    key, sep, value = pair.partition('=')
+    if not sep:
+      parser.error('--metadata: expected KEY=VALUE: %r' % pair)
+    metadata.setdefault(key, []).append(value)
+  return metadata
+
+
+def _PrintTable(rows, columns, out):
+  out.write('\t'.join(columns) + '\n')
+  for row in rows:
+    out.write('\t'.join(unicode(row[column]).encode('utf-8')
+                        for column in columns) + '\n')
+
+
+def _AddFilterArguments(parser):
+  parser.add_argument('--test', action='append',
+                      help='Benchmark name. May be repeated.')
+  parser.add_argument('--metric', action='append',
+                      help='Metric name. May be repeated.')
+  parser.add_argument('--run_uri', action='append',
+                      help='Run URI. May be repeated.')
+  parser.add_argument('--since', type=_ParseTime, dest='start_time',
+                      help='Earliest sample time, in seconds since the epoch '
+                      'or as a UTC YYYY-MM-DD[ HH:MM[:SS]] date.')
+  parser.add_argument('--until', type=_ParseTime, dest='end_time',
+                      help='Time before which samples were published.')
+  parser.add_argument('--metadata', action='append', metavar='KEY=VALUE',
+                      help='Metadata value to match. May be repeated; values '
+                      'of the same key are alternatives.')
+
+
+def main(argv=None, out=sys.stdout):
+  parser = argparse.ArgumentParser(
+      description='Imports and queries an indexed store of PerfKitBenchmarker '
+      'results.')
+  parser.add_argument('--db', required=True,
+                      help='Path of the SQLite results store.')
+  parser.add_argument('--index_metadata', default=[],
+                      type=lambda value: value.split(','),
+                      help='Comma separated metadata keys to index, in '
+                      'addition to those already indexed.')
+  subparsers = parser.add_subparsers(dest='command')
+  import_parser = subparsers.add_parser(
+      'import', help='Imports newline-delimited JSON results files.')
+  import_parser.add_argument('paths', nargs='+')
+  query_parser = subparsers.add_parser(
+      'query', help='Prints the samples matching filters.')
+  _AddFilterArguments(query_parser)
+  query_parser.add_argument('--limit', type=int)
+  query_parser.add_argument('--format', choices=('table', 'json'),
+                            default='table',
+                            help='Tab separated columns, or one JSON sample '
+                            'per line.')
+  aggregate_parser = subparsers.add_parser(
+      'aggregate', help='Prints the count, mean, standard deviation, minimum '
+      'and maximum of the values of samples matching filters.')
+  _AddFilterArguments(aggregate_parser)
+  aggregate_parser.add_argument(
+      '--group_by', default=['test', 'metric', 'unit'],
+      type=lambda value: value.split(','),
+      help='Comma separated columns and indexed metadata keys prefixed with '
+      '"metadata." to group samples by.')
+  args = parser.parse_args(argv)
+
+  store = ResultsStore(args.db, args.index_metadata)
+  try:
+    if args.command == 'import':
+      for path in args.paths:
+        added = store.ImportJSONFile(path)
+        out.write('Imported %d samples from %s\n' % (added, path))
+      return 0
+    filters = dict(test=args.test, metric=args.metric, run_uri=args.run_uri,
+                   start_time=args.start_time, end_time=args.end_time,
+                   metadata=_ParseMetadata(parser, args.metadata))
+    if args.command == 'query':
+      samples = store.Query(limit=args.limit, **filters)
+      if args.format == 'json':
+        for sample in samples:
+          out.write(json.dumps(sample, sort_keys=True) + '\n')
+      else:
+        _PrintTable(samples, ('timestamp', 'run_uri', 'test', 'metric', 'value',
+                              'unit'), out)
+    else:
+      try:
+        results = store.Aggregate(args.group_by, **filters)
+      except ValueError as e:
+        parser.error(str(e))
+      _PrintTable(results, list(args.group_by) + list(AGGREGATES), out)
+  finally:
+    store.Close()
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -13,18 +13,35 @@
 # limitations under the License.
 """A performance sample class."""
 
+import base64
 import collections
+import math
+import struct
 import time
-PERCENTILES_LIST = [0.1, 1, 5, 10, 50, 90, 95, 99, 99.9]
+import zlib
 
-_SAMPLE_FIELDS = 'metric', 'value', 'unit', 'metadata', 'timestamp'
+import numpy as np
+
+from perfkitbenchmarker import stats_util
+
+PERCENTILES_LIST = list(stats_util.PERCENTILES_LIST)
+
+_SAMPLE_FIELDS = ('metric', 'value', 'unit', 'metadata', 'timestamp',
+                  'histogram')
+
+# Version, significant figures, resolution, min, max, sum, index of the first
+# encoded bucket and number of encoded buckets. Followed by the zlib
+# compressed little-endian int64 bucket counts.
+_HISTOGRAM_HEADER = struct.Struct('<BBddddqq')
+_HISTOGRAM_VERSION = 1
 
 
 def PercentileCalculator(numbers, percentiles=PERCENTILES_LIST):
   """Computes percentiles, stddev and mean on a set of numbers.
 
   Args:
-    numbers: A sequence of numbers to compute percentiles for.
+    numbers: A sequence (or numpy array or pandas Series) of numbers to
+      compute percentiles for.
     percentiles: If given, a list of percentiles to compute. Can be
       floats, ints or longs.
 
@@ -37,31 +54,273 @@ def PercentileCalculator(numbers, percentiles=PERCENTILES_LIST):
 
   """
 
-  if not len(numbers):  # 'if not numbers' will fail if numbers is a pd.Series.
-    raise ValueError("Can't compute percentiles of empty list.")
+  return stats_util.Summarize(numbers, percentiles)
+
+
+class Histogram(object):
+  """A mergeable histogram of non-negative values with log-linear buckets.
+
+  Like an HdrHistogram, values are counted exactly up to a limit that depends
+  on significant_figures. Above it, buckets double in width with every power
+  of two so that a value is never off by more than one part in
+  10 ** significant_figures. The counts are kept in a numpy array indexed by
+  bucket, so merging two histograms is a single array addition regardless of
+  how many values they were built from, and no precision is lost by merging.
+
+  Values are counted in multiples of resolution, e.g. a resolution of 0.001
+  for latencies in milliseconds keeps microsecond precision.
+
+  Attributes:
+    significant_figures: int. Decimal digits of precision of the buckets.
+    resolution: float. Smallest difference between values that is counted.
+    count: int. Total number of values added.
+    min: float. Smallest value added.
+    max: float. Largest value added.
+    sum: float. Sum of all values added.
+  """
+
+  def __init__(self, significant_figures=3, resolution=1.0):
+    if significant_figures not in range(1, 6):
+      raise ValueError('significant_figures must be between 1 and 5, got '
+                       '{0}'.format(significant_figures))
+    if resolution <= 0:
+      raise ValueError('resolution must be positive, got {0}'.format(
+          resolution))
+    self.significant_figures = significant_figures
+    self.resolution = float(resolution)
+    # Values below _sub_bucket_count have a bucket of their own. Above it,
+    # each power of two is split into _sub_bucket_count / 2 buckets.
+    self._sub_bucket_magnitude = int(
+        math.ceil(math.log(2 * 10 ** significant_figures, 2)))
+    self._sub_bucket_count = 2 ** self._sub_bucket_magnitude
+    self._counts = np.zeros(0, dtype=np.int64)
+    self.min = float('inf')
+    self.max = float('-inf')
+    self.sum = 0.0
+
+  @classmethod
+  def FromDict(cls, histogram, **kwargs):
+    """Creates a Histogram from a dict mapping values to their counts.
+
+    Args:
+      histogram: dict mapping value to the number of times it occurred.
+      **kwargs: Passed to the Histogram constructor.
+
+    Returns:
+      Histogram.
+    """
+    result = cls(**kwargs)
+    if histogram:
+      values, counts = zip(*histogram.items())
+      result.Add(values, counts)
+    return result
+
+  @property
+  def count(self):
+    return int(self._counts.sum())
+
+  def _Indices(self, values):
+    """Returns the bucket index of each value in a numpy array."""
+    units = np.floor(values / self.resolution).astype(np.int64)
+    indices = units.copy()
+    large = units >= self._sub_bucket_count
+    if large.any():
+      # frexp returns exponents such that 2 ** (exponent - 1) <= value.
+      magnitudes = np.frexp(units[large].astype(float))[1] - 1
+      shifts = magnitudes - self._sub_bucket_magnitude + 1
+      half = self._sub_bucket_count // 2
+      indices[large] = (self._sub_bucket_count + (shifts - 1) * half +
+                        (units[large] >> shifts) - half)
+    return indices
+
+  def _BucketValues(self, indices):
+    """Returns the value that represents each bucket index."""
+    indices = np.asarray(indices, dtype=np.int64)
+    lowest = indices.astype(float)
+    large = indices >= self._sub_bucket_count
+    if large.any():
+      half = self._sub_bucket_count // 2
+      offsets = indices[large] - self._sub_bucket_count
+      shifts = offsets // half + 1
+      widths = 2.0 ** shifts
+      lowest[large] = ((offsets % half + half) * widths +
+                       (widths - 1) / 2.0)
+    return lowest * self.resolution
+
+  def Add(self, values, counts=None):
+    """Adds values to the histogram.
 
-  numbers_sorted = sorted(numbers)
-  count = len(numbers_sorted)
-  total = sum(numbers_sorted)
-  result = {}
-  for percentile in percentiles:
-    if percentile < 0.0 or percentile > 100.0:
-      raise ValueError('Invalid percentile %s' % percentile)
+    Args:
+      values: A number, or a sequence or numpy array of numbers.
+      counts: None to add each value once, or the number of times to add
+          each of the values.
 
-    percentile_string = 'p%s' % str(percentile)
-    index = int(count * float(percentile) / 100.0)
-    index = min(index, count - 1)  # Correction to handle 100th percentile.
-    result[percentile_string] = numbers_sorted[index]
+    Raises:
+      ValueError: if a value is negative.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    if counts is None:
+      counts = np.ones(values.size, dtype=np.int64)
+    else:
+      counts = np.asarray(counts, dtype=np.int64).ravel()
+      values = values[counts != 0]
+      counts = counts[counts != 0]
+    if not values.size:
+      return
+    if values.min() < 0:
+      raise ValueError('Histogram values must not be negative.')
+    indices = self._Indices(values)
+    self._Grow(int(indices.max()) + 1)
+    self._counts += np.bincount(indices, weights=counts,
+                                minlength=self._counts.size).astype(np.int64)
+    self.min = min(self.min, float(values.min()))
+    self.max = max(self.max, float(values.max()))
+    self.sum += float(np.dot(values, counts))
 
-  average = total / float(count)
-  result['average'] = average
-  if count > 1:
-    total_of_squares = sum([(i - average) ** 2 for i in numbers])
-    result['stddev'] = (total_of_squares / (count - 1)) ** 0.5
-  else:
-    result['stddev'] = 0
+  def _Grow(self, size):
+    if size > self._counts.size:
+      self._counts = np.concatenate(
+          (self._counts, np.zeros(size - self._counts.size, dtype=np.int64)))
 
-  return result
+  def _CheckCompatible(self, other):
+    if (other.significant_figures != self.significant_figures or
+        other.resolution != self.resolution):
+      raise ValueError(
+          'Cannot combine histograms with different buckets: {0} and '
+          '{1}'.format(self, other))
+
+  def Merge(self, other):
+    """Adds the counts of another Histogram with the same buckets to this one.
+
+    Raises:
+      ValueError: if the histograms' significant figures or resolutions
+        differ.
+    """
+    self._CheckCompatible(other)
+    self._Grow(other._counts.size)
+    self._counts[:other._counts.size] += other._counts
+    self.min = min(self.min, other.min)
+    self.max = max(self.max, other.max)
+    self.sum += other.sum
+
+  @classmethod
+  def Combine(cls, histograms):
+    """Returns a new Histogram with the counts of several histograms.
+
+    The counts are summed in a single vectorized pass, which is cheaper than
+    merging the histograms one at a time.
+
+    Args:
+      histograms: Non-empty iterable of Histograms with the same buckets.
+
+    Raises:
+      ValueError: if there are no histograms or their buckets differ.
+    """
+    histograms = list(histograms)
+    if not histograms:
+      raise ValueError('No histograms to combine.')
+    result = cls(histograms[0].significant_figures, histograms[0].resolution)
+    counts = np.zeros((len(histograms),
+                       max(h._counts.size for h in histograms)),
+                      dtype=np.int64)
+    for i, histogram in enumerate(histograms):
+      result._CheckCompatible(histogram)
+      counts[i, :histogram._counts.size] = histogram._counts
+    result._counts = counts.sum(axis=0)
+    result.min = min(h.min for h in histograms)
+    result.max = max(h.max for h in histograms)
+    result.sum = math.fsum(h.sum for h in histograms)
+    return result
+
+  def Buckets(self):
+    """Returns numpy arrays of the values and counts of non-empty buckets."""
+    indices = np.flatnonzero(self._counts)
+    return self._BucketValues(indices), self._counts[indices]
+
+  def ToDict(self):
+    """Returns a dict mapping each non-empty bucket's value to its count."""
+    values, counts = self.Buckets()
+    return dict(zip(values.tolist(), counts.tolist()))
+
+  def Percentiles(self, percentiles=PERCENTILES_LIST):
+    """Returns a list with the value at each of the percentiles.
+
+    Raises:
+      ValueError: if the histogram is empty or a percentile is invalid.
+    """
+    values, counts = self.Buckets()
+    if not values.size:
+      raise ValueError("Can't compute percentiles of empty histogram.")
+    values = stats_util.WeightedPercentiles(values, counts, percentiles)
+    return [min(max(value, self.min), self.max) for value in values]
+
+  def Summarize(self, percentiles=PERCENTILES_LIST):
+    """Returns a dict with the same keys as PercentileCalculator."""
+    result = dict(zip((stats_util.PercentileLabel(p) for p in percentiles),
+                      self.Percentiles(percentiles)))
+    stats = stats_util.SummarizeHistogram(zip(*self.Buckets()), ())
+    result['average'] = self.sum / self.count
+    result['stddev'] = stats['stddev']
+    return result
+
+  def Encode(self):
+    """Returns the histogram as a compact base64 string.
+
+    Only the buckets from the first to the last non-empty one are encoded.
+    """
+    indices = np.flatnonzero(self._counts)
+    first = int(indices[0]) if indices.size else 0
+    last = int(indices[-1]) + 1 if indices.size else 0
+    header = _HISTOGRAM_HEADER.pack(
+        _HISTOGRAM_VERSION, self.significant_figures, self.resolution,
+        self.min, self.max, self.sum, first, last - first)
+    counts = self._counts[first:last].astype('<i8').tostring()
+    return base64.b64encode(header + zlib.compress(counts))
+
+  @classmethod
+  def Decode(cls, encoded):
+    """Creates a Histogram from the output of Encode.
+
+    Raises:
+      ValueError: if encoded is not an encoded histogram.
+    """
+    try:
+      data = base64.b64decode(encoded)
+      (version, significant_figures, resolution, minimum, maximum, total,
+       first, size) = _HISTOGRAM_HEADER.unpack_from(data)
+      counts = np.frombuffer(
+          zlib.decompress(data[_HISTOGRAM_HEADER.size:]), dtype='<i8')
+    except (TypeError, struct.error, zlib.error) as e:
+      raise ValueError('Invalid encoded histogram: {0}'.format(e))
+    if version != _HISTOGRAM_VERSION or counts.size != size:
+      raise ValueError('Invalid encoded histogram.')
+    result = cls(significant_figures, resolution)
+    result._Grow(first + size)
+    result._counts[first:] = counts
+    result.min, result.max, result.sum = minimum, maximum, total
+    return result
+
+  def __eq__(self, other):
+    if not isinstance(other, Histogram):
+      return NotImplemented
+    size = max(self._counts.size, other._counts.size)
+    return (self.significant_figures == other.significant_figures and
+            self.resolution == other.resolution and
+            self.min == other.min and self.max == other.max and
+            self.sum == other.sum and
+            np.array_equal(np.pad(self._counts, (0, size - self._counts.size),
+                                  'constant'),
+                           np.pad(other._counts,
+                                  (0, size - other._counts.size), 'constant')))
+
+  def __ne__(self, other):
+    result = self.__eq__(other)
+    return result if result is NotImplemented else not result
+
+  def __repr__(self):
+    return ('<{0} significant_figures={1} resolution={2} count={3}>'.format(
+        type(self).__name__, self.significant_figures, self.resolution,
+        self.count))
 
 
 class Sample(collections.namedtuple('Sample', _SAMPLE_FIELDS)):
@@ -73,18 +332,29 @@ class Sample(collections.namedtuple('Sample', _SAMPLE_FIELDS)):
     unit: string. Units for 'value'.
     metadata: dict. Additional metadata to include with the sample.
     timestamp: float. Unix timestamp.
+    histogram: Histogram or None. Distribution of the values summarized by
+        the sample, in units of 'unit'.
   """
 
   def __new__(cls, metric, value, unit, metadata=None, timestamp=None,
-              **kwargs):
+              histogram=None, **kwargs):
     if timestamp is None:
       timestamp = time.time()
 
     return super(Sample, cls).__new__(cls, metric, value, unit,
                                       metadata=metadata or {},
                                       timestamp=timestamp,
+                                      histogram=histogram,
                                       **kwargs)
 
   def asdict(self):
-    """Converts the Sample to a dictionary."""
-    return self._asdict()
+    """Converts the Sample to a dictionary.
+
+    The histogram is included as the string returned by Histogram.Encode, and
+    omitted if the sample has none.
+    """
+    result = self._asdict()
+    histogram = result.pop('histogram')
+    if histogram is not None:
+      result['histogram'] = histogram.Encode()
+    return result
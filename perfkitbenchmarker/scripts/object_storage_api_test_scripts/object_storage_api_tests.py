@@ -33,6 +33,7 @@ import string
 import random
 import time
 
+import numpy as np
 import yaml
 
 import gflags as flags
@@ -40,6 +41,14 @@ import gflags as flags
 import azure_flags  # noqa
 import s3_flags  # noqa
 
+try:
+  # On test VMs the modules are uploaded next to this script.
+  import stats_util
+  import stream_columns
+except ImportError:
+  from perfkitbenchmarker import stats_util
+  from perfkitbenchmarker import stream_columns
+
 FLAGS = flags.FLAGS
 
 flags.DEFINE_enum(
@@ -89,6 +98,12 @@ flags.DEFINE_string('objects_written_file', None, 'The path where the '
                     'MultiStreamWrite and this file exists, it will be '
                     'deleted.')
 
+flags.DEFINE_string('worker_output_file', None, 'If set, the MultiStreamRead '
+                    'and MultiStreamWrite scenarios write the records of '
+                    'their operations to this path as a gzip-compressed '
+                    'columns file (see stream_columns) instead of writing '
+                    'them to stdout as JSON.')
+
 flags.DEFINE_float('start_time', None, 'The time (as a POSIX timestamp) '
                    'to start the operation. Only applies to the '
                    'MultiStreamRead and MultiStreamWrite scenarios.')
@@ -235,29 +250,8 @@ def MaxSizeInDistribution(dist):
 # ### Utilities for data analysis ###
 
 def PercentileCalculator(numbers):
-  numbers_sorted = sorted(numbers)
-  count = len(numbers_sorted)
-  total = sum(numbers_sorted)
-  result = {}
-  result['p0.1'] = numbers_sorted[int(count * 0.001)]
-  result['p1'] = numbers_sorted[int(count * 0.01)]
-  result['p5'] = numbers_sorted[int(count * 0.05)]
-  result['p10'] = numbers_sorted[int(count * 0.1)]
-  result['p50'] = numbers_sorted[int(count * 0.5)]
-  result['p90'] = numbers_sorted[int(count * 0.9)]
-  result['p95'] = numbers_sorted[int(count * 0.95)]
-  result['p99'] = numbers_sorted[int(count * 0.99)]
-  result['p99.9'] = numbers_sorted[int(count * 0.999)]
-  if count > 0:
-    average = total / float(count)
-    result['average'] = average
-    if count > 1:
-      total_of_squares = sum([(i - average) ** 2 for i in numbers])
-      result['stddev'] = (total_of_squares / (count - 1)) ** 0.5
-    else:
-      result['stddev'] = 0
-
-  return result
+  """Computes percentiles, average and stddev of a list of numbers."""
+  return stats_util.Summarize(numbers)
 
 # ### Object naming schemes ###
 
@@ -614,6 +608,31 @@ def RunWorkerProcesses(worker, worker_args, per_process_args=None):
   return results
 
 
+def _StreamsFromResults(results):
+  """Returns the data we send back to the controller from worker results."""
+  result_keys = ('stream_num', 'start_times', 'latencies', 'sizes')
+  return [{k: result[k] for k in result_keys} for result in results]
+
+
+def _OutputStreams(streams):
+  """Outputs the operation records of all streams for the controller.
+
+  The records are written to FLAGS.worker_output_file in the columns format if
+  it is set and to sys.stdout as JSON otherwise.
+
+  Args:
+    streams: a list of dicts with the keys 'stream_num', 'start_times',
+      'latencies' and 'sizes', the last three of which are numpy arrays.
+  """
+  if FLAGS.worker_output_file is not None:
+    stream_columns.WriteStreamsFile(FLAGS.worker_output_file, streams,
+                                    compress=True)
+    return
+  json.dump([{k: v.tolist() if isinstance(v, np.ndarray) else v
+              for k, v in stream.iteritems()} for stream in streams],
+            sys.stdout, indent=0)
+
+
 def MultiStreamWrites(service):
   """Run multi-stream write benchmark.
 
@@ -633,7 +652,8 @@ def MultiStreamWrites(service):
    ...]
 
   Second, it writes records of the objects it wrote, along with timing
-  information, to sys.stdout. The format is
+  information, to FLAGS.worker_output_file in the columns format if it is
+  set, or else to sys.stdout. The format of the latter is
 
   [{"operation": "upload", "start_time": start_time_1,
     "latency": latency_1, "size": size_1, "stream_num": stream_num_1},
@@ -666,7 +686,8 @@ def MultiStreamWrites(service):
     try:
       object_records = []
       for result in results:
-        for name, size in zip(result['object_names'], result['sizes']):
+        for name, size in zip(result['object_names'],
+                              result['sizes'].tolist()):
           object_records.append([name, size])
       if os.path.exists(FLAGS.objects_written_file):
         os.remove(FLAGS.objects_written_file)
@@ -680,11 +701,7 @@ def MultiStreamWrites(service):
 
   logging.info('len(results) = %s', len(results))
 
-  # streams is the data we send back to the controller.
-  streams = []
-  for result in results:
-    result_keys = ('stream_num', 'start_times', 'latencies', 'sizes')
-    streams.append({k: result[k] for k in result_keys})
+  streams = _StreamsFromResults(results)
 
   num_writes = sum([len(stream['start_times']) for stream in streams])
   num_writes_requested = FLAGS.objects_per_stream * FLAGS.num_streams
@@ -694,7 +711,7 @@ def MultiStreamWrites(service):
         'Wrote %s objects out of %s requested (%s requred)' %
         (num_writes, num_writes_requested, min_writes_required))
 
-  json.dump(streams, sys.stdout, indent=0)
+  _OutputStreams(streams)
 
 
 def MultiStreamReads(service):
@@ -709,6 +726,7 @@ def MultiStreamReads(service):
   service, potentially using multiple threads.
 
   It doesn't directly return anything, but it writes its results to
+  FLAGS.worker_output_file in the columns format if it is set, or else to
   sys.stdout in the following format:
 
   [{"operation": "download", "start_time": start_time_1,
@@ -737,11 +755,7 @@ def MultiStreamReads(service):
        FLAGS.start_time),
       per_process_args=objects_by_worker)
 
-  # streams is the data we send back to the controller.
-  streams = []
-  for result in results:
-    result_keys = ('stream_num', 'start_times', 'latencies', 'sizes')
-    streams.append({k: result[k] for k in result_keys})
+  streams = _StreamsFromResults(results)
 
   num_reads = sum([len(stream['start_times']) for stream in streams])
   num_reads_requested = FLAGS.objects_per_stream * FLAGS.num_streams
@@ -751,7 +765,7 @@ def MultiStreamReads(service):
         'Read %s objects out of %s requested (%s requred)' %
         (num_reads, num_reads_requested, min_reads_required))
 
-  json.dump(streams, sys.stdout, indent=0)
+  _OutputStreams(streams)
 
 
 def SleepUntilTime(when):
@@ -825,10 +839,11 @@ def WriteWorker(service, payload,
 
   logging.info('Worker %s finished writing its objects' % worker_num)
 
+  # Arrays are much cheaper to pickle through the queue than lists.
   result_queue.put({'object_names': object_names,
-                    'start_times': start_times,
-                    'latencies': latencies,
-                    'sizes': sizes,
+                    'start_times': np.array(start_times, dtype=np.float64),
+                    'latencies': np.array(latencies, dtype=np.float64),
+                    'sizes': np.array(sizes, dtype=np.int64),
                     'stream_num': worker_num + FLAGS.stream_num_start})
 
 
@@ -854,9 +869,9 @@ def ReadWorker(service, start_time, object_records,
                    (worker_num, e, name))
 
 
-  result_queue.put({'start_times': start_times,
-                    'latencies': latencies,
-                    'sizes': sizes,
+  result_queue.put({'start_times': np.array(start_times, dtype=np.float64),
+                    'latencies': np.array(latencies, dtype=np.float64),
+                    'sizes': np.array(sizes, dtype=np.int64),
                     'stream_num': worker_num + FLAGS.stream_num_start})
 
 
@@ -22,6 +22,16 @@ Blocks until a command wrapped by "execute_command.py" completes, then mimics
 the wrapped command, copying the wrapped command's stdout/stderr to this
 process' stdout/stderr, and exiting with the wrapped command's status.
 
+With --follow, the output of the wrapped command is instead written to stdout
+as it is appended to the output files, starting at --stdout-offset and
+--stderr-offset, so that a reader can resume where an earlier invocation was
+interrupted. The output is framed as a sequence of records:
+
+  "O <length>\n" followed by <length> bytes of stdout,
+  "E <length>\n" followed by <length> bytes of stderr,
+  "X <status>\n" once the wrapped command has completed and all of its output
+  has been written.
+
 *Runs on the guest VM. Supports Python 2.6, 2.7, and 3.x.*
 """
 
@@ -35,6 +45,76 @@ import time
 
 WAIT_TIMEOUT_IN_SEC = 120.0
 WAIT_SLEEP_IN_SEC = 5.0
+FOLLOW_CHUNK_SIZE = 1 << 20
+# Exit status of --follow if the output files do not exist.
+FILES_MISSING_EXIT_CODE = 3
+
+
+def _WriteNewOutput(files, out):
+  """Writes records with the output appended to 'files' since the last call.
+
+  Args:
+    files: list of (record type, file object) tuples.
+    out: binary file object to write the records to.
+  """
+  for record_type, f in files:
+    while True:
+      data = f.read(FOLLOW_CHUNK_SIZE)
+      if not data:
+        break
+      out.write(('%s %d\n' % (record_type, len(data))).encode('ascii'))
+      out.write(data)
+  out.flush()
+
+
+def Follow(options):
+  """Writes the output of the wrapped command as records until it completes.
+
+  The output files may not have been created yet when the output is first
+  followed, but they exist when resuming at a non-zero offset.
+
+  Returns:
+    0 once the status record has been written, FILES_MISSING_EXIT_CODE if the
+    files do not exist.
+  """
+  out = getattr(sys.stdout, 'buffer', sys.stdout)
+  timeout = WAIT_TIMEOUT_IN_SEC
+  if options.stdout_offset or options.stderr_offset:
+    timeout = 0
+  start = time.time()
+  while not all(os.path.exists(f)
+                for f in (options.stdout, options.stderr, options.status)):
+    if time.time() >= timeout + start:
+      sys.stderr.write('ERROR: output files do not exist.\n')
+      return FILES_MISSING_EXIT_CODE
+    time.sleep(WAIT_SLEEP_IN_SEC)
+
+  with open(options.stdout, 'rb') as stdout:
+    with open(options.stderr, 'rb') as stderr:
+      with open(options.status, 'r') as status:
+        stdout.seek(options.stdout_offset)
+        stderr.seek(options.stderr_offset)
+        files = [('O', stdout), ('E', stderr)]
+        while True:
+          _WriteNewOutput(files, out)
+          try:
+            fcntl.lockf(status, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            break
+          except IOError:
+            # The wrapped command is still running.
+            time.sleep(options.poll_interval)
+        # Output written between the last copy and the exit of the command.
+        _WriteNewOutput(files, out)
+        return_code_str = status.read()
+
+  if return_code_str:
+    return_code = int(return_code_str)
+  else:
+    sys.stderr.write('WARNING: wrapper script interrupted.\n')
+    return_code = 1
+  out.write(('X %d\n' % return_code).encode('ascii'))
+  out.flush()
+  return 0
 
 
 def main():
@@ -48,6 +128,18 @@ def main():
                'Will block until a shared lock is acquired on FILE.')
   p.add_option('-d', '--delete', dest='delete', action='store_true',
                help='Delete stdout, stderr, and status files when finished.')
+  p.add_option('-f', '--follow', dest='follow', action='store_true',
+               help='Write the output of the command as records while it '
+               'runs, and its status as the last record.')
+  p.add_option('--stdout-offset', dest='stdout_offset', type='int', default=0,
+               help='With --follow, skip the first N bytes of stdout.',
+               metavar='N')
+  p.add_option('--stderr-offset', dest='stderr_offset', type='int', default=0,
+               help='With --follow, skip the first N bytes of stderr.',
+               metavar='N')
+  p.add_option('--poll-interval', dest='poll_interval', type='float',
+               default=1.0, metavar='SECONDS',
+               help='With --follow, how often to check for new output.')
   options, args = p.parse_args()
   if args:
     sys.stderr.write('Unexpected arguments: {0}\n'.format(args))
@@ -65,6 +157,9 @@ def main():
     sys.stderr.write(msg)
     return 1
 
+  if options.follow:
+    return Follow(options)
+
   start = time.time()
   return_code_str = None
   while (time.time() < WAIT_TIMEOUT_IN_SEC + start):
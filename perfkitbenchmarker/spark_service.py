@@ -180,6 +180,10 @@ class PkbSparkService(BaseSparkService):
     assert self.cluster_id is None
     self.vms = {}
 
+  def GetResourceDependencies(self):
+    """Returns the VMs that must be created before the cluster."""
+    return [vm for group_vms in self.vms.itervalues() for vm in group_vms]
+
   def _Create(self):
     """Create an Apache Spark cluster."""
 
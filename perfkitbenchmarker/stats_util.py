@@ -0,0 +1,352 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Percentiles and summary statistics of raw values, histograms and sketches.
+
+There are three ways to describe a distribution:
+
+  * Raw values: Percentiles/Summarize select the requested ranks with
+    numpy.partition, which is linear in the number of values instead of
+    sorting them.
+  * Weighted values, e.g. a histogram mapping a value to the number of times
+    it was seen: WeightedPercentiles/SummarizeHistogram.
+  * A QuantileSketch, which summarizes a stream of values in bounded memory
+    with a bounded relative error and can be merged with other sketches.
+
+Unless stated otherwise a percentile p of n values is the value with the
+0-based rank floor(n * p / 100) in sorted order ("nearest rank").
+
+This module only depends on numpy so that it can also be copied to VMs next to
+the scripts that run there.
+"""
+
+import math
+
+import numpy as np
+
+PERCENTILES_LIST = 0.1, 1, 5, 10, 50, 90, 95, 99, 99.9
+
+# Methods of choosing the value at a percentile of weighted values.
+# The value whose (0-based) rank is floor(total weight * p / 100).
+NEAREST_RANK = 'nearest_rank'
+# The first value whose cumulative weight is at least total weight * p / 100.
+CUMULATIVE_WEIGHT = 'cumulative_weight'
+
+
+def PercentileLabel(percentile):
+  """Returns the name of a percentile statistic, e.g. 'p99.9'."""
+  return 'p%s' % str(percentile)
+
+
+def _CheckPercentiles(percentiles):
+  """Returns the percentiles as floats.
+
+  Raises:
+    ValueError: if a percentile is not a number in [0, 100].
+  """
+  result = []
+  for percentile in percentiles:
+    p = float(percentile)
+    if p < 0.0 or p > 100.0:
+      raise ValueError('Invalid percentile %s' % percentile)
+    result.append(p)
+  return result
+
+
+def _NearestRanks(count, percentiles):
+  return [min(int(count * p / 100.0), count - 1)
+          for p in _CheckPercentiles(percentiles)]
+
+
+def Percentiles(values, percentiles=PERCENTILES_LIST, axis=None):
+  """Computes percentiles of raw values.
+
+  Args:
+    values: A non-empty sequence or numpy array of numbers.
+    percentiles: A sequence of percentiles in [0, 100].
+    axis: If given, the axis of a multi-dimensional array along which to
+        compute the percentiles, e.g. 0 for the percentiles of each column of
+        a matrix. By default the percentiles of all values are computed.
+
+  Returns:
+    A list with the value at each of the percentiles. If axis is given, each
+    element is a numpy array with one dimension fewer than values.
+
+  Raises:
+    ValueError: if values is empty or a percentile is invalid.
+  """
+  values = np.asarray(values)
+  if not values.size:
+    raise ValueError("Can't compute percentiles of empty list.")
+  if axis is None:
+    values = values.ravel()
+    axis = 0
+  ranks = _NearestRanks(values.shape[axis], percentiles)
+  # Partitioning around every requested rank places each of them where a full
+  # sort would have without sorting the values in between.
+  partitioned = np.partition(values, sorted(set(ranks)), axis=axis)
+  if partitioned.ndim == 1:
+    return [partitioned[rank].item() for rank in ranks]
+  return [partitioned.take(rank, axis=axis) for rank in ranks]
+
+
+def Summarize(values, percentiles=PERCENTILES_LIST):
+  """Computes percentiles, mean and standard deviation of raw values.
+
+  Args:
+    values: A non-empty sequence or numpy array of numbers.
+    percentiles: A sequence of percentiles in [0, 100].
+
+  Returns:
+    A dict mapping PercentileLabel(p) for each percentile as well as 'average'
+    and 'stddev' (sample standard deviation) to their values.
+
+  Raises:
+    ValueError: if values is empty or a percentile is invalid.
+  """
+  values = np.asarray(values)
+  result = dict(zip((PercentileLabel(p) for p in percentiles),
+                    Percentiles(values, percentiles)))
+  result['average'] = float(values.mean())
+  result['stddev'] = float(values.std(ddof=1)) if values.size > 1 else 0
+  return result
+
+
+def _SortedWeights(values, weights):
+  """Returns values sorted ascending and the cumulative sum of their weights."""
+  values = np.asarray(values)
+  weights = np.asarray(weights)
+  if values.shape != weights.shape:
+    raise ValueError('Lengths do not match: {0} != {1}'.format(
+        len(values), len(weights)))
+  if not values.size:
+    raise ValueError("Can't compute percentiles of empty list.")
+  order = np.argsort(values, kind='mergesort')
+  return values[order], weights[order]
+
+
+def _WeightedPercentiles(values, cumulative, percentiles, method):
+  """Implements WeightedPercentiles for sorted values."""
+  total = cumulative[-1]
+  if method == NEAREST_RANK:
+    targets = [min(int(total * p / 100.0), total - 1)
+               for p in _CheckPercentiles(percentiles)]
+    indices = np.searchsorted(cumulative, targets, side='right')
+  elif method == CUMULATIVE_WEIGHT:
+    targets = [total * p / 100.0 for p in _CheckPercentiles(percentiles)]
+    indices = np.searchsorted(cumulative, targets, side='left')
+  else:
+    raise ValueError('Unknown method: {0}'.format(method))
+  indices = np.minimum(indices, len(values) - 1)
+  return [values[i].item() for i in indices]
+
+
+def WeightedPercentiles(values, weights, percentiles=PERCENTILES_LIST,
+                        method=NEAREST_RANK):
+  """Computes percentiles of weighted values, such as a histogram.
+
+  Args:
+    values: A non-empty sequence or numpy array of numbers. Need not be sorted.
+    weights: A sequence or numpy array of the same length as values with the
+        weight (e.g. number of occurrences) of each value.
+    percentiles: A sequence of percentiles in [0, 100].
+    method: NEAREST_RANK or CUMULATIVE_WEIGHT.
+
+  Returns:
+    A list with the value at each of the percentiles.
+
+  Raises:
+    ValueError: if values is empty, if values and weights differ in length, or
+      a percentile is invalid.
+  """
+  values, weights = _SortedWeights(values, weights)
+  return _WeightedPercentiles(values, np.cumsum(weights), percentiles, method)
+
+
+def SummarizeHistogram(histogram, percentiles=PERCENTILES_LIST):
+  """Computes percentiles, mean and standard deviation of a histogram.
+
+  Args:
+    histogram: A dict mapping values to the number of times they occurred, or
+        a sequence of (value, count) pairs.
+    percentiles: A sequence of percentiles in [0, 100].
+
+  Returns:
+    A dict with the same keys as Summarize.
+
+  Raises:
+    ValueError: if the histogram is empty or a percentile is invalid.
+  """
+  if isinstance(histogram, dict):
+    histogram = histogram.items()
+  if not len(histogram):
+    raise ValueError("Can't compute percentiles of empty list.")
+  values, weights = _SortedWeights(*zip(*histogram))
+  cumulative = np.cumsum(weights)
+  result = dict(zip(
+      (PercentileLabel(p) for p in percentiles),
+      _WeightedPercentiles(values, cumulative, percentiles, NEAREST_RANK)))
+  total = float(cumulative[-1])
+  average = float(np.dot(values, weights)) / total
+  result['average'] = average
+  if total > 1:
+    squares = float(np.dot((values - average) ** 2, weights))
+    result['stddev'] = (squares / (total - 1)) ** 0.5
+  else:
+    result['stddev'] = 0
+  return result
+
+
+class _BucketCounts(object):
+  """Counts per integer bucket key, stored densely from the smallest key."""
+
+  def __init__(self):
+    self.offset = 0
+    self.counts = np.zeros(0, dtype=np.int64)
+
+  def _Extend(self, min_key, max_key):
+    if not self.counts.size:
+      self.offset = min_key
+      self.counts = np.zeros(max_key - min_key + 1, dtype=np.int64)
+      return
+    new_offset = min(min_key, self.offset)
+    new_size = max(max_key + 1, self.offset + self.counts.size) - new_offset
+    if new_offset != self.offset or new_size != self.counts.size:
+      counts = np.zeros(new_size, dtype=np.int64)
+      start = self.offset - new_offset
+      counts[start:start + self.counts.size] = self.counts
+      self.offset = new_offset
+      self.counts = counts
+
+  def Add(self, keys):
+    if not keys.size:
+      return
+    min_key, max_key = int(keys.min()), int(keys.max())
+    self._Extend(min_key, max_key)
+    counts = np.bincount(keys - min_key)
+    start = min_key - self.offset
+    self.counts[start:start + counts.size] += counts
+
+  def Merge(self, other):
+    if not other.counts.size:
+      return
+    self._Extend(other.offset, other.offset + other.counts.size - 1)
+    start = other.offset - self.offset
+    self.counts[start:start + other.counts.size] += other.counts
+
+  def Keys(self):
+    return np.arange(self.offset, self.offset + self.counts.size)
+
+
+class QuantileSketch(object):
+  """A mergeable summary of a stream of values with bounded relative error.
+
+  Values are counted in buckets whose boundaries grow geometrically, so every
+  percentile reported is within relative_accuracy of a value that is at that
+  percentile, and memory use depends on the range of the values rather than on
+  how many there are. Sketches with the same relative_accuracy can be merged,
+  e.g. to combine the results of several worker processes. The count, mean,
+  standard deviation, minimum and maximum are exact.
+
+  Attributes:
+    relative_accuracy: float. Maximum relative error of reported percentiles.
+    count: int. Number of values added.
+    min: float. Smallest value added.
+    max: float. Largest value added.
+  """
+
+  def __init__(self, relative_accuracy=0.01):
+    if not 0 < relative_accuracy < 1:
+      raise ValueError('Invalid relative accuracy: {0}'.format(
+          relative_accuracy))
+    self.relative_accuracy = relative_accuracy
+    self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    self._log_gamma = math.log(self._gamma)
+    self.count = 0
+    self.min = float('inf')
+    self.max = float('-inf')
+    self._mean = 0.0
+    # Sum of squared differences from the mean.
+    self._m2 = 0.0
+    self._zero_count = 0
+    self._positive = _BucketCounts()
+    self._negative = _BucketCounts()
+
+  def _Keys(self, magnitudes):
+    return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+
+  def _BucketValues(self, keys):
+    # The point of a bucket (gamma^(k-1), gamma^k] with the lowest worst-case
+    # relative error to the values in it.
+    return 2 * self._gamma ** keys.astype(float) / (self._gamma + 1)
+
+  def _MergeMoments(self, count, mean, m2):
+    total = self.count + count
+    delta = mean - self._mean
+    self._mean += delta * count / total
+    self._m2 += m2 + delta ** 2 * self.count * count / total
+    self.count = total
+
+  def Add(self, values):
+    """Adds a sequence or numpy array of numbers to the sketch."""
+    values = np.asarray(values, dtype=float).ravel()
+    if not values.size:
+      return
+    self.min = min(self.min, float(values.min()))
+    self.max = max(self.max, float(values.max()))
+    mean = float(values.mean())
+    self._MergeMoments(values.size, mean, float(((values - mean) ** 2).sum()))
+    self._positive.Add(self._Keys(values[values > 0]))
+    self._negative.Add(self._Keys(-values[values < 0]))
+    self._zero_count += int((values == 0).sum())
+
+  def Merge(self, other):
+    """Adds all values summarized by another QuantileSketch to this one."""
+    if other.relative_accuracy != self.relative_accuracy:
+      raise ValueError('Cannot merge sketches with different accuracies.')
+    if not other.count:
+      return
+    self.min = min(self.min, other.min)
+    self.max = max(self.max, other.max)
+    self._MergeMoments(other.count, other._mean, other._m2)
+    self._positive.Merge(other._positive)
+    self._negative.Merge(other._negative)
+    self._zero_count += other._zero_count
+
+  def Percentiles(self, percentiles=PERCENTILES_LIST):
+    """Returns a list with the approximate value at each percentile.
+
+    Raises:
+      ValueError: if the sketch is empty or a percentile is invalid.
+    """
+    if not self.count:
+      raise ValueError("Can't compute percentiles of empty sketch.")
+    values = np.concatenate((
+        -self._BucketValues(self._negative.Keys()[::-1]),
+        [0.0],
+        self._BucketValues(self._positive.Keys())))
+    counts = np.concatenate((self._negative.counts[::-1], [self._zero_count],
+                             self._positive.counts))
+    result = _WeightedPercentiles(values, np.cumsum(counts), percentiles,
+                                  NEAREST_RANK)
+    return [min(max(value, self.min), self.max) for value in result]
+
+  def Summarize(self, percentiles=PERCENTILES_LIST):
+    """Returns a dict with the same keys as the module-level Summarize."""
+    result = dict(zip((PercentileLabel(p) for p in percentiles),
+                      self.Percentiles(percentiles)))
+    result['average'] = self._mean
+    result['stddev'] = (
+        (self._m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0)
+    return result
@@ -0,0 +1,165 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Batched status polling for cloud resources.
+
+Resources check whether they exist (and whether they are ready) by describing
+themselves through a cloud CLI. When many resources of the same kind are
+provisioned at once, that is one CLI invocation per resource per poll, which
+is slow and quickly runs into API rate limits.
+
+A status poller instead collects the keys (IDs, names, client tokens, ...) of
+every resource that is currently waiting on a status in one region or zone,
+issues a single list/describe call for all of them and hands each waiting
+thread the part of the response that describes its resource. A thread only
+ever receives a status from a call that was started after it asked, so the
+results are never staler than an unbatched call would have been.
+
+Providers subclass BaseStatusPoller, implement _ListStatuses, and obtain the
+shared instance for a scope with GetPoller. ClearPollers forgets the shared
+instances when a benchmark is torn down.
+"""
+
+import abc
+import logging
+import threading
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+def GetPoller(poller_class, *scope):
+  """Returns the poller shared by all resources in a scope.
+
+  Args:
+    poller_class: BaseStatusPoller subclass.
+    *scope: Hashable arguments passed to the poller_class constructor that
+        identify what one list call can cover (e.g. the region).
+
+  Returns:
+    An instance of poller_class.
+  """
+  key = (poller_class,) + scope
+  with _pollers_lock:
+    if key not in _pollers:
+      _pollers[key] = poller_class(*scope)
+    return _pollers[key]
+
+
+def ClearPollers():
+  """Forgets the shared pollers, so that later calls get new ones."""
+  with _pollers_lock:
+    _pollers.clear()
+
+
+class BaseStatusPoller(object):
+  """Combines concurrent status queries for resources into batched calls.
+
+  Attributes:
+    scope: Tuple of the arguments the poller was constructed with.
+    num_calls: Number of times _ListStatuses has been called.
+  """
+
+  __metaclass__ = abc.ABCMeta
+
+  # Maximum number of keys passed to a single _ListStatuses call, or None if
+  # there is no limit. Larger batches are split into several calls.
+  MAX_BATCH_SIZE = None
+
+  def __init__(self, *scope):
+    self.scope = scope
+    self.num_calls = 0
+    self._cond = threading.Condition()
+    self._pending = set()
+    self._in_flight = False
+    self._num_batches_started = 0
+    # Maps key to a (batch number, status, exception) tuple describing the
+    # most recent batch that included the key.
+    self._results = {}
+
+  @abc.abstractmethod
+  def _ListStatuses(self, keys):
+    """Looks up the status of several resources with a single call.
+
+    Args:
+      keys: Sorted list of resource keys.
+
+    Returns:
+      dict mapping key to status for each of the keys whose resource was
+      found. The status can be any provider-specific object.
+    """
+    raise NotImplementedError()
+
+  def GetStatus(self, key):
+    """Returns the status of a resource.
+
+    Blocks until a batched call that started after this method was called
+    has completed. If no call is in progress the calling thread issues it on
+    behalf of every thread waiting at that point.
+
+    Args:
+      key: The resource key.
+
+    Returns:
+      The status returned by _ListStatuses, or None if the resource was not
+      found.
+
+    Raises:
+      Exception: Whatever _ListStatuses raised for the batch containing key.
+    """
+    with self._cond:
+      self._pending.add(key)
+      batch = self._num_batches_started + 1
+      while self._results.get(key, (0,))[0] < batch:
+        if self._in_flight:
+          self._cond.wait()
+        else:
+          self._RunBatch()
+      _, status, exception = self._results[key]
+    if exception:
+      raise exception
+    return status
+
+  def _RunBatch(self):
+    """Queries the status of all pending keys. Must hold self._cond."""
+    self._in_flight = True
+    self._num_batches_started += 1
+    batch = self._num_batches_started
+    keys = sorted(self._pending)
+    self._pending = set()
+    statuses = {}
+    exception = None
+    finished = False
+    self._cond.release()
+    try:
+      step = self.MAX_BATCH_SIZE or len(keys)
+      for i in xrange(0, len(keys), step):
+        self.num_calls += 1
+        statuses.update(self._ListStatuses(keys[i:i + step]))
+      finished = True
+    except Exception as e:
+      logging.exception('Error polling the status of %s in %s.',
+                        type(self).__name__, self.scope)
+      exception = e
+      finished = True
+    finally:
+      self._cond.acquire()
+      self._in_flight = False
+      if finished:
+        for key in keys:
+          self._results[key] = (batch, statuses.get(key), exception)
+      else:
+        # Interrupted; let the next batch pick the keys up again.
+        self._pending.update(keys)
+      self._cond.notify_all()
@@ -0,0 +1,162 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A compact binary format for per-stream operation records.
+
+The multi-stream object storage workers record the start time, latency and
+object size of every operation they perform. Instead of a JSON list per
+stream, a columns file stores each of these as one contiguous column of all
+streams in a row, plus the number and length of each stream:
+
+  stream_nums     int64[num_streams]
+  stream_lengths  int64[num_streams]
+  start_times     float64[num_records]
+  latencies       float64[num_records]
+  sizes           int64[num_records]
+
+Each column is written in the .npy format, one after another, so the columns
+of an uncompressed file can be memory-mapped instead of read into memory.
+The file may be gzip-compressed for transfer; it has to be decompressed before
+it is loaded.
+"""
+
+import gzip
+import shutil
+
+import numpy as np
+
+_STREAM_COLUMNS = (('stream_nums', np.int64), ('stream_lengths', np.int64))
+_RECORD_COLUMNS = (('start_times', np.float64), ('latencies', np.float64),
+                   ('sizes', np.int64))
+
+
+def _WriteColumn(fp, dtype, arrays):
+  """Writes the concatenation of arrays as one .npy column."""
+  arrays = [np.asarray(array, dtype=dtype) for array in arrays]
+  np.lib.format.write_array_header_1_0(fp, {
+      'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+      'fortran_order': False,
+      'shape': (sum(array.size for array in arrays),)})
+  for array in arrays:
+    fp.write(array.tobytes())
+
+
+def WriteStreams(fp, streams):
+  """Writes the records of several streams in the columns format.
+
+  Columns are written one stream at a time, so no more than one stream's
+  column is copied at once.
+
+  Args:
+    fp: file object opened for binary writing. May be a gzip.GzipFile.
+    streams: a list of dicts with the keys 'stream_num', 'start_times',
+        'latencies' and 'sizes'. The last three are sequences or numpy arrays
+        of equal length.
+
+  Raises:
+    ValueError: if the columns of a stream differ in length.
+  """
+  for stream in streams:
+    lengths = set(len(stream[name]) for name, _ in _RECORD_COLUMNS)
+    if len(lengths) != 1:
+      raise ValueError('Columns of stream {0} differ in length: {1}'.format(
+          stream['stream_num'], sorted(lengths)))
+  _WriteColumn(fp, np.int64, [[stream['stream_num'] for stream in streams]])
+  _WriteColumn(fp, np.int64, [[len(stream['start_times'])
+                               for stream in streams]])
+  for name, dtype in _RECORD_COLUMNS:
+    _WriteColumn(fp, dtype, [stream[name] for stream in streams])
+
+
+def WriteStreamsFile(path, streams, compress=False):
+  """Writes the records of several streams to a columns file.
+
+  Args:
+    path: string. The file to write.
+    streams: see WriteStreams.
+    compress: boolean. Whether to gzip-compress the file.
+  """
+  if compress:
+    # Most of the bytes are float timestamps and latencies, which barely
+    # compress, so the fastest level gets nearly all of the size reduction.
+    with gzip.open(path, 'wb', compresslevel=1) as fp:
+      WriteStreams(fp, streams)
+  else:
+    with open(path, 'wb') as fp:
+      WriteStreams(fp, streams)
+
+
+def DecompressFile(compressed_path, path):
+  """Decompresses a gzip-compressed columns file without reading it at once."""
+  with gzip.open(compressed_path, 'rb') as src, open(path, 'wb') as dest:
+    shutil.copyfileobj(src, dest, 1 << 20)
+
+
+def IsColumnsFile(path):
+  """Returns whether an uncompressed file is in the columns format."""
+  with open(path, 'rb') as fp:
+    return fp.read(len(np.lib.format.MAGIC_PREFIX)) == (
+        np.lib.format.MAGIC_PREFIX)
+
+
+def _MapColumns(path, names):
+  """Returns a dict of memory-mapped columns read from the start of a file."""
+  columns = {}
+  with open(path, 'rb') as fp:
+    for name in names:
+      version = np.lib.format.read_magic(fp)
+      if version != (1, 0):
+        raise ValueError('Unsupported column format version {0} in {1}'.format(
+            version, path))
+      shape, _, dtype = np.lib.format.read_array_header_1_0(fp)
+      offset = fp.tell()
+      if shape[0]:
+        columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                                  shape=shape)
+      else:
+        # Empty files and offsets at the end of the file cannot be mapped.
+        columns[name] = np.zeros(shape, dtype=dtype)
+      fp.seek(offset + shape[0] * dtype.itemsize)
+  return columns
+
+
+def LoadStreams(path):
+  """Loads the streams of an uncompressed columns file.
+
+  The arrays returned are views of memory-mapped columns, so the records are
+  read from the file as they are used rather than all at once.
+
+  Args:
+    path: string. The columns file.
+
+  Returns:
+    A tuple of stream_nums, start_times, latencies and sizes. stream_nums is
+    a numpy array with the number of each stream. The others are lists of
+    numpy arrays, one per stream, in the same order.
+
+  Raises:
+    ValueError: if the file is not a valid columns file.
+  """
+  names = [name for name, _ in _STREAM_COLUMNS + _RECORD_COLUMNS]
+  columns = _MapColumns(path, names)
+  stream_lengths = np.asarray(columns['stream_lengths'])
+  bounds = np.concatenate(([0], np.cumsum(stream_lengths)))
+  if bounds[-1] != columns['start_times'].size:
+    raise ValueError('Stream lengths of {0} do not add up to its {1} '
+                     'records.'.format(path, columns['start_times'].size))
+  result = [np.array(columns['stream_nums'])]
+  for name, _ in _RECORD_COLUMNS:
+    result.append([columns[name][start:stop]
+                   for start, stop in zip(bounds[:-1], bounds[1:])])
+  return tuple(result)
@@ -18,7 +18,10 @@ PerfKit Benchmarker creates files under a temporary directory (typically in
 more information).
 """
 
+import errno
 import os
+import shutil
+import stat
 import tempfile
 
 from perfkitbenchmarker import flags
@@ -27,6 +30,10 @@ from perfkitbenchmarker import version
 
 _PERFKITBENCHMARKER = 'perfkitbenchmarker'
 _RUNS = 'runs'
+_SSH_CONNECTIONS = 'ssh'
+# Leaves room for the socket name (16 characters) and the 17 character suffix
+# ssh adds to it when creating a master connection.
+_MAX_SSH_CONNECTIONS_DIR_LENGTH = 64
 _VERSIONS = 'versions'
 
 _TEMP_DIR = os.path.join(tempfile.gettempdir(), _PERFKITBENCHMARKER)
@@ -46,16 +53,62 @@ def GetRunDirPath(run_uri=None):
       FLAGS.temp_dir, _RUNS, run_uri or str(flags.FLAGS.run_uri))
 
 
+def GetSshConnectionsDir():
+  """Returns the directory for SSH ControlPath sockets of the current run.
+
+  Unix socket paths are limited to about 104 bytes, and ssh appends a random
+  suffix to the ControlPath while creating the master connection. If the run
+  directory is too long to hold the sockets, a short directory under the
+  system temp directory is used instead. CreateTemporaryDirectories creates
+  the directory, and RemoveSshConnectionsDir removes it.
+  """
+  path = os.path.join(GetRunDirPath(), _SSH_CONNECTIONS)
+  if len(path) > _MAX_SSH_CONNECTIONS_DIR_LENGTH:
+    path = os.path.join(tempfile.gettempdir(),
+                        'pkb-ssh-%s' % flags.FLAGS.run_uri)
+  return path
+
+
 def GetVersionDirPath(version=version.VERSION):
   """Gets path to the directory containing files specific to a PKB version."""
   return os.path.join(FLAGS.temp_dir, _VERSIONS, version)
 
 
+def _CreatePrivateDirectory(path):
+  """Creates a directory that only the current user can access.
+
+  The SSH connections directory may be under the shared system temp
+  directory with a predictable name, so an existing directory is only used if
+  it is a directory, not a link, of the current user with mode 0700.
+
+  Raises:
+    OSError: if the directory cannot be created or is not private.
+  """
+  try:
+    os.mkdir(path, 0o700)
+  except OSError as e:
+    if e.errno != errno.EEXIST:
+      raise
+  path_stat = os.lstat(path)
+  if not stat.S_ISDIR(path_stat.st_mode):
+    raise OSError(errno.ENOTDIR, 'Not a directory', path)
+  if hasattr(os, 'getuid') and (path_stat.st_uid != os.getuid() or
+                                path_stat.st_mode & 0o077):
+    raise OSError(errno.EACCES, 'Directory is not private to the current user',
+                  path)
+
+
 def CreateTemporaryDirectories():
   """Creates the temporary sub-directories needed by the current run."""
   for path in (GetRunDirPath(), GetVersionDirPath()):
     try:
-      os.makedirs(path)
+      os.makedirs(path, 0o777)
     except OSError:
       if not os.path.isdir(path):
         raise
+  _CreatePrivateDirectory(GetSshConnectionsDir())
+
+
+def RemoveSshConnectionsDir():
+  """Removes the SSH connections directory of the current run."""
+  shutil.rmtree(GetSshConnectionsDir(), ignore_errors=True)
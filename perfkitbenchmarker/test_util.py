@@ -48,6 +48,9 @@ class SamplesTestMixin(object):
     self.assertEqual(a.metadata, b.metadata,
                      msg or 'Samples %s and %s have different metadata' %
                      (a, b))
+    self.assertEqual(a.histogram, b.histogram,
+                     msg or 'Samples %s and %s have different histograms' %
+                     (a, b))
     # Deliberately don't compare the timestamp fields of the samples.
 
   def assertSampleListsEqualUpToTimestamp(self, a, b, msg=None):
@@ -29,6 +29,7 @@ import uuid
 from perfkitbenchmarker import events
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import sample
+from perfkitbenchmarker import stats_util
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import dstat
 
@@ -45,6 +46,89 @@ flags.DEFINE_string('dstat_output', None,
                     'Default: run temporary directory.')
 flags.DEFINE_boolean('dstat_publish', False,
                      'Whether or not publish dstat statistics.')
+flags.DEFINE_list('dstat_percentiles', [],
+                  'Percentiles of each dstat metric to publish for each event '
+                  'in addition to its mean, e.g. 50,90,99. Only applicable '
+                  'when --dstat_publish is specified.')
+
+
+def ValidatePercentiles(percentiles):
+  """Returns whether all of 'percentiles' are numbers between 0 and 100."""
+  try:
+    return all(0 <= float(p) <= 100 for p in percentiles)
+  except ValueError:
+    return False
+
+
+flags.register_validator(
+    'dstat_percentiles', ValidatePercentiles,
+    'Percentiles must be numbers between 0 and 100.')
+
+
+def _EventWindows(epochs, tracing_events):
+  """Finds the rows of dstat output recorded during each event.
+
+  Args:
+    epochs: sorted ndarray. The timestamp of each row.
+    tracing_events: list of events.TracingEvent.
+
+  Returns:
+    A tuple of ndarrays with the index of the first row and one past the last
+    row of each event. Rows strictly between the start and end timestamps of
+    an event belong to it.
+  """
+  starts = np.array([e.start_timestamp for e in tracing_events], dtype=float)
+  ends = np.array([e.end_timestamp for e in tracing_events], dtype=float)
+  return (np.searchsorted(epochs, starts, side='right'),
+          np.searchsorted(epochs, ends, side='left'))
+
+
+def _AnalyzeEvents(role, labels, out, tracing_events, percentiles=()):
+  """Creates samples of the dstat metrics during each event.
+
+  Args:
+    role: string. The role of the VM the output was recorded on.
+    labels: list of strings. The label of each column of out.
+    out: ndarray. Parsed dstat output whose first column is the epoch.
+    tracing_events: list of events.TracingEvent.
+    percentiles: sequence of percentiles (numbers or strings of numbers) to
+        report in addition to the mean of each metric.
+
+  Returns:
+    A list of samples with the mean of each metric for each event, followed by
+    its percentiles.
+  """
+  if not tracing_events or not len(out):
+    return []
+  epochs = out[:, 0]
+  if (np.diff(epochs) < 0).any():
+    out = out[np.argsort(epochs, kind='mergesort')]
+    epochs = out[:, 0]
+  samples = []
+  for event, start, stop in zip(tracing_events,
+                                *_EventWindows(epochs, tracing_events)):
+    # Skip analyzing event if none of rows falling into time range.
+    if stop <= start:
+      continue
+    window = out[start:stop, 1:]
+    metadata = copy.deepcopy(event.metadata)
+    metadata['event'] = event.event
+    metadata['sender'] = event.sender
+    metadata['vm_role'] = role
+
+    avg = window.mean(axis=0)
+    samples.extend([
+        sample.Sample(label, avg[idx], '', metadata)
+        for idx, label in enumerate(labels[1:])])
+    if percentiles:
+      percentile_values = stats_util.Percentiles(window, percentiles, axis=0)
+      for percentile, values in zip(percentiles, percentile_values):
+        samples.extend([
+            sample.Sample('%s %s' % (label,
+                                     stats_util.PercentileLabel(percentile)),
+                          values[idx], '', metadata)
+            for idx, label in enumerate(labels[1:])])
+  return samples
 
 
 class _DStatCollector(object):
@@ -53,16 +137,20 @@ class _DStatCollector(object):
   Installs and runs dstat on a collection of VMs.
   """
 
-  def __init__(self, interval=None, output_directory=None):
+  def __init__(self, interval=None, output_directory=None, percentiles=()):
     """Runs dstat on 'vms'.
 
     Start dstat collection via `Start`. Stop via `Stop`.
 
     Args:
       interval: Optional int. Interval in seconds in which to collect samples.
+      output_directory: Optional string. Directory to copy dstat output to.
+      percentiles: Optional sequence of percentiles of each metric to report
+          in addition to its mean when analyzing the output.
     """
     self.interval = interval
     self.output_directory = output_directory or vm_util.GetTempDir()
+    self.percentiles = percentiles
     self._lock = threading.Lock()
     self._pids = {}
     self._file_names = {}
@@ -139,35 +227,15 @@ class _DStatCollector(object):
   def Analyze(self, sender, benchmark_spec, samples):
     """Analyze dstat file and record samples."""
 
-    def _AnalyzeEvent(role, labels, out, event):
-      # Find out index of rows belong to event according to timestamp.
-      cond = (out[:, 0] > event.start_timestamp) & (
-          out[:, 0] < event.end_timestamp)
-      # Skip analyzing event if none of rows falling into time range.
-      if not cond.any():
-        return
-      # Calculate mean of each column.
-      avg = np.average(out[:, 1:], weights=cond, axis=0)
-      metadata = copy.deepcopy(event.metadata)
-      metadata['event'] = event.event
-      metadata['sender'] = event.sender
-      metadata['vm_role'] = role
-
-      samples.extend([
-          sample.Sample(label, avg[idx], '', metadata)
-          for idx, label in enumerate(labels[1:])])
-
-    def _Analyze(role, file):
+    # Parsing and aggregating are CPU bound, so analyzing the files in
+    # threads would only make them contend for the GIL.
+    for role, file in sorted(self._role_mapping.iteritems()):
       with open(os.path.join(self.output_directory,
                              os.path.basename(file)), 'r') as f:
-        fp = iter(f)
-        labels, out = dstat.ParseCsvFile(fp)
-        vm_util.RunThreaded(
-            _AnalyzeEvent,
-            [((role, labels, out, e), {}) for e in events.TracingEvent.events])
-
-    vm_util.RunThreaded(
-        _Analyze, [((k, w), {}) for k, w in self._role_mapping.iteritems()])
+        labels, out = dstat.ParseCsvFile(f)
+      samples.extend(_AnalyzeEvents(role, labels, out,
+                                    events.TracingEvent.events,
+                                    self.percentiles))
 
 
 def Register(parsed_flags):
@@ -184,8 +252,10 @@ def Register(parsed_flags):
 
   if not os.path.isdir(output_directory):
     os.makedirs(output_directory)
-  collector = _DStatCollector(interval=parsed_flags.dstat_interval,
-                              output_directory=output_directory)
+  collector = _DStatCollector(
+      interval=parsed_flags.dstat_interval,
+      output_directory=output_directory,
+      percentiles=parsed_flags.dstat_percentiles)
   events.before_phase.connect(collector.Start, events.RUN_PHASE, weak=False)
   events.after_phase.connect(collector.Stop, events.RUN_PHASE, weak=False)
   if parsed_flags.dstat_publish:
@@ -0,0 +1,466 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Streams system performance counters from VMs while benchmarks run.
+
+Unlike the dstat and collectd collectors, which copy the agent's output files
+after the run phase, this collector keeps one SSH channel per VM open during
+the run phase and reads dstat's CSV output from it as it is produced. The most
+recent rows of each VM are kept in a fixed-size ring buffer on the controller,
+and the metrics of all VMs of a group are aggregated over rolling windows. The
+aggregates are logged as each window closes and published as samples of the
+run phase.
+
+Windows are cut on the timestamps of dstat's rows rather than the controller's
+clock. A window is aggregated once all VMs have reported rows past its end, or
+once any VM is a full window further, so that a VM that stopped reporting does
+not hold back the others.
+
+The controller's memory use is bounded by the number of VMs times the number
+of rows of one window, and the number of samples does not depend on the number
+of VMs. All channels are read by a single thread. Windows VMs are skipped.
+"""
+
+import collections
+import itertools
+import logging
+import os
+import select
+import threading
+
+import numpy as np
+
+from perfkitbenchmarker import events
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import os_types
+from perfkitbenchmarker import sample
+from perfkitbenchmarker import stats_util
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.linux_packages import dstat
+from perfkitbenchmarker.traces import dstat as dstat_trace
+
+flags.DEFINE_boolean('metric_stream', False,
+                     'Stream system performance metrics collected by dstat '
+                     'from each VM during the run phase and publish rolling '
+                     'aggregates across the VMs of each group.')
+flags.DEFINE_integer('metric_stream_interval', 1,
+                     'Interval in seconds at which dstat collects metrics. '
+                     'Only applicable when --metric_stream is specified.',
+                     lower_bound=1)
+flags.DEFINE_integer('metric_stream_window', 60,
+                     'Length in seconds of the rolling windows over which '
+                     'streamed metrics are aggregated. Only applicable when '
+                     '--metric_stream is specified.',
+                     lower_bound=1)
+flags.DEFINE_list('metric_stream_metrics',
+                  ['usr__total cpu usage', 'sys__total cpu usage',
+                   'wai__total cpu usage', 'used__memory usage',
+                   'read__dsk/total', 'writ__dsk/total',
+                   'recv__net/total', 'send__net/total'],
+                  'dstat metrics to stream, as "<label>__<category>" of the '
+                  'cpu, disk, network, memory, load and system columns. Only '
+                  'applicable when --metric_stream is specified.')
+flags.DEFINE_list('metric_stream_percentiles', ['50', '90', '99'],
+                  'Percentiles across the VMs of a group to publish for each '
+                  'metric and window in addition to the mean and maximum. '
+                  'Only applicable when --metric_stream is specified.')
+
+flags.register_validator(
+    'metric_stream_percentiles', dstat_trace.ValidatePercentiles,
+    'Percentiles must be numbers between 0 and 100.')
+
+# dstat writes its CSV output to file descriptor 3, which is the SSH channel,
+# and discards its human-readable output.
+_DSTAT_COMMAND = ('dstat --epoch -c -d -n -m -l -y --noheaders '
+                  '--output /dev/fd/3 {interval} 3>&1 >/dev/null 2>&1')
+
+# Maximum number of bytes read from a channel at once.
+_READ_SIZE = 65536
+
+# Maximum number of seconds the reader thread waits before checking whether
+# the collector was stopped.
+_POLL_TIMEOUT = 1.0
+
+# Number of times the channel to a VM is reopened after it closed unexpectedly.
+_MAX_RECONNECTS = 3
+
+
+class _RingBuffer(object):
+  """Fixed-capacity buffer holding the most recent rows of a matrix.
+
+  Attributes:
+    capacity: int. Maximum number of rows held.
+    count: int. Number of rows currently held.
+  """
+
+  def __init__(self, capacity, num_columns):
+    self.capacity = capacity
+    self.count = 0
+    self._rows = np.zeros((capacity, num_columns))
+    self._next = 0
+
+  def Extend(self, rows):
+    """Appends rows, overwriting the oldest rows once the buffer is full."""
+    rows = rows[-self.capacity:]
+    num_rows = len(rows)
+    end = self._next + num_rows
+    if end <= self.capacity:
+      self._rows[self._next:end] = rows
+    else:
+      split = self.capacity - self._next
+      self._rows[self._next:] = rows[:split]
+      self._rows[:num_rows - split] = rows[split:]
+    self._next = end % self.capacity
+    self.count = min(self.count + num_rows, self.capacity)
+
+  def Rows(self):
+    """Returns an array of the rows held, oldest first."""
+    if self.count < self.capacity:
+      return self._rows[:self.count]
+    return np.concatenate((self._rows[self._next:], self._rows[:self._next]))
+
+  def Window(self, start, end):
+    """Returns the rows whose first column is in (start, end].
+
+    Rows are expected to be appended in order of their first column.
+    """
+    rows = self.Rows()
+    first, last = np.searchsorted(rows[:, 0], [start, end], side='right')
+    return rows[first:last]
+
+
+class _DstatStream(object):
+  """Incrementally parses dstat CSV output read from a VM.
+
+  Attributes:
+    buffer: _RingBuffer. The most recent rows, with the epoch followed by the
+        streamed metrics.
+    rows_received: int. Number of rows parsed.
+    first_timestamp: float or None. The epoch of the first row parsed.
+    last_timestamp: float or None. The epoch of the last row parsed.
+  """
+
+  def __init__(self, metrics, capacity):
+    """Initializes the stream.
+
+    Args:
+      metrics: list of strings. The dstat labels of the metrics to keep.
+      capacity: int. Number of rows to keep.
+    """
+    self.metrics = metrics
+    self.buffer = _RingBuffer(capacity, len(metrics) + 1)
+    self.rows_received = 0
+    self.first_timestamp = None
+    self.last_timestamp = None
+    self.Reset()
+
+  def Reset(self):
+    """Prepares for the output of a new dstat process."""
+    self._partial_line = ''
+    self._headers = []
+    self._num_columns = None
+    self._columns = None
+
+  def _ParseHeaders(self, lines):
+    """Consumes header lines and returns the remaining lines."""
+    if not self._headers:
+      # dstat writes blank lines before its header when its output file
+      # already exists, as /dev/fd/3 always does. The header itself contains
+      # a blank line, so only the leading ones are skipped.
+      lines = list(itertools.dropwhile(lambda line: not line.strip(), lines))
+    needed = dstat.HEADER_LINES - len(self._headers)
+    self._headers.extend(lines[:needed])
+    if len(self._headers) < dstat.HEADER_LINES:
+      return []
+    labels = dstat.ParseCsvHeaders(self._headers)
+    missing = [m for m in self.metrics if m not in labels]
+    if missing:
+      raise ValueError('dstat output has no metrics named {}. Available: {}'
+                       .format(missing, labels))
+    self._num_columns = len(labels)
+    # The epoch is always the first column.
+    self._columns = [0] + [labels.index(m) for m in self.metrics]
+    return lines[needed:]
+
+  def Feed(self, data):
+    """Parses a chunk of output.
+
+    Args:
+      data: string. Output read from the channel. It does not need to end at a
+          line boundary.
+
+    Raises:
+      ValueError: if the output is not valid dstat CSV output or does not
+          contain one of the metrics.
+    """
+    lines = (self._partial_line + data).split('\n')
+    self._partial_line = lines.pop()
+    if self._columns is None:
+      lines = self._ParseHeaders(lines)
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+      return
+    rows = dstat.ParseCsvRows(lines, self._num_columns, self.rows_received)
+    self.buffer.Extend(rows[:, self._columns])
+    self.rows_received += len(lines)
+    if self.first_timestamp is None:
+      self.first_timestamp = rows[0, 0]
+    self.last_timestamp = rows[-1, 0]
+
+
+def _AggregateWindow(group, streams, metrics, start, end, percentiles=()):
+  """Creates samples of the metrics of a group of VMs during a window.
+
+  The mean of each metric is computed for each VM over the rows it reported
+  during the window, and the samples describe the distribution of those
+  means across the VMs.
+
+  Args:
+    group: string. The name of the VM group.
+    streams: list of _DstatStream. The streams of the VMs in the group.
+    metrics: list of strings. The names of the metrics of the streams.
+    start: float. Timestamp at which the window starts, exclusive.
+    end: float. Timestamp at which the window ends, inclusive.
+    percentiles: sequence of percentiles to report in addition to the mean
+        and maximum of each metric.
+
+  Returns:
+    A list of samples with the mean of each metric, followed by its maximum
+    and percentiles. Empty if no VM reported rows during the window.
+  """
+  vm_means = []
+  for stream in streams:
+    rows = stream.buffer.Window(start, end)
+    if len(rows):
+      vm_means.append(rows[:, 1:].mean(axis=0))
+  if not vm_means:
+    return []
+  vm_means = np.array(vm_means)
+  metadata = {'vm_group': group,
+              'num_vms': len(vm_means),
+              'window_start': start,
+              'window_end': end}
+  statistics = [('', vm_means.mean(axis=0)), (' max', vm_means.max(axis=0))]
+  if percentiles:
+    statistics.extend(
+        (' ' + stats_util.PercentileLabel(percentile), values)
+        for percentile, values in zip(
+            percentiles,
+            stats_util.Percentiles(vm_means, percentiles, axis=0)))
+  samples = []
+  for suffix, values in statistics:
+    samples.extend(
+        sample.Sample(metric + suffix, float(value), '', metadata,
+                      timestamp=end)
+        for metric, value in zip(metrics, values))
+  return samples
+
+
+class _MetricStreamCollector(object):
+  """Streams dstat output from a collection of VMs during the run phase."""
+
+  def __init__(self, interval=1, window=60, metrics=(), percentiles=()):
+    """Initializes the collector.
+
+    Args:
+      interval: int. Interval in seconds in which dstat collects metrics.
+      window: int. Length in seconds of the aggregation windows.
+      metrics: sequence of strings. The dstat labels of the metrics to stream.
+      percentiles: sequence of percentiles across VMs to report for each
+          metric and window.
+    """
+    self.interval = interval
+    self.window = window
+    self.metrics = list(metrics)
+    self.percentiles = percentiles
+    # Keep one spare window of rows, so that rows arriving late still fall
+    # into the window they were recorded in.
+    self.capacity = 2 * (window // interval + 1)
+    self.samples = []
+    self._streams = {}
+    self._groups = collections.OrderedDict()
+    self._stop = threading.Event()
+    self._thread = None
+    # The start of the current window, in the time of the rows. None until
+    # the first row is received.
+    self._window_start = None
+
+  def _Connect(self, vm, poller, channels):
+    """Starts dstat on 'vm' and registers its channel with 'poller'."""
+    process = vm.StartRemoteCommand(
+        _DSTAT_COMMAND.format(interval=self.interval))
+    fd = process.stdout.fileno()
+    channels[fd] = (vm, process)
+    poller.register(fd, select.POLLIN)
+
+  def _Disconnect(self, fd, poller, channels):
+    """Terminates the channel on 'fd' and returns its VM."""
+    vm, process = channels.pop(fd)
+    poller.unregister(fd)
+    try:
+      if process.poll() is None:
+        process.terminate()
+      process.wait()
+    except OSError as e:
+      logging.warning('Error stopping the metric stream of %s: %s', vm, e)
+    process.stdout.close()
+    return vm
+
+  def _Reconnect(self, vm, poller, channels, reconnects, error):
+    """Reopens the channel to 'vm' or gives up after _MAX_RECONNECTS."""
+    while reconnects[vm] < _MAX_RECONNECTS:
+      reconnects[vm] += 1
+      logging.warning('Reconnecting to stream metrics from %s: %s', vm, error)
+      self._streams[vm].Reset()
+      try:
+        self._Connect(vm, poller, channels)
+        return
+      except Exception as e:  # pylint: disable=broad-except
+        # The other VMs' metrics are still read if a VM cannot be reached.
+        error = e
+    logging.warning('Stopped streaming metrics from %s: %s', vm, error)
+
+  def _Read(self, fd, poller, channels, reconnects):
+    """Reads available output from the channel on 'fd'."""
+    vm, _ = channels[fd]
+    stream = self._streams[vm]
+    try:
+      data = os.read(fd, _READ_SIZE)
+      if data:
+        stream.Feed(data)
+        return
+      error = 'channel closed'
+    except (OSError, ValueError) as e:
+      error = e
+    except Exception as e:  # pylint: disable=broad-except
+      # Anything else is a bug, but it must not stop the collector thread
+      # from reading the other VMs' metrics.
+      logging.exception('Unexpected error parsing metrics from %s.', vm)
+      error = e
+    self._Disconnect(fd, poller, channels)
+    self._Reconnect(vm, poller, channels, reconnects, error)
+
+  def _CloseWindow(self, end):
+    """Aggregates the metrics of each group over the current window."""
+    for group, vms in self._groups.iteritems():
+      samples = _AggregateWindow(
+          group, [self._streams[vm] for vm in vms], self.metrics,
+          self._window_start, end, self.percentiles)
+      self.samples.extend(samples)
+      if samples:
+        logging.info('Metrics of %s VMs in group %s: %s',
+                     samples[0].metadata['num_vms'], group,
+                     ', '.join('%s=%.2f' % (s.metric, s.value)
+                               for s in samples[:len(self.metrics)]))
+    self._window_start = end
+
+  def _CloseCompleteWindows(self):
+    """Aggregates the windows that all VMs have reported rows past.
+
+    Returns:
+      The epoch of the newest row received, or None if no rows were received.
+    """
+    streams = [stream for stream in self._streams.itervalues()
+               if stream.last_timestamp is not None]
+    if not streams:
+      return None
+    if self._window_start is None:
+      # A dstat row holds the averages over the interval before its epoch.
+      self._window_start = (min(s.first_timestamp for s in streams) -
+                            self.interval)
+    newest = max(s.last_timestamp for s in streams)
+    # The buffers only hold two windows of rows, so lagging VMs are waited
+    # for at most one window.
+    complete = max(min(s.last_timestamp for s in streams),
+                   newest - self.window)
+    while self._window_start + self.window <= complete:
+      self._CloseWindow(self._window_start + self.window)
+    return newest
+
+  def _StreamMetrics(self, vms):
+    """Reads the output of all VMs until the collector is stopped."""
+    poller = select.poll()
+    channels = {}
+    reconnects = collections.Counter()
+    for vm in vms:
+      try:
+        self._Connect(vm, poller, channels)
+      except Exception as e:  # pylint: disable=broad-except
+        self._Reconnect(vm, poller, channels, reconnects, e)
+    try:
+      while not self._stop.is_set():
+        for fd, _ in poller.poll(_POLL_TIMEOUT * 1000):
+          if fd in channels:
+            self._Read(fd, poller, channels, reconnects)
+        self._CloseCompleteWindows()
+    finally:
+      for fd in channels.keys():
+        self._Disconnect(fd, poller, channels)
+
+  def Start(self, sender, benchmark_spec):
+    """Install dstat on the Linux VMs and start streaming their metrics."""
+    vms = [vm for vm in benchmark_spec.vms if vm.OS_TYPE != os_types.WINDOWS]
+    vm_util.RunThreaded(lambda vm: vm.Install('dstat'), vms)
+    self.samples = []
+    self._groups.clear()
+    self._streams.clear()
+    for group, group_vms in sorted(benchmark_spec.vm_groups.iteritems()):
+      group_vms = [vm for vm in group_vms if vm in vms]
+      if not group_vms:
+        continue
+      self._groups[group] = group_vms
+      for vm in group_vms:
+        self._streams[vm] = _DstatStream(self.metrics, self.capacity)
+    self._stop.clear()
+    self._window_start = None
+    self._thread = threading.Thread(target=self._StreamMetrics,
+                                    args=(list(self._streams),))
+    self._thread.daemon = True
+    self._thread.start()
+
+  def Stop(self, sender, benchmark_spec):
+    """Stop streaming and aggregate the last, partial window."""
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+    newest = self._CloseCompleteWindows()
+    if newest is not None and newest > self._window_start:
+      self._CloseWindow(newest)
+    logging.info('Streamed %s rows of metrics from %s VMs.',
+                 sum(s.rows_received for s in self._streams.itervalues()),
+                 len(self._streams))
+
+  def Analyze(self, sender, benchmark_spec, samples):
+    """Add the aggregates of all windows to 'samples'."""
+    samples.extend(self.samples)
+
+
+def Register(parsed_flags):
+  """Registers the metric stream collector if FLAGS.metric_stream is set."""
+  if not parsed_flags.metric_stream:
+    return
+
+  logging.debug('Registering metric stream collector with interval %s and '
+                'window %s.', parsed_flags.metric_stream_interval,
+                parsed_flags.metric_stream_window)
+
+  collector = _MetricStreamCollector(
+      interval=parsed_flags.metric_stream_interval,
+      window=parsed_flags.metric_stream_window,
+      metrics=parsed_flags.metric_stream_metrics,
+      percentiles=parsed_flags.metric_stream_percentiles)
+  events.before_phase.connect(collector.Start, events.RUN_PHASE, weak=False)
+  events.after_phase.connect(collector.Stop, events.RUN_PHASE, weak=False)
+  events.samples_created.connect(
+      collector.Analyze, events.RUN_PHASE, weak=False)
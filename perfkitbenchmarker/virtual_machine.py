@@ -205,6 +205,8 @@ class BaseVirtualMachine(resource.BaseResource):
       usage while running the benchmark.
     background_network_ip_type: Type of IP address to use for generating
       background network workload
+    golden_image: The name of the golden image the VM boots from, or None. See
+      perfkitbenchmarker.golden_image.
   """
 
   __metaclass__ = AutoRegisterVmMeta
@@ -214,6 +216,11 @@ class BaseVirtualMachine(resource.BaseResource):
   _instance_counter_lock = threading.Lock()
   _instance_counter = 0
 
+  # While CreateScratchDisks runs, a list of the (index, disk_spec, disk)
+  # tuples of the scratch disks whose creation it defers. See
+  # _CreateScratchDiskFromDisks.
+  _pending_scratch_disks = None
+
   def __init__(self, vm_spec):
     """Initialize BaseVirtualMachine class.
 
@@ -245,6 +252,7 @@ class BaseVirtualMachine(resource.BaseResource):
         vm_spec.background_network_mbits_per_sec)
     self.background_network_ip_type = vm_spec.background_network_ip_type
     self.use_dedicated_host = None
+    self.golden_image = None
 
     self.network = None
     self.firewall = None
@@ -258,6 +266,10 @@ class BaseVirtualMachine(resource.BaseResource):
       return self.ip_address
     return super(BaseVirtualMachine, self).__str__()
 
+  def GetResourceDependencies(self):
+    """Returns the network that must be created before this VM."""
+    return [self.network] if self.network else []
+
   def CreateScratchDisk(self, disk_spec):
     """Create a VM's scratch disk.
 
@@ -266,6 +278,49 @@ class BaseVirtualMachine(resource.BaseResource):
     """
     pass
 
+  def CreateScratchDisks(self, timer=None, name=None):
+    """Creates the scratch disks of all of self.disk_specs concurrently.
+
+    CreateScratchDisk is called for each disk spec in order, which numbers and
+    names the disks as before. VMs whose _CreateScratchDiskFromDisks supports
+    it then create, attach and set up the disks of all specs in parallel
+    threads instead of one spec at a time.
+
+    Args:
+      timer: An optional IntervalTimer that measures each step of preparing
+          each scratch disk, e.g. 'Attach VM 0 Scratch Disk 1'.
+      name: string. The name of the VM in the names of the measured
+          intervals. Defaults to the name of the VM.
+    """
+    self._pending_scratch_disks = []
+    try:
+      for disk_spec in self.disk_specs:
+        self.CreateScratchDisk(disk_spec)
+      pending = self._pending_scratch_disks
+    finally:
+      self._pending_scratch_disks = None
+    if not pending:
+      return
+    name = name or self.name
+    vm_util.RunThreaded(
+        self._PrepareScratchDisk,
+        [((disk_spec, data_disk),
+          {'timer': timer, 'name': '%s Scratch Disk %d' % (name, index)})
+         for index, disk_spec, data_disk in pending])
+
+  def _DeferScratchDisk(self, disk_spec, data_disk):
+    """Returns whether CreateScratchDisks will prepare the disk later.
+
+    Must be called after 'data_disk' is added to self.scratch_disks. VMs that
+    defer disks must implement _PrepareScratchDisk(disk_spec, data_disk,
+    timer=None, name=None), as BaseLinuxMixin does.
+    """
+    if self._pending_scratch_disks is None:
+      return False
+    self._pending_scratch_disks.append(
+        (len(self.scratch_disks) - 1, disk_spec, data_disk))
+    return True
+
   def DeleteScratchDisks(self):
     """Delete a VM's scratch disks."""
     for scratch_disk in self.scratch_disks:
@@ -440,6 +495,13 @@ class BaseOsMixin(object):
     """
     raise NotImplementedError()
 
+  def CloseRemoteConnections(self):
+    """Closes any persistent connections held open to the VM.
+
+    This will be called once before the VM is deleted.
+    """
+    pass
+
   def OnStartup(self):
     """Performs any necessary setup on the VM specific to the OS.
 
@@ -459,6 +521,32 @@ class BaseOsMixin(object):
     """Installs a PerfKit package on the VM."""
     raise NotImplementedError()
 
+  def InstallMany(self, package_names):
+    """Installs several PerfKit packages on the VM.
+
+    OS mixins may override this to install the packages more efficiently
+    than one after another.
+
+    Args:
+      package_names: list of PerfKit package names.
+    """
+    for package_name in package_names:
+      self.Install(package_name)
+
+  def GetInstalledPackages(self):
+    """Returns the sorted names of the PerfKit packages installed on the VM."""
+    return sorted(self._installed_packages)
+
+  def MarkPackagesInstalled(self, package_names):
+    """Records PerfKit packages that the VM's image already contains.
+
+    Install skips the recorded packages.
+
+    Args:
+      package_names: iterable of PerfKit package names.
+    """
+    self._installed_packages.update(package_names)
+
   @abc.abstractmethod
   def Uninstall(self, package_name):
     """Uninstalls a PerfKit package on the VM."""
@@ -651,11 +739,19 @@ class BaseOsMixin(object):
 
   def PrepareBackgroundWorkload(self):
     """Prepare for the background workload."""
+    workloads = []
     for workload in background_workload.BACKGROUND_WORKLOADS:
       if workload.IsEnabled(self):
         if self.OS_TYPE in workload.EXCLUDED_OS_TYPES:
           raise NotImplementedError()
-        workload.Prepare(self)
+        workloads.append(workload)
+    packages = []
+    for workload in workloads:
+      packages.extend(p for p in workload.PACKAGES if p not in packages)
+    if packages:
+      self.InstallMany(packages)
+    for workload in workloads:
+      workload.Prepare(self)
 
   @abc.abstractmethod
   def SetReadAhead(self, num_sectors, devices):
@@ -16,6 +16,7 @@
 
 import contextlib
 import functools32
+import hashlib
 import logging
 import os
 import random
@@ -29,9 +30,11 @@ import time
 import jinja2
 
 from perfkitbenchmarker import background_tasks
+from perfkitbenchmarker import command_engine
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import rate_limiter
 from perfkitbenchmarker import temp_dir
 
 FLAGS = flags.FLAGS
@@ -53,6 +56,9 @@ POLL_INTERVAL = 30
 TIMEOUT = 1200
 FUZZ = .5
 MAX_RETRIES = -1
+# Bounds of the exponential backoff between tries of retryable CLI commands.
+RETRYABLE_COMMAND_POLL_INTERVAL = POLL_INTERVAL
+RETRYABLE_COMMAND_MAX_POLL_INTERVAL = 120
 
 WINDOWS = 'nt'
 PASSWORD_LENGTH = 15
@@ -63,6 +69,16 @@ OUTPUT_EXIT_CODE = 2
 
 flags.DEFINE_integer('default_timeout', TIMEOUT, 'The default timeout for '
                      'retryable commands in seconds.')
+flags.DEFINE_boolean('ssh_reuse_connections', True,
+                     'Whether to reuse SSH connections to a VM by '
+                     'multiplexing commands over a persistent master '
+                     'connection (OpenSSH ControlMaster) rather than '
+                     'establishing a new connection for each remote command.')
+flags.DEFINE_string('ssh_control_persist', '30m',
+                    'Setting applied to SSH connections if '
+                    '--ssh_reuse_connections is set. Sets how long an idle '
+                    'master connection persists before it is closed. See '
+                    'ControlPersist in ssh_config(5).')
 flags.DEFINE_integer('burn_cpu_seconds', 0,
                      'Amount of time in seconds to burn cpu on vm before '
                      'starting benchmark')
@@ -168,8 +184,18 @@ def GetCertPath():
   return PrependTempDir(CERT_FILE)
 
 
-def GetSshOptions(ssh_key_filename):
-  """Return common set of SSH and SCP options."""
+def GetSshOptions(ssh_key_filename, control_path=None):
+  """Return common set of SSH and SCP options.
+
+  Args:
+    ssh_key_filename: Path to the private key used to authenticate.
+    control_path: Optional path of the ControlMaster socket. If provided, the
+        options instruct ssh to multiplex the session over a persistent master
+        connection at that path, creating the master if it does not yet exist.
+
+  Returns:
+    A list of strings to be appended to an ssh or scp command line.
+  """
   options = [
       '-2',
       '-o', 'UserKnownHostsFile=/dev/null',
@@ -183,11 +209,52 @@ def GetSshOptions(ssh_key_filename):
       '-o', 'ServerAliveCountMax=10',
       '-i', ssh_key_filename
   ]
+  if control_path:
+    options.extend([
+        '-o', 'ControlPath=%s' % control_path,
+        '-o', 'ControlMaster=auto',
+        '-o', 'ControlPersist=%s' % FLAGS.ssh_control_persist
+    ])
   options.extend(FLAGS.ssh_options)
 
   return options
 
 
+def GetSshControlPath(user_name, ip_address, port):
+  """Returns the ControlMaster socket path to use for an SSH destination.
+
+  Args:
+    user_name: string. Account name used to log in.
+    ip_address: string. Address of the remote host.
+    port: int. SSH port of the remote host.
+
+  Returns:
+    The socket path string, or None if connections should not be reused.
+  """
+  if not FLAGS.ssh_reuse_connections or RunningOnWindows():
+    return None
+  # A hash keeps the socket path within the Unix socket path length limit
+  # regardless of the length of the user name and address.
+  destination = '%s@%s:%s' % (user_name, ip_address, port)
+  return os.path.join(temp_dir.GetSshConnectionsDir(),
+                      hashlib.sha1(destination).hexdigest()[:16])
+
+
+def CloseSshConnections():
+  """Stops the SSH master connections of the current run.
+
+  Master connections otherwise persist after PKB exits (see
+  --ssh_control_persist). The directory of their sockets is removed.
+  """
+  connections_dir = temp_dir.GetSshConnectionsDir()
+  if os.path.isdir(connections_dir):
+    for name in os.listdir(connections_dir):
+      IssueCommand(['ssh', '-O', 'exit', '-o',
+                    'ControlPath=%s' % os.path.join(connections_dir, name),
+                    'pkb'], suppress_warning=True, timeout=10)
+  temp_dir.RemoveSshConnectionsDir()
+
+
 # TODO(skschneider): Remove at least RunParallelProcesses and RunParallelThreads
 # from this file (update references to call directly into background_tasks).
 RunParallelProcesses = background_tasks.RunParallelProcesses
@@ -197,12 +264,13 @@ RunThreaded = background_tasks.RunThreaded
 
 def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
           timeout=None, fuzz=FUZZ, log_errors=True,
-          retryable_exceptions=None):
+          retryable_exceptions=None, max_poll_interval=None, api=None):
   """A function decorator that will retry when exceptions are thrown.
 
   Args:
     poll_interval: The time between tries in seconds. This is the maximum poll
-        interval when fuzz is specified.
+        interval when fuzz is specified. With max_poll_interval, this is the
+        minimum time between tries instead.
     max_retries: The maximum number of retries before giving up. If -1, this
         means continue until the timeout is reached. The function will stop
         retrying when either max_retries is met or timeout is reached.
@@ -217,6 +285,15 @@ def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
     retryable_exceptions: A tuple of exceptions that should be retried. By
         default, this is None, which indicates that all exceptions should
         be retried.
+    max_poll_interval: If not None, the time between tries grows
+        exponentially from poll_interval up to max_poll_interval seconds,
+        with decorrelated jitter: each sleep is drawn uniformly between
+        poll_interval and three times the previous sleep. fuzz is ignored.
+    api: The name of the cloud API called by the function, or a function
+        returning it when called with the arguments of the wrapped function,
+        such as rate_limiter.GetCommandApi. Tries are then subject to the
+        rate limit and retry budget of the API shared by all threads. See
+        rate_limiter.
 
   Returns:
     A function that wraps functions in retry logic. It can be
@@ -236,14 +313,30 @@ def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
       else:
         deadline = float('inf')
 
+      limiter = None
+      if api is not None:
+        limiter = rate_limiter.GetApiLimiter(
+            api(*args, **kwargs) if callable(api) else api)
+        limiter.BeforeCall()
+
       tries = 0
+      sleep_time = poll_interval
       while True:
         try:
           tries += 1
-          return f(*args, **kwargs)
+          if limiter is None:
+            return f(*args, **kwargs)
+          with rate_limiter.LimitingCommands(False):
+            return f(*args, **kwargs)
         except retryable_exceptions as e:
-          fuzz_multiplier = 1 - fuzz + random.random() * fuzz
-          sleep_time = poll_interval * fuzz_multiplier
+          if limiter:
+            limiter.RecordError(e)
+          if max_poll_interval is None:
+            fuzz_multiplier = 1 - fuzz + random.random() * fuzz
+            sleep_time = poll_interval * fuzz_multiplier
+          else:
+            sleep_time = min(max_poll_interval,
+                             random.uniform(poll_interval, sleep_time * 3))
           if ((time.time() + sleep_time) >= deadline or
               (max_retries >= 0 and tries > max_retries)):
             raise
@@ -251,6 +344,11 @@ def Retry(poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
             if log_errors:
               logging.error('Retrying exception running %s: %s', f.__name__, e)
             time.sleep(sleep_time)
+            if limiter and not limiter.BeforeCall(retry=True,
+                                                  deadline=deadline):
+              logging.error('Retry budget of %s exhausted running %s.',
+                            limiter.api, f.__name__)
+              raise
     return WrappedFunction
   return Wrap
 
@@ -259,6 +357,9 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
                  env=None, timeout=DEFAULT_TIMEOUT, cwd=None):
   """Tries running the provided command once.
 
+  Within rate_limiter.LimitingCommands, the command first waits for the rate
+  limit of its API.
+
   Args:
     cmd: A list of strings such as is given to the subprocess.Popen()
         constructor.
@@ -282,6 +383,78 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
   Returns:
     A tuple of stdout, stderr, and retcode from running the provided command.
   """
+  limiter = rate_limiter.BeforeCommand(cmd)
+  stdout, stderr, retcode = IssueCommandAsync(
+      cmd, force_info_log=force_info_log, suppress_warning=suppress_warning,
+      env=env, timeout=timeout, cwd=cwd).Result()
+  if limiter and retcode:
+    limiter.RecordError(stderr)
+  return stdout, stderr, retcode
+
+
+def IssueCommandAsync(cmd, force_info_log=False, suppress_warning=False,
+                      env=None, timeout=DEFAULT_TIMEOUT, cwd=None):
+  """Starts running the provided command once, without waiting for it.
+
+  With --multiplex_commands, the command is run by the CommandEngine, which
+  does not use a thread per command. Otherwise, or on Windows, the command
+  runs to completion before this function returns.
+
+  Args:
+    cmd: A list of strings such as is given to the subprocess.Popen()
+        constructor.
+    force_info_log: See IssueCommand.
+    suppress_warning: See IssueCommand.
+    env: See IssueCommand.
+    timeout: See IssueCommand.
+    cwd: See IssueCommand.
+
+  Returns:
+    A command_engine.CommandFuture whose result is a tuple of stdout, stderr,
+    and retcode from running the provided command.
+  """
+  if (not FLAGS.multiplex_commands or RunningOnWindows() or
+      not command_engine.IsSupported()):
+    future = command_engine.CommandFuture()
+    future.SetResult(_IssueCommandWithTimer(
+        cmd, force_info_log=force_info_log,
+        suppress_warning=suppress_warning, env=env, timeout=timeout, cwd=cwd))
+    return future
+
+  logging.debug('Environment variables: %s' % env)
+
+  full_cmd = ' '.join(cmd)
+  logging.info('Running: %s', full_cmd)
+
+  command = command_engine.GetEngine().Start(cmd, env=env, timeout=timeout,
+                                             cwd=cwd)
+
+  def _LogResult(future):
+    stdout, stderr, retcode = future.Result()
+    _LogCommandResult(full_cmd, stdout, stderr, retcode, force_info_log,
+                      suppress_warning)
+
+  command.AddDoneCallback(_LogResult)
+  return command
+
+
+def _LogCommandResult(full_cmd, stdout, stderr, retcode, force_info_log,
+                      suppress_warning):
+  """Logs the result of a command issued by IssueCommand."""
+  debug_text = ('Ran %s. Got return code (%s).\nSTDOUT: %s\nSTDERR: %s' %
+                (full_cmd, retcode, stdout, stderr))
+  if force_info_log or (retcode and not suppress_warning):
+    logging.info(debug_text)
+  else:
+    logging.debug(debug_text)
+
+
+def _IssueCommandWithTimer(cmd, force_info_log=False, suppress_warning=False,
+                           env=None, timeout=DEFAULT_TIMEOUT, cwd=None):
+  """Runs a command with a timer thread enforcing its timeout.
+
+  Args and return value are those of IssueCommand.
+  """
   logging.debug('Environment variables: %s' % env)
 
   full_cmd = ' '.join(cmd)
@@ -311,12 +484,8 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
     tf_err.seek(0)
     stderr = tf_err.read().decode('ascii', 'ignore')
 
-  debug_text = ('Ran %s. Got return code (%s).\nSTDOUT: %s\nSTDERR: %s' %
-                (full_cmd, process.returncode, stdout, stderr))
-  if force_info_log or (process.returncode and not suppress_warning):
-    logging.info(debug_text)
-  else:
-    logging.debug(debug_text)
+  _LogCommandResult(full_cmd, stdout, stderr, process.returncode,
+                    force_info_log, suppress_warning)
 
   return stdout, stderr, process.returncode
 
@@ -342,7 +511,9 @@ def IssueBackgroundCommand(cmd, stdout_path, stderr_path, env=None):
                    stdout=outfile, stderr=errfile, close_fds=True)
 
 
-@Retry()
+@Retry(poll_interval=RETRYABLE_COMMAND_POLL_INTERVAL,
+       max_poll_interval=RETRYABLE_COMMAND_MAX_POLL_INTERVAL,
+       api=rate_limiter.GetCommandApi)
 def IssueRetryableCommand(cmd, env=None):
   """Tries running the provided command until it succeeds or times out.
 
@@ -357,7 +528,7 @@ def IssueRetryableCommand(cmd, env=None):
   stdout, stderr, retcode = IssueCommand(cmd, env=env)
   if retcode:
     raise errors.VmUtil.CalledProcessException(
-        'Command returned a non-zero exit code.\n')
+        'Command returned a non-zero exit code.\n%s' % stderr)
   return stdout, stderr
 
 
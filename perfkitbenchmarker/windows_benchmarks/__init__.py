@@ -14,17 +14,13 @@
 """Contains benchmark imports and a list of benchmarks.
 
 All modules within this package are considered benchmarks, and are loaded
-dynamically. Add non-benchmark code to other packages.
+dynamically when they are first used. Add non-benchmark code to other
+packages.
 """
 
-from perfkitbenchmarker import import_util
+from perfkitbenchmarker import module_index
 
+# Benchmark modules are imported on first access. See module_index.
+BENCHMARKS = module_index.LazyModuleList(__name__)
 
-def _LoadBenchmarks():
-  return list(import_util.LoadModulesForPath(__path__, __name__))
-
-
-BENCHMARKS = _LoadBenchmarks()
-
-VALID_BENCHMARKS = {module.BENCHMARK_NAME: module
-                    for module in BENCHMARKS}
+VALID_BENCHMARKS = module_index.LazyModuleDict(__name__, key='benchmark_name')
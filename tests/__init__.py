@@ -14,10 +14,14 @@
 
 import sys
 from perfkitbenchmarker import flags
+from perfkitbenchmarker import module_index
 
 
 # Many places in the PKB codebase directly reference the global FLAGS. Several
 # tests were written using python-gflags==2.0, which allows accessing flag
 # values before they are parsed. python-gflags>=3.0.4 discourages this behavior,
 # so parse program name + an empty list of flags before any tests are executed.
+# Benchmark and package modules are imported first, as pkb does when help is
+# requested, so that the flags of all of them are defined.
+module_index.ImportAllModules()
 flags.FLAGS([sys.argv[0]])
@@ -16,6 +16,8 @@
 
 import json
 import os.path
+import shutil
+import tempfile
 import unittest
 
 import mock
@@ -55,6 +57,7 @@ class AwsVolumeExistsTestCase(unittest.TestCase):
                 '"CreateTime": "2015-05-04T23:47:31.726Z","VolumeId":'
                 '"vol-5859691f","AvailabilityZone":"us-east-1a","VolumeType":'
                 '"standard","State":"creating"}]}')
+    self.disk.id = 'vol-5859691f'
     util.IssueRetryableCommand.side_effect = [(response, None)]
     self.assertTrue(self.disk._Exists())
 
@@ -63,6 +66,7 @@ class AwsVolumeExistsTestCase(unittest.TestCase):
                 '"AvailabilityZone": "us-east-1a","CreateTime":'
                 '"2015-05-04T23:53:42.952Z","Attachments":[],"State":'
                 '"deleting","SnapshotId":null,"VolumeType": "standard"}]}')
+    self.disk.id = 'vol-e45b6ba3'
     util.IssueRetryableCommand.side_effect = [(response, None)]
     self.assertFalse(self.disk._Exists())
 
@@ -104,7 +108,9 @@ class AwsVirtualMachineTestCase(unittest.TestCase):
     mocked_flags.cloud = providers.AWS
     mocked_flags.os_type = os_types.DEBIAN
     mocked_flags.run_uri = 'aaaaaa'
-    mocked_flags.temp_dir = 'tmp'
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    mocked_flags.temp_dir = temp_dir
     p = mock.patch('perfkitbenchmarker.providers.aws.'
                    'util.IssueRetryableCommand')
     p.start()
@@ -150,6 +156,24 @@ class AwsVirtualMachineTestCase(unittest.TestCase):
     util.IssueRetryableCommand.side_effect = [(json.dumps(response), None)]
     self.assertFalse(self.vm._Exists())
 
+  def testInstanceNotFound(self):
+    util.IssueRetryableCommand.side_effect = [('{"Reservations": []}', None)]
+    self.assertFalse(self.vm._Exists())
+    util.IssueRetryableCommand.assert_called_once_with(
+        ['aws', '--output', 'json', 'ec2', 'describe-instances',
+         '--region=us-east-1',
+         '--filter=Name=client-token,'
+         'Values=00000000-1111-2222-3333-444444444444'])
+
+  def testIsReady(self):
+    response = json.loads(self.response)
+    state = response['Reservations'][0]['Instances'][0]['State']
+    util.IssueRetryableCommand.side_effect = [(self.response, None)]
+    self.assertFalse(self.vm._IsReady())
+    state['Name'] = 'running'
+    util.IssueRetryableCommand.side_effect = [(json.dumps(response), None)]
+    self.assertTrue(self.vm._IsReady())
+
   def testCreateSpot(self):
     vm_util.IssueCommand.side_effect = [(self.sir_response, None, None),
                                         (self.sir_response, None, None)]
@@ -214,6 +238,37 @@ class AwsVirtualMachineTestCase(unittest.TestCase):
            '--spot-instance-request-ids=sir-abc'])
 
 
+class AwsInstanceStatusPollerTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(util.__name__ + '.IssueRetryableCommand',
+                   side_effect=self._FakeDescribeInstances)
+    p.start()
+    self.addCleanup(p.stop)
+    self.poller = aws_virtual_machine.AwsInstanceStatusPoller('us-east-1',
+                                                              'client-token')
+
+  def _FakeDescribeInstances(self, cmd):
+    tokens = cmd[-1].split('Values=')[1].split(',')
+    reservations = [
+        {'Instances': [{'ClientToken': token, 'InstanceId': 'i-' + token,
+                        'State': {'Name': 'pending'}}]}
+        for token in tokens if token != 'missing']
+    return json.dumps({'Reservations': reservations}), ''
+
+  def testListStatuses(self):
+    statuses = self.poller._ListStatuses(['a', 'b', 'missing'])
+    self.assertEqual(sorted(statuses), ['a', 'b'])
+    self.assertEqual(statuses['b']['InstanceId'], 'i-b')
+    util.IssueRetryableCommand.assert_called_once_with(
+        ['aws', '--output', 'json', 'ec2', 'describe-instances',
+         '--region=us-east-1', '--filter=Name=client-token,Values=a,b,missing'])
+
+  def testGetStatus(self):
+    self.assertEqual(self.poller.GetStatus('a')['InstanceId'], 'i-a')
+    self.assertIsNone(self.poller.GetStatus('missing'))
+
+
 class AwsIsRegionTestCase(unittest.TestCase):
 
   def testBadFormat(self):
@@ -15,6 +15,8 @@
 """Tests for background cpu workload """
 
 import itertools
+import shutil
+import tempfile
 import unittest
 
 import contextlib2
@@ -51,7 +53,7 @@ ping:
 
 _GROUP_1 = 'vm_1'
 _GROUP_2 = 'vm_2'
-_MOCKED_VM_FUNCTIONS = 'Install', 'RemoteCommand'
+_MOCKED_VM_FUNCTIONS = 'InstallMany', 'RemoteCommand'
 
 
 class TestBackgroundWorkload(unittest.TestCase):
@@ -60,7 +62,9 @@ class TestBackgroundWorkload(unittest.TestCase):
     self._mocked_flags = mock_flags.PatchTestCaseFlags(self)
     self._mocked_flags.cloud = providers.GCP
     self._mocked_flags.os_type = os_types.DEBIAN
-    self._mocked_flags.temp_dir = 'tmp'
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    self._mocked_flags.temp_dir = temp_dir
     p = patch(util.__name__ + '.GetDefaultProject')
     p.start()
     self.addCleanup(context.SetThreadBenchmarkSpec, None)
@@ -15,6 +15,8 @@
 """Tests for background network workload"""
 
 import itertools
+import shutil
+import tempfile
 import unittest
 
 import contextlib2
@@ -85,7 +87,7 @@ ping:
 
 _GROUP_1 = 'vm_1'
 _GROUP_2 = 'vm_2'
-_MOCKED_VM_FUNCTIONS = 'AllowPort', 'Install', 'RemoteCommand'
+_MOCKED_VM_FUNCTIONS = 'AllowPort', 'InstallMany', 'RemoteCommand'
 
 
 class TestBackgroundNetworkWorkload(unittest.TestCase):
@@ -95,7 +97,9 @@ class TestBackgroundNetworkWorkload(unittest.TestCase):
     self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
     self.mocked_flags.os_type = os_types.DEBIAN
     self.mocked_flags.cloud = providers.GCP
-    self.mocked_flags.temp_dir = 'tmp'
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    self.mocked_flags.temp_dir = temp_dir
     p = patch(util.__name__ + '.GetDefaultProject')
     p.start()
     self.addCleanup(p.stop)
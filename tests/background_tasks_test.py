@@ -18,10 +18,14 @@ import functools
 import multiprocessing
 import multiprocessing.managers
 import os
+import Queue
 import signal
 import threading
+import time
 import unittest
 
+import mock
+
 from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import errors
 
@@ -125,6 +129,71 @@ class RunParallelThreadsTestCase(unittest.TestCase):
       background_tasks.RunParallelThreads(calls, max_concurrency=2)
     self.assertEqual(int_list, [1])
 
+  def testDependencies(self):
+    int_list = []
+    calls = [(_WaitAndAppendInt, (int_list, i), {}) for i in range(4)]
+    result = background_tasks.RunParallelThreads(
+        calls, max_concurrency=4, dependencies=[[2], [0], [], [1, 2]])
+    self.assertEqual(result, [None] * 4)
+    self.assertEqual(int_list, [2, 0, 1, 3])
+
+  def testDependencyFailureSkipsDependents(self):
+    int_list = []
+    calls = [(_RaiseValueError, (), {}),
+             (_AppendLength, (int_list,), {}),
+             (_AppendLength, (int_list,), {}),
+             (_AppendLength, (int_list,), {})]
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      background_tasks.RunParallelThreads(
+          calls, max_concurrency=4, dependencies=[[], [0], [1], []])
+    self.assertEqual(int_list, [0])
+
+  def testDependencyCycle(self):
+    calls = [(_ReturnArgs, ('a',), {})] * 2
+    with self.assertRaises(ValueError):
+      background_tasks.RunParallelThreads(calls, max_concurrency=2,
+                                          dependencies=[[1], [0]])
+
+
+class PollingRunParallelThreadsTestCase(RunParallelThreadsTestCase):
+  """Runs the RunParallelThreads tests with the polling task manager."""
+
+  def setUp(self):
+    p = mock.patch.object(background_tasks, '_EVENT_DRIVEN_WAITS_SUPPORTED',
+                          False)
+    p.start()
+    self.addCleanup(p.stop)
+
+
+class PipeSignaledSingleReaderQueueTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.queue = background_tasks._PipeSignaledSingleReaderQueue()
+    self.addCleanup(self.queue.Close)
+
+  def testGetTimeout(self):
+    start = time.time()
+    with self.assertRaises(Queue.Empty):
+      self.queue.Get(timeout=0.05)
+    self.assertGreaterEqual(time.time() - start, 0.05)
+
+  def testFifoOrder(self):
+    for i in range(3):
+      self.queue.Put(i)
+    self.assertEqual([self.queue.Get() for _ in range(3)], [0, 1, 2])
+
+  def testPutFromOtherThread(self):
+    timer = threading.Timer(0.05, self.queue.Put, ('item',))
+    timer.start()
+    self.assertEqual(self.queue.Get(timeout=10), 'item')
+    timer.join()
+
+  def testManyPutsDoNotBlock(self):
+    # More puts than the pipe can buffer wakeup bytes for.
+    for i in range(100000):
+      self.queue.Put(i)
+    self.assertEqual(self.queue.Get(), 0)
+
 
 class RunThreadedTestCase(unittest.TestCase):
 
@@ -175,5 +244,15 @@ class RunParallelProcessesTestCase(unittest.TestCase):
     self.assertEqual(counter.value, 2)
 
 
+class PollingRunParallelProcessesTestCase(RunParallelProcessesTestCase):
+  """Runs the RunParallelProcesses tests with the polling task manager."""
+
+  def setUp(self):
+    p = mock.patch.object(background_tasks, '_EVENT_DRIVEN_WAITS_SUPPORTED',
+                          False)
+    p.start()
+    self.addCleanup(p.stop)
+
+
 if __name__ == '__main__':
   unittest.main()
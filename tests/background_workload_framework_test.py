@@ -15,6 +15,8 @@
 """Tests for background workload framework"""
 
 import functools
+import shutil
+import tempfile
 import unittest
 
 import mock
@@ -44,7 +46,9 @@ class TestBackgroundWorkloadFramework(unittest.TestCase):
     self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
     self.mocked_flags.os_type = os_types.DEBIAN
     self.mocked_flags.cloud = providers.GCP
-    self.mocked_flags.temp_dir = 'tmp'
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    self.mocked_flags.temp_dir = temp_dir
     self.addCleanup(context.SetThreadBenchmarkSpec, None)
     p = mock.patch(util.__name__ + '.GetDefaultProject')
     p.start()
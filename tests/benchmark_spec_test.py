@@ -14,16 +14,21 @@
 """Tests for perfkitbenchmarker.benchmark_spec."""
 
 import mock
+import shutil
+import tempfile
 import unittest
 
 from perfkitbenchmarker import benchmark_spec
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import context
+from perfkitbenchmarker import errors
 from perfkitbenchmarker import flags
 from perfkitbenchmarker import linux_benchmarks
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import providers
 from perfkitbenchmarker import static_virtual_machine as static_vm
+from perfkitbenchmarker import timing_util
+from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.configs import benchmark_config_spec
 from perfkitbenchmarker.providers.aws import aws_virtual_machine as aws_vm
 from perfkitbenchmarker.providers.gcp import gce_virtual_machine as gce_vm
@@ -109,7 +114,9 @@ class _BenchmarkSpecTestCase(unittest.TestCase):
     self._mocked_flags = mock_flags.MockFlags()
     self._mocked_flags.cloud = providers.GCP
     self._mocked_flags.os_type = os_types.DEBIAN
-    self._mocked_flags.temp_dir = 'tmp'
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    self._mocked_flags.temp_dir = temp_dir
     p = mock.patch(util.__name__ + '.GetDefaultProject')
     p.start()
     self.addCleanup(p.stop)
@@ -247,5 +254,80 @@ class RedirectGlobalFlagsTestCase(_BenchmarkSpecTestCase):
     self.assertEqual(FLAGS.benchmark_spec_test_flag, 0)
 
 
+class ResourceGraphTestCase(_BenchmarkSpecTestCase):
+
+  def setUp(self):
+    super(ResourceGraphTestCase, self).setUp()
+    config_spec = benchmark_config_spec.BenchmarkConfigSpec(
+        NAME, flag_values=FLAGS, vm_groups={})
+    self.spec = benchmark_spec.BenchmarkSpec(mock.MagicMock(), config_spec,
+                                             UID)
+    self.calls = []
+    self.regional_network = self._MockResource('regional')
+    self.zonal_network = self._MockResource('zonal', [self.regional_network])
+    self.vm = self._MockResource('vm', [self.zonal_network])
+    self.db = self._MockResource('db')
+    self.spec.networks = {('AWS', 'region', 'us-east-1'): self.regional_network,
+                          ('AWS', 'us-east-1a'): self.zonal_network}
+    self.spec.vms = [self.vm]
+    self.spec.managed_relational_db = self.db
+    for method, operation in (('PrepareVm', 'Create'), ('DeleteVm', 'Delete')):
+      p = mock.patch.object(
+          self.spec, method,
+          side_effect=lambda vm, operation=operation, **_: self.calls.append(
+              (operation, vm.name)))
+      p.start()
+      self.addCleanup(p.stop)
+    p = mock.patch(vm_util.__name__ + '.GenerateSSHConfig')
+    p.start()
+    self.addCleanup(p.stop)
+
+  def _MockResource(self, name, dependencies=()):
+    resource = mock.MagicMock()
+    resource.name = name
+    resource.GetResourceDependencies.return_value = list(dependencies)
+    resource.Create.side_effect = lambda: self.calls.append(('Create', name))
+    resource.Delete.side_effect = lambda: self.calls.append(('Delete', name))
+    return resource
+
+  def testProvisionOrder(self):
+    self.spec.Provision()
+    creates = [name for operation, name in self.calls if operation == 'Create']
+    self.assertItemsEqual(creates, ['regional', 'zonal', 'vm', 'db'])
+    self.assertLess(creates.index('regional'), creates.index('zonal'))
+    self.assertLess(creates.index('zonal'), creates.index('vm'))
+
+  def testProvisionSkipsDependentsOfFailedResource(self):
+    self.zonal_network.Create.side_effect = Exception('Create failed')
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      self.spec.Provision()
+    self.assertItemsEqual(self.calls, [('Create', 'regional'),
+                                       ('Create', 'db')])
+
+  def testDeleteOrder(self):
+    self.spec.Delete()
+    deletes = [name for operation, name in self.calls if operation == 'Delete']
+    self.assertItemsEqual(deletes, ['regional', 'zonal', 'vm', 'db'])
+    self.assertLess(deletes.index('vm'), deletes.index('zonal'))
+    self.assertLess(deletes.index('zonal'), deletes.index('regional'))
+    self.assertTrue(self.spec.deleted)
+
+  def testDeleteContinuesAfterNetworkFailure(self):
+    self.zonal_network.Delete.side_effect = Exception('Delete failed')
+    self.spec.Delete()
+    self.assertIn(('Delete', 'regional'), self.calls)
+
+  def testPerResourceTimerSamples(self):
+    timer = timing_util.IntervalTimer()
+    self.spec.Provision(timer)
+    self.spec.Delete(timer)
+    names = [interval[0] for interval in timer.intervals]
+    self.assertItemsEqual(names, [
+        'Create Network AWS region us-east-1', 'Create Network AWS us-east-1a',
+        'Create VM 0', 'Create Managed Relational Db',
+        'Delete Network AWS region us-east-1', 'Delete Network AWS us-east-1a',
+        'Delete VM 0', 'Delete Managed Relational Db', 'Delete Firewalls'])
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -13,6 +13,9 @@
 # limitations under the License.
 """Tests for perfkitbenchmarker.configs."""
 
+import os
+import shutil
+import tempfile
 import unittest
 import yaml
 
@@ -22,6 +25,7 @@ from perfkitbenchmarker import linux_benchmarks
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import windows_benchmarks
+from tests import mock_flags
 
 CONFIG_NAME = 'a'
 INVALID_NAME = 'b'
@@ -67,6 +71,15 @@ a:
 
 class ConfigsTestCase(unittest.TestCase):
 
+  def setUp(self):
+    # Parsed configs are cached in a directory of the test.
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    p = mock.patch.object(configs, '_GetParsedYamlDir',
+                          return_value=self.temp_dir)
+    p.start()
+    self.addCleanup(p.stop)
+
   def testLoadAllDefaultConfigs(self):
     all_benchmarks = (linux_benchmarks.BENCHMARKS +
                       windows_benchmarks.BENCHMARKS)
@@ -116,6 +129,46 @@ class ConfigsTestCase(unittest.TestCase):
     with self.assertRaises(errors.Config.ParseError):
       configs.LoadMinimalConfig(BAD_REF_CONFIG, CONFIG_NAME)
 
+  def testLoadMinimalConfigReturnsCopies(self):
+    config = configs.LoadMinimalConfig(CONFIG_A, CONFIG_NAME)
+    config['flags']['flag1'] = 'modified'
+    self.assertEqual(
+        configs.LoadMinimalConfig(CONFIG_A, CONFIG_NAME)['flags']['flag1'],
+        'old_value')
+
+  def testParsedConfigCache(self):
+    with mock.patch.object(configs, '_parsed_yaml', {}), \
+            mock.patch.object(configs.yaml, 'load',
+                              side_effect=yaml.load) as yaml_load:
+      config = configs.LoadMinimalConfig(VALID_CONFIG, CONFIG_NAME)
+      self.assertEqual(configs.LoadMinimalConfig(VALID_CONFIG, CONFIG_NAME),
+                       config)
+      self.assertEqual(yaml_load.call_count, 1)
+      # A new process reads the parsed config from the cache directory.
+      configs._parsed_yaml.clear()
+      self.assertEqual(configs.LoadMinimalConfig(VALID_CONFIG, CONFIG_NAME),
+                       config)
+      self.assertEqual(yaml_load.call_count, 1)
+      with self.assertRaises(KeyError):
+        configs.LoadMinimalConfig(VALID_CONFIG, INVALID_NAME)
+
+  def testCorruptParsedConfig(self):
+    with mock.patch.object(configs, '_parsed_yaml', {}):
+      config = configs.LoadMinimalConfig(VALID_CONFIG, CONFIG_NAME)
+      configs._parsed_yaml.clear()
+      for name in os.listdir(self.temp_dir):
+        with open(os.path.join(self.temp_dir, name), 'wb') as cache_file:
+          cache_file.write('\x00corrupt')
+      self.assertEqual(configs.LoadMinimalConfig(VALID_CONFIG, CONFIG_NAME),
+                       config)
+
+  def testMergeConfigsDoesNotShareValues(self):
+    default = {'a': {'b': [1], 'c': {'d': 2}}}
+    config = configs.MergeConfigs(default, {'a': {'e': [3]}})
+    self.assertEqual(config, {'a': {'b': [1], 'c': {'d': 2}, 'e': [3]}})
+    config['a']['b'].append(4)
+    config['a']['c']['d'] = 5
+    self.assertEqual(default, {'a': {'b': [1], 'c': {'d': 2}}})
 
   def testConfigOverrideFlag(self):
     p = mock.patch(configs.__name__ + '.FLAGS')
@@ -137,3 +190,29 @@ class ConfigsTestCase(unittest.TestCase):
     mock_flags.configure_mock(benchmark_config_file="test_import.yml")
     config = configs.GetUserConfig()
     self.assertEqual(config['flags']['num_vms'], 3)
+
+
+class GetParsedYamlDirTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.temp_dir = self.temp_dir
+    p = mock.patch.object(type(configs.FLAGS), 'is_parsed',
+                          return_value=True)
+    self.is_parsed = p.start()
+    self.addCleanup(p.stop)
+
+  def testCreatesUserOnlyDirectory(self):
+    path = configs._GetParsedYamlDir()
+    self.assertTrue(path.startswith(self.temp_dir))
+    self.assertEqual(os.stat(path).st_mode & 0o777, 0o700)
+
+  def testSharedDirectoryIsNotUsed(self):
+    os.chmod(configs._GetParsedYamlDir(), 0o777)
+    self.assertIsNone(configs._GetParsedYamlDir())
+
+  def testNotUsedBeforeFlagsAreParsed(self):
+    self.is_parsed.return_value = False
+    self.assertIsNone(configs._GetParsedYamlDir())
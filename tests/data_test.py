@@ -109,3 +109,11 @@ class ResourcePathTestCase(unittest.TestCase):
   def testDoNotSearchUserPaths(self):
     with self.assertRaises(data.ResourceNotFound):
       data.ResourcePath('resource', False)
+
+
+class PkbModuleResourceTestCase(unittest.TestCase):
+
+  def testFindsPkbModule(self):
+    path = data.ResourcePath('stats_util.py', search_user_paths=False)
+    self.assertEqual(os.path.basename(path), 'stats_util.py')
+    self.assertTrue(os.path.isfile(path))
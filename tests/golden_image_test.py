@@ -0,0 +1,236 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.golden_image."""
+
+import json
+import re
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import golden_image
+from perfkitbenchmarker import linux_packages
+from perfkitbenchmarker import os_types
+from tests import mock_flags
+
+_FAKE_CLOUD = 'FakeGoldenImageCloud'
+
+
+class FakeImageProvider(golden_image.BaseImageProvider):
+  """Keeps images, and the manifest of the VM they were created from, in a dict.
+  """
+
+  CLOUD = _FAKE_CLOUD
+  images = {}
+  operations = []
+  fail_create = False
+
+  def FindImage(self, vm, name):
+    if name not in self.images:
+      return None
+    return golden_image.GoldenImage(name, name + '-id')
+
+  def CreateImage(self, vm, name):
+    if self.fail_create:
+      raise errors.Resource.CreationError('Failed to create image.')
+    self.operations.append(('create', name))
+    # Like the images of a GCE image family, the new image replaces the old
+    # one as the image found by FindImage.
+    self.images[name] = vm.files.get(golden_image.MANIFEST_PATH)
+    return golden_image.GoldenImage(name, name + '-id')
+
+  def DeleteImage(self, vm, image):
+    self.operations.append(('delete', image.name))
+
+  def UseImage(self, vm, image):
+    vm.image = image.image_id
+    manifest = self.images[image.name]
+    if manifest is not None:
+      vm.files[golden_image.MANIFEST_PATH] = manifest
+
+
+class FakeVm(object):
+
+  CLOUD = _FAKE_CLOUD
+  OS_TYPE = os_types.DEBIAN
+  is_static = False
+  install_packages = True
+
+  def __init__(self, name):
+    self.name = name
+    self.image = 'ubuntu-1604'
+    self.zone = 'us-east1-b'
+    self.golden_image = None
+    self.files = {}
+    self.installed_packages = set()
+    self.install_calls = []
+
+  def RemoteCommand(self, command, ignore_failure=False):
+    match = re.match(r"echo '(.*)' > (\S+) && sync$", command)
+    if match:
+      self.files[match.group(2)] = match.group(1)
+      return '', ''
+    match = re.match(r'cat (\S+)$', command)
+    return self.files.get(match.group(1), ''), ''
+
+  def GetInstalledPackages(self):
+    return sorted(self.installed_packages)
+
+  def MarkPackagesInstalled(self, package_names):
+    self.installed_packages.update(package_names)
+
+  def InstallMany(self, package_names):
+    self.install_calls.append(list(package_names))
+    self.installed_packages.update(package_names)
+
+
+class GoldenImageManagerTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.golden_image_prefix = 'pkb-golden'
+    FakeImageProvider.images = {}
+    FakeImageProvider.operations = []
+    FakeImageProvider.fail_create = False
+    # Package records are kept under the temp dir.
+    self.mocked_flags.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.mocked_flags.temp_dir)
+
+  def _Run(self, packages, group_vms=1):
+    """Simulates a run whose Prepare installs 'packages' on one group's VMs."""
+    manager = golden_image.GoldenImageManager('fio')
+    vms = [FakeVm('pkb-%d' % i) for i in range(group_vms)]
+    for vm in vms:
+      manager.BeforeCreate(vm, 'default')
+      manager.AfterBoot(vm)
+    restored = vms[0].GetInstalledPackages()
+    manager.CreateImages({'default': vms})
+    for vm in vms:
+      vm.MarkPackagesInstalled(packages)
+    manager.RecordPackages({'default': vms})
+    return vms, restored
+
+  def _GetManifest(self):
+    manifest, = FakeImageProvider.images.values()
+    return json.loads(manifest)
+
+  def testRecordsPackagesOnFirstRun(self):
+    vms, restored = self._Run(['build_tools', 'fio'], group_vms=2)
+    self.assertEqual(restored, [])
+    self.assertIsNone(vms[0].golden_image)
+    self.assertEqual(FakeImageProvider.images, {})
+
+  def testCreatesImageBeforePrepare(self):
+    self._Run(['build_tools', 'fio'])
+    vms, restored = self._Run(['build_tools', 'fio'], group_vms=2)
+    self.assertEqual(restored, [])
+    self.assertEqual(vms[0].install_calls, [['build_tools', 'fio']])
+    self.assertEqual(vms[1].install_calls, [])
+    name, = FakeImageProvider.images
+    self.assertTrue(name.startswith('pkb-golden-'))
+    self.assertEqual(self._GetManifest(), {
+        'build_tools': golden_image.GetPackageDigest('build_tools'),
+        'fio': golden_image.GetPackageDigest('fio')})
+
+  def testReusesImage(self):
+    self._Run(['build_tools', 'fio'])
+    self._Run(['build_tools', 'fio'])
+    images = dict(FakeImageProvider.images)
+    vms, restored = self._Run(['build_tools', 'fio'], group_vms=2)
+    self.assertEqual(restored, ['build_tools', 'fio'])
+    for vm in vms:
+      self.assertIsNotNone(vm.golden_image)
+      self.assertEqual(vm.image, vm.golden_image + '-id')
+      self.assertEqual(vm.install_calls, [])
+    self.assertEqual(FakeImageProvider.images, images)
+    self.assertEqual(FakeImageProvider.operations,
+                     [('create', vm.golden_image)])
+
+  def testAddsNewlyRecordedPackages(self):
+    self._Run(['build_tools'])
+    self._Run(['build_tools'])
+    name, = FakeImageProvider.images
+    self._Run(['build_tools', 'fio'])
+    vms, restored = self._Run(['build_tools', 'fio'])
+    self.assertEqual(restored, ['build_tools'])
+    self.assertEqual(vms[0].install_calls, [['fio']])
+    self.assertEqual(FakeImageProvider.operations,
+                     [('create', name), ('create', name), ('delete', name)])
+    self.assertEqual(sorted(self._GetManifest()), ['build_tools', 'fio'])
+
+  def testReplacesOutOfDateImage(self):
+    self._Run(['build_tools', 'fio'])
+    self._Run(['build_tools', 'fio'])
+    name, = FakeImageProvider.images
+    FakeImageProvider.images[name] = json.dumps(
+        {'build_tools': golden_image.GetPackageDigest('build_tools'),
+         'fio': 'old-digest'})
+    vms, restored = self._Run(['build_tools', 'fio'])
+    self.assertEqual(restored, ['build_tools'])
+    self.assertEqual(vms[0].install_calls, [['fio']])
+    self.assertEqual(FakeImageProvider.operations,
+                     [('create', name), ('create', name), ('delete', name)])
+    self.assertEqual(self._GetManifest()['fio'],
+                     golden_image.GetPackageDigest('fio'))
+
+  def testKeepsOldImageWhenCreateFails(self):
+    self._Run(['build_tools'])
+    self._Run(['build_tools', 'fio'])
+    images = dict(FakeImageProvider.images)
+    FakeImageProvider.fail_create = True
+    self._Run(['build_tools', 'fio'])
+    self.assertEqual(FakeImageProvider.images, images)
+    self.assertEqual(len(FakeImageProvider.operations), 1)
+
+  def testImageNamesDependOnSourceImage(self):
+    manager = golden_image.GoldenImageManager('fio')
+    vm = FakeVm('pkb-0')
+    name = manager.GetImageName(vm, 'default')
+    self.assertNotEqual(manager.GetImageName(vm, 'clients'), name)
+    vm.image = 'ubuntu-1404'
+    self.assertNotEqual(manager.GetImageName(vm, 'default'), name)
+
+  def testImageNamesDependOnLocation(self):
+    manager = golden_image.GoldenImageManager('fio')
+    vm = FakeVm('pkb-0')
+    name = manager.GetImageName(vm, 'default')
+    vm.zone = 'europe-west1-b'
+    self.assertNotEqual(manager.GetImageName(vm, 'default'), name)
+
+  def testPackageDigestsDependOnDependencies(self):
+    digests = {package_name: golden_image.GetPackageDigest(package_name)
+               for package_name in ('memtier', 'wget')}
+    with mock.patch.dict(linux_packages.PACKAGES,
+                         {'curl': linux_packages.PACKAGES['wget']}):
+      self.assertNotEqual(golden_image.GetPackageDigest('memtier'),
+                          digests['memtier'])
+      self.assertEqual(golden_image.GetPackageDigest('wget'), digests['wget'])
+
+  def testUnsupportedVm(self):
+    manager = golden_image.GoldenImageManager('fio')
+    vm = FakeVm('pkb-0')
+    vm.is_static = True
+    for _ in range(2):
+      manager.BeforeCreate(vm, 'default')
+      manager.CreateImages({'default': [vm]})
+      vm.MarkPackagesInstalled(['fio'])
+      manager.RecordPackages({'default': [vm]})
+    self.assertEqual(FakeImageProvider.images, {})
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -14,10 +14,16 @@
 
 """Tests for object storage service benchmark."""
 
+import json
+import os
+import shutil
+import tempfile
 import time
 import unittest
 import mock
+import numpy as np
 
+from perfkitbenchmarker import stream_columns
 from perfkitbenchmarker.linux_benchmarks import object_storage_service_benchmark
 from tests import mock_flags
 
@@ -103,5 +109,109 @@ class TestDistributionToBackendFormat(unittest.TestCase):
       object_storage_service_benchmark._DistributionToBackendFormat(dist)
 
 
+class TestProcessMultiStreamResults(unittest.TestCase):
+
+  def setUp(self):
+    mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    mocked_flags.object_storage_streams_per_vm = 2
+    mocked_flags.num_vms = 1
+    mocked_flags.object_storage_multistream_objects_per_stream = 4
+    mocked_flags.object_storage_object_naming_scheme = 'sequential_by_stream'
+    mocked_flags.object_storage_latency_histogram_interval = 0.5
+    # Stream 1 starts last, at 1.0, and stream 0 stops first, at 4.0, so
+    # records 1-3 of stream 0 and 0-2 of stream 1 are active.
+    self.start_times = [np.array([0.0, 1.0, 2.0, 3.0]),
+                        np.array([1.0, 2.0, 3.0, 4.0])]
+    self.latencies = [np.array([0.5, 1.0, 0.5, 1.0]),
+                      np.array([1.0, 0.5, 1.0, 0.5])]
+    self.sizes = [np.array([10, 20, 10, 20]), np.array([20, 20, 10, 10])]
+
+  def _Process(self):
+    results = []
+    object_storage_service_benchmark._ProcessMultiStreamResults(
+        self.start_times, self.latencies, self.sizes, 'upload', [10, 20],
+        results)
+    return {(s.metric, s.metadata['object_size_B']): s for s in results}
+
+  def testActiveWindow(self):
+    results = self._Process()
+    self.assertEqual(
+        results['Multi-stream upload QPS (all streams active)',
+                'distribution'].value, 2.0)
+    self.assertEqual(
+        results['Multi-stream upload latency p50', 'distribution'].value, 1.0)
+    self.assertEqual(
+        results['Multi-stream upload latency p99.9', 10].value, 1.0)
+    self.assertEqual(
+        results['Multi-stream upload latency p0.1', 20].value, 0.5)
+    # Both streams are active for 3 seconds and transfer for 2.5 of them.
+    self.assertAlmostEqual(
+        results['Multi-stream upload total gap time', 'distribution'].value,
+        1.0)
+    self.assertAlmostEqual(
+        results['Multi-stream upload net throughput (with gap)',
+                'distribution'].value,
+        (50 / 3.0 + 50 / 3.0) * 8)
+
+  def testLatencyHistograms(self):
+    results = self._Process()
+    size_10 = results['Multi-stream upload latency histogram', 10]
+    self.assertEqual(size_10.metadata['interval'], 0.5)
+    # Linear buckets of 0.5s starting at 0.
+    self.assertEqual(size_10.metadata['histogram'], '0,3,1')
+    size_20 = results['Multi-stream upload latency histogram', 20]
+    self.assertEqual(size_20.metadata['histogram'], '0,1,3')
+
+
+class TestGroupBySize(unittest.TestCase):
+
+  def testGroupBySize(self):
+    record_sizes = np.array([3, 1, 2, 1, 3, 3])
+    values = np.arange(6)
+    for max_sizes in (0, 10):
+      with mock.patch.object(object_storage_service_benchmark,
+                             '_MAX_SIZES_TO_GROUP_BY_MASK', max_sizes):
+        groups = object_storage_service_benchmark._GroupBySize(
+            record_sizes, values, [1, 2, 3, 4])
+      self.assertEqual({size: sorted(group) for size, group
+                        in groups.iteritems()},
+                       {1: [1, 3], 2: [2], 3: [0, 4, 5], 4: []})
+
+
+class TestLoadWorkerOutput(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    self.vm_streams = [
+        [{'stream_num': 0, 'start_times': [0.0, 1.0], 'latencies': [0.5, 0.5],
+          'sizes': [10, 20]},
+         {'stream_num': 1, 'start_times': [0.5], 'latencies': [1.0],
+          'sizes': [10]}],
+        [{'stream_num': 2, 'start_times': [0.25, 2.0],
+          'latencies': [1.5, 0.25], 'sizes': [20, 20]}]]
+
+  def _Load(self, output, output_format):
+    return [[a.tolist() for a in column] for column in
+            object_storage_service_benchmark.LoadWorkerOutput(output,
+                                                              output_format)]
+
+  def testColumnsMatchJson(self):
+    json_output = [json.dumps(streams) for streams in self.vm_streams]
+    paths = []
+    for i, streams in enumerate(self.vm_streams):
+      paths.append(os.path.join(self.temp_dir, str(i)))
+      stream_columns.WriteStreamsFile(paths[-1], streams)
+    expected = self._Load(json_output, 'json')
+    self.assertEqual(self._Load(paths, 'columns'), expected)
+    self.assertEqual(expected[2], [[10, 20], [10], [20, 20]])
+
+    combined_path = os.path.join(self.temp_dir, 'combined')
+    object_storage_service_benchmark._WriteWorkerOutput(paths, 'columns',
+                                                        combined_path)
+    self.assertEqual(self._Load([combined_path], 'columns'), expected)
+    self.assertEqual(stream_columns.LoadStreams(combined_path)[0].tolist(),
+                     [0, 1, 2])
+
 if __name__ == '__main__':
   unittest.main()
@@ -16,6 +16,7 @@
 import os
 import unittest
 
+import mock
 
 from perfkitbenchmarker.linux_packages import dstat
 
@@ -50,6 +51,38 @@ class DstatTestCase(unittest.TestCase):
         'majpf__virtual memory', 'minpf__virtual memory',
         'alloc__virtual memory', 'free__virtual memory'], labels)
 
+  def testParseInChunks(self):
+    path = os.path.join(os.path.dirname(__file__), '..', 'data',
+                        'dstat-result.csv')
+    with open(path) as f:
+      _, expected = dstat.ParseCsvFile(f)
+    with open(path) as f:
+      with mock.patch.object(dstat, '_CHUNK_ROWS', 10):
+        _, out = dstat.ParseCsvFile(f)
+    self.assertTrue((out == expected).all())
+
+  def _ParseRows(self, rows):
+    header = ['"Dstat 0.7.2 CSV output"\n', '"Author:"\n', '"Host:","vm"\n',
+              '"Cmdline:"\n', '\n', '"epoch","total cpu usage"\n',
+              '"epoch","usr"\n']
+    return dstat.ParseCsvFile(header + rows)
+
+  def testTrailingComma(self):
+    _, out = self._ParseRows(['1.0,2.5,\n', '2.0,3.5\n'])
+    self.assertEqual(out.tolist(), [[1.0, 2.5], [2.0, 3.5]])
+
+  def testNoRows(self):
+    labels, out = self._ParseRows([])
+    self.assertEqual(out.shape, (0, len(labels)))
+
+  def testWrongNumberOfColumns(self):
+    with self.assertRaises(ValueError):
+      self._ParseRows(['1.0,2.5,3.0\n'])
+
+  def testEmptyValue(self):
+    with self.assertRaises(ValueError):
+      self._ParseRows(['1.0,,\n'])
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -15,6 +15,7 @@
 
 import json
 import os
+import tempfile
 import unittest
 
 import mock
@@ -428,5 +429,21 @@ class FioTestCase(unittest.TestCase, test_util.SamplesTestMixin):
             'filename'))
 
 
+  def testParseHistogram(self):
+    with tempfile.NamedTemporaryFile() as hist_file:
+      hist_file.write('1000, 0, 4096, 1, 0, 2\n'
+                      '2000, 0, 4096, 0, 3, 1\n'
+                      '1000, 1, 4096, 5, 0, 0\n')
+      hist_file.flush()
+      samples = fio._ParseHistogram(hist_file.name, [10.5, 20.5, 2000.0],
+                                    'job', {'foo': 'bar'})
+    histograms = {s.metric: s.histogram.ToDict() for s in samples}
+    # Half microsecond bin means are kept; large ones within 3 digits.
+    self.assertEqual(histograms, {
+        'job:4096:read:histogram': {10.5: 1, 20.5: 3, 2000.25: 3},
+        'job:4096:write:histogram': {10.5: 5}})
+    for s in samples:
+      self.assertEqual(s.metadata, {'foo': 'bar'})
+
 if __name__ == '__main__':
   unittest.main()
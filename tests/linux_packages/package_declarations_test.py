@@ -0,0 +1,78 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Checks the declarations of packages against what they install."""
+
+import unittest
+
+import mock
+
+from perfkitbenchmarker import linux_packages
+from tests import mock_flags
+
+_DECLARATIONS = ('DEPENDENCIES', 'APT_PACKAGES', 'YUM_PACKAGES')
+
+
+def _DeclaringPackages():
+  """Yields the names and modules of packages with declarations."""
+  for name in linux_packages.PACKAGES:
+    module = linux_packages.PACKAGES[name]
+    if any(hasattr(module, attribute) for attribute in _DECLARATIONS):
+      yield name, module
+
+
+class PackageDeclarationsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    mocked_flags.package_cache = False
+
+  def _Install(self, install_function):
+    """Returns the packages and OS packages 'install_function' installs."""
+    vm = mock.Mock(num_cpus=1)
+    vm.RemoteCommand.return_value = ('', '')
+    vm.RemoteHostCommand.return_value = ('', '')
+    install_function(vm)
+    packages = {c[0][0] for c in vm.Install.call_args_list}
+    os_packages = {os_package
+                   for c in vm.InstallPackages.call_args_list
+                   for os_package in c[0][0].split()}
+    return packages, os_packages
+
+  def testDeclarationsMatchInstallFunctions(self):
+    checked = []
+    for name, module in _DeclaringPackages():
+      for prefix, attribute in (('Apt', 'APT_PACKAGES'),
+                                ('Yum', 'YUM_PACKAGES')):
+        install_function = getattr(module, prefix + 'Install', None)
+        if install_function is None:
+          continue
+        try:
+          packages, os_packages = self._Install(install_function)
+        except NotImplementedError:
+          continue
+        self.assertEqual(
+            packages, set(getattr(module, 'DEPENDENCIES', [])),
+            '%s.%sInstall installs other packages than its DEPENDENCIES' %
+            (name, prefix))
+        if hasattr(module, attribute):
+          self.assertEqual(
+              os_packages, set(getattr(module, attribute).split()),
+              '%s.%sInstall installs other OS packages than its %s' %
+              (name, prefix, attribute))
+        checked.append(name)
+    self.assertIn('fio', checked)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -17,7 +17,9 @@ import copy
 import os
 import unittest
 
+import mock
 
+from perfkitbenchmarker import sample
 from perfkitbenchmarker.linux_packages import ycsb
 
 
@@ -51,7 +53,7 @@ class SimpleResultParserTestCase(unittest.TestCase):
                 '95thPercentileLatency(ms)': 0,
                 '99thPercentileLatency(ms)': 0
             },
-            'histogram': [(0, 530), (19, 1)],
+            'histogram': sample.Histogram.FromDict({0: 530, 19: 1}),
         },
         dict(self.results['groups']['update']))
 
@@ -68,7 +70,7 @@ class SimpleResultParserTestCase(unittest.TestCase):
                 '95thPercentileLatency(ms)': 0,
                 '99thPercentileLatency(ms)': 0
             },
-            'histogram': [(0, 469)],
+            'histogram': sample.Histogram.FromDict({0: 469}),
         },
         dict(self.results['groups']['read']))
 
@@ -80,12 +82,63 @@ class SimpleResultParserTestCase(unittest.TestCase):
                 'Throughput(ops/sec)': 12500.0
             },
             'group': 'overall',
-            'histogram': []
+            'histogram': sample.Histogram()
         },
         self.results['groups']['overall'])
 
 
 
+class StreamingResultParserTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.path = os.path.join(os.path.dirname(__file__), '..', 'data',
+                             'ycsb-test-run-2.dat')
+    with open(self.path) as fp:
+      self.expected = ycsb.ParseResults(fp.read())
+
+  def testParsesFile(self):
+    with open(self.path) as fp:
+      self.assertEqual(ycsb.ParseResults(fp), self.expected)
+
+  def testParsesInterleavedOutput(self):
+    with open(self.path) as fp:
+      lines = fp.readlines()
+    # YCSB > 0.7.0 prints the header to stderr and results to stdout, so
+    # lines of the two streams arrive interleaved.
+    vm = mock.Mock()
+    vm.IterRobustRemoteCommand.return_value = iter(
+        [('stderr', 'log line\n'), ('stderr', lines[0]),
+         ('stdout', 'Loading workload...\n'), ('stderr', lines[1])] +
+        [('stdout', line) for line in lines[2:]])
+    result = ycsb._RunAndParseResults(vm, 'ycsb run')
+    vm.IterRobustRemoteCommand.assert_called_once_with('ycsb run', lines=True)
+    self.assertEqual(result, self.expected)
+
+  def testSkipsOtherOutput(self):
+    result = ycsb.ParseResults('noise\n[OVERALL], RunTime(ms), 10.0\n'
+                               '[READ-FAILED], Operations, 1\n'
+                               'Exception in [READ]\n'
+                               '[READ], Operations, 2\n'
+                               '[READ], 3, 2\n'
+                               '[CLEANUP], Operations, 1\n')
+    self.assertEqual(list(result['groups']), ['overall', 'read'])
+    self.assertEqual(result['groups']['read']['statistics'],
+                     {'Operations': 2})
+    self.assertEqual(result['groups']['read']['histogram'].ToDict(), {3: 2})
+
+  def testTimeseries(self):
+    result = ycsb.ParseResults('[OVERALL], RunTime(ms), 10.0\n'
+                               '[READ], 0, 1.5\n'
+                               '[READ], 10, 2.5\n', 'timeseries')
+    self.assertEqual(result['groups']['read']['timeseries'],
+                     [(0, 1.5), (10, 2.5)])
+    self.assertNotIn('histogram', result['groups']['read'])
+
+  def testNoResults(self):
+    with self.assertRaises(IOError):
+      ycsb.ParseResults('no results\n')
+
+
 class DetailedResultParserTestCase(unittest.TestCase):
 
   def setUp(self):
@@ -184,7 +237,7 @@ class CombineResultsTestCase(unittest.TestCase):
                 'group': 'read',
                 'statistics': {'Operations': 100,
                                'Return=0': 100},
-                'histogram': []
+                'histogram': sample.Histogram()
             }
         }
     }
@@ -196,13 +249,13 @@ class CombineResultsTestCase(unittest.TestCase):
                 'group': 'read',
                 'statistics': {'Operations': 96, 'Return=0': 94,
                                'Return=-1': 2},
-                'histogram': []
+                'histogram': sample.Histogram()
             },
             'update': {
                 'group': 'update',
                 'statistics': {'Operations': 100,
                                'AverageLatency(ms)': 25},
-                'histogram': []
+                'histogram': sample.Histogram()
             }
         }
     }
@@ -222,7 +275,7 @@ class CombineResultsTestCase(unittest.TestCase):
             'read': {
                 'group': 'read',
                 'statistics': {'AverageLatency(ms)': 21},
-                'histogram': []
+                'histogram': sample.Histogram()
             }
         }
     }
@@ -233,3 +286,71 @@ class CombineResultsTestCase(unittest.TestCase):
     self.assertEqual(r, r_copy)
     r['groups']['read']['statistics'] = {}
     self.assertEqual(r, combined)
+
+  def testCombinesHistograms(self):
+    results = []
+    for i in xrange(3):
+      results.append({
+          'client': '',
+          'command_line': '',
+          'groups': {
+              'read': {
+                  'group': 'read',
+                  'statistics': {'Operations': 3},
+                  'histogram': sample.Histogram.FromDict({i: 1, 5: 2})
+              }
+          }
+      })
+    originals = copy.deepcopy(results)
+    combined = ycsb._CombineResults(results)
+    self.assertEqual(results, originals)
+    self.assertEqual(combined['groups']['read']['histogram'].ToDict(),
+                     {0: 1, 1: 1, 2: 1, 5: 6})
+    self.assertEqual(combined['groups']['read']['statistics'],
+                     {'Operations': 9})
+    combined = ycsb._CombineResults(results, combine_histograms=False)
+    self.assertNotIn('histogram', combined['groups']['read'])
+
+
+class CreateSamplesTestCase(unittest.TestCase):
+
+  def testHistogramSample(self):
+    result = {
+        'client': '',
+        'command_line': 'ycsb run',
+        'groups': {
+            'read': {
+                'group': 'read',
+                'statistics': {},
+                'histogram': sample.Histogram.FromDict({1: 3, 7: 1})
+            }
+        }
+    }
+    samples = list(ycsb._CreateSamples(result, include_histogram=False,
+                                       include_histogram_sample=True))
+    histogram_samples = [s for s in samples if s.histogram]
+    self.assertEqual(len(histogram_samples), 1)
+    self.assertEqual(histogram_samples[0].metric, 'read_latency_histogram')
+    self.assertEqual(histogram_samples[0].value, 4)
+    self.assertIs(histogram_samples[0].histogram,
+                  result['groups']['read']['histogram'])
+    self.assertIn('read p50 latency', [s.metric for s in samples])
+
+  def testHistogramBucketSamples(self):
+    result = {
+        'client': '',
+        'command_line': 'ycsb run',
+        'groups': {
+            'read': {
+                'group': 'read',
+                'statistics': {},
+                'histogram': sample.Histogram.FromDict({1: 3, 7: 1})
+            }
+        }
+    }
+    samples = list(ycsb._CreateSamples(result, include_histogram=True))
+    self.assertFalse([s for s in samples if s.histogram])
+    self.assertEqual(
+        [(s.metric, s.value) for s in samples if 'histogram' in s.metric],
+        [('read_latency_histogram_1_ms', 3),
+         ('read_latency_histogram_7_ms', 1)])
@@ -14,11 +14,19 @@
 
 """Tests for linux_virtual_machine.py"""
 
+import os
+import StringIO
+import subprocess
+import types
 import unittest
 
 import mock
 
+from perfkitbenchmarker import command_engine
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import linux_packages
 from perfkitbenchmarker import linux_virtual_machine
+from perfkitbenchmarker import vm_util
 from tests import mock_flags
 
 
@@ -100,5 +108,263 @@ class TestSysctl(unittest.TestCase):
         [])
 
 
+class TestSshConnectionReuse(unittest.TestCase):
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.ssh_options = []
+    self.mocked_flags.ssh_reuse_connections = True
+    self.mocked_flags.ssh_control_persist = '30m'
+    self.vm = LinuxVM()
+    self.vm.user_name = 'perfkit'
+    self.vm.ip_address = '1.2.3.4'
+    self.vm.ssh_private_key = 'keyfile'
+    self.control_path = '/tmp/ssh/perfkit@1.2.3.4:22'
+    p = mock.patch(vm_util.__name__ + '.GetSshControlPath',
+                   return_value=self.control_path)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def _IssueCommands(self, socket_exists):
+    """Returns the commands issued by RemoteHostCommand and RemoteHostCopy."""
+    future = command_engine.CommandFuture()
+    future.SetResult(('', '', 0))
+    with mock.patch(vm_util.__name__ + '.IssueCommandAsync',
+                    return_value=future) as issue_command_async, \
+            mock.patch(vm_util.__name__ + '.IssueCommand',
+                       return_value=('', '', 0)) as issue_command, \
+            mock.patch.object(os.path, 'exists', side_effect=socket_exists):
+      self.vm.RemoteHostCommand('hostname')
+      self.vm.RemoteHostCopy('local_file', 'remote_file')
+    return [call[0][0] for call in (issue_command_async.call_args_list +
+                                    issue_command.call_args_list)]
+
+  def testCommandsShareControlPath(self):
+    commands = self._IssueCommands([False, True])
+    self.assertEqual(len(commands), 2)
+    for cmd in commands:
+      self.assertIn('ControlPath=%s' % self.control_path, cmd)
+      self.assertIn('ControlMaster=auto', cmd)
+      self.assertIn('ControlPersist=30m', cmd)
+
+  def testConnectionCounts(self):
+    self._IssueCommands([False, True])
+    self.assertEqual(self.vm.ssh_connection_counts, {'new': 1, 'reused': 1})
+
+  def testCloseRemoteConnections(self):
+    with mock.patch(vm_util.__name__ + '.IssueCommand',
+                    return_value=('', '', 0)) as issue_command, \
+            mock.patch.object(os.path, 'exists', return_value=True):
+      self.vm.CloseRemoteConnections()
+    cmd = issue_command.call_args[0][0]
+    self.assertEqual(cmd[:3], ['ssh', '-O', 'exit'])
+    self.assertIn('ControlPath=%s' % self.control_path, cmd)
+
+  def testCloseWithoutMasterConnection(self):
+    with mock.patch(vm_util.__name__ + '.IssueCommand') as issue_command, \
+            mock.patch.object(os.path, 'exists', return_value=False):
+      self.vm.CloseRemoteConnections()
+    self.assertFalse(issue_command.called)
+
+  def testStartRemoteCommand(self):
+    with mock.patch.object(subprocess, 'Popen') as popen, \
+            mock.patch.object(os.path, 'exists', return_value=True):
+      process = self.vm.StartRemoteCommand('dstat 1')
+    self.assertIs(process, popen.return_value)
+    cmd = popen.call_args[0][0]
+    self.assertEqual(cmd[-1], 'dstat 1')
+    self.assertIn('ControlPath=%s' % self.control_path, cmd)
+    self.assertEqual(popen.call_args[1]['stdout'], subprocess.PIPE)
+    self.assertEqual(self.vm.ssh_connection_counts, {'new': 0, 'reused': 1})
+
+
+class DebianVM(linux_virtual_machine.DebianMixin):
+  pass
+
+
+def _FakePackage(name, dependencies=(), apt_packages=''):
+  module = types.ModuleType(name)
+  module.DEPENDENCIES = list(dependencies)
+  module.APT_PACKAGES = apt_packages
+  return module
+
+
+class TestInstallMany(unittest.TestCase):
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.max_concurrent_package_installs = 4
+    packages = {
+        'build_tools': _FakePackage('build_tools', apt_packages='gcc make'),
+        'curl': _FakePackage('curl', apt_packages='curl'),
+        'openssl': _FakePackage('openssl', apt_packages='openssl libssl-dev'),
+        'wrk': _FakePackage('wrk', ['build_tools', 'curl', 'openssl']),
+        'memtier': _FakePackage('memtier', ['build_tools'],
+                                apt_packages='make'),
+    }
+    p = mock.patch.dict(linux_packages.PACKAGES, packages, clear=True)
+    p.start()
+    self.addCleanup(p.stop)
+    self.vm = DebianVM()
+    self.vm.install_packages = True
+
+  def testResolveDependencies(self):
+    self.assertEqual(
+        linux_packages.ResolveDependencies(['wrk', 'memtier']),
+        ['build_tools', 'curl', 'openssl', 'wrk', 'memtier'])
+
+  def testResolveDependencyCycle(self):
+    linux_packages.PACKAGES['curl'].DEPENDENCIES = ['wrk']
+    with self.assertRaises(ValueError):
+      linux_packages.ResolveDependencies(['wrk'])
+
+  def testInstallsOsPackagesOnce(self):
+    with mock.patch.object(self.vm, 'InstallPackages') as install_packages, \
+            mock.patch.object(self.vm, 'Install') as install:
+      self.vm.InstallMany(['wrk', 'memtier'])
+    install_packages.assert_called_once_with(
+        'gcc make curl openssl libssl-dev')
+    self.assertItemsEqual(
+        [call[0][0] for call in install.call_args_list],
+        ['build_tools', 'curl', 'openssl', 'wrk', 'memtier'])
+
+  def testSkipsInstalledPackages(self):
+    self.vm._installed_packages.update(['build_tools', 'curl', 'openssl'])
+    with mock.patch.object(self.vm, 'InstallPackages') as install_packages, \
+            mock.patch.object(self.vm, 'Install') as install:
+      self.vm.InstallMany(['wrk'])
+    self.assertFalse(install_packages.called)
+    install.assert_called_once_with('wrk')
+
+  def testReinstallsOsPackagesAfterUninstall(self):
+    with mock.patch.object(self.vm, '_AptInstall') as apt_install:
+      self.vm.InstallPackages('curl')
+      self.vm.InstallPackages('curl')
+      self.assertEqual(apt_install.call_count, 1)
+      self.vm.Uninstall('curl')
+      self.vm.InstallPackages('curl')
+    self.assertEqual(apt_install.call_count, 2)
+
+
+class TestRemoteHostCommandAsync(unittest.TestCase):
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.ssh_options = []
+    self.mocked_flags.ssh_reuse_connections = False
+    self.vm = LinuxVM()
+    self.vm.user_name = 'perfkit'
+    self.vm.ip_address = '1.2.3.4'
+    self.vm.ssh_private_key = 'keyfile'
+
+  def _Future(self, result):
+    future = command_engine.CommandFuture()
+    future.SetResult(result)
+    return future
+
+  def _IssueCommand(self, results, **kwargs):
+    with mock.patch(vm_util.__name__ + '.IssueCommandAsync',
+                    side_effect=[self._Future(r) for r in results]) as issue:
+      future = self.vm.RemoteHostCommandAsync('hostname', **kwargs)
+    return future, issue
+
+  def testResult(self):
+    future, issue = self._IssueCommand([('host\n', '', 0)])
+    self.assertEqual(future.Result(), ('host\n', ''))
+    self.assertEqual(issue.call_args[0][0][-1], 'hostname')
+
+  def testRetriesSshFailures(self):
+    future, issue = self._IssueCommand([('', '', 255), ('host\n', '', 0)])
+    self.assertEqual(future.Result(), ('host\n', ''))
+    self.assertEqual(issue.call_count, 2)
+
+  def testFailure(self):
+    future, _ = self._IssueCommand([('', 'error', 1)])
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      future.Result()
+
+  def testIgnoreFailure(self):
+    future, _ = self._IssueCommand([('', 'error', 1)], ignore_failure=True)
+    self.assertEqual(future.Result(), ('', 'error'))
+
+
+class TestIterRobustRemoteCommand(unittest.TestCase):
+
+  def setUp(self):
+    self.vm = LinuxVM()
+    self.vm._PushRobustCommandScripts = mock.Mock()
+    p = mock.patch.object(self.vm, 'RemoteCommand', return_value=('', ''))
+    self.remote_command = p.start()
+    self.addCleanup(p.stop)
+    p = mock.patch(linux_virtual_machine.__name__ + '.time.sleep')
+    p.start()
+    self.addCleanup(p.stop)
+
+  def _Process(self, records, returncode=255):
+    """Returns a follow process, by default of a failed ssh connection."""
+    process = mock.Mock()
+    process.stdout = StringIO.StringIO(records)
+    process.poll.return_value = returncode
+    process.wait.return_value = returncode
+    return process
+
+  def _Iter(self, records_per_connection, **kwargs):
+    processes = [self._Process(r) for r in records_per_connection]
+    with mock.patch.object(self.vm, 'StartRemoteCommand',
+                           side_effect=processes) as s:
+      output = list(self.vm.IterRobustRemoteCommand('cmd', **kwargs))
+    return output, [c[0][0] for c in s.call_args_list]
+
+  def testChunks(self):
+    output, commands = self._Iter(['O 4\nab\ncE 3\nerrO 2\nd\nX 0\n'])
+    self.assertEqual(output, [('stdout', 'ab\nc'), ('stderr', 'err'),
+                              ('stdout', 'd\n')])
+    self.assertEqual(len(commands), 1)
+    self.assertIn('--stdout-offset 0 --stderr-offset 0', commands[0])
+    self.assertIn('rm -f', self.remote_command.call_args[0][0])
+
+  def testLines(self):
+    output, _ = self._Iter(['O 4\nab\ncO 3\nd\neX 0\n'], lines=True)
+    self.assertEqual(output, [('stdout', 'ab\n'), ('stdout', 'cd\n'),
+                              ('stdout', 'e')])
+
+  def testResumesAtOffsets(self):
+    output, commands = self._Iter(['O 3\nabcE 1\neO 5\nde', '',
+                                   'O 2\ndeX 0\n'])
+    self.assertEqual(output, [('stdout', 'abc'), ('stderr', 'e'),
+                              ('stdout', 'de')])
+    self.assertIn('--stdout-offset 3 --stderr-offset 1', commands[1])
+    self.assertIn('--stdout-offset 3 --stderr-offset 1', commands[2])
+
+  def testGivesUpWithoutProgress(self):
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self._Iter([''] * linux_virtual_machine.SSH_RETRIES)
+    self.assertRegexpMatches(
+        self.remote_command.call_args[0][0],
+        r'^rm -f .*\.stdout .*\.stderr .*\.status .*\.log$')
+
+  def testFailsFastIfFilesAreMissing(self):
+    process = self._Process(
+        '', linux_virtual_machine._FOLLOW_FILES_MISSING_EXIT_CODE)
+    with mock.patch.object(self.vm, 'StartRemoteCommand',
+                           return_value=process) as start_remote_command:
+      with self.assertRaisesRegexp(errors.VirtualMachine.RemoteCommandError,
+                                   'do not exist'):
+        list(self.vm.IterRobustRemoteCommand('cmd'))
+    self.assertEqual(start_remote_command.call_count, 1)
+
+  def testMalformedHeader(self):
+    for records in ('O 4\nab\ncO x\n', 'Q 1\nq', 'garbage\n'):
+      with self.assertRaisesRegexp(errors.VirtualMachine.RemoteCommandError,
+                                   'Unexpected record'):
+        self._Iter([records])
+
+  def testFailure(self):
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self._Iter(['E 4\nbad\nX 2\n'])
+    output, _ = self._Iter(['E 4\nbad\nX 2\n'], ignore_failure=True)
+    self.assertEqual(output, [('stderr', 'bad\n')])
+
+
 if __name__ == '__main__':
   unittest.main()
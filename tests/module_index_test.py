@@ -0,0 +1,161 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.module_index."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from perfkitbenchmarker import linux_benchmarks
+from perfkitbenchmarker import linux_packages
+from perfkitbenchmarker import module_index
+from perfkitbenchmarker import pkb
+from perfkitbenchmarker.linux_benchmarks import iperf_benchmark
+from perfkitbenchmarker.linux_packages import fio
+from perfkitbenchmarker.linux_packages import iperf
+
+_PACKAGE = 'perfkitbenchmarker.linux_packages'
+
+
+class GetFlagNamesTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+
+  def testFlags(self):
+    self.assertEqual(
+        module_index.GetFlagNames(
+            ['pkb.py', '--benchmarks=fio', '-fio_io_depths', '1', '--nofoo',
+             'positional', '--', '--ignored']),
+        set(['benchmarks', 'fio_io_depths', 'nofoo', 'foo']))
+
+  def testFlagFiles(self):
+    nested_path = os.path.join(self.temp_dir, 'nested')
+    with open(nested_path, 'w') as nested_file:
+      nested_file.write('--fio_hist_log\n')
+    path = os.path.join(self.temp_dir, 'flags')
+    with open(path, 'w') as flag_file:
+      flag_file.write('# Comment\n--benchmarks=fio\n--flagfile=%s\n'
+                      '--flagfile=%s\n' % (nested_path, path))
+    self.assertEqual(
+        module_index.GetFlagNames(['pkb.py', '--flagfile', path]),
+        set(['benchmarks', 'fio_hist_log']))
+
+  def testIsHelpRequested(self):
+    self.assertTrue(module_index.IsHelpRequested(['pkb.py', '--help']))
+    self.assertTrue(module_index.IsHelpRequested(
+        ['pkb.py', '--helpmatch=fio']))
+    self.assertFalse(module_index.IsHelpRequested(
+        ['pkb.py', '--benchmarks=fio']))
+
+
+class IndexTestCase(unittest.TestCase):
+
+  def testIndexesFlagsOfModules(self):
+    index = module_index._GetIndex()
+    self.assertIn('fio_hist_log', index[_PACKAGE]['fio']['flags'])
+    self.assertNotIn('fio_hist_log', index[linux_benchmarks.__name__][
+        'fio_benchmark']['flags'])
+
+  def testBenchmarkSummaries(self):
+    summaries = {
+        summary['benchmark_name']: summary
+        for summary in module_index.GetBenchmarkSummaries(
+            linux_benchmarks.__name__)}
+    self.assertEqual(summaries['iperf'], {
+        'benchmark_name': 'iperf',
+        'description': 'Run iperf',
+        'vm_count': 2,
+        'scratch_disk': False,
+        'flags': summaries['iperf']['flags']})
+
+  def testBenchmarkDocumentation(self):
+    doc = pkb._GenerateBenchmarkDocumentation()
+    self.assertIn('iperf: Run iperf (2 VMs)', doc.split('\n\t'))
+
+  def testPackageSignature(self):
+    signature = module_index._GetPackageSignature(_PACKAGE)
+    self.assertEqual([path for path, _ in signature['directories']],
+                     list(linux_packages.__path__))
+    self.assertIn('fio', [name for name, _ in signature['modules']])
+    with mock.patch.object(module_index.os, 'stat',
+                           side_effect=OSError()):
+      self.assertNotEqual(module_index._GetPackageSignature(_PACKAGE),
+                          signature)
+
+  def testImportModulesDefiningFlags(self):
+    module_index._GetIndex()
+    with mock.patch.object(module_index.importlib,
+                           'import_module') as import_module:
+      module_index.ImportModulesDefiningFlags(['not_a_flag'])
+    import_module.assert_not_called()
+
+
+class LazyModuleDictTestCase(unittest.TestCase):
+
+  def setUp(self):
+    index = {_PACKAGE: {'fio': {'flags': []}, 'iperf': {'flags': []}},
+             linux_benchmarks.__name__: {
+                 'iperf_benchmark': {'flags': [], 'benchmark_name': 'iperf'},
+                 'fio_helper': {'flags': []}}}
+    p = mock.patch.object(module_index, '_GetIndex', return_value=index)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def testImportsModules(self):
+    packages = module_index.LazyModuleDict(_PACKAGE)
+    self.assertEqual(list(packages), ['fio', 'iperf'])
+    self.assertIs(packages['fio'], fio)
+    self.assertNotIn('ycsb', packages)
+
+  def testKey(self):
+    benchmarks = module_index.LazyModuleDict(linux_benchmarks.__name__,
+                                             key='benchmark_name')
+    self.assertEqual(dict(benchmarks), {'iperf': iperf_benchmark})
+
+  def testExtraItems(self):
+    packages = module_index.LazyModuleDict(
+        _PACKAGE, extra_items=lambda: {'extra': 'value'})
+    self.assertEqual(packages['extra'], 'value')
+    self.assertEqual(len(packages), 3)
+
+  def testOverrides(self):
+    packages = module_index.LazyModuleDict(_PACKAGE)
+    with mock.patch.dict(packages, {'fake': 'value'}, clear=True):
+      self.assertEqual(dict(packages), {'fake': 'value'})
+      self.assertNotIn('fio', packages)
+    self.assertEqual(list(packages), ['fio', 'iperf'])
+    self.assertIs(packages['fio'], fio)
+
+  def testLazyModuleList(self):
+    modules = module_index.LazyModuleList(_PACKAGE)
+    self.assertEqual(len(modules), 2)
+    self.assertIs(modules[0], fio)
+    self.assertEqual(modules + [iperf_benchmark],
+                     [fio, iperf, iperf_benchmark])
+
+
+class PackagesTestCase(unittest.TestCase):
+
+  def testDockerImagePackages(self):
+    self.assertIn('fio', linux_packages.PACKAGES)
+    self.assertIn('cloudsuite/graph-analytics', linux_packages.PACKAGES)
+
+
+if __name__ == '__main__':
+  unittest.main()
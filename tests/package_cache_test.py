@@ -0,0 +1,179 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.package_cache."""
+
+import functools
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+import urllib
+
+import mock
+
+from perfkitbenchmarker import package_cache
+from tests import mock_flags
+
+
+class ArtifactCacheTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp(prefix='pkb-test-')
+    self.cache = package_cache.ArtifactCache(
+        os.path.join(self.temp_dir, 'cache'))
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def _Create(self, file_name, content):
+    file_path = os.path.join(self.temp_dir, file_name)
+    with open(file_path, 'w') as fp:
+      fp.write(content)
+    return file_path
+
+  def testGetMissingEntry(self):
+    self.assertEqual(self.cache.Get(['url', 'http://a/b.tgz', '']),
+                     (None, None))
+
+  def testPutIsContentAddressed(self):
+    path = self.cache.Put(['a'], self._Create('a.tgz', 'contents'))
+    other_path = self.cache.Put(['b'], self._Create('b.tgz', 'contents'))
+    self.assertEqual(path, other_path)
+    self.assertEqual(os.path.basename(path),
+                     hashlib.sha256('contents').hexdigest())
+    self.assertEqual(self.cache.Get(['a']), (path, 'a.tgz'))
+    self.assertEqual(self.cache.Get(['b']), (path, 'b.tgz'))
+
+  def testDownload(self):
+    url = 'file://' + urllib.pathname2url(self._Create('c.jar', 'jar'))
+    path = self.cache.Download(['c'], url, 'c.jar')
+    with open(path) as f:
+      self.assertEqual(f.read(), 'jar')
+    self.assertEqual(self.cache.Get(['c']), (path, 'c.jar'))
+
+  def testGetFromMirror(self):
+    self.cache.Put(['d'], self._Create('d.tgz', 'mirrored'))
+    mirror_url = 'file://' + urllib.pathname2url(self.cache.directory)
+    cache = package_cache.ArtifactCache(
+        os.path.join(self.temp_dir, 'other'), mirror=mirror_url)
+    path, file_name = cache.Get(['d'])
+    self.assertTrue(path.startswith(cache.directory))
+    self.assertEqual(file_name, 'd.tgz')
+    self.assertEqual(cache.Get(['e']), (None, None))
+
+  def testCorruptMirrorEntry(self):
+    path = self.cache.Put(['f'], self._Create('f.tgz', 'original'))
+    with open(path, 'w') as f:
+      f.write('modified')
+    mirror_url = 'file://' + urllib.pathname2url(self.cache.directory)
+    cache = package_cache.ArtifactCache(
+        os.path.join(self.temp_dir, 'other'), mirror=mirror_url)
+    with self.assertRaises(package_cache.CorruptEntryError):
+      cache.Get(['f'])
+
+
+class BuildOnceTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp(prefix='pkb-test-')
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.package_cache = True
+    self.mocked_flags.package_cache_dir = self.temp_dir
+    self.mocked_flags.package_mirror = None
+    p = mock.patch.object(package_cache, '_cache', None)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def _Vm(self, architecture='x86_64'):
+    vm = mock.Mock(OS_TYPE='debian')
+    vm.RemoteCommand.return_value = (architecture + '\n', '')
+
+    def PullFile(local_dir, remote_path):
+      with open(os.path.join(local_dir, os.path.basename(remote_path)),
+                'w') as f:
+        f.write('build')
+    vm.PullFile.side_effect = PullFile
+    return vm
+
+  def testBuildsOnce(self):
+    build = mock.Mock()
+    seed, peer = self._Vm(), self._Vm()
+    package_cache.BuildOnce(seed, 'fio', 'fio-2.17', '/opt/pkb/fio', build)
+    package_cache.BuildOnce(peer, 'fio', 'fio-2.17', '/opt/pkb/fio', build)
+    build.assert_called_once_with(seed)
+    self.assertTrue(seed.PullFile.called)
+    self.assertFalse(peer.PullFile.called)
+    self.assertTrue(peer.PushFile.called)
+    self.assertIn('tar -C /opt/pkb -xzf',
+                  peer.RemoteCommand.call_args[0][0])
+
+  def testBuildsPerVersion(self):
+    build = mock.Mock()
+    package_cache.BuildOnce(self._Vm(), 'fio', '1', '/opt/pkb/fio', build)
+    package_cache.BuildOnce(self._Vm(), 'fio', '2', '/opt/pkb/fio', build)
+    self.assertEqual(build.call_count, 2)
+
+  def testBuildsPerArchitecture(self):
+    build = mock.Mock()
+    package_cache.BuildOnce(self._Vm(), 'fio', '1', '/opt/pkb/fio', build)
+    package_cache.BuildOnce(self._Vm('aarch64'), 'fio', '1', '/opt/pkb/fio',
+                            build)
+    self.assertEqual(build.call_count, 2)
+
+  def testBuildsPerBuildFunction(self):
+    calls = []
+
+    def Build(vm):
+      calls.append(vm)
+
+    def BuildWithFlags(vm, flags=''):
+      calls.append(vm)
+
+    package_cache.BuildOnce(self._Vm(), 'fio', '1', '/opt/pkb/fio', Build)
+    package_cache.BuildOnce(self._Vm(), 'fio', '1', '/opt/pkb/fio', Build)
+    package_cache.BuildOnce(self._Vm(), 'fio', '1', '/opt/pkb/fio',
+                            functools.partial(BuildWithFlags, flags='-O2'))
+    package_cache.BuildOnce(self._Vm(), 'fio', '1', '/opt/pkb/fio',
+                            functools.partial(BuildWithFlags, flags='-O3'))
+    self.assertEqual(len(calls), 3)
+
+  def testDisabled(self):
+    self.mocked_flags.package_cache = False
+    build = mock.Mock()
+    vm = self._Vm()
+    package_cache.BuildOnce(vm, 'fio', '1', '/opt/pkb/fio', build)
+    build.assert_called_once_with(vm)
+    self.assertFalse(vm.RemoteCommand.called)
+
+
+class FetchFileTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.package_cache = False
+
+  def testDisabledDownloadsOnVm(self):
+    vm = mock.Mock()
+    path = package_cache.FetchFile(vm, 'http://host/dir/file.tgz',
+                                   '/opt/pkb')
+    self.assertEqual(path, '/opt/pkb/file.tgz')
+    vm.RemoteCommand.assert_called_once_with(
+        'mkdir -p /opt/pkb && curl -fsSL -o /opt/pkb/file.tgz '
+        'http://host/dir/file.tgz')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -107,5 +107,35 @@ class GcloudCommandTestCase(unittest.TestCase):
     self.assertEqual(return_value, mock_issue_return_value)
 
 
+class GceStatusPollerTestCase(unittest.TestCase):
+
+  def setUp(self):
+    super(GceStatusPollerTestCase, self).setUp()
+    p = mock.patch(util.__name__ + '.FLAGS')
+    self.mock_flags = p.start()
+    self.addCleanup(p.stop)
+    self.mock_flags.gcloud_path = _GCLOUD_PATH
+    self.mock_flags.additional_gcloud_flags = []
+    p = mock.patch(util.__name__ + '.vm_util.IssueCommand',
+                   return_value=('[{"name": "vm-1", "status": "RUNNING"}]',
+                                 '', 0))
+    self.mock_issue = p.start()
+    self.addCleanup(p.stop)
+    self.poller = util.GceStatusPoller('test-project', 'test-zone',
+                                       'instances')
+
+  def testListStatuses(self):
+    statuses = self.poller._ListStatuses(['vm-1', 'vm-2'])
+    self.assertEqual(statuses, {'vm-1': {'name': 'vm-1', 'status': 'RUNNING'}})
+    self.mock_issue.assert_called_once_with(
+        ['path/gcloud', 'compute', 'instances', 'list', '--format', 'json',
+         '--quiet', '--project', 'test-project', '--zones', 'test-zone',
+         '--filter', 'name=(vm-1 vm-2)'], suppress_warning=True)
+
+  def testFailedListFindsNothing(self):
+    self.mock_issue.return_value = ('', 'ERROR: internal error', 1)
+    self.assertEqual(self.poller._ListStatuses(['vm-1']), {})
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -13,18 +13,27 @@
 # limitations under the License.
 """Tests for perfkitbenchmarker.publisher."""
 
+import base64
+import BaseHTTPServer
 import collections
 import csv
 import io
 import json
+import os
 import re
+import shutil
+import SocketServer
 import tempfile
+import threading
+import time
 import uuid
 import unittest
+import zlib
 
 import mock
 
 from perfkitbenchmarker import publisher
+from perfkitbenchmarker import results_store
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.providers.gcp import util
@@ -103,6 +112,12 @@ class NewlineDelimitedJSONPublisherTestCase(unittest.TestCase):
                           {u'test': u'testb', u'labels': u'|key2:val2|'}],
                          result)
 
+  def testLaterBatchesAreAppended(self):
+    self.instance.PublishSamples([{'test': 'testa', 'metadata': {}}])
+    self.instance.PublishSamples([{'test': 'testb', 'metadata': {}}])
+    result = [json.loads(i)['test'] for i in self.fp]
+    self.assertListEqual([u'testa', u'testb'], result)
+
 
 class BigQueryPublisherTestCase(unittest.TestCase):
 
@@ -129,6 +144,7 @@ class BigQueryPublisherTestCase(unittest.TestCase):
         ['bq',
          'load',
          '--source_format=NEWLINE_DELIMITED_JSON',
+         '--ignore_unknown_values',
          self.table,
          mock.ANY])
 
@@ -184,6 +200,156 @@ class CloudStoragePublisherTestCase(unittest.TestCase):
          'gs://test-bucket/141764776338_be428eb'])
 
 
+class _FakeElasticsearchHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Answers Elasticsearch index and _bulk API requests for tests."""
+
+  protocol_version = 'HTTP/1.1'
+
+  def log_message(self, *args):
+    pass
+
+  def _Respond(self, status, body=''):
+    self.send_response(status)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def _ReadBody(self):
+    body = self.rfile.read(int(self.headers.getheader('Content-Length', 0)))
+    if self.headers.getheader('Content-Encoding') == 'gzip':
+      body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    return body
+
+  def do_HEAD(self):
+    self.server.ports.add(self.client_address[1])
+    self.server.authorizations.add(self.headers.getheader('Authorization'))
+    self._Respond(200 if self.path in self.server.indices else 404)
+
+  def do_PUT(self):
+    self.server.ports.add(self.client_address[1])
+    self.server.indices[self.path] = json.loads(self._ReadBody())
+    self._Respond(200, '{"acknowledged": true}')
+
+  def do_POST(self):
+    self.server.ports.add(self.client_address[1])
+    self.server.encodings.append(self.headers.getheader('Content-Encoding'))
+    self.server.authorizations.add(self.headers.getheader('Authorization'))
+    lines = self._ReadBody().splitlines()
+    items = []
+    for action, doc in zip(lines[::2], lines[1::2]):
+      doc_id = json.loads(action)['create']['_id']
+      if doc_id in self.server.reject:
+        status = self.server.reject.pop(doc_id)
+      else:
+        status = 201
+        self.server.docs[doc_id] = json.loads(doc)
+      items.append({'create': {'_id': doc_id, 'status': status}})
+    self._Respond(200, json.dumps({
+        'errors': any(item['create']['status'] != 201 for item in items),
+        'items': items}))
+
+
+class _ThreadedHTTPServer(SocketServer.ThreadingMixIn,
+                          BaseHTTPServer.HTTPServer):
+  daemon_threads = True
+
+
+class ElasticsearchPublisherTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.server = _ThreadedHTTPServer(('localhost', 0),
+                                      _FakeElasticsearchHandler)
+    self.server.indices = {}
+    self.server.docs = {}
+    self.server.reject = {}
+    self.server.ports = set()
+    self.server.encodings = []
+    self.server.authorizations = set()
+    thread = threading.Thread(target=self.server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    self.addCleanup(self.server.server_close)
+    self.addCleanup(self.server.shutdown)
+    p = mock.patch.object(publisher, '_SleepBeforeRetry')
+    self.sleep = p.start()
+    self.addCleanup(p.stop)
+    self.samples = [
+        {'sample_uri': str(i), 'timestamp': 1.5, 'metric': 'm', 'value': i,
+         'metadata': {'a.b': {'c.d': i}}}
+        for i in range(10)]
+
+  def _CreatePublisher(self, userinfo='', **kwargs):
+    es_uri = 'http://%slocalhost:%d' % (userinfo,
+                                        self.server.server_address[1])
+    return publisher.ElasticsearchPublisher(
+        es_uri=es_uri, es_index='PerfKit', es_type='result', bulk_size=3,
+        **kwargs)
+
+  def testBulkPublishSamples(self):
+    self._CreatePublisher().PublishSamples(self.samples)
+    self.assertIn('/perfkit', self.server.indices)
+    self.assertEqual(len(self.server.docs), 10)
+    self.assertEqual(self.server.docs['4'], {
+        'sample_uri': '4', 'timestamp': '1970-01-01 00:00:01.500000',
+        'metric': 'm', 'value': 4, 'metadata': {'a_b': {'c_d': 4}}})
+    # Samples are not modified.
+    self.assertEqual(self.samples[4]['metadata'], {'a.b': {'c.d': 4}})
+    # Requests reuse one connection.
+    self.assertEqual(len(self.server.ports), 1)
+    self.assertEqual(self.server.encodings, [None] * 4)
+    self.assertEqual(self.server.authorizations, {None})
+
+  def testCredentials(self):
+    self._CreatePublisher(userinfo='elastic:p%40ss@').PublishSamples(
+        self.samples)
+    self.assertEqual(len(self.server.docs), 10)
+    self.assertEqual(self.server.authorizations,
+                     {'Basic ' + base64.b64encode('elastic:p@ss')})
+
+  def testGzip(self):
+    self._CreatePublisher(gzip=True, parallelism=4).PublishSamples(
+        self.samples)
+    self.assertEqual(len(self.server.docs), 10)
+    self.assertEqual(self.server.encodings, ['gzip'] * 4)
+
+  def testRetriesRejectedSamples(self):
+    self.server.reject = {'1': 429, '5': 503, '7': 400}
+    with mock.patch.object(publisher.logging, 'error') as error:
+      self._CreatePublisher().PublishSamples(self.samples)
+    self.assertItemsEqual(self.server.docs,
+                          [str(i) for i in range(10) if i != 7])
+    self.assertEqual(self.sleep.call_count, 2)
+    error.assert_any_call(mock.ANY, 1, 10, 'perfkit')
+
+  def testGivesUpAfterMaxRetries(self):
+    self.server.reject = {'1': 429}
+    with mock.patch.object(publisher.logging, 'error') as error:
+      self._CreatePublisher(max_retries=0).PublishSamples(self.samples)
+    self.assertEqual(len(self.server.docs), 9)
+    self.sleep.assert_not_called()
+    error.assert_any_call(mock.ANY, 1, 10, 'perfkit')
+
+  def testPublishersFromFlags(self):
+    with mock.patch(publisher.__name__ + '.FLAGS') as mock_flags:
+      mock_flags.json_path = None
+      mock_flags.bigquery_table = None
+      mock_flags.cloud_storage_bucket = None
+      mock_flags.csv_path = None
+      mock_flags.sqlite_path = None
+      mock_flags.influx_uri = None
+      mock_flags.es_uri = 'http://localhost:9200'
+      mock_flags.es_index = 'perfkit'
+      mock_flags.es_type = 'result'
+      mock_flags.es_bulk_size = 100
+      mock_flags.es_bulk_parallelism = 2
+      mock_flags.es_gzip = True
+      mock_flags.es_max_retries = 3
+      es_publisher, = publisher.SampleCollector._PublishersFromFlags()
+    self.assertEqual((es_publisher.bulk_size, es_publisher.parallelism,
+                      es_publisher.gzip, es_publisher.max_retries),
+                     (100, 2, True, 3))
+
+
 class SampleCollectorTestCase(unittest.TestCase):
 
   def setUp(self):
@@ -234,6 +400,125 @@ class SampleCollectorTestCase(unittest.TestCase):
         },
         self.instance.samples[0])
 
+  def testPublishSamples(self):
+    mock_publisher = mock.MagicMock()
+    self.instance.publishers = [mock_publisher]
+    self.instance.AddSamples([self.sample], self.benchmark,
+                             self.benchmark_spec)
+    self.assertTrue(self.instance.HasUnpublishedSamples())
+    self.instance.PublishSamples()
+    mock_publisher.PublishSamples.assert_called_once_with([mock.ANY])
+    self.assertFalse(self.instance.HasUnpublishedSamples())
+
+
+class StreamingSampleCollectorTestCase(unittest.TestCase):
+
+  def setUp(self):
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    p = mock.patch(publisher.__name__ + '.FLAGS')
+    self.mock_flags = p.start()
+    self.addCleanup(p.stop)
+    self.mock_flags.stream_samples = True
+    self.mock_flags.sample_publish_batch_size = 2
+    self.mock_flags.product_name = 'PerfKitBenchmarker'
+    self.mock_flags.official = False
+    self.mock_flags.owner = 'owner'
+    p = mock.patch(vm_util.__name__ + '.GetTempDir', return_value=temp_dir)
+    p.start()
+    self.addCleanup(p.stop)
+    self.mock_publisher = mock.MagicMock()
+    self.instance = publisher.SampleCollector(
+        metadata_providers=[], publishers=[self.mock_publisher],
+        publishers_from_flags=False, add_default_publishers=False)
+    self.samples = [sample.Sample('widgets', i, 'oz', {}) for i in range(5)]
+    self.benchmark_spec = mock.MagicMock(uuid='uuid')
+
+  def _PublishedValues(self):
+    return [[s['value'] for s in call[0][0]]
+            for call in self.mock_publisher.PublishSamples.call_args_list]
+
+  def testSamplesAreSpilled(self):
+    self.instance.AddSamples(self.samples, 'test', self.benchmark_spec)
+    self.assertEqual([], self.instance.samples)
+    with open(self.instance.spill_file.path) as fp:
+      self.assertEqual(5, len(fp.readlines()))
+
+  def testPublishSamplesInBatches(self):
+    self.instance.AddSamples(self.samples, 'test', self.benchmark_spec)
+    self.instance.PublishSamples()
+    self.assertEqual([[0, 1], [2, 3], [4]], self._PublishedValues())
+    self.assertFalse(self.instance.HasUnpublishedSamples())
+
+  def testPublishSamplesIncrementally(self):
+    self.instance.AddSamples(self.samples[:1], 'test', self.benchmark_spec)
+    self.instance.PublishSamples()
+    self.instance.AddSamples(self.samples[1:2], 'test', self.benchmark_spec)
+    self.instance.PublishSamples()
+    self.instance.PublishSamples()
+    self.assertEqual([[0], [1]], self._PublishedValues())
+
+  def testImportExportedSpillFile(self):
+    child = publisher.SampleCollector(metadata_providers=[], publishers=[],
+                                      publishers_from_flags=False,
+                                      add_default_publishers=False)
+    child.AddSamples(self.samples[:3], 'test', self.benchmark_spec)
+    self.instance.ImportSamples(child.ExportSamples())
+    self.assertTrue(self.instance.HasUnpublishedSamples())
+    self.instance.PublishSamples()
+    self.assertEqual([[0, 1], [2]], self._PublishedValues())
+
+  def testPublishingPeriodically(self):
+    child = publisher.SampleCollector(metadata_providers=[], publishers=[],
+                                      publishers_from_flags=False,
+                                      add_default_publishers=False,
+                                      spill_name='child')
+    self.instance.ImportSamples(publisher.SampleSpillFile(
+        publisher.GetSpillFilePath('child')))
+    with self.instance.PublishingPeriodically(0.01):
+      child.AddSamples(self.samples[:1], 'test', self.benchmark_spec)
+      for _ in range(500):
+        if self.mock_publisher.PublishSamples.called:
+          break
+        time.sleep(0.01)
+      # Samples are published while the child is still adding samples.
+      self.assertEqual([[0]], self._PublishedValues())
+      child.AddSamples(self.samples[1:2], 'test', self.benchmark_spec)
+    # Importing the exported spill file again does not publish twice.
+    self.instance.ImportSamples(child.ExportSamples())
+    self.instance.PublishSamples()
+    self.assertEqual([0, 1], sum(self._PublishedValues(), []))
+
+
+class SampleSpillFileTestCase(unittest.TestCase):
+
+  def setUp(self):
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    self.spill_file = publisher.SampleSpillFile(
+        os.path.join(temp_dir, 'samples.json'))
+
+  def testMissingFile(self):
+    self.assertFalse(self.spill_file.HasUnreadSamples())
+    self.assertEqual([], list(self.spill_file.ReadBatches(10)))
+
+  def testPartialLineIsNotRead(self):
+    self.spill_file.Append([{'value': 1}])
+    with open(self.spill_file.path, 'ab') as fp:
+      fp.write('{"value"')
+    self.assertEqual([[{'value': 1}]], list(self.spill_file.ReadBatches(10)))
+    with open(self.spill_file.path, 'ab') as fp:
+      fp.write(': 2}\n')
+    self.assertEqual([[{'value': 2}]], list(self.spill_file.ReadBatches(10)))
+
+  def testFailedBatchIsReadAgain(self):
+    self.spill_file.Append([{'value': 1}, {'value': 2}])
+    with self.assertRaises(ValueError):
+      for _ in self.spill_file.ReadBatches(1):
+        raise ValueError()
+    self.assertEqual([[{'value': 1}], [{'value': 2}]],
+                     list(self.spill_file.ReadBatches(1)))
+
 
 class DefaultMetadataProviderTestCase(unittest.TestCase):
 
@@ -263,6 +548,7 @@ class DefaultMetadataProviderTestCase(unittest.TestCase):
                                   zone='us-central1-a',
                                   machine_type='n1-standard-1',
                                   image='ubuntu-14-04',
+                                  golden_image=None,
                                   scratch_disks=[],
                                   hostname='Hostname')
     self.mock_vm.GetMachineTypeDict.return_value = {
@@ -299,6 +585,13 @@ class DefaultMetadataProviderTestCase(unittest.TestCase):
     meta.pop('num_striped_disks')
     self._RunTest(self.mock_spec, meta)
 
+  def testAddMetadata_GoldenImage(self):
+    self.mock_vm.configure_mock(golden_image='pkb-golden-0123')
+    expected = self.default_meta.copy()
+    expected.pop('num_striped_disks')
+    expected['golden_image'] = 'pkb-golden-0123'
+    self._RunTest(self.mock_spec, expected)
+
   def testAddMetadata_WithScratchDisk(self):
     self.mock_disk.configure_mock(disk_type='disk-type')
     self.mock_vm.configure_mock(scratch_disks=[self.mock_disk])
@@ -405,6 +698,40 @@ class CSVPublisherTestCase(unittest.TestCase):
     self.assertEqual(['key1', 'key3'], reader.fieldnames[-2:])
     self.assertEqual(3, len(rows))
 
+  def testLaterBatchesAreAppended(self):
+    instance = publisher.CSVPublisher(self.tf.name)
+    instance.PublishSamples([{'test': 'testa', 'metric': '1', 'value': 1.0,
+                              'unit': 'MB', 'metadata': {'key1': 'value1'}}])
+    instance.PublishSamples([{'test': 'testa', 'metric': '2', 'value': 2.0,
+                              'unit': 'MB', 'metadata': {'key1': 'value2'}}])
+    instance.PublishSamples([{'test': 'testa', 'metric': '3', 'value': 3.0,
+                              'unit': 'MB', 'metadata': {'key0': 'value3'}}])
+    with open(self.tf.name) as fp:
+      reader = csv.DictReader(fp)
+      rows = list(reader)
+    self.assertEqual(['key0', 'key1'], reader.fieldnames[-2:])
+    self.assertEqual([('1', '', 'value1'), ('2', '', 'value2'),
+                      ('3', 'value3', '')],
+                     [(r['metric'], r['key0'], r['key1']) for r in rows])
+
+
+class SQLitePublisherTestCase(unittest.TestCase):
+
+  def testPublishSamples(self):
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    path = os.path.join(temp_dir, 'results.db')
+    instance = publisher.SQLitePublisher(path, indexed_metadata_keys=['key1'])
+    for i in range(2):
+      instance.PublishSamples([{
+          'test': 'testa', 'metric': 'm', 'value': i, 'unit': 'MB',
+          'timestamp': i, 'run_uri': 'run', 'sample_uri': str(i),
+          'metadata': {'key1': 'value%d' % i}}])
+    store = results_store.ResultsStore(path)
+    self.addCleanup(store.Close)
+    self.assertEqual(
+        [s['value'] for s in store.Query(metadata={'key1': 'value1'})], [1])
+
 
 class InfluxDBPublisherTestCase(unittest.TestCase):
   def setUp(self):
@@ -512,12 +839,22 @@ class InfluxDBPublisherTestCase(unittest.TestCase):
     ]
 
     mock_publish_method.return_value = None
-    self.test_db.PublishSamples(samples)
-    mock_publish_method.assert_called_once_with(expected)
+    with mock.patch.object(self.test_db, '_CreateDB'):
+      self.test_db.PublishSamples(samples)
+    mock_publish_method.assert_called_once_with(mock.ANY)
+    self.assertEqual(list(mock_publish_method.call_args[0][0]), expected)
+
+  @mock.patch.object(publisher.InfluxDBPublisher, '_Publish')
+  @mock.patch.object(publisher.InfluxDBPublisher, '_CreateDB',
+                     side_effect=IOError('Connection refused'))
+  def testPublishSamplesWithoutDatabase(self, _, mock_publish_method):
+    with mock.patch.object(publisher.logging, 'error'):
+      self.test_db.PublishSamples([{}, {}, {}])
+    self.assertFalse(mock_publish_method.called)
+    self.assertEqual(self.test_db.stats['failed_samples'], 3)
 
   @mock.patch.object(publisher.InfluxDBPublisher, '_WriteData')
-  @mock.patch.object(publisher.InfluxDBPublisher, '_CreateDB')
-  def testPublish(self, mock_create_db, mock_write_data):
+  def testPublish(self, mock_write_data):
     formatted_samples = [
         ('perfkitbenchmarker,test=testc,official=1.0,owner=Rackspace,'
          'run_uri=323,sample_uri=33,metric=1,unit=MB,info=1,more_info=2,'
@@ -538,8 +875,133 @@ class InfluxDBPublisherTestCase(unittest.TestCase):
                        'owner=Rackspace,run_uri=5rtw,sample_uri=5r,'
                        'metric=3,unit=us value=non 123000000000')
 
-    mock_create_db.return_value = None
     mock_write_data.return_value = None
     self.test_db._Publish(formatted_samples)
-    mock_create_db.assert_called_once()
     mock_write_data.assert_called_once_with(expected_output)
+
+
+class _FakeInfluxDBHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Answers Influx DB query and write requests for tests."""
+
+  protocol_version = 'HTTP/1.1'
+
+  def log_message(self, *args):
+    pass
+
+  def do_POST(self):
+    server = self.server
+    server.ports.add(self.client_address[1])
+    body = self.rfile.read(int(self.headers.getheader('Content-Length', 0)))
+    if self.path.startswith('/query'):
+      server.queries.append(self.path)
+    elif server.write_statuses:
+      status = server.write_statuses.pop(0)
+    else:
+      status = 204
+      if self.headers.getheader('Content-Encoding') == 'gzip':
+        body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+      server.writes.append((self.path, body))
+    if self.path.startswith('/query'):
+      status = 200
+    self.send_response(status)
+    self.send_header('Content-Length', '0')
+    self.end_headers()
+
+
+class InfluxDBPublisherWriteTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(publisher.__name__ + '.FLAGS', official=False,
+                   owner='pkb', run_uri='abc', product_name='PKB')
+    p.start()
+    self.addCleanup(p.stop)
+    self.server = _ThreadedHTTPServer(('localhost', 0), _FakeInfluxDBHandler)
+    self.server.queries = []
+    self.server.writes = []
+    self.server.write_statuses = []
+    self.server.ports = set()
+    thread = threading.Thread(target=self.server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    self.addCleanup(self.server.server_close)
+    self.addCleanup(self.server.shutdown)
+    p = mock.patch.object(publisher.time, 'sleep')
+    self.sleep = p.start()
+    self.addCleanup(p.stop)
+    self.samples = [
+        {'test': 'iperf', 'metric': 'Throughput', 'official': False,
+         'value': i, 'unit': 'Mbits/sec', 'owner': 'pkb', 'run_uri': 'abc',
+         'sample_uri': str(i), 'timestamp': 1.5, 'metadata': {'ip type': 'x'}}
+        for i in range(10)]
+
+  def _CreatePublisher(self, **kwargs):
+    return publisher.InfluxDBPublisher(
+        'localhost:%d' % self.server.server_address[1], 'perfkit', **kwargs)
+
+  def _GetSampleWrites(self):
+    """Returns the writes of samples, without those of publishing stats."""
+    return [(path, body) for path, body in self.server.writes
+            if 'test=%s,' % publisher.INFLUX_STATS_TEST not in body]
+
+  def testWritesBatches(self):
+    test_db = self._CreatePublisher(max_batch_bytes=500, precision='ms')
+    test_db.PublishSamples(self.samples[:5])
+    test_db.PublishSamples(self.samples[5:])
+    self.assertEqual(len(self.server.queries), 1)
+    self.assertEqual(len(self.server.ports), 1)
+    lines = []
+    for path, body in self._GetSampleWrites():
+      self.assertEqual(path, '/write?db=perfkit&precision=ms')
+      self.assertLessEqual(len(body), 500)
+      lines.extend(body.split('\n'))
+    self.assertEqual(len(self._GetSampleWrites()), 4)
+    self.assertEqual(len(lines), 10)
+    self.assertEqual(
+        lines[0],
+        'perfkitbenchmarker,test=iperf,official=False,owner=pkb,run_uri=abc,'
+        'sample_uri=0,metric=Throughput,unit=Mbits/sec,ip\\ type=x '
+        'value=0 1500')
+    self.assertEqual(test_db.stats['samples'], 10)
+    self.assertEqual(test_db.stats['requests'], 4)
+
+  def testWritesStatsSamples(self):
+    test_db = self._CreatePublisher()
+    test_db.PublishSamples(self.samples)
+    test_db.PublishSamples([])
+    self.assertEqual(len(self.server.writes), 2)
+    self.assertEqual(test_db.stats['requests'], 1)
+    stats_lines = self.server.writes[1][1].split('\n')
+    self.assertEqual(len(stats_lines), 3)
+    for line, metric, value in zip(
+        stats_lines,
+        ('Influx\\ DB\\ Publish\\ Throughput',
+         'Influx\\ DB\\ Published\\ Samples',
+         'Influx\\ DB\\ Failed\\ Samples'),
+        (None, '10', '0')):
+      self.assertIn('test=influxdb_publisher,', line)
+      self.assertIn(',metric=%s,' % metric, line)
+      if value is not None:
+        self.assertIn(' value=%s ' % value, line)
+
+  def testGzip(self):
+    self._CreatePublisher(gzip=True).PublishSamples(self.samples)
+    self.assertEqual(len(self._GetSampleWrites()), 1)
+    self.assertEqual(len(self._GetSampleWrites()[0][1].split('\n')), 10)
+
+  def testRetriesFailedWrites(self):
+    self.server.write_statuses = [503, 429]
+    test_db = self._CreatePublisher()
+    test_db.PublishSamples(self.samples)
+    self.assertEqual(len(self._GetSampleWrites()), 1)
+    self.assertEqual(self.sleep.call_count, 2)
+    self.assertEqual(test_db.stats['failed_samples'], 0)
+
+  def testCountsFailedWrites(self):
+    self.server.write_statuses = [400]
+    test_db = self._CreatePublisher(max_batch_bytes=500)
+    with mock.patch.object(publisher.logging, 'error'):
+      test_db.PublishSamples(self.samples)
+    self.assertEqual(len(self._GetSampleWrites()), 3)
+    self.assertEqual(test_db.stats['samples'] +
+                     test_db.stats['failed_samples'], 10)
+    self.assertGreater(test_db.stats['failed_samples'], 0)
@@ -0,0 +1,232 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.rate_limiter."""
+
+import unittest
+
+import mock
+
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import rate_limiter
+from perfkitbenchmarker import resource
+from perfkitbenchmarker import vm_util
+from tests import mock_flags
+
+
+class FakeClock(object):
+  """Replaces time.time and time.sleep with a clock advanced by sleep."""
+
+  def __init__(self):
+    self.now = 1000.0
+    self.sleeps = []
+
+  def time(self):
+    return self.now
+
+  def sleep(self, seconds):
+    self.sleeps.append(seconds)
+    self.now += seconds
+
+
+class RateLimiterTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.clock = FakeClock()
+    for module in (rate_limiter, vm_util):
+      p = mock.patch.object(module, 'time', self.clock)
+      p.start()
+      self.addCleanup(p.stop)
+    p = mock.patch.object(rate_limiter, '_limiters', {})
+    p.start()
+    self.addCleanup(p.stop)
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.api_rate_limit = 10
+    self.mocked_flags.api_rate_limit_burst = 2
+    self.mocked_flags.api_rate_limits = ['aws:ec2=1']
+    self.mocked_flags.retry_budget_ratio = 0.5
+    self.mocked_flags.retry_budget_min_rate = 0
+    self.mocked_flags.default_timeout = 1200
+
+
+class TokenBucketTestCase(RateLimiterTestCase):
+
+  def testSpacesCallsAfterBurst(self):
+    bucket = rate_limiter.TokenBucket(rate=2, capacity=2)
+    waits = [bucket.Acquire() for _ in range(4)]
+    self.assertEqual(waits, [0, 0, 0.5, 0.5])
+
+  def testDeadline(self):
+    bucket = rate_limiter.TokenBucket(rate=1, capacity=1)
+    bucket.Acquire()
+    self.assertIsNone(bucket.Acquire(deadline=self.clock.now + 0.5))
+    self.assertEqual(bucket.Acquire(deadline=self.clock.now + 1), 1)
+
+  def testNoRate(self):
+    bucket = rate_limiter.TokenBucket(rate=0, capacity=1)
+    self.assertEqual(bucket.Acquire(), 0)
+    self.assertIsNone(bucket.Acquire())
+    bucket.Deposit(1)
+    self.assertEqual(bucket.Acquire(), 0)
+
+
+class ApiLimiterTestCase(RateLimiterTestCase):
+
+  def testRatePerApi(self):
+    self.assertIs(rate_limiter.GetApiLimiter('aws:ec2'),
+                  rate_limiter.GetApiLimiter('aws:ec2'))
+    limiter = rate_limiter.GetApiLimiter('aws:ec2')
+    for _ in range(3):
+      limiter.BeforeCall()
+    self.assertEqual(self.clock.sleeps, [1])
+
+  def testRetryBudget(self):
+    limiter = rate_limiter.GetApiLimiter('gcloud:compute')
+    # The budget starts full.
+    self.assertTrue(limiter.BeforeCall(retry=True))
+    self.assertTrue(limiter.BeforeCall(retry=True))
+    self.assertFalse(limiter.BeforeCall(retry=True))
+    # Two calls earn one retry.
+    limiter.BeforeCall()
+    limiter.BeforeCall()
+    self.assertTrue(limiter.BeforeCall(retry=True))
+    self.assertFalse(limiter.BeforeCall(retry=True))
+
+  def testSamples(self):
+    limiter = rate_limiter.GetApiLimiter('aws:ec2')
+    rate_limiter.GetApiLimiter('gcloud:compute').BeforeCall()
+    for _ in range(3):
+      limiter.BeforeCall()
+    limiter.RecordError(Exception('An error occurred (RequestLimitExceeded)'))
+    limiter.RecordError(Exception('InvalidInstanceID.NotFound'))
+    limiter.BeforeCall(retry=True)
+    samples = rate_limiter.GetSamples()
+    self.assertEqual(
+        [(s.metric, s.value) for s in samples],
+        [('API Rate Limit Wait Time', 2), ('API Retries', 1),
+         ('API Throttling Errors', 1)])
+    self.assertEqual(samples[0].metadata, {'api': 'aws:ec2', 'api_calls': 4,
+                                           'retry_budget_exhausted': 0})
+    self.assertEqual(rate_limiter.GetSamples(), [])
+
+  def testGetCommandApi(self):
+    self.assertEqual(rate_limiter.GetCommandApi(
+        ['aws', '--output', 'json', 'ec2', 'run-instances']), 'aws:ec2')
+    self.assertEqual(rate_limiter.GetCommandApi(
+        ['/usr/bin/gcloud', '--format=json', 'compute', 'instances']),
+        'gcloud:compute')
+    self.assertEqual(rate_limiter.GetCommandApi(['az'], env={}), 'az')
+
+  def testValidateApiRateLimits(self):
+    self.assertTrue(rate_limiter._ValidateApiRateLimits(
+        ['aws:ec2=5', 'gcloud:compute=0.5']))
+    self.assertTrue(rate_limiter._ValidateApiRateLimits([]))
+    for value in ('aws:ec2', 'aws:ec2=fast', '=5', 'aws:ec2=-1'):
+      self.assertFalse(rate_limiter._ValidateApiRateLimits([value]), value)
+
+
+class RetryTestCase(RateLimiterTestCase):
+
+  def _Flaky(self, failures, message='failed'):
+    calls = []
+
+    def Call(cmd):
+      calls.append(cmd)
+      if len(calls) <= failures:
+        raise errors.VmUtil.CalledProcessException(message)
+      return 'done'
+    return Call, calls
+
+  def testBackoffWithDecorrelatedJitter(self):
+    call, calls = self._Flaky(5)
+    retried = vm_util.Retry(poll_interval=1, max_poll_interval=10,
+                            log_errors=False)(call)
+    with mock.patch.object(vm_util.random, 'uniform',
+                           side_effect=lambda low, high: high):
+      self.assertEqual(retried(['ls']), 'done')
+    self.assertEqual(len(calls), 6)
+    self.assertEqual(self.clock.sleeps, [3, 9, 10, 10, 10])
+
+  def testApiRetryBudget(self):
+    self.mocked_flags.api_rate_limit = 0
+    call, calls = self._Flaky(10, 'Throttling: Rate exceeded')
+    retried = vm_util.Retry(poll_interval=1, fuzz=0, log_errors=False,
+                            api=rate_limiter.GetCommandApi)(call)
+    with self.assertRaises(errors.VmUtil.CalledProcessException):
+      retried(['gcloud', 'compute', 'instances', 'list'])
+    # The budget, full at 2 retries, is spent.
+    self.assertEqual(len(calls), 3)
+    limiter = rate_limiter.GetApiLimiter('gcloud:compute')
+    self.assertEqual(limiter.PopStats(), {
+        'calls': 3, 'retries': 2, 'throttling_errors': 3,
+        'retry_budget_exhausted': 1, 'wait_time': 0})
+
+
+class _PolledResource(resource.BaseResource):
+  """Resource whose existence and readiness checks issue CLI commands."""
+
+  def _Create(self):
+    pass
+
+  def _Delete(self):
+    self.deleted = True
+
+  def _Exists(self):
+    vm_util.IssueCommand(['aws', 'ec2', 'describe-instances'])
+    return not getattr(self, 'deleted', False)
+
+  def _IsReady(self):
+    vm_util.IssueCommand(['aws', 'ec2', 'describe-instances'])
+    return True
+
+
+class LimitingCommandsTestCase(RateLimiterTestCase):
+
+  def setUp(self):
+    super(LimitingCommandsTestCase, self).setUp()
+    self.mocked_flags.api_rate_limit = 0
+    self.mocked_flags.api_rate_limits = []
+    p = mock.patch.object(vm_util, 'IssueCommandAsync')
+    self.issue_command_async = p.start()
+    self.addCleanup(p.stop)
+    self.issue_command_async.return_value.Result.return_value = (
+        '', 'RequestLimitExceeded', 1)
+
+  def _GetStats(self, api='aws:ec2'):
+    return rate_limiter.GetApiLimiter(api).PopStats()
+
+  def testIssueCommand(self):
+    vm_util.IssueCommand(['aws', 'ec2', 'describe-instances'])
+    self.assertEqual(rate_limiter._limiters, {})
+    with rate_limiter.LimitingCommands():
+      vm_util.IssueCommand(['aws', 'ec2', 'describe-instances'])
+    stats = self._GetStats()
+    self.assertEqual((stats['calls'], stats['throttling_errors']), (1, 1))
+
+  def testRetryLimitsCommandsOnce(self):
+    retried = vm_util.Retry(api=rate_limiter.GetCommandApi)(
+        vm_util.IssueCommand)
+    with rate_limiter.LimitingCommands():
+      retried(['aws', 'ec2', 'describe-instances'])
+    self.assertEqual(self._GetStats()['calls'], 1)
+
+  def testResourceStatusChecks(self):
+    polled_resource = _PolledResource()
+    polled_resource.Create()
+    polled_resource.Delete()
+    # _Exists after creation and deletion, and _IsReady.
+    self.assertEqual(self._GetStats()['calls'], 3)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,159 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.results_store."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from perfkitbenchmarker import results_store
+
+
+def _Sample(i, test='iperf', metric='Throughput', value=None, **metadata):
+  return {'test': test, 'metric': metric,
+          'value': float(i if value is None else value), 'unit': 'Mbps',
+          'timestamp': 1000.0 + i, 'run_uri': 'run%d' % (i // 2),
+          'sample_uri': '%s-%s-%d' % (test, metric, i), 'official': False,
+          'owner': 'pkb', 'product_name': 'PerfKitBenchmarker',
+          'metadata': metadata}
+
+
+class ResultsStoreTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    self.path = os.path.join(self.temp_dir, 'results.db')
+    self.store = results_store.ResultsStore(self.path)
+    self.addCleanup(self.store.Close)
+    self.store.AddSamples(
+        [_Sample(i, cloud='GCP' if i % 2 else 'AWS', vm_count=i % 3)
+         for i in range(6)] +
+        [_Sample(i, metric='Latency', cloud='GCP') for i in range(2)])
+
+  def _Values(self, samples):
+    return [s['value'] for s in samples]
+
+  def testQuery(self):
+    samples = self.store.Query(test='iperf', metric='Throughput')
+    self.assertEqual(self._Values(samples), [0, 1, 2, 3, 4, 5])
+    self.assertEqual(samples[1], _Sample(1, cloud='GCP', vm_count=1))
+
+  def testQueryFilters(self):
+    self.assertEqual(self._Values(self.store.Query(
+        metric=['Throughput'], run_uri=['run1', 'run2'], start_time=1003,
+        end_time=1005)), [3, 4])
+    self.assertEqual(self._Values(self.store.Query(metric='Latency',
+                                                   limit=1)), [0])
+    self.assertEqual(self.store.Query(test='fio'), [])
+
+  def testQueryByMetadata(self):
+    self.assertEqual(self._Values(self.store.Query(
+        metric='Throughput', metadata={'cloud': 'GCP'})), [1, 3, 5])
+    # vm_count is not indexed, and is compared as text.
+    self.assertEqual(self._Values(self.store.Query(
+        metadata={'cloud': ['AWS', 'GCP'], 'vm_count': 1}, limit=1)), [1])
+
+  def testAggregate(self):
+    results = self.store.Aggregate(['metric', 'metadata.cloud'],
+                                   test='iperf')
+    self.assertEqual(
+        [(r['metric'], r['metadata.cloud'], r['count'], r['mean'], r['min'],
+          r['max']) for r in results],
+        [('Latency', 'GCP', 2, 0.5, 0, 1),
+         ('Throughput', 'AWS', 3, 2, 0, 4),
+         ('Throughput', 'GCP', 3, 3, 1, 5)])
+    self.assertAlmostEqual(results[1]['stddev'], (8 / 3.0) ** 0.5)
+
+  def testAggregateStdDevOfLargeValues(self):
+    self.store.AddSamples([_Sample(i, test='clock', value=1e9 + i)
+                           for i in (0, 2, 4)])
+    result, = self.store.Aggregate(['test'], test='clock')
+    self.assertAlmostEqual(result['stddev'], (8 / 3.0) ** 0.5)
+
+  def testAggregateErrors(self):
+    with self.assertRaises(ValueError):
+      self.store.Aggregate(['metadata.vm_count'])
+    with self.assertRaises(ValueError):
+      self.store.Aggregate(['test'], metadata={'vm_count': '1'})
+
+  def testAddIndexedMetadataKeys(self):
+    self.store.Close()
+    self.store = results_store.ResultsStore(self.path, ['vm_count'])
+    self.assertEqual(self.store.GetIndexedMetadataKeys(),
+                     {'cloud', 'machine_type', 'zone', 'vm_count'})
+    self.assertEqual(
+        [(r['metadata.vm_count'], r['count']) for r in self.store.Aggregate(
+            ['metadata.vm_count'], metric='Throughput')],
+        [('0', 2), ('1', 2), ('2', 2)])
+
+  def testImportJSONFile(self):
+    path = os.path.join(self.temp_dir, 'results.json')
+    sample = _Sample(0, test='fio')
+    sample['labels'] = '|cloud:GCP|,|vm_count:1|'
+    del sample['metadata']
+    with open(path, 'w') as json_file:
+      json_file.write(json.dumps(sample) + '\n\n')
+    self.assertEqual(self.store.ImportJSONFile(path), 1)
+    # Samples already in the store are skipped.
+    self.assertEqual(self.store.ImportJSONFile(path), 0)
+    self.assertEqual(
+        self.store.Query(test='fio', metadata={'cloud': 'GCP',
+                                               'vm_count': 1}),
+        [_Sample(0, test='fio', cloud='GCP', vm_count='1')])
+
+
+class MainTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    self.db = os.path.join(self.temp_dir, 'results.db')
+    self.json_path = os.path.join(self.temp_dir, 'results.json')
+    with open(self.json_path, 'w') as json_file:
+      for i in range(4):
+        json_file.write(json.dumps(_Sample(i, cloud='GCP')) + '\n')
+
+  def _Main(self, *args):
+    out = io.BytesIO()
+    self.assertEqual(
+        results_store.main(['--db', self.db] + list(args), out=out), 0)
+    return out.getvalue()
+
+  def testImportQueryAndAggregate(self):
+    self.assertEqual(self._Main('import', self.json_path),
+                     'Imported 4 samples from %s\n' % self.json_path)
+    output = self._Main('query', '--metadata', 'cloud=GCP', '--since',
+                        '1970-01-01 00:16:42', '--format', 'json')
+    self.assertEqual([json.loads(line)['value']
+                      for line in output.splitlines()], [2, 3])
+    self.assertEqual(
+        self._Main('aggregate', '--group_by', 'run_uri', '--test', 'iperf'),
+        'run_uri\tcount\tmean\tstddev\tmin\tmax\n'
+        'run0\t2\t0.5\t0.5\t0.0\t1.0\n'
+        'run1\t2\t2.5\t0.5\t2.0\t3.0\n')
+
+  def testInvalidMetadataFilter(self):
+    with mock.patch('sys.stderr'):
+      with self.assertRaises(SystemExit):
+        self._Main('query', '--metadata', 'cloud')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -14,6 +14,8 @@
 
 import unittest
 
+import numpy as np
+
 from perfkitbenchmarker import sample
 
 
@@ -29,6 +31,19 @@ class SampleTestCase(unittest.TestCase):
                              metadata=metadata.copy())
     self.assertDictEqual(metadata, instance.metadata)
 
+  def testAsDictWithoutHistogram(self):
+    instance = sample.Sample('Test', 1.0, 'Mbps', timestamp=1)
+    self.assertEqual(instance.asdict(), {
+        'metric': 'Test', 'value': 1.0, 'unit': 'Mbps', 'metadata': {},
+        'timestamp': 1})
+
+  def testAsDictEncodesHistogram(self):
+    histogram = sample.Histogram()
+    histogram.Add([1, 2, 3])
+    instance = sample.Sample('Test', 0, 'ms', histogram=histogram)
+    self.assertEqual(sample.Histogram.Decode(instance.asdict()['histogram']),
+                     histogram)
+
 
 class TestPercentileCalculator(unittest.TestCase):
   def testPercentileCalculator(self):
@@ -56,3 +71,82 @@ class TestPercentileCalculator(unittest.TestCase):
   def testWrongTypePercentile(self):
     with self.assertRaises(ValueError):
       sample.PercentileCalculator([3], percentiles=["a"])
+
+
+class HistogramTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.values = np.random.RandomState(0).lognormal(8.0, 2.0, 10000)
+
+  def testSmallValuesAreExact(self):
+    histogram = sample.Histogram.FromDict({0: 2, 5: 1, 1000: 3})
+    self.assertEqual(histogram.ToDict(), {0: 2, 5: 1, 1000: 3})
+    self.assertEqual(histogram.count, 6)
+    self.assertEqual(histogram.Percentiles([0, 40, 100]), [0, 5, 1000])
+
+  def testRelativeError(self):
+    for significant_figures in (1, 2, 3):
+      histogram = sample.Histogram(significant_figures)
+      histogram.Add(self.values)
+      for value, count in histogram.ToDict().items():
+        self.assertGreater(count, 0)
+      expected = sample.PercentileCalculator(self.values)
+      actual = histogram.Summarize()
+      self.assertEqual(set(actual), set(expected))
+      for key in expected:
+        if key.startswith('p'):
+          self.assertLessEqual(abs(actual[key] - expected[key]),
+                               expected[key] * 10 ** -significant_figures +
+                               histogram.resolution)
+      self.assertAlmostEqual(actual['average'], expected['average'])
+
+  def testResolution(self):
+    histogram = sample.Histogram(resolution=0.001)
+    histogram.Add([0.0015, 0.25, 1.5])
+    self.assertEqual(histogram.Percentiles([0, 50, 100]), [0.0015, 0.25, 1.5])
+
+  def testMergeIsLossless(self):
+    merged = sample.Histogram()
+    for chunk in np.array_split(self.values, 50):
+      histogram = sample.Histogram()
+      histogram.Add(chunk)
+      merged.Merge(histogram)
+    whole = sample.Histogram()
+    whole.Add(self.values)
+    self.assertEqual(merged.ToDict(), whole.ToDict())
+    self.assertEqual((merged.min, merged.max), (whole.min, whole.max))
+    self.assertAlmostEqual(merged.sum / whole.sum, 1)
+
+  def testMergeDifferentBuckets(self):
+    with self.assertRaises(ValueError):
+      sample.Histogram(2).Merge(sample.Histogram(3))
+    with self.assertRaises(ValueError):
+      sample.Histogram(resolution=1).Merge(sample.Histogram(resolution=2))
+
+  def testAddCounts(self):
+    histogram = sample.Histogram()
+    histogram.Add([10, 20, 30], [1, 0, 4])
+    self.assertEqual(histogram.ToDict(), {10: 1, 30: 4})
+    self.assertEqual((histogram.min, histogram.max, histogram.sum),
+                     (10, 30, 130))
+
+  def testEncodeDecode(self):
+    histogram = sample.Histogram(2, 0.5)
+    histogram.Add(self.values)
+    encoded = histogram.Encode()
+    self.assertIsInstance(encoded, str)
+    self.assertEqual(sample.Histogram.Decode(encoded), histogram)
+    self.assertEqual(sample.Histogram.Decode(sample.Histogram().Encode()),
+                     sample.Histogram())
+
+  def testDecodeInvalid(self):
+    with self.assertRaises(ValueError):
+      sample.Histogram.Decode('not a histogram')
+
+  def testInvalidValues(self):
+    with self.assertRaises(ValueError):
+      sample.Histogram().Add([-1])
+    with self.assertRaises(ValueError):
+      sample.Histogram(0)
+    with self.assertRaises(ValueError):
+      sample.Histogram().Percentiles()
@@ -25,6 +25,7 @@ from perfkitbenchmarker import errors
 from perfkitbenchmarker import linux_virtual_machine
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import providers
+from perfkitbenchmarker import timing_util
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker.configs import benchmark_config_spec
 from perfkitbenchmarker.providers.aws import aws_disk
@@ -69,9 +70,7 @@ class ScratchDiskTestMixin(object):
 
     vm_prefix = linux_virtual_machine.__name__ + '.BaseLinuxMixin'
     self.patches.append(
-        mock.patch(vm_prefix + '.FormatDisk'))
-    self.patches.append(
-        mock.patch(vm_prefix + '.MountDisk'))
+        mock.patch(vm_prefix + '.SetUpDisk'))
     self.patches.append(
         mock.patch(util.__name__ + '.GetDefaultProject'))
 
@@ -114,9 +113,9 @@ class ScratchDiskTestMixin(object):
     scratch_disk = vm.scratch_disks[0]
 
     scratch_disk.Create.assert_called_once_with()
-    vm.FormatDisk.assert_called_once_with(scratch_disk.GetDevicePath())
-    vm.MountDisk.assert_called_once_with(
-        scratch_disk.GetDevicePath(), '/mountpoint0')
+    vm.SetUpDisk.assert_called_once_with(
+        scratch_disk.GetDevicePath(), mount_path='/mountpoint0',
+        striped_devices=None)
 
     disk_spec = disk.BaseDiskSpec(_COMPONENT, mount_point='/mountpoint1')
     vm.CreateScratchDisk(disk_spec)
@@ -134,15 +133,36 @@ class ScratchDiskTestMixin(object):
     scratch_disk = vm.scratch_disks[1]
 
     scratch_disk.Create.assert_called_once_with()
-    vm.FormatDisk.assert_called_with(scratch_disk.GetDevicePath())
-    vm.MountDisk.assert_called_with(
-        scratch_disk.GetDevicePath(), '/mountpoint1')
+    vm.SetUpDisk.assert_called_with(
+        scratch_disk.GetDevicePath(), mount_path='/mountpoint1',
+        striped_devices=None)
 
     vm.DeleteScratchDisks()
 
     vm.scratch_disks[0].Delete.assert_called_once_with()
     vm.scratch_disks[1].Delete.assert_called_once_with()
 
+  def testCreateScratchDisks(self):
+    """Test for creating the scratch disks of all disk specs at once."""
+    vm = self._CreateVm()
+    vm.disk_specs = [
+        disk.BaseDiskSpec(_COMPONENT, mount_point='/mountpoint%d' % i)
+        for i in range(3)]
+    timer = timing_util.IntervalTimer()
+    vm.CreateScratchDisks(timer=timer, name='VM 0')
+
+    self.assertEqual(len(vm.scratch_disks), 3)
+    for i, scratch_disk in enumerate(vm.scratch_disks):
+      scratch_disk.Create.assert_called_once_with()
+      vm.SetUpDisk.assert_any_call(
+          scratch_disk.GetDevicePath(), mount_path='/mountpoint%d' % i,
+          striped_devices=None)
+    self.assertItemsEqual(
+        [interval[0] for interval in timer.intervals],
+        ['%s VM 0 Scratch Disk %d' % (step, i)
+         for step in ('Create', 'Attach', 'Set Up') for i in range(3)])
+    self.assertIsNone(vm._pending_scratch_disks)
+
 
 class AzureScratchDiskTest(ScratchDiskTestMixin, unittest.TestCase):
 
@@ -187,6 +207,64 @@ class AwsScratchDiskTest(ScratchDiskTestMixin, unittest.TestCase):
     return aws_disk.AwsDisk
 
 
+class StripedDiskTest(unittest.TestCase):
+
+  def testMemberDisks(self):
+    disks = [mock.MagicMock() for _ in range(4)]
+    striped_disk = disk.StripedDisk(disk.BaseDiskSpec(_COMPONENT), disks)
+    vm = mock.MagicMock()
+    striped_disk.Create()
+    striped_disk.Attach(vm)
+    striped_disk.Detach()
+    striped_disk.Delete()
+    for member in disks:
+      member.Create.assert_called_once_with()
+      member.Attach.assert_called_once_with(vm)
+      member.Detach.assert_called_once_with()
+      member.Delete.assert_called_once_with()
+
+
+class SetUpDiskTest(unittest.TestCase):
+
+  def setUp(self):
+    mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    mocked_flags.cloud = providers.GCP
+    mocked_flags.os_type = os_types.DEBIAN
+    for p in (mock.patch(util.__name__ + '.GetDefaultProject'),
+              mock.patch('subprocess.Popen')):
+      p.start()
+      self.addCleanup(p.stop)
+    self.addCleanup(context.SetThreadBenchmarkSpec, None)
+    config_spec = benchmark_config_spec.BenchmarkConfigSpec(
+        _BENCHMARK_NAME, flag_values=mocked_flags, vm_groups={})
+    benchmark_spec.BenchmarkSpec(mock.MagicMock(), config_spec,
+                                 _BENCHMARK_UID)
+    vm_spec = gce_virtual_machine.GceVmSpec('test_vm_spec.GCP',
+                                            machine_type='test_machine_type')
+    self.vm = gce_virtual_machine.DebianBasedGceVirtualMachine(vm_spec)
+    self.vm.Install = mock.MagicMock()
+    self.vm.RemoteHostCommand = mock.MagicMock(return_value=('', ''))
+
+  def testStripeFormatAndMount(self):
+    self.vm.SetUpDisk('/dev/md0', mount_path='/scratch',
+                      striped_devices=['/dev/sdb', '/dev/sdc'])
+    self.vm.Install.assert_called_once_with('mdadm')
+    self.vm.RemoteHostCommand.assert_called_once_with(
+        '{ [[ -b /dev/md0 ]] || (yes | sudo mdadm --create /dev/md0 '
+        '--level=stripe --raid-devices=2 /dev/sdb /dev/sdc); } && '
+        '{ [[ -d /mnt ]] && sudo umount /mnt; sudo mke2fs -F -E '
+        'lazy_itable_init=0,discard -O ^has_journal -t ext4 -b 4096 '
+        '/dev/md0; } && '
+        '{ sudo mkdir -p /scratch;sudo mount -o discard /dev/md0 /scratch;'
+        'sudo chown -R $USER:$USER /scratch; }')
+
+  def testStripeOnly(self):
+    self.vm.SetUpDisk('/dev/md0', striped_devices=['/dev/sdb', '/dev/sdc'])
+    command = self.vm.RemoteHostCommand.call_args[0][0]
+    self.assertIn('mdadm', command)
+    self.assertNotIn('mke2fs', command)
+
+
 class GceDeviceIdTest(unittest.TestCase):
   def testDeviceId(self):
     with mock.patch(disk.__name__ + '.FLAGS') as disk_flags:
@@ -0,0 +1,165 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for tools/side-by-side/comparison.py."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'tools', 'side-by-side'))
+
+import comparison
+
+
+def _Samples(values, metric='Throughput', unit='Mbps', test='iperf',
+             **metadata):
+  """Returns one sample per value, each from a different run."""
+  return [{'test': test, 'metric': metric, 'unit': unit, 'value': value,
+           'run_uri': 'run%d' % i, 'metadata': dict(metadata, run_number=i)}
+          for i, value in enumerate(values)]
+
+
+class MannWhitneyUTestCase(unittest.TestCase):
+
+  def testSeparatedSamples(self):
+    u, p_value = comparison.MannWhitneyU([6, 7, 8, 9, 10], [1, 2, 3, 4, 5])
+    self.assertEqual(u, 25)
+    # 2 of the 252 orderings of 5 + 5 values separate them completely.
+    self.assertAlmostEqual(p_value, 2 / 252.0)
+    u, p_value = comparison.MannWhitneyU([1, 2, 3, 4, 5], [6, 7, 8, 9, 10])
+    self.assertEqual(u, 0)
+    self.assertAlmostEqual(p_value, 2 / 252.0)
+
+  def testInterleavedSamples(self):
+    self.assertEqual(comparison.MannWhitneyU([1, 4], [2, 3]), (2, 1.0))
+
+  def testTiesCountAsHalf(self):
+    u, p_value = comparison.MannWhitneyU([1, 2], [2, 3])
+    self.assertEqual(u, 0.5)
+    self.assertGreater(p_value, 0.05)
+    self.assertLessEqual(p_value, 1.0)
+
+  def testLargeSamplesUseNormalApproximation(self):
+    u, p_value = comparison.MannWhitneyU(range(100, 130), range(30))
+    self.assertEqual(u, 900)
+    self.assertLess(p_value, 1e-9)
+
+  def testAllValuesTied(self):
+    self.assertEqual(comparison.MannWhitneyU([1, 1], [1, 1]), (2, 1.0))
+
+
+class AdjustPValuesTestCase(unittest.TestCase):
+
+  def testBenjaminiHochberg(self):
+    adjusted = comparison.AdjustPValues([0.01, 0.04, None, 0.03])
+    self.assertIsNone(adjusted[2])
+    for actual, expected in zip([adjusted[i] for i in (0, 1, 3)],
+                                [0.03, 0.04, 0.04]):
+      self.assertAlmostEqual(actual, expected)
+
+  def testAdjustedPValuesAreAtMostOne(self):
+    self.assertEqual(comparison.AdjustPValues([1.0, 0.9]), [1.0, 1.0])
+
+  def testNoPValues(self):
+    self.assertEqual(comparison.AdjustPValues([None]), [None])
+    self.assertEqual(comparison.AdjustPValues([]), [])
+
+
+class MatchSamplesTestCase(unittest.TestCase):
+
+  def _Match(self, base_samples, head_samples):
+    return [(base and base.values, head and head.values)
+            for base, head in comparison.MatchSamples(base_samples,
+                                                      head_samples)]
+
+  def testMatchesByMetadata(self):
+    base = (_Samples([1, 2], cloud='GCP') + _Samples([3, 4], cloud='AWS'))
+    head = (_Samples([5, 6], cloud='AWS') + _Samples([7, 8], cloud='GCP'))
+    self.assertEqual(self._Match(base, head),
+                     [([1, 2], [7, 8]), ([3, 4], [5, 6])])
+
+  def testIgnoresMetadataThatVariesBetweenRuns(self):
+    base = [dict(s, metadata=dict(s['metadata'], ip='10.0.0.%d' % i))
+            for i, s in enumerate(_Samples([1, 2]))]
+    head = [dict(s, metadata=dict(s['metadata'], ip='10.0.1.%d' % i))
+            for i, s in enumerate(_Samples([3, 4]))]
+    self.assertEqual(self._Match(base, head), [([1, 2], [3, 4])])
+
+  def testPairsUnmatchedGroupsInOrder(self):
+    base = (_Samples([1, 2], image='debian-7') +
+            _Samples([3, 4], metric='Latency', image='debian-7'))
+    head = (_Samples([5, 6], image='ubuntu-14') +
+            _Samples([7, 8], metric='Latency', image='ubuntu-14'))
+    self.assertEqual(self._Match(base, head),
+                     [([1, 2], [5, 6]), ([3, 4], [7, 8])])
+
+  def testAddedAndRemovedGroups(self):
+    base = _Samples([1, 2]) + _Samples([3, 4], metric='Removed')
+    head = _Samples([5, 6]) + _Samples([7, 8], metric='Added')
+    self.assertEqual(self._Match(base, head),
+                     [([1, 2], [5, 6]), ([3, 4], None), (None, [7, 8])])
+
+
+class CompareTestCase(unittest.TestCase):
+
+  def _Verdicts(self, base_samples, head_samples, **kwargs):
+    return {(c['metric'], c['verdict'])
+            for c in comparison.Compare(base_samples, head_samples,
+                                        bootstrap_iterations=200, **kwargs)}
+
+  def testVerdicts(self):
+    base = (_Samples([100, 101, 102, 103, 104]) +
+            _Samples([10, 11, 12, 13, 14], metric='Latency', unit='ms') +
+            _Samples([50, 51, 52, 53, 54], metric='Steady') +
+            _Samples([1], metric='Single') +
+            _Samples([1, 2], metric='Removed'))
+    head = (_Samples([120, 121, 122, 123, 124]) +
+            _Samples([20, 21, 22, 23, 24], metric='Latency', unit='ms') +
+            _Samples([54, 50, 53, 51, 52], metric='Steady') +
+            _Samples([2], metric='Single') +
+            _Samples([1, 2], metric='Added'))
+    self.assertEqual(self._Verdicts(base, head), {
+        ('Throughput', comparison.IMPROVEMENT),
+        ('Latency', comparison.REGRESSION),
+        ('Steady', comparison.NO_CHANGE),
+        ('Single', comparison.INSUFFICIENT_DATA),
+        ('Removed', comparison.REMOVED),
+        ('Added', comparison.ADDED)})
+
+  def testSmallChangesAreNotSignificant(self):
+    base = _Samples([100, 100.1, 100.2, 100.3, 100.4])
+    head = _Samples([100.5, 100.6, 100.7, 100.8, 100.9])
+    self.assertEqual(self._Verdicts(base, head),
+                     {('Throughput', comparison.NO_CHANGE)})
+    self.assertEqual(self._Verdicts(base, head, min_change=0.001),
+                     {('Throughput', comparison.IMPROVEMENT)})
+
+  def testComparisonStatistics(self):
+    result, = comparison.Compare(_Samples([100, 101, 102, 103, 104]),
+                                 _Samples([120, 121, 122, 123, 124]),
+                                 bootstrap_iterations=200)
+    self.assertAlmostEqual(result['relative_change'], 122 / 102.0 - 1)
+    self.assertEqual(result['base']['median'], 102)
+    self.assertEqual(result['head']['n'], 5)
+    self.assertEqual(result['cliffs_delta'], 1)
+    self.assertAlmostEqual(result['p_value'], 2 / 252.0)
+    self.assertAlmostEqual(result['adjusted_p_value'], 2 / 252.0)
+    low, high = result['ci']
+    self.assertTrue(0 < low <= high)
+    self.assertEqual(result['labels'], {})
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,184 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.stats_util."""
+
+import random
+import unittest
+
+import numpy as np
+
+from perfkitbenchmarker import stats_util
+
+
+def _ReferencePercentile(values, percentile):
+  values = sorted(values)
+  return values[int(len(values) * percentile / 100.0)]
+
+
+class PercentilesTestCase(unittest.TestCase):
+
+  def testMatchesSortedValues(self):
+    rand = random.Random(0)
+    values = [rand.expovariate(1.0) for _ in xrange(1001)]
+    self.assertEqual(
+        stats_util.Percentiles(values),
+        [_ReferencePercentile(values, p) for p in stats_util.PERCENTILES_LIST])
+
+  def testHundredthPercentileIsMaximum(self):
+    self.assertEqual(stats_util.Percentiles([3, 1, 2], [0, 100]), [1, 3])
+
+  def testReturnsPythonNumbers(self):
+    result = stats_util.Percentiles(np.arange(10, dtype=np.int32), [50])
+    self.assertIs(type(result[0]), int)
+
+  def testAxis(self):
+    values = np.array([[3, 10], [1, 30], [2, 20]])
+    result = stats_util.Percentiles(values, [0, 50, 100], axis=0)
+    self.assertEqual([r.tolist() for r in result],
+                     [[1, 10], [2, 20], [3, 30]])
+    self.assertEqual(stats_util.Percentiles(values, [100]), [30])
+
+  def testEmpty(self):
+    with self.assertRaises(ValueError):
+      stats_util.Percentiles([])
+
+  def testInvalidPercentile(self):
+    with self.assertRaises(ValueError):
+      stats_util.Percentiles([1, 2, 3], [101])
+
+
+class SummarizeTestCase(unittest.TestCase):
+
+  def testSummarize(self):
+    result = stats_util.Summarize(range(1, 11), [50, 90])
+    self.assertEqual(set(result), {'p50', 'p90', 'average', 'stddev'})
+    self.assertEqual(result['p50'], 6)
+    self.assertEqual(result['p90'], 10)
+    self.assertAlmostEqual(result['average'], 5.5)
+    self.assertAlmostEqual(result['stddev'], np.std(range(1, 11), ddof=1))
+
+  def testSingleValue(self):
+    result = stats_util.Summarize([4.0], [50])
+    self.assertEqual(result, {'p50': 4.0, 'average': 4.0, 'stddev': 0})
+
+
+class WeightedPercentilesTestCase(unittest.TestCase):
+
+  def testNearestRankMatchesExpandedValues(self):
+    values = [5, 1, 3, 2]
+    weights = [1, 10, 4, 5]
+    expanded = [v for v, w in zip(values, weights) for _ in xrange(w)]
+    self.assertEqual(
+        stats_util.WeightedPercentiles(values, weights),
+        [_ReferencePercentile(expanded, p)
+         for p in stats_util.PERCENTILES_LIST])
+
+  def testCumulativeWeight(self):
+    # Cumulative weights of 1, 2, 3 and 4 are 0.1, 0.3, 0.6 and 1.0.
+    result = stats_util.WeightedPercentiles(
+        [1, 2, 3, 4], [1, 2, 3, 4], [0, 10, 30, 31, 100],
+        method=stats_util.CUMULATIVE_WEIGHT)
+    self.assertEqual(result, [1, 1, 2, 3, 4])
+
+  def testLengthMismatch(self):
+    with self.assertRaises(ValueError):
+      stats_util.WeightedPercentiles([1, 2], [1])
+
+  def testUnknownMethod(self):
+    with self.assertRaises(ValueError):
+      stats_util.WeightedPercentiles([1], [1], method='mean')
+
+
+class SummarizeHistogramTestCase(unittest.TestCase):
+
+  def testMatchesSummarize(self):
+    histogram = {1: 3, 4: 1, 2: 6}
+    expanded = [1] * 3 + [4] + [2] * 6
+    expected = stats_util.Summarize(expanded)
+    actual = stats_util.SummarizeHistogram(histogram)
+    self.assertEqual(set(actual), set(expected))
+    for key in expected:
+      self.assertAlmostEqual(actual[key], expected[key])
+
+  def testPairs(self):
+    self.assertEqual(
+        stats_util.SummarizeHistogram([(7, 1)], [50]),
+        {'p50': 7, 'average': 7.0, 'stddev': 0})
+
+  def testEmpty(self):
+    with self.assertRaises(ValueError):
+      stats_util.SummarizeHistogram({})
+
+
+class QuantileSketchTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.values = np.random.RandomState(0).lognormal(0.0, 2.0, 10000)
+
+  def assertWithinAccuracy(self, sketch, values):
+    expected = stats_util.Percentiles(values)
+    for actual, exact in zip(sketch.Percentiles(), expected):
+      self.assertLessEqual(abs(actual - exact),
+                           sketch.relative_accuracy * abs(exact) + 1e-12)
+
+  def testAccuracy(self):
+    sketch = stats_util.QuantileSketch(0.01)
+    sketch.Add(self.values)
+    self.assertWithinAccuracy(sketch, self.values)
+    summary = sketch.Summarize()
+    self.assertAlmostEqual(summary['average'], self.values.mean())
+    self.assertAlmostEqual(summary['stddev'], self.values.std(ddof=1))
+    self.assertEqual(sketch.count, self.values.size)
+
+  def testMerge(self):
+    merged = stats_util.QuantileSketch()
+    for chunk in np.array_split(self.values, 7):
+      sketch = stats_util.QuantileSketch()
+      sketch.Add(chunk)
+      merged.Merge(sketch)
+    whole = stats_util.QuantileSketch()
+    whole.Add(self.values)
+    self.assertEqual(merged.Percentiles(), whole.Percentiles())
+    self.assertAlmostEqual(merged.Summarize()['stddev'],
+                           whole.Summarize()['stddev'])
+    self.assertEqual((merged.min, merged.max), (whole.min, whole.max))
+
+  def testNegativeAndZeroValues(self):
+    values = np.concatenate((-self.values, np.zeros(100), self.values))
+    sketch = stats_util.QuantileSketch()
+    sketch.Add(values)
+    self.assertWithinAccuracy(sketch, values)
+    self.assertEqual(sketch.Percentiles([50]), [0.0])
+
+  def testPercentilesWithinRange(self):
+    sketch = stats_util.QuantileSketch(0.1)
+    sketch.Add([3.0, 3.0, 3.0])
+    self.assertEqual(sketch.Percentiles([0, 100]), [3.0, 3.0])
+
+  def testMergeDifferentAccuracy(self):
+    with self.assertRaises(ValueError):
+      stats_util.QuantileSketch(0.01).Merge(stats_util.QuantileSketch(0.02))
+
+  def testEmpty(self):
+    with self.assertRaises(ValueError):
+      stats_util.QuantileSketch().Percentiles()
+
+  def testInvalidAccuracy(self):
+    with self.assertRaises(ValueError):
+      stats_util.QuantileSketch(0)
+
+
+if __name__ == '__main__':
+  unittest.main()
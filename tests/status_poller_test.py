@@ -0,0 +1,132 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.status_poller."""
+
+import threading
+import time
+import unittest
+
+from perfkitbenchmarker import status_poller
+
+_TIMEOUT = 10
+
+
+class _FakeStatusPoller(status_poller.BaseStatusPoller):
+  """Reports the keys that start with 'x' as not found.
+
+  The first batch blocks until release is set so that tests can queue up
+  requests behind it.
+  """
+
+  def __init__(self, *scope):
+    super(_FakeStatusPoller, self).__init__(*scope)
+    self.batches = []
+    self.first_batch_started = threading.Event()
+    self.release = threading.Event()
+    self.error = None
+
+  def _ListStatuses(self, keys):
+    self.batches.append(keys)
+    self.first_batch_started.set()
+    self.release.wait(_TIMEOUT)
+    if self.error:
+      raise self.error
+    return {key: key.upper() for key in keys if not key.startswith('x')}
+
+
+class StatusPollerTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.poller = _FakeStatusPoller()
+    self.results = {}
+
+  def _GetStatusInThread(self, key):
+    def _GetStatus():
+      try:
+        self.results[key] = self.poller.GetStatus(key)
+      except Exception as e:
+        self.results[key] = e
+    thread = threading.Thread(target=_GetStatus)
+    thread.start()
+    return thread
+
+  def _WaitForPendingKeys(self, count):
+    deadline = time.time() + _TIMEOUT
+    while len(self.poller._pending) < count and time.time() < deadline:
+      time.sleep(0.001)
+
+  def _RunConcurrently(self, first_key, other_keys):
+    """Issues other_keys while the batch for first_key is in flight."""
+    threads = [self._GetStatusInThread(first_key)]
+    self.poller.first_batch_started.wait(_TIMEOUT)
+    threads.extend(self._GetStatusInThread(key) for key in other_keys)
+    self._WaitForPendingKeys(len(other_keys))
+    self.poller.release.set()
+    for thread in threads:
+      thread.join(_TIMEOUT)
+
+  def testSingleKey(self):
+    self.poller.release.set()
+    self.assertEqual(self.poller.GetStatus('a'), 'A')
+    self.assertIsNone(self.poller.GetStatus('xa'))
+    self.assertEqual(self.poller.batches, [['a'], ['xa']])
+    self.assertEqual(self.poller.num_calls, 2)
+
+  def testConcurrentRequestsAreBatched(self):
+    self._RunConcurrently('a', ['d', 'b', 'xc'])
+    self.assertEqual(self.poller.batches, [['a'], ['b', 'd', 'xc']])
+    self.assertEqual(self.results, {'a': 'A', 'b': 'B', 'd': 'D', 'xc': None})
+
+  def testRequestDuringBatchWaitsForNextBatch(self):
+    self._RunConcurrently('a', ['a'])
+    self.assertEqual(self.poller.batches, [['a'], ['a']])
+
+  def testMaxBatchSize(self):
+    self.poller.MAX_BATCH_SIZE = 2
+    self._RunConcurrently('a', ['b', 'c', 'd', 'e', 'f'])
+    self.assertEqual(self.poller.batches,
+                     [['a'], ['b', 'c'], ['d', 'e'], ['f']])
+    self.assertEqual(self.poller.num_calls, 4)
+
+  def testErrorIsRaisedInEveryWaitingThread(self):
+    self.poller.error = ValueError('describe failed')
+    self._RunConcurrently('a', ['b', 'c'])
+    for key in 'abc':
+      self.assertIs(self.results[key], self.poller.error)
+    self.poller.error = None
+    self.assertEqual(self.poller.GetStatus('a'), 'A')
+
+
+class GetPollerTestCase(unittest.TestCase):
+
+  def testSameScopeSharesPoller(self):
+    poller = status_poller.GetPoller(_FakeStatusPoller, 'region-1')
+    self.assertIs(status_poller.GetPoller(_FakeStatusPoller, 'region-1'),
+                  poller)
+    self.assertEqual(poller.scope, ('region-1',))
+
+  def testClearPollers(self):
+    poller = status_poller.GetPoller(_FakeStatusPoller, 'region-1')
+    status_poller.ClearPollers()
+    self.assertIsNot(status_poller.GetPoller(_FakeStatusPoller, 'region-1'),
+                     poller)
+
+  def testDifferentScopesDoNotSharePoller(self):
+    self.assertIsNot(status_poller.GetPoller(_FakeStatusPoller, 'region-1'),
+                     status_poller.GetPoller(_FakeStatusPoller, 'region-2'))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,87 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for perfkitbenchmarker.stream_columns."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from perfkitbenchmarker import stream_columns
+
+
+class StreamColumnsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    self.path = os.path.join(self.temp_dir, 'columns')
+    self.streams = [
+        {'stream_num': 3, 'start_times': [1.5, 2.5], 'latencies': [0.5, 0.25],
+         'sizes': [100, 200]},
+        {'stream_num': 4, 'start_times': np.array([]),
+         'latencies': np.array([]), 'sizes': np.array([], dtype=np.int64)},
+        {'stream_num': 5, 'start_times': np.array([7.0]),
+         'latencies': np.array([0.125]), 'sizes': np.array([300])}]
+
+  def assertStreamsEqual(self, loaded):
+    stream_nums, start_times, latencies, sizes = loaded
+    self.assertEqual(stream_nums.tolist(), [3, 4, 5])
+    self.assertEqual([a.tolist() for a in start_times],
+                     [[1.5, 2.5], [], [7.0]])
+    self.assertEqual([a.tolist() for a in latencies],
+                     [[0.5, 0.25], [], [0.125]])
+    self.assertEqual([a.tolist() for a in sizes], [[100, 200], [], [300]])
+    self.assertEqual(sizes[0].dtype, np.int64)
+    self.assertEqual(latencies[0].dtype, np.float64)
+
+  def testRoundTrip(self):
+    stream_columns.WriteStreamsFile(self.path, self.streams)
+    self.assertTrue(stream_columns.IsColumnsFile(self.path))
+    loaded = stream_columns.LoadStreams(self.path)
+    self.assertStreamsEqual(loaded)
+    self.assertIsInstance(loaded[1][0], np.memmap)
+
+  def testCompressed(self):
+    compressed_path = self.path + '.gz'
+    stream_columns.WriteStreamsFile(compressed_path, self.streams,
+                                    compress=True)
+    self.assertFalse(stream_columns.IsColumnsFile(compressed_path))
+    stream_columns.DecompressFile(compressed_path, self.path)
+    self.assertStreamsEqual(stream_columns.LoadStreams(self.path))
+
+  def testNoRecords(self):
+    stream_columns.WriteStreamsFile(self.path, [self.streams[1]])
+    stream_nums, start_times, _, _ = stream_columns.LoadStreams(self.path)
+    self.assertEqual(stream_nums.tolist(), [4])
+    self.assertEqual(start_times[0].size, 0)
+
+  def testColumnLengthMismatch(self):
+    self.streams[0]['sizes'] = [100]
+    with self.assertRaises(ValueError):
+      stream_columns.WriteStreamsFile(self.path, self.streams)
+
+  def testNotColumnsFile(self):
+    with open(self.path, 'w') as fp:
+      fp.write('[{"stream_num": 1}]')
+    self.assertFalse(stream_columns.IsColumnsFile(self.path))
+    with self.assertRaises(ValueError):
+      stream_columns.LoadStreams(self.path)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -16,6 +16,8 @@
 import os
 import unittest
 
+import numpy as np
+
 from perfkitbenchmarker import events
 from perfkitbenchmarker.sample import Sample
 from perfkitbenchmarker.traces import dstat
@@ -101,6 +103,36 @@ class DstatTestCase(unittest.TestCase):
     self.assertEqual(
         expected.metadata, self.samples[0].metadata)
 
+  def testAnalyzeMultipleEventsWithPercentiles(self):
+    self.collector.percentiles = ['50', 100]
+    events.AddEvent('sender', 'first', 1475708693, 1475708695, {})
+    events.AddEvent('sender', 'empty', 1475708693.5, 1475708694, {})
+    events.AddEvent('sender', 'second', 1475708692, 1475708694, {})
+    self.collector.Analyze('testSender', None, self.samples)
+    # 61 metrics, each with its mean, p50 and p100 for two events.
+    self.assertEqual(len(self.samples), 61 * 3 * 2)
+    usr = [(s.metadata['event'], s.metric, s.value) for s in self.samples
+           if s.metric.startswith('usr__total cpu usage')]
+    self.assertEqual(usr, [
+        ('first', 'usr__total cpu usage', 3.2),
+        ('first', 'usr__total cpu usage p50', 6.4),
+        ('first', 'usr__total cpu usage p100', 6.4),
+        ('second', 'usr__total cpu usage', 6.4),
+        ('second', 'usr__total cpu usage p50', 6.4),
+        ('second', 'usr__total cpu usage p100', 6.4)])
+
+
+class AnalyzeEventsTestCase(unittest.TestCase):
+
+  def testUnsortedRows(self):
+    labels = ['epoch__epoch', 'usr__total cpu usage']
+    out = np.array([[3.0, 30.0], [1.0, 10.0], [2.0, 20.0], [4.0, 40.0]])
+    event = events.TracingEvent('sender', 'event', 1.5, 3.5, {})
+    samples = dstat._AnalyzeEvents('vm', labels, out, [event], [0])
+    self.assertEqual([(s.metric, s.value) for s in samples],
+                     [('usr__total cpu usage', 25.0),
+                      ('usr__total cpu usage p0', 20.0)])
+
 
 if __name__ == '__main__':
   unittest.main()
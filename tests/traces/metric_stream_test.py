@@ -0,0 +1,197 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.traces.metric_stream"""
+
+import collections
+import os
+import unittest
+
+import mock
+
+import numpy as np
+
+from perfkitbenchmarker.linux_packages import dstat
+from perfkitbenchmarker.traces import metric_stream
+
+METRICS = ['usr__total cpu usage', 'recv__net/total']
+
+
+class RingBufferTestCase(unittest.TestCase):
+
+  def testExtendWrapsAround(self):
+    buf = metric_stream._RingBuffer(4, 1)
+    buf.Extend(np.array([[1.], [2.], [3.]]))
+    self.assertEqual(buf.Rows().ravel().tolist(), [1., 2., 3.])
+    buf.Extend(np.array([[4.], [5.]]))
+    self.assertEqual(buf.count, 4)
+    self.assertEqual(buf.Rows().ravel().tolist(), [2., 3., 4., 5.])
+
+  def testExtendMoreThanCapacity(self):
+    buf = metric_stream._RingBuffer(2, 1)
+    buf.Extend(np.array([[1.], [2.], [3.]]))
+    self.assertEqual(buf.Rows().ravel().tolist(), [2., 3.])
+
+  def testWindow(self):
+    buf = metric_stream._RingBuffer(3, 2)
+    buf.Extend(np.array([[10., 1.], [11., 2.], [12., 3.], [13., 4.]]))
+    self.assertEqual(buf.Window(11, 13)[:, 1].tolist(), [3., 4.])
+    self.assertEqual(len(buf.Window(20, 30)), 0)
+
+
+class DstatStreamTestCase(unittest.TestCase):
+
+  def setUp(self):
+    path = os.path.join(os.path.dirname(__file__), '..', 'data',
+                        'dstat-result.csv')
+    with open(path) as f:
+      self.data = f.read()
+    with open(path) as f:
+      labels, out = dstat.ParseCsvFile(f)
+    self.expected = out[:, [0] + [labels.index(m) for m in METRICS]]
+
+  def testFeedInChunks(self):
+    stream = metric_stream._DstatStream(METRICS, 100)
+    for i in range(0, len(self.data), 1000):
+      stream.Feed(self.data[i:i + 1000])
+    self.assertEqual(stream.rows_received, len(self.expected))
+    np.testing.assert_array_equal(stream.buffer.Rows(), self.expected[-100:])
+
+  def testFeedAfterReset(self):
+    stream = metric_stream._DstatStream(METRICS, 1000)
+    stream.Feed(self.data[:2000])
+    stream.Reset()
+    stream.Feed(self.data)
+    self.assertGreater(stream.rows_received, len(self.expected))
+
+  def testFeedWithLeadingBlankLines(self):
+    stream = metric_stream._DstatStream(METRICS, 1000)
+    stream.Feed('\n')
+    stream.Feed('\n' + self.data)
+    self.assertEqual(stream.rows_received, len(self.expected))
+    np.testing.assert_array_equal(stream.buffer.Rows(), self.expected)
+
+  def testUnknownMetric(self):
+    stream = metric_stream._DstatStream(['foo__bar'], 10)
+    with self.assertRaises(ValueError):
+      stream.Feed(self.data)
+
+
+class AggregateWindowTestCase(unittest.TestCase):
+
+  def _Stream(self, rows):
+    stream = metric_stream._DstatStream(METRICS, 10)
+    stream.buffer.Extend(np.array(rows, dtype=float))
+    return stream
+
+  def testAggregateAcrossVms(self):
+    streams = [self._Stream([[1, 10, 0], [2, 20, 0], [3, 90, 0]]),
+               self._Stream([[1, 40, 4], [2, 40, 8]])]
+    samples = metric_stream._AggregateWindow(
+        'clients', streams, METRICS, 0, 2, percentiles=['50'])
+    values = {s.metric: s.value for s in samples}
+    self.assertEqual(values, {
+        'usr__total cpu usage': 27.5,
+        'usr__total cpu usage max': 40.0,
+        'usr__total cpu usage p50': 40.0,
+        'recv__net/total': 3.0,
+        'recv__net/total max': 6.0,
+        'recv__net/total p50': 6.0})
+    self.assertEqual(samples[0].metadata,
+                     {'vm_group': 'clients', 'num_vms': 2,
+                      'window_start': 0, 'window_end': 2})
+    self.assertEqual(samples[0].timestamp, 2)
+
+  def testEmptyWindow(self):
+    streams = [self._Stream([[1, 10, 0]])]
+    self.assertEqual(
+        metric_stream._AggregateWindow('clients', streams, METRICS, 5, 10),
+        [])
+
+
+
+class MetricStreamCollectorTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.collector = metric_stream._MetricStreamCollector(
+        interval=1, window=2, metrics=METRICS)
+
+  def _AddStream(self, vm, group, rows):
+    stream = metric_stream._DstatStream(METRICS, self.collector.capacity)
+    self.collector._streams[vm] = stream
+    self.collector._groups.setdefault(group, []).append(vm)
+    self._Extend(stream, rows)
+    return stream
+
+  def _Extend(self, stream, rows):
+    rows = np.array(rows, dtype=float)
+    stream.buffer.Extend(rows)
+    if stream.first_timestamp is None:
+      stream.first_timestamp = rows[0, 0]
+    stream.last_timestamp = rows[-1, 0]
+
+  def _WindowEnds(self):
+    return sorted({s.metadata['window_end'] for s in self.collector.samples})
+
+  def testWindowsFollowRowTimestamps(self):
+    self._AddStream('vm0', 'clients', [[101, 10, 0], [102, 20, 0],
+                                       [103, 30, 0], [104, 40, 0]])
+    lagging = self._AddStream('vm1', 'clients', [[101, 10, 0], [102, 20, 0]])
+    self.collector._CloseCompleteWindows()
+    self.assertEqual(self._WindowEnds(), [102])
+    self._Extend(lagging, [[103, 30, 0], [104, 40, 0]])
+    self.collector._CloseCompleteWindows()
+    self.assertEqual(self._WindowEnds(), [102, 104])
+
+  def testLaggingVmHoldsBackWindowsForOneWindow(self):
+    self._AddStream('vm0', 'clients', [[101, 10, 0], [105, 20, 0]])
+    self._AddStream('vm1', 'clients', [[101, 10, 0]])
+    self.collector._CloseCompleteWindows()
+    self.assertEqual(self._WindowEnds(), [102])
+
+  def testStopClosesPartialWindow(self):
+    self._AddStream('vm0', 'clients', [[101, 10, 0], [102, 20, 0],
+                                       [103, 30, 0]])
+    self.collector.Stop(None, None)
+    self.assertEqual(self._WindowEnds(), [102, 103])
+
+  def testStopWithoutStart(self):
+    self.collector.Stop(None, None)
+    self.assertEqual(self.collector.samples, [])
+
+  def testFailedReconnectDropsVm(self):
+    vm = mock.Mock()
+    vm.StartRemoteCommand.side_effect = OSError('unreachable')
+    self._AddStream(vm, 'clients', [[101, 10, 0]])
+    channels = {}
+    self.collector._Reconnect(vm, mock.Mock(), channels,
+                              collections.Counter(), 'channel closed')
+    self.assertEqual(vm.StartRemoteCommand.call_count,
+                     metric_stream._MAX_RECONNECTS)
+    self.assertEqual(channels, {})
+
+  def testSkipsWindowsVms(self):
+    linux_vm = mock.Mock(OS_TYPE='debian')
+    windows_vm = mock.Mock(OS_TYPE='windows')
+    spec = mock.Mock(vms=[linux_vm, windows_vm],
+                     vm_groups={'clients': [linux_vm], 'servers': [windows_vm]})
+    with mock.patch.object(metric_stream.vm_util, 'RunThreaded') as run, \
+            mock.patch.object(metric_stream.threading, 'Thread') as thread:
+      self.collector.Start(None, spec)
+    self.assertEqual(run.call_args[0][1], [linux_vm])
+    self.assertEqual(list(self.collector._groups), ['clients'])
+    self.assertEqual(thread.call_args[1]['args'], ([linux_vm],))
+
+
+if __name__ == '__main__':
+  unittest.main()
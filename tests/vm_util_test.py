@@ -16,14 +16,20 @@
 
 import os
 import psutil
+import shutil
+import signal
 import subprocess
+import tempfile
 import threading
 import time
 import unittest
 
 import mock
 
+from perfkitbenchmarker import command_engine
+from perfkitbenchmarker import temp_dir
 from perfkitbenchmarker import vm_util
+from tests import mock_flags
 
 
 class ShouldRunOnInternalIpAddressTestCase(unittest.TestCase):
@@ -72,6 +78,102 @@ class ShouldRunOnInternalIpAddressTestCase(unittest.TestCase):
         False, vm_util.IpAddressSubset.REACHABLE, False)
 
 
+class GetSshOptionsTestCase(unittest.TestCase):
+
+  def setUp(self):
+    p = mock.patch(vm_util.__name__ + '.FLAGS')
+    self.flags = p.start()
+    self.addCleanup(p.stop)
+    self.flags.ssh_options = []
+    self.flags.ssh_control_persist = '10m'
+
+  def testNoControlPath(self):
+    options = vm_util.GetSshOptions('keyfile')
+    self.assertNotIn('ControlMaster=auto', options)
+
+  def testControlPath(self):
+    options = vm_util.GetSshOptions('keyfile', '/tmp/ssh/host')
+    self.assertIn('ControlPath=/tmp/ssh/host', options)
+    self.assertIn('ControlMaster=auto', options)
+    self.assertIn('ControlPersist=10m', options)
+
+  def testControlPathDisabled(self):
+    self.flags.ssh_reuse_connections = False
+    self.assertIsNone(vm_util.GetSshControlPath('user', '1.2.3.4', 22))
+
+
+class GetSshControlPathTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.flags = mock_flags.PatchTestCaseFlags(self)
+    self.flags.ssh_reuse_connections = True
+    self.flags.run_uri = 'abcd1234'
+    p = mock.patch(vm_util.__name__ + '.RunningOnWindows', return_value=False)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def testControlPathInRunDir(self):
+    self.flags.temp_dir = '/tmp/perfkitbenchmarker'
+    path = vm_util.GetSshControlPath('perfkit', '1.2.3.4', 22)
+    self.assertEqual(os.path.dirname(path),
+                     '/tmp/perfkitbenchmarker/runs/abcd1234/ssh')
+    self.assertNotEqual(path, vm_util.GetSshControlPath('perfkit', '1.2.3.4',
+                                                        2222))
+
+  def testControlPathWithLongTempDir(self):
+    self.flags.temp_dir = '/home/user/' + 'x' * 100
+    path = vm_util.GetSshControlPath('a' * 32, '2001:db8::' + '1' * 20, 22)
+    self.assertEqual(os.path.basename(os.path.dirname(path)),
+                     'pkb-ssh-abcd1234')
+    self.assertLess(len(path) + len('.0123456789abcdef'), 104)
+
+
+class SshConnectionsDirTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.temp_dir)
+    self.flags = mock_flags.PatchTestCaseFlags(self)
+    self.flags.run_uri = 'abcd1234'
+    self.flags.temp_dir = os.path.join(self.temp_dir, 'x' * 64)
+    p = mock.patch(temp_dir.__name__ + '.tempfile.gettempdir',
+                   return_value=self.temp_dir)
+    p.start()
+    self.addCleanup(p.stop)
+    self.path = os.path.join(self.temp_dir, 'pkb-ssh-abcd1234')
+
+  def testCreatesPrivateFallbackDirectory(self):
+    temp_dir.CreateTemporaryDirectories()
+    self.assertEqual(temp_dir.GetSshConnectionsDir(), self.path)
+    self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o700)
+    # An existing private directory is reused.
+    temp_dir.CreateTemporaryDirectories()
+
+  def testRejectsSharedFallbackDirectory(self):
+    os.mkdir(self.path, 0o700)
+    os.chmod(self.path, 0o777)
+    with self.assertRaises(OSError):
+      temp_dir.CreateTemporaryDirectories()
+
+  def testRejectsLinkedFallbackDirectory(self):
+    target = os.path.join(self.temp_dir, 'target')
+    os.mkdir(target, 0o700)
+    os.symlink(target, self.path)
+    with self.assertRaises(OSError):
+      temp_dir.CreateTemporaryDirectories()
+
+  def testCloseSshConnections(self):
+    temp_dir.CreateTemporaryDirectories()
+    open(os.path.join(self.path, '0123456789abcdef'), 'w').close()
+    with mock.patch(vm_util.__name__ + '.IssueCommand') as issue_command:
+      vm_util.CloseSshConnections()
+    issue_command.assert_called_once_with(
+        ['ssh', '-O', 'exit', '-o',
+         'ControlPath=%s' % os.path.join(self.path, '0123456789abcdef'),
+         'pkb'], suppress_warning=True, timeout=10)
+    self.assertFalse(os.path.exists(self.path))
+
+
 def HaveSleepSubprocess():
   """Checks if the current process has a sleep subprocess."""
 
@@ -121,6 +223,11 @@ class WaitUntilSleepTimer(threading.Thread):
 
 
 class IssueCommandTestCase(unittest.TestCase):
+  """Tests IssueCommand with a timer thread per command."""
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.multiplex_commands = False
 
   def testTimeoutNotReached(self):
     _, _, retcode = vm_util.IssueCommand(['sleep', '0s'])
@@ -144,5 +251,66 @@ class IssueCommandTestCase(unittest.TestCase):
     self.assertFalse(HaveSleepSubprocess())
 
 
+class MultiplexedIssueCommandTestCase(unittest.TestCase):
+  """Tests IssueCommand and IssueCommandAsync with the CommandEngine."""
+
+  def setUp(self):
+    self.mocked_flags = mock_flags.PatchTestCaseFlags(self)
+    self.mocked_flags.multiplex_commands = True
+    # Outputs larger than this are spilled to a temporary file.
+    self.mocked_flags.command_output_spill_bytes = 1 << 16
+    p = mock.patch.object(command_engine, '_engine', None)
+    p.start()
+    self.addCleanup(p.stop)
+
+  def testOutputAndReturnCode(self):
+    stdout, stderr, retcode = vm_util.IssueCommand(
+        ['sh', '-c', 'echo out; echo err >&2; exit 3'])
+    self.assertEqual((stdout, stderr, retcode), ('out\n', 'err\n', 3))
+
+  def testTimeoutReached(self):
+    _, _, retcode = vm_util.IssueCommand(['sleep', '2s'], timeout=1)
+    self.assertEqual(retcode, -9)
+    self.assertFalse(HaveSleepSubprocess())
+
+  def testLargeOutput(self):
+    stdout, _, retcode = vm_util.IssueCommand(
+        ['head', '-c', '3000000', '/dev/zero'])
+    self.assertEqual(retcode, 0)
+    self.assertEqual(len(stdout), 3000000)
+
+  def testConcurrentCommands(self):
+    thread_count = threading.active_count()
+    start = time.time()
+    futures = [vm_util.IssueCommandAsync(['sh', '-c', 'sleep 1; echo %d' % i])
+               for i in range(50)]
+    # One engine thread, however many commands are running.
+    self.assertLessEqual(threading.active_count(), thread_count + 1)
+    results = [future.Result() for future in futures]
+    self.assertEqual([stdout for stdout, _, _ in results],
+                     ['%d\n' % i for i in range(50)])
+    self.assertLess(time.time() - start, 10)
+
+  def testPipesHeldByBackgroundProcess(self):
+    # The background sleep inherits stdout, as ssh ControlPersist masters do.
+    stdout, _, retcode = vm_util.IssueCommand(
+        ['sh', '-c', 'echo done; sleep 2.5 & echo $!'])
+    lines = stdout.splitlines()
+    try:
+      os.kill(int(lines[1]), signal.SIGTERM)
+    except OSError:
+      pass
+    self.assertEqual((lines[0], retcode), ('done', 0))
+
+  def testEngineFailure(self):
+    with mock.patch.object(command_engine.RunningCommand, 'Write',
+                           side_effect=RuntimeError('engine bug')):
+      future = vm_util.IssueCommandAsync(['echo', 'out'])
+      with self.assertRaises(RuntimeError):
+        future.Result(timeout=10)
+    # The next command starts a new engine thread.
+    self.assertEqual(vm_util.IssueCommand(['echo', 'out'])[0], 'out\n')
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the overhead of the background_tasks task managers.
+
+For each task manager and concurrency level, runs a batch of tiny tasks and
+reports the mean dispatch latency (wall time per task) and the controller CPU
+time consumed. A second measurement runs one sleeping task per thread to show
+how much CPU the controller burns while it has nothing to do.
+"""
+
+import argparse
+import os
+import time
+
+import mock
+
+from perfkitbenchmarker import background_tasks
+
+
+def _NoOp():
+  pass
+
+
+def _Sleep(seconds):
+  time.sleep(seconds)
+
+
+def _CpuSeconds():
+  times = os.times()
+  return times[0] + times[1]
+
+
+def _Measure(run_function, target_arg_tuples, concurrency):
+  """Returns (wall seconds, CPU seconds) taken to run all of the tasks."""
+  start_wall = time.time()
+  start_cpu = _CpuSeconds()
+  run_function(target_arg_tuples, concurrency)
+  return time.time() - start_wall, _CpuSeconds() - start_cpu
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--tasks', type=int, default=10000,
+                      help='Number of tiny tasks to dispatch per measurement.')
+  parser.add_argument('--process_tasks', type=int, default=1000,
+                      help='Number of tiny tasks to dispatch to processes.')
+  parser.add_argument('--concurrency', type=int, nargs='+',
+                      default=[1, 10, 50, 200],
+                      help='Concurrency levels to measure.')
+  parser.add_argument('--idle_seconds', type=float, default=2.,
+                      help='Duration of each sleeping task in the idle '
+                      'measurement.')
+  args = parser.parse_args()
+
+  print '{0:<13} {1:<9} {2:>11} {3:>7} {4:>13} {5:>9}'.format(
+      'manager', 'kind', 'concurrency', 'tasks', 'latency(us)', 'cpu(s)')
+  row = '{0:<13} {1:<9} {2:>11} {3:>7} {4:>13.1f} {5:>9.3f}'
+  for event_driven in (False, True):
+    manager = 'event-driven' if event_driven else 'polling'
+    with mock.patch.object(background_tasks, '_EVENT_DRIVEN_WAITS_SUPPORTED',
+                           event_driven):
+      for concurrency in args.concurrency:
+        for kind, run_function, count in (
+            ('threads', background_tasks.RunParallelThreads, args.tasks),
+            ('processes', background_tasks.RunParallelProcesses,
+             args.process_tasks)):
+          wall, cpu = _Measure(run_function, [(_NoOp, (), {})] * count,
+                               concurrency)
+          print row.format(manager, kind, concurrency, count,
+                           wall / count * 1e6, cpu)
+        wall, cpu = _Measure(
+            background_tasks.RunParallelThreads,
+            [(_Sleep, (args.idle_seconds,), {})] * concurrency, concurrency)
+        print row.format(manager, 'idle', concurrency, concurrency,
+                         wall / concurrency * 1e6, cpu)
+
+
+if __name__ == '__main__':
+  main()
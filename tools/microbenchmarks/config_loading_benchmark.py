@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the time taken to load benchmark configs.
+
+Loads the config of a benchmark once per combination of a flag matrix, the
+way pkb does for each combination that GetBenchmarksFromFlags returns, and
+reports the time per config for:
+
+  yaml: parsing the config with yaml.load and merging it with copy.deepcopy,
+      as configs.LoadConfig did before parsed configs were cached.
+  cached: configs.LoadConfig.
+"""
+
+import argparse
+import copy
+import time
+
+import yaml
+
+from perfkitbenchmarker import configs
+from perfkitbenchmarker import linux_benchmarks
+
+
+def _PreviousLoadConfig(benchmark_config, user_config, benchmark_name):
+  """Loads a config the way configs.LoadConfig did without caching."""
+  config = yaml.load('\n'.join([configs._LoadConfigConstants(),
+                                benchmark_config]))[benchmark_name]
+  merged = copy.deepcopy(config)
+  for key, value in user_config.iteritems():
+    merged[key] = copy.deepcopy(value)
+  return merged
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--benchmark', default='fio',
+                      help='Benchmark whose config is loaded.')
+  parser.add_argument('--combinations', type=int, default=1000,
+                      help='Number of flag matrix combinations to load.')
+  args = parser.parse_args()
+
+  module = linux_benchmarks.VALID_BENCHMARKS[args.benchmark]
+  user_configs = [{'flags': {'flag_matrix_index': i}}
+                  for i in range(args.combinations)]
+  print '{0:<7} {1:>14}'.format('mode', 'per config(us)')
+  for mode, load_function in (('yaml', _PreviousLoadConfig),
+                              ('cached', configs.LoadConfig)):
+    start = time.time()
+    for user_config in user_configs:
+      load_function(module.BENCHMARK_CONFIG, user_config, module.BENCHMARK_NAME)
+    elapsed = time.time() - start
+    print '{0:<7} {1:>14.1f}'.format(mode, elapsed / len(user_configs) * 1e6)
+
+
+if __name__ == '__main__':
+  main()
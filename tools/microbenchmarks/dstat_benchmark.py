@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the time taken to analyze dstat output of several VMs.
+
+Writes synthetic dstat CSV files with one row per second for each VM and
+records tracing events that cover random parts of the run. The files are then
+analyzed once with the previous implementation, which parsed each row with the
+csv module and averaged every event over a boolean mask of the whole matrix in
+a thread per event, and twice with the dstat trace collector: computing only
+the mean of every metric like before, and also computing its percentiles.
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from perfkitbenchmarker import events
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.traces import dstat
+
+_HEADER = ('"Dstat 0.7.2 CSV output"\n'
+           '"Author:","Dag Wieers <dag@wieers.com>",,,,"URL:",""\n'
+           '"Host:","pkb-vm",,,,"User:","perfkit"\n'
+           '"Cmdline:","dstat --epoch"\n'
+           '\n')
+
+
+def _WriteOutput(path, num_rows, num_columns, start_time, random_state):
+  """Writes a synthetic dstat CSV file."""
+  with open(path, 'w') as fp:
+    fp.write(_HEADER)
+    fp.write('"epoch",' + ','.join(['"metric %d"' % (i // 4)
+                                    for i in xrange(num_columns - 1)]) + '\n')
+    fp.write('"epoch",' + ','.join(['"m%d"' % i
+                                    for i in xrange(num_columns - 1)]) + '\n')
+    for chunk_start in xrange(0, num_rows, 1000):
+      rows = min(1000, num_rows - chunk_start)
+      data = random_state.lognormal(3.0, 2.0, (rows, num_columns)).round(3)
+      data[:, 0] = start_time + chunk_start + np.arange(rows) + 0.292
+      for row in data:
+        fp.write(','.join(repr(value) for value in row.tolist()) + ',\n')
+
+
+def _PreviousParseCsvFile(fp):
+  """The implementation dstat.ParseCsvFile replaced, without validation."""
+  reader = csv.reader(fp)
+  list(itertools.islice(reader, 5))
+  categories = next(reader)
+  for i, category in enumerate(categories):
+    if not categories[i]:
+      categories[i] = categories[i - 1]
+  labels = ['%s__%s' % x for x in zip(next(reader), categories)]
+  data = []
+  for row in reader:
+    if len(row) == len(labels) + 1:
+      row = row[:-1]
+    data.append(row)
+  return labels, np.array(data, dtype=float)
+
+
+def _PreviousAnalyze(paths, samples):
+  """The implementation _DStatCollector.Analyze replaced."""
+
+  def _AnalyzeEvent(labels, out, event):
+    cond = (out[:, 0] > event.start_timestamp) & (
+        out[:, 0] < event.end_timestamp)
+    if not cond.any():
+      return
+    avg = np.average(out[:, 1:], weights=cond, axis=0)
+    samples.extend(zip(labels[1:], avg))
+
+  def _Analyze(path):
+    with open(path) as f:
+      labels, out = _PreviousParseCsvFile(iter(f))
+      vm_util.RunThreaded(
+          _AnalyzeEvent,
+          [((labels, out, e), {}) for e in events.TracingEvent.events])
+
+  vm_util.RunThreaded(_Analyze, paths)
+
+
+def _Analyze(temp_dir, paths, percentiles, samples):
+  collector = dstat._DStatCollector(output_directory=temp_dir,
+                                    percentiles=percentiles)
+  for i, path in enumerate(paths):
+    collector._role_mapping['vm_%d' % i] = path
+  collector.Analyze('dstat_benchmark', None, samples)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--hours', type=float, default=4.0,
+                      help='Length of the dstat output at 1s intervals.')
+  parser.add_argument('--columns', type=int, default=120,
+                      help='Number of columns, including the epoch.')
+  parser.add_argument('--vms', type=int, default=8,
+                      help='Number of VMs, each with its own output file.')
+  parser.add_argument('--events', type=int, default=20,
+                      help='Number of tracing events.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the random output and events.')
+  args = parser.parse_args()
+
+  random_state = np.random.RandomState(args.seed)
+  num_rows = int(args.hours * 3600)
+  start_time = 1.5e9
+  temp_dir = tempfile.mkdtemp(prefix='dstat-benchmark')
+  saved_events = events.TracingEvent.events
+  try:
+    paths = []
+    for i in xrange(args.vms):
+      paths.append(os.path.join(temp_dir, 'vm-%d-dstat.csv' % i))
+      _WriteOutput(paths[-1], num_rows, args.columns, start_time, random_state)
+    size_mb = sum(os.path.getsize(path) for path in paths) / 2.0 ** 20
+    events.TracingEvent.events = []
+    for _ in xrange(args.events):
+      start, end = sorted(random_state.uniform(0, num_rows, 2))
+      events.AddEvent('dstat_benchmark', 'event', start_time + start,
+                      start_time + end, {})
+
+    print '{0:<12} {1:>8} {2:>8} {3:>8} {4:>10} {5:>10}'.format(
+        'analysis', 'rows', 'vms', 'events', 'size(MB)', 'time(s)')
+    row = '{0:<12} {1:>8} {2:>8} {3:>8} {4:>10.1f} {5:>10.2f}'
+    for name, function, function_args in (
+        ('previous', _PreviousAnalyze, (paths, [])),
+        ('means', _Analyze, (temp_dir, paths, [], [])),
+        ('percentiles', _Analyze, (temp_dir, paths, [50, 90, 99], []))):
+      start = time.time()
+      function(*function_args)
+      print row.format(name, num_rows, args.vms, args.events, size_mb,
+                       time.time() - start)
+  finally:
+    events.TracingEvent.events = saved_events
+    shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+  main()
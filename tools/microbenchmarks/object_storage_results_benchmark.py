@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures post-processing time of object storage multi-stream results.
+
+Generates synthetic per-stream operation records like the ones the
+api_multistream workers report (sequential operations with random latencies
+and object sizes, with streams starting and stopping at slightly different
+times) and times object_storage_service_benchmark._ProcessMultiStreamResults
+on them, with and without latency histograms.
+"""
+
+import argparse
+import time
+
+import mock
+import numpy as np
+
+from perfkitbenchmarker.linux_benchmarks import object_storage_service_benchmark
+
+
+def _GenerateStreams(num_streams, records_per_stream, object_sizes,
+                     start_spread, random_state):
+  """Returns start_times, latencies and sizes lists of per-stream arrays."""
+  start_times, latencies, sizes = [], [], []
+  for _ in xrange(num_streams):
+    latency = random_state.lognormal(np.log(0.05), 0.5, records_per_stream)
+    gaps = random_state.exponential(0.001, records_per_stream)
+    start = (random_state.uniform(0, start_spread) +
+             np.cumsum(latency + gaps) - latency)
+    start_times.append(start)
+    latencies.append(latency)
+    sizes.append(random_state.choice(object_sizes, records_per_stream))
+  return start_times, latencies, sizes
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--streams', type=int, nargs='+', default=[10, 100, 1000],
+                      help='Numbers of streams to measure.')
+  parser.add_argument('--records', type=int, default=1000000,
+                      help='Total number of operation records.')
+  parser.add_argument('--object_sizes', type=int, nargs='+',
+                      default=[1024, 65536, 1048576],
+                      help='Object sizes in bytes.')
+  parser.add_argument('--start_spread', type=float, default=1.0,
+                      help='Seconds over which the start times of the '
+                      'streams are spread.')
+  parser.add_argument('--histogram_interval', type=float, default=0.001,
+                      help='Latency histogram interval in seconds for the '
+                      'measurements with histograms.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the random records.')
+  args = parser.parse_args()
+
+  random_state = np.random.RandomState(args.seed)
+  print '{0:>8} {1:>10} {2:>10} {3:>10}'.format(
+      'streams', 'records', 'histogram', 'time(s)')
+  row = '{0:>8} {1:>10} {2:>10} {3:>10.3f}'
+  for num_streams in args.streams:
+    records_per_stream = args.records // num_streams
+    streams = _GenerateStreams(num_streams, records_per_stream,
+                               args.object_sizes, args.start_spread,
+                               random_state)
+    for interval in (None, args.histogram_interval):
+      flags = mock.MagicMock(
+          num_vms=1, object_storage_streams_per_vm=num_streams,
+          object_storage_multistream_objects_per_stream=records_per_stream,
+          object_storage_object_naming_scheme='sequential_by_stream',
+          object_storage_latency_histogram_interval=interval)
+      with mock.patch.object(object_storage_service_benchmark, 'FLAGS',
+                             flags):
+        start = time.time()
+        object_storage_service_benchmark._ProcessMultiStreamResults(
+            streams[0], streams[1], streams[2], 'upload', args.object_sizes,
+            [])
+        elapsed = time.time() - start
+      print row.format(num_streams, num_streams * records_per_stream,
+                       'yes' if interval else 'no', elapsed)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures loading object storage worker output as JSON and as columns.
+
+Generates synthetic multi-stream operation records and writes them once as
+the JSON the API test script prints to stdout and once as a compressed columns
+file. Then, each in a child process so that its peak resident memory can be
+reported, the output is loaded the way object_storage_service_benchmark does
+it: the JSON text is read and parsed by LoadWorkerOutput, and the columns file
+is decompressed and memory-mapped by LoadWorkerOutput. Both then compute the
+total latency so that all records are actually read.
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from perfkitbenchmarker import stream_columns
+from perfkitbenchmarker.linux_benchmarks import object_storage_service_benchmark
+
+
+def _GenerateStreams(num_streams, records_per_stream, random_state):
+  streams = []
+  for stream_num in xrange(num_streams):
+    latencies = random_state.lognormal(np.log(0.05), 0.5, records_per_stream)
+    streams.append({
+        'stream_num': stream_num,
+        'start_times': 1.5e9 + np.cumsum(latencies) - latencies,
+        'latencies': latencies,
+        'sizes': random_state.choice([1024, 65536], records_per_stream)})
+  return streams
+
+
+def _WriteOutputs(json_path, columns_path, num_streams, records_per_stream,
+                  seed):
+  streams = _GenerateStreams(num_streams, records_per_stream,
+                             np.random.RandomState(seed))
+  with open(json_path, 'w') as fp:
+    json.dump([{k: v.tolist() if isinstance(v, np.ndarray) else v
+                for k, v in stream.iteritems()} for stream in streams],
+              fp, indent=0)
+  stream_columns.WriteStreamsFile(columns_path, streams, compress=True)
+
+
+def _LoadJson(path):
+  with open(path) as fp:
+    output = [fp.read()]
+  _, latencies, _ = object_storage_service_benchmark.LoadWorkerOutput(output)
+  return sum(latency.sum() for latency in latencies)
+
+
+def _LoadColumns(compressed_path):
+  path = os.path.splitext(compressed_path)[0]
+  stream_columns.DecompressFile(compressed_path, path)
+  _, latencies, _ = object_storage_service_benchmark.LoadWorkerOutput(
+      [path], object_storage_service_benchmark.COLUMNS_WORKER_OUTPUT)
+  return sum(latency.sum() for latency in latencies)
+
+
+def _MeasureInChild(function, *args):
+  """Returns (wall seconds, peak RSS in MB) of running function in a child."""
+  start = time.time()
+  pid = os.fork()
+  if not pid:
+    try:
+      function(*args)
+    finally:
+      os._exit(0)
+  _, status, usage = os.wait4(pid, 0)
+  if status:
+    raise RuntimeError('Measurement failed with status {0}'.format(status))
+  return time.time() - start, usage.ru_maxrss / 1024.0
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--records', type=int, default=2000000,
+                      help='Total number of operation records.')
+  parser.add_argument('--streams', type=int, default=100,
+                      help='Number of streams.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the random records.')
+  args = parser.parse_args()
+
+  temp_dir = tempfile.mkdtemp(prefix='worker-output-benchmark')
+  try:
+    json_path = os.path.join(temp_dir, 'output.json')
+    columns_path = os.path.join(temp_dir, 'output.gz')
+    # Generating the records in a child keeps them out of the peak memory of
+    # the children that load them.
+    _MeasureInChild(_WriteOutputs, json_path, columns_path, args.streams,
+                    args.records // args.streams, args.seed)
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    print '{0:<8} {1:>10} {2:>10} {3:>10} {4:>13}'.format(
+        'format', 'records', 'size(MB)', 'time(s)', 'peak_rss(MB)')
+    row = '{0:<8} {1:>10} {2:>10.1f} {3:>10.2f} {4:>13.1f}'
+    for name, function, path in (('json', _LoadJson, json_path),
+                                 ('columns', _LoadColumns, columns_path)):
+      wall, rss = _MeasureInChild(function, path)
+      print row.format(name, args.records, os.path.getsize(path) / 2.0 ** 20,
+                       wall, rss)
+    print 'Peak RSS of this process before measuring: {0:.1f} MB'.format(
+        baseline_rss)
+  finally:
+    shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+  main()
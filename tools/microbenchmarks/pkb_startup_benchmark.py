@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the time taken by pkb to start up and parse its command line.
+
+Each measurement runs in a new Python process, which imports pkb, imports the
+benchmark and package modules the way pkb.Main does and parses the flags. It
+reports the wall time taken and the number of modules in sys.modules for:
+
+  lazy: only the modules defining the given flags are imported.
+  eager: all benchmark and package modules are imported, as pkb did before
+      they were loaded lazily.
+  help: all modules are imported and the benchmark help text is generated,
+      as for --help.
+
+Measurements are repeated to average out noise; the first run of each
+measurement also rebuilds the module index if it is out of date.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+# Runs in the child process. %(mode)r and %(argv)r are substituted.
+_CHILD_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.time()
+from perfkitbenchmarker import flags
+from perfkitbenchmarker import module_index
+from perfkitbenchmarker import pkb
+argv = %(argv)r
+if %(mode)r == 'lazy':
+  module_index.ImportModulesForArgv(argv)
+else:
+  module_index.ImportAllModules()
+if %(mode)r == 'help':
+  pkb._GenerateBenchmarkDocumentation()
+flags.FLAGS(argv)
+print json.dumps({'seconds': time.time() - start,
+                  'modules': len(sys.modules)})
+"""
+
+
+def _Measure(mode, argv):
+  """Returns (seconds, module count) of one startup in a new process."""
+  env = dict(os.environ)
+  env['PYTHONPATH'] = os.pathsep.join(
+      filter(None, [_REPO_DIR, env.get('PYTHONPATH')]))
+  output = subprocess.check_output(
+      [sys.executable, '-c', _CHILD_SCRIPT % {'mode': mode, 'argv': argv}],
+      env=env, cwd=_REPO_DIR)
+  result = json.loads(output.strip().splitlines()[-1])
+  return result['seconds'], result['modules']
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--runs', type=int, default=5,
+                      help='Number of processes started per measurement.')
+  parser.add_argument('--pkb_args', nargs='*',
+                      default=['--benchmarks=iperf', '--cloud=GCP'],
+                      help='Flags passed to pkb in each measurement.')
+  args = parser.parse_args()
+
+  argv = ['pkb.py'] + args.pkb_args
+  print '{0:<6} {1:>12} {2:>12} {3:>8}'.format(
+      'mode', 'mean(ms)', 'min(ms)', 'modules')
+  for mode in ('lazy', 'eager', 'help'):
+    results = [_Measure(mode, argv) for _ in range(args.runs)]
+    seconds = [result[0] for result in results]
+    print '{0:<6} {1:>12.1f} {2:>12.1f} {3:>8}'.format(
+        mode, sum(seconds) / len(seconds) * 1e3, min(seconds) * 1e3,
+        results[-1][1])
+
+
+if __name__ == '__main__':
+  main()
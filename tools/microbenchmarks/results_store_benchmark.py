@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures lookups of past results in a results_store.ResultsStore.
+
+Writes synthetic nightly results of several benchmarks as newline-delimited
+JSON with collapsed labels, imports them into a store, and reports the time
+taken by:
+
+  import: results_store.ResultsStore.ImportJSONFile.
+  json query: reading the JSON file and filtering samples by test, metric and
+      cloud, as tools that re-parse the results files do.
+  query: ResultsStore.Query with the same filters.
+  aggregate: ResultsStore.Aggregate of the same samples by machine type over
+      the last 30 days.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from perfkitbenchmarker import results_store
+
+_TESTS = ('iperf', 'fio', 'netperf', 'coremark', 'ping', 'unixbench')
+_CLOUDS = ('AWS', 'Azure', 'GCP')
+_MACHINE_TYPES = ('small', 'medium', 'large', 'xlarge')
+
+
+def _WriteResults(path, runs, samples_per_run):
+  """Writes the results of nightly runs, one run per test and day."""
+  start = time.time() - runs * 86400.0 / len(_TESTS)
+  with open(path, 'w') as json_file:
+    for run in xrange(runs):
+      test = _TESTS[run % len(_TESTS)]
+      timestamp = start + run * 86400.0 / len(_TESTS)
+      labels = '|cloud:%s|,|machine_type:%s|,|zone:zone-%d|' % (
+          random.choice(_CLOUDS), random.choice(_MACHINE_TYPES),
+          random.randint(0, 9))
+      for i in xrange(samples_per_run):
+        json_file.write(json.dumps({
+            'test': test, 'metric': 'metric %d' % (i % 20),
+            'value': random.random(), 'unit': 'ms', 'timestamp': timestamp,
+            'run_uri': 'run%d' % run, 'sample_uri': 'run%d-%d' % (run, i),
+            'official': False, 'owner': 'pkb',
+            'product_name': 'PerfKitBenchmarker', 'labels': labels}) + '\n')
+
+
+def _JsonQuery(path, test, metric, cloud):
+  """Filters samples by reading the JSON results file."""
+  samples = []
+  with open(path) as json_file:
+    for line in json_file:
+      sample = json.loads(line)
+      metadata = dict(item.split(':', 1) for item in
+                      sample.pop('labels')[1:-1].split('|,|'))
+      if (sample['test'] == test and sample['metric'] == metric and
+          metadata['cloud'] == cloud):
+        sample['metadata'] = metadata
+        samples.append(sample)
+  return samples
+
+
+def _Time(function, *args, **kwargs):
+  start = time.time()
+  result = function(*args, **kwargs)
+  return time.time() - start, result
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--runs', type=int, default=10000,
+                      help='Number of runs in the results.')
+  parser.add_argument('--samples_per_run', type=int, default=100,
+                      help='Number of samples published by each run.')
+  args = parser.parse_args()
+
+  temp_dir = tempfile.mkdtemp()
+  try:
+    json_path = os.path.join(temp_dir, 'results.json')
+    _WriteResults(json_path, args.runs, args.samples_per_run)
+    store = results_store.ResultsStore(os.path.join(temp_dir, 'results.db'))
+    filters = {'test': 'iperf', 'metric': 'metric 3'}
+    timings = [
+        ('import', _Time(store.ImportJSONFile, json_path)),
+        ('json query', _Time(_JsonQuery, json_path, cloud='GCP', **filters)),
+        ('query', _Time(store.Query, metadata={'cloud': 'GCP'}, **filters)),
+        ('aggregate', _Time(store.Aggregate, ['metadata.machine_type'],
+                            start_time=time.time() - 30 * 86400,
+                            metadata={'cloud': 'GCP'}, **filters))]
+    store.Close()
+    print '{0:<11} {1:>10} {2:>8}'.format('operation', 'seconds', 'results')
+    for name, (seconds, result) in timings:
+      count = result if isinstance(result, int) else len(result)
+      print '{0:<11} {1:>10.3f} {2:>8}'.format(name, seconds, count)
+  finally:
+    shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+  main()
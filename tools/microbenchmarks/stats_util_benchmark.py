@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the cost of computing latency percentiles with stats_util.
+
+For each input size, generates log-normally distributed latencies and reports
+the wall time of the sort-based pure Python percentile calculation that
+sample.PercentileCalculator used to perform, stats_util.Summarize on a numpy
+array, stats_util.SummarizeHistogram on the values rounded to microseconds and
+filling plus summarizing a stats_util.QuantileSketch. The largest relative
+error of the sketch percentiles is reported as well.
+"""
+
+import argparse
+import collections
+import math
+import time
+
+import numpy as np
+
+from perfkitbenchmarker import stats_util
+
+
+def _PythonSummarize(numbers, percentiles=stats_util.PERCENTILES_LIST):
+  """The sort-based implementation stats_util.Summarize replaced."""
+  numbers_sorted = sorted(numbers)
+  count = len(numbers_sorted)
+  total = sum(numbers_sorted)
+  result = {}
+  for percentile in percentiles:
+    result['p%s' % str(percentile)] = numbers_sorted[
+        int(count * float(percentile) / 100)]
+  average = total / float(count)
+  result['average'] = average
+  if count > 1:
+    total_of_squares = sum([(i - average) ** 2 for i in numbers])
+    result['stddev'] = (total_of_squares / (count - 1)) ** 0.5
+  else:
+    result['stddev'] = 0
+  return result
+
+
+def _Time(function, *args):
+  """Returns (wall seconds, return value) of calling function."""
+  start = time.time()
+  result = function(*args)
+  return time.time() - start, result
+
+
+def _SketchSummarize(values):
+  sketch = stats_util.QuantileSketch()
+  sketch.Add(values)
+  return sketch.Summarize()
+
+
+def _MaxRelativeError(expected, actual):
+  return max(abs(actual[key] - expected[key]) / abs(expected[key])
+             for key in expected if key.startswith('p') and expected[key])
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--sizes', type=int, nargs='+',
+                      default=[10 ** i for i in xrange(3, 9)],
+                      help='Numbers of values to summarize.')
+  parser.add_argument('--max_python_size', type=int, default=10 ** 6,
+                      help='Largest size measured with the pure Python '
+                      'implementation.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the random latencies.')
+  args = parser.parse_args()
+
+  random_state = np.random.RandomState(args.seed)
+  print '{0:>10} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}'.format(
+      'values', 'python(s)', 'numpy(s)', 'hist(s)', 'sketch(s)', 'sketch_err')
+  row = '{0:>10} {1:>10} {2:>10.4f} {3:>10.4f} {4:>10.4f} {5:>10.4f}'
+  for size in args.sizes:
+    # Latencies in seconds with a median of 10ms and a long tail.
+    values = random_state.lognormal(math.log(0.01), 1.0, size)
+    if size <= args.max_python_size:
+      python_time = '{0:.4f}'.format(
+          _Time(_PythonSummarize, values.tolist())[0])
+    else:
+      python_time = '-'
+    numpy_time, exact = _Time(stats_util.Summarize, values)
+    microseconds = np.round(values * 1e6).astype(np.int64)
+    keys, counts = np.unique(microseconds, return_counts=True)
+    histogram_time, _ = _Time(
+        stats_util.SummarizeHistogram,
+        collections.OrderedDict(zip(keys.tolist(), counts.tolist())))
+    sketch_time, approximate = _Time(_SketchSummarize, values)
+    print row.format(size, python_time, numpy_time, histogram_time,
+                     sketch_time, _MaxRelativeError(exact, approximate))
+
+
+if __name__ == '__main__':
+  main()
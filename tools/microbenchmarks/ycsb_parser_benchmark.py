@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the time and memory taken to parse and combine YCSB results.
+
+Writes synthetic YCSB output files for several clients, which consist of
+status lines like the ones YCSB prints with -s followed by the results of
+each operation with a full 1ms latency histogram. Each file is then parsed and
+all results combined, once with the previous implementation, which read each
+output into a string and built lists of (bucket, count) tuples, and once with
+ycsb.ParseResults streaming the file. Every measurement runs in a child
+process so that its peak resident memory can be reported.
+"""
+
+import argparse
+import collections
+import copy
+import csv
+import io
+import itertools
+import operator
+import os
+import random
+import re
+import resource
+import shutil
+import tempfile
+import time
+
+from perfkitbenchmarker.linux_packages import ycsb
+
+_OPERATIONS = 'READ', 'UPDATE', 'INSERT', 'SCAN'
+_STATUS_LINE = ('2017-06-01 12:00:{0:02d}:{1:03d} {0} sec: {2} operations; '
+                '{3:.2f} current ops/sec; [READ AverageLatency(us)={4:.2f}] '
+                '[UPDATE AverageLatency(us)={5:.2f}]\n')
+
+
+def _WriteOutput(path, size_bytes, rand):
+  """Writes a synthetic YCSB output file of about size_bytes."""
+  with open(path, 'w') as fp:
+    fp.write('YCSB Client 0.1\nCommand line: -db com.yahoo.ycsb.BasicDB '
+             '-P workloads/workloada -t\n')
+    status_lines = [
+        _STATUS_LINE.format(i % 60, i % 1000, i * 1000, rand.random() * 1e4,
+                            rand.random() * 1e3, rand.random() * 1e3)
+        for i in xrange(1000)]
+    for line in itertools.cycle(status_lines):
+      fp.write(line)
+      if fp.tell() >= size_bytes:
+        break
+    fp.write('[OVERALL], RunTime(ms), 1800413.0\n'
+             '[OVERALL], Throughput(ops/sec), 2740.503428935472\n')
+    for operation in _OPERATIONS:
+      fp.write('[{0}], Operations, 2468054\n'
+               '[{0}], AverageLatency(us), 2218.85\n'
+               '[{0}], MinLatency(us), 554\n'
+               '[{0}], MaxLatency(us), 352634\n'
+               '[{0}], 95thPercentileLatency(ms), 4\n'
+               '[{0}], 99thPercentileLatency(ms), 7\n'
+               '[{0}], Return=0, 2468054\n'.format(operation))
+      for bucket in xrange(1000):
+        fp.write('[{0}], {1}, {2}\n'.format(
+            operation, bucket, int(rand.expovariate(1e-3 * (bucket + 1)))))
+      fp.write('[{0}], >1000, 3\n'.format(operation))
+
+
+def _PreviousParseResults(ycsb_result_string, data_type='histogram'):
+  """The implementation ycsb.ParseResults replaced."""
+  lines = []
+  client_string = 'YCSB'
+  command_line = 'unknown'
+  fp = io.BytesIO(ycsb_result_string)
+  result_string = next(fp).strip()
+
+  def IsHeadOfResults(line):
+    return line.startswith('YCSB Client 0.') or line.startswith('[OVERALL]')
+
+  while not IsHeadOfResults(result_string):
+    result_string = next(fp).strip()
+
+  if result_string.startswith('YCSB Client 0.'):
+    client_string = result_string
+    command_line = next(fp).strip()
+  else:
+    lines.append(result_string)
+
+  def LineFilter(line):
+    return re.search(r'^\[[A-Z]+\]', line) is not None
+  lines = itertools.chain(lines, itertools.ifilter(LineFilter, fp))
+  by_operation = itertools.groupby(csv.reader(lines), operator.itemgetter(0))
+  result = collections.OrderedDict([
+      ('client', client_string),
+      ('command_line', command_line),
+      ('groups', collections.OrderedDict())])
+  for operation, lines in by_operation:
+    operation = operation[1:-1].lower()
+    op_result = {'group': operation, data_type: [], 'statistics': {}}
+    for _, name, val in lines:
+      name = name.strip()
+      val = val.strip()
+      if name.startswith('>'):
+        name = name[1:]
+      val = float(val) if '.' in val or 'nan' in val.lower() else int(val)
+      if name.isdigit():
+        if val:
+          op_result[data_type].append((int(name), val))
+      else:
+        if '(us)' in name:
+          name = name.replace('(us)', '(ms)')
+          val /= 1000.0
+        op_result['statistics'][name] = val
+    result['groups'][operation] = op_result
+  return result
+
+
+def _PreviousCombineResults(result_list):
+  """The implementation ycsb._CombineResults replaced."""
+  def CombineHistograms(hist1, hist2):
+    h1 = dict(hist1)
+    h2 = dict(hist2)
+    return [(k, h1.get(k, 0) + h2.get(k, 0))
+            for k in sorted(frozenset(h1) | frozenset(h2))]
+
+  result = copy.deepcopy(result_list[0])
+  for indiv in result_list[1:]:
+    for group_name, group in indiv['groups'].iteritems():
+      combined = result['groups'][group_name]
+      for k, v in group['statistics'].iteritems():
+        op = ycsb.AGGREGATE_OPERATORS.get(k)
+        if op is not None and k in combined['statistics']:
+          combined['statistics'][k] = op(combined['statistics'][k], v)
+      combined['histogram'] = CombineHistograms(combined['histogram'],
+                                                group['histogram'])
+  return result
+
+
+def _ParsePrevious(paths):
+  results = []
+  for path in paths:
+    with open(path) as fp:
+      results.append(_PreviousParseResults(fp.read()))
+  return _PreviousCombineResults(results)
+
+
+def _ParseStreaming(paths):
+  results = []
+  for path in paths:
+    with open(path) as fp:
+      results.append(ycsb.ParseResults(fp))
+  return ycsb._CombineResults(results)
+
+
+def _MeasureInChild(function, *args):
+  """Returns (wall seconds, peak RSS in MB) of running function in a child."""
+  start = time.time()
+  pid = os.fork()
+  if not pid:
+    try:
+      function(*args)
+    finally:
+      os._exit(0)
+  _, status, usage = os.wait4(pid, 0)
+  if status:
+    raise RuntimeError('Measurement failed with status {0}'.format(status))
+  return time.time() - start, usage.ru_maxrss / 1024.0
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--size_mb', type=int, default=1024,
+                      help='Total size of the YCSB output of all clients.')
+  parser.add_argument('--clients', type=int, default=8,
+                      help='Number of client outputs to combine.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the random output.')
+  parser.add_argument('--skip_previous', action='store_true',
+                      help='Only measure the streaming parser.')
+  args = parser.parse_args()
+
+  rand = random.Random(args.seed)
+  temp_dir = tempfile.mkdtemp(prefix='ycsb-parser-benchmark')
+  try:
+    paths = []
+    for i in xrange(args.clients):
+      paths.append(os.path.join(temp_dir, 'client-{0}.txt'.format(i)))
+      _WriteOutput(paths[-1], args.size_mb * 1024 * 1024 // args.clients,
+                   rand)
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    print '{0:<10} {1:>8} {2:>8} {3:>10} {4:>13}'.format(
+        'parser', 'size(MB)', 'clients', 'time(s)', 'peak_rss(MB)')
+    row = '{0:<10} {1:>8} {2:>8} {3:>10.2f} {4:>13.1f}'
+    parsers = [('streaming', _ParseStreaming)]
+    if not args.skip_previous:
+      parsers.insert(0, ('previous', _ParsePrevious))
+    for name, function in parsers:
+      wall, rss = _MeasureInChild(function, paths)
+      print row.format(name, args.size_mb, args.clients, wall, rss)
+    print 'Peak RSS of this process before measuring: {0:.1f} MB'.format(
+        baseline_rss)
+  finally:
+    shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+  main()
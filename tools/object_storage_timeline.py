@@ -14,6 +14,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+"""Plots a timeline of the operations of the object storage workers.
+
+Usage: object_storage_timeline.py <worker output> <figure file>
+
+The worker output is the file written by object_storage_service_benchmark
+with --object_storage_worker_output, either as JSON or, with
+--object_storage_worker_output_format=columns, as a columns file that is
+memory-mapped instead of being read into memory. Run from the root of the
+repository with PYTHONPATH=. so that perfkitbenchmarker can be imported.
+"""
+
 import json
 import numpy as np
 import matplotlib.collections as mplc
@@ -21,6 +32,8 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as mpl_patches
 import sys
 
+from perfkitbenchmarker import stream_columns
+
 
 class DraggableXRange:
   def __init__(self, figure, updater):
@@ -208,7 +221,8 @@ def LoadWorkerOutput(output):
   """Load output from worker processes to our internal format.
 
   Args:
-    output: list of strings. The stdouts of all worker processes.
+    output: list of strings. The stdouts of all worker processes, or the
+      path of a columns file.
 
   Returns:
     A tuple of start_time, latency, size. Each of these is a list of
@@ -233,6 +247,10 @@ def LoadWorkerOutput(output):
     start_times, latencies, or sizes.
   """
 
+  if isinstance(output, basestring):
+    _, start_times, latencies, sizes = stream_columns.LoadStreams(output)
+    return start_times, latencies, sizes
+
   start_times = []
   latencies = []
   sizes = []
@@ -254,8 +272,11 @@ def LoadWorkerOutput(output):
 def main():
   worker_output = None
   print("Reading worker output")
-  with open(sys.argv[1], 'r') as worker_out_file:
-    worker_output = json.loads(worker_out_file.read())
+  if stream_columns.IsColumnsFile(sys.argv[1]):
+    worker_output = sys.argv[1]
+  else:
+    with open(sys.argv[1], 'r') as worker_out_file:
+      worker_output = json.loads(worker_out_file.read())
   print("Parsing worker output")
   start_times, latencies, _ = LoadWorkerOutput(worker_output)
   GenerateObjectTimeline(sys.argv[2], start_times, latencies)
@@ -0,0 +1,411 @@
+# Copyright 2017 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Statistical comparison of the samples of repeated PerfKitBenchmarker runs.
+
+Samples of each side are grouped by test, metric, unit and normalized
+metadata with a dict, so that matching is linear in the number of samples.
+Metadata is normalized by dropping the keys in 'ignored_metadata_keys' and
+the keys whose values vary between repetitions, i.e. that take more distinct
+values on one side than a single run has samples of that test, metric and
+unit. Groups of a test, metric and unit that still do not match are paired in
+order of appearance when both sides have the same number of them.
+
+For each pair of groups, the values of the head side are compared to those of
+the base side with:
+
+  relative_change: the change of the median, head / base - 1.
+  ci: a bootstrap confidence interval of the relative change.
+  p_value: the two-sided p-value of a Mann-Whitney U test, exact for small
+      samples without ties, and adjusted_p_value, the p-value adjusted for
+      the number of comparisons with the Benjamini-Hochberg procedure.
+  cliffs_delta: Cliff's delta effect size, in [-1, 1], from the U statistic.
+
+A change is significant when its adjusted p-value is below 'alpha', its
+confidence interval excludes 0 and its magnitude is at least 'min_change'.
+Significant changes are regressions or improvements depending on whether the
+metric is better higher or lower. Two repetitions per side are the minimum for
+a test, but the p-value of a Mann-Whitney U test of 4 values per side is at
+least 0.029, so use 5 or more repetitions to detect regressions reliably.
+"""
+
+import collections
+import math
+import random
+import re
+
+# Metadata keys that are not used to match samples.
+DEFAULT_IGNORED_METADATA_KEYS = ('hostnames', 'perfkitbenchmarker_version',
+                                 'run_number')
+
+# Metrics that are better when lower, matched against metric names.
+DEFAULT_LOWER_IS_BETTER = r'(?i)latency|time|duration|overhead|error|fail'
+_LOWER_IS_BETTER_UNITS = frozenset([
+    's', 'sec', 'secs', 'second', 'seconds', 'ms', 'msec', 'millisecond',
+    'milliseconds', 'us', 'usec', 'microsecond', 'microseconds', 'ns',
+    'nanosecond', 'nanoseconds', 'minutes', 'hours'])
+
+# Largest total number of values for which exact U test p-values are used.
+_MAX_EXACT_U_TEST_VALUES = 40
+
+REGRESSION = 'regression'
+IMPROVEMENT = 'improvement'
+NO_CHANGE = 'no change'
+INSUFFICIENT_DATA = 'insufficient data'
+ADDED = 'added'
+REMOVED = 'removed'
+
+
+def SplitLabels(labels):
+  """Parse the 'labels' key from a PerfKitBenchmarker record.
+
+  Labels are recorded in '|key:value|,|key:value|' form.
+  This function transforms them to a dict.
+
+  Args:
+    labels: string. labels to parse.
+
+  Returns:
+    dict. Parsed 'labels'.
+  """
+  result = {}
+  if not labels:
+    return result
+  for item in labels.strip('|').split('|,|'):
+    k, v = item.split(':', 1)
+    result[k] = v
+  return result
+
+
+def GetMetadata(sample):
+  """Returns the metadata of a sample as a dict of strings."""
+  if 'metadata' in sample:
+    return {k: u'%s' % (v,) for k, v in sample['metadata'].iteritems()}
+  return SplitLabels(sample.get('labels', ''))
+
+
+def _Median(values):
+  values = sorted(values)
+  middle = len(values) // 2
+  if len(values) % 2:
+    return values[middle]
+  return (values[middle - 1] + values[middle]) / 2.0
+
+
+def Summarize(values):
+  """Returns the count, mean, median, stddev, min and max of 'values'."""
+  n = len(values)
+  mean = math.fsum(values) / n
+  variance = (math.fsum((v - mean) ** 2 for v in values) / (n - 1)
+              if n > 1 else 0.0)
+  return {'n': n, 'mean': mean, 'median': _Median(values),
+          'stddev': math.sqrt(variance), 'min': min(values),
+          'max': max(values)}
+
+
+def _ExactUDistribution(n1, n2):
+  """Returns the number of orderings of n1 + n2 values giving each U.
+
+  U counts the pairs in which the value of the first sample is the larger.
+  If the largest value is in the first sample, it is larger than the n2
+  values of the second; otherwise it adds nothing to U.
+  """
+  previous = [[1] for _ in range(n2 + 1)]
+  for i in range(1, n1 + 1):
+    current = [[1]]
+    for j in range(1, n2 + 1):
+      counts = [0] * j + previous[j]
+      for u, count in enumerate(current[j - 1]):
+        counts[u] += count
+      current.append(counts)
+    previous = current
+  return previous[n2]
+
+
+def MannWhitneyU(a, b):
+  """Runs a two-sided Mann-Whitney U test of samples 'a' and 'b'.
+
+  Returns:
+    (u, p_value) tuple. 'u' is the number of pairs in which the value from
+    'a' is larger than the value from 'b', counting ties as half.
+  """
+  n1, n2 = len(a), len(b)
+  values = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+  rank_sum = 0.0
+  tie_term = 0
+  i = 0
+  while i < len(values):
+    j = i
+    while j < len(values) and values[j][0] == values[i][0]:
+      j += 1
+    # Values i..j-1 are tied and share the average of ranks i+1..j.
+    rank = (i + 1 + j) / 2.0
+    rank_sum += rank * sum(1 for k in range(i, j) if values[k][1] == 0)
+    tie_term += (j - i) ** 3 - (j - i)
+    i = j
+  u = rank_sum - n1 * (n1 + 1) / 2.0
+  if not tie_term and n1 + n2 <= _MAX_EXACT_U_TEST_VALUES:
+    counts = _ExactUDistribution(n1, n2)
+    total = float(sum(counts))
+    u_low = int(min(u, n1 * n2 - u))
+    p_value = 2 * sum(counts[:u_low + 1]) / total
+    return u, min(1.0, p_value)
+  n = n1 + n2
+  variance = n1 * n2 / 12.0 * ((n + 1) - tie_term / float(n * (n - 1)))
+  if variance <= 0:
+    return u, 1.0
+  z = max(0.0, abs(u - n1 * n2 / 2.0) - 0.5) / math.sqrt(variance)
+  return u, min(1.0, math.erfc(z / math.sqrt(2)))
+
+
+def BootstrapRelativeChange(base, head, confidence=0.95, iterations=1000,
+                            rng=None):
+  """Returns a bootstrap confidence interval of the change of the median.
+
+  Args:
+    base: list of floats. Values of the base side.
+    head: list of floats. Values of the head side.
+    confidence: float. Confidence level of the interval.
+    iterations: int. Number of resamples of each side.
+    rng: random.Random or None. Source of the resamples.
+
+  Returns:
+    (low, high) tuple of head median / base median - 1, or None if the
+    change is undefined because base medians are 0.
+  """
+  rng = rng or random.Random(0)
+  uniform = rng.random
+  n_base, n_head = len(base), len(head)
+  changes = []
+  for _ in range(iterations):
+    base_median = _Median([base[int(uniform() * n_base)]
+                           for _ in range(n_base)])
+    if not base_median:
+      continue
+    head_median = _Median([head[int(uniform() * n_head)]
+                           for _ in range(n_head)])
+    changes.append(head_median / float(base_median) - 1)
+  if len(changes) < iterations / 2:
+    return None
+  changes.sort()
+  tail = (1 - confidence) / 2
+  return (changes[int(tail * len(changes))],
+          changes[int(math.ceil((1 - tail) * len(changes))) - 1])
+
+
+def AdjustPValues(p_values):
+  """Adjusts p-values for multiple comparisons (Benjamini-Hochberg).
+
+  Args:
+    p_values: list of floats or None.
+
+  Returns:
+    List of the adjusted p-values, None where 'p_values' has None.
+  """
+  indices = sorted((i for i, p in enumerate(p_values) if p is not None),
+                   key=lambda i: p_values[i], reverse=True)
+  adjusted = [None] * len(p_values)
+  smallest = 1.0
+  for rank, i in zip(range(len(indices), 0, -1), indices):
+    smallest = min(smallest, p_values[i] * len(indices) / rank)
+    adjusted[i] = smallest
+  return adjusted
+
+
+def IsLowerBetter(metric, unit, lower_is_better=DEFAULT_LOWER_IS_BETTER):
+  """Returns whether lower values of a metric are better."""
+  return bool(unit and unit.lower() in _LOWER_IS_BETTER_UNITS or
+              re.search(lower_is_better, metric))
+
+
+class _Group(object):
+  """Samples of one side with the same test, metric, unit and metadata."""
+
+  def __init__(self, triple, metadata):
+    self.triple = triple
+    self.metadata = metadata
+    self.samples = []
+
+  @property
+  def values(self):
+    return [float(s['value']) for s in self.samples]
+
+
+def _GroupSamples(samples, ignored_metadata_keys):
+  """Groups samples by test, metric, unit and normalized metadata.
+
+  Returns:
+    OrderedDict mapping (test, metric, unit, metadata items) to a _Group.
+  """
+  by_triple = collections.OrderedDict()
+  for sample in samples:
+    triple = (sample['test'], sample['metric'], sample['unit'])
+    metadata = GetMetadata(sample)
+    for key in ignored_metadata_keys:
+      metadata.pop(key, None)
+    by_triple.setdefault(triple, []).append((sample, metadata))
+
+  groups = collections.OrderedDict()
+  for triple, items in by_triple.iteritems():
+    max_per_run = max(collections.Counter(
+        sample.get('run_uri') for sample, _ in items).itervalues())
+    distinct_values = collections.defaultdict(set)
+    for _, metadata in items:
+      for key, value in metadata.iteritems():
+        distinct_values[key].add(value)
+    varying_keys = {key for key, values in distinct_values.iteritems()
+                    if len(values) > max_per_run}
+    for sample, metadata in items:
+      for key in varying_keys:
+        metadata.pop(key, None)
+      key = triple + (tuple(sorted(metadata.iteritems())),)
+      if key not in groups:
+        groups[key] = _Group(triple, metadata)
+      groups[key].samples.append(sample)
+  return groups
+
+
+def MatchSamples(base_samples, head_samples,
+                 ignored_metadata_keys=DEFAULT_IGNORED_METADATA_KEYS):
+  """Matches groups of samples of the base side with groups of the head side.
+
+  Returns:
+    List of (base _Group or None, head _Group or None) pairs, in order of
+    appearance of the base groups, then of the unmatched head groups.
+  """
+  base_groups = _GroupSamples(base_samples, ignored_metadata_keys)
+  head_groups = _GroupSamples(head_samples, ignored_metadata_keys)
+  partners = {}
+  unmatched_base = collections.OrderedDict()
+  unmatched_head = collections.defaultdict(list)
+  for key, group in base_groups.iteritems():
+    if key in head_groups:
+      partners[key] = head_groups[key]
+    else:
+      unmatched_base.setdefault(group.triple, []).append(key)
+  for key, group in head_groups.iteritems():
+    if key not in base_groups:
+      unmatched_head[group.triple].append(group)
+  for triple, keys in unmatched_base.iteritems():
+    if len(keys) == len(unmatched_head[triple]):
+      for key, head_group in zip(keys, unmatched_head.pop(triple)):
+        partners[key] = head_group
+  matched_head = {id(group) for group in partners.itervalues()}
+  pairs = [(group, partners.get(key))
+           for key, group in base_groups.iteritems()]
+  pairs.extend((None, group) for group in head_groups.itervalues()
+               if id(group) not in matched_head)
+  return pairs
+
+
+def _Labels(pairs):
+  """Returns the metadata that distinguishes each pair from the others.
+
+  These are the metadata values of keys that differ between the groups of
+  the same test, metric and unit.
+  """
+  values_by_triple = collections.defaultdict(
+      lambda: collections.defaultdict(set))
+  for pair in pairs:
+    for group in pair:
+      if group:
+        for key, value in group.metadata.iteritems():
+          values_by_triple[group.triple][key].add(value)
+  labels = []
+  for pair in pairs:
+    group = pair[0] or pair[1]
+    distinct_values = values_by_triple[group.triple]
+    labels.append({key: value for key, value in group.metadata.iteritems()
+                   if len(distinct_values[key]) > 1})
+  return labels
+
+
+def Compare(base_samples, head_samples, alpha=0.05, min_change=0.01,
+            confidence=0.95, bootstrap_iterations=1000,
+            ignored_metadata_keys=DEFAULT_IGNORED_METADATA_KEYS,
+            lower_is_better=DEFAULT_LOWER_IS_BETTER, seed=0):
+  """Compares the samples of the head side to those of the base side.
+
+  Args:
+    base_samples: list of sample dicts of the base side, from any number of
+        runs.
+    head_samples: list of sample dicts of the head side.
+    alpha: float. Adjusted p-value below which changes are significant.
+    min_change: float. Minimum magnitude of significant relative changes.
+    confidence: float. Confidence level of the bootstrap intervals.
+    bootstrap_iterations: int. Number of bootstrap resamples per comparison.
+    ignored_metadata_keys: iterable of strings. Metadata keys not used to
+        match samples.
+    lower_is_better: string. Regular expression matching the names of
+        metrics that are better when lower.
+    seed: int. Seed of the bootstrap resamples.
+
+  Returns:
+    List of dicts, one per matched group of samples, with the keys 'test',
+    'metric', 'unit', 'labels' (distinguishing metadata), 'base' and 'head'
+    (summaries of the values, or None), 'base_sample' and 'head_sample'
+    (the first sample of each side), 'lower_is_better', 'relative_change',
+    'ci', 'p_value', 'adjusted_p_value', 'cliffs_delta' and 'verdict'.
+  """
+  rng = random.Random(seed)
+  pairs = MatchSamples(base_samples, head_samples, ignored_metadata_keys)
+  comparisons = []
+  for (base, head), labels in zip(pairs, _Labels(pairs)):
+    test, metric, unit = (base or head).triple
+    comparison = {
+        'test': test, 'metric': metric, 'unit': unit, 'labels': labels,
+        'base': None, 'head': None, 'base_sample': None, 'head_sample': None,
+        'lower_is_better': IsLowerBetter(metric, unit, lower_is_better),
+        'relative_change': None, 'ci': None, 'p_value': None,
+        'adjusted_p_value': None, 'cliffs_delta': None}
+    for side, group in (('base', base), ('head', head)):
+      if group:
+        comparison[side] = Summarize(group.values)
+        comparison[side + '_sample'] = group.samples[0]
+    comparisons.append(comparison)
+    if not (base and head):
+      comparison['verdict'] = REMOVED if base else ADDED
+      continue
+    base_values, head_values = base.values, head.values
+    if comparison['base']['median']:
+      comparison['relative_change'] = (
+          comparison['head']['median'] / comparison['base']['median'] - 1)
+    if len(base_values) < 2 or len(head_values) < 2:
+      comparison['verdict'] = INSUFFICIENT_DATA
+      continue
+    u, comparison['p_value'] = MannWhitneyU(head_values, base_values)
+    comparison['cliffs_delta'] = (
+        2 * u / (len(base_values) * len(head_values)) - 1)
+    comparison['ci'] = BootstrapRelativeChange(
+        base_values, head_values, confidence, bootstrap_iterations, rng)
+
+  adjusted = AdjustPValues([c['p_value'] for c in comparisons])
+  for comparison, adjusted_p_value in zip(comparisons, adjusted):
+    if adjusted_p_value is None:
+      continue
+    comparison['adjusted_p_value'] = adjusted_p_value
+    change = comparison['relative_change']
+    ci = comparison['ci']
+    significant = (adjusted_p_value < alpha and
+                   (change is None or abs(change) >= min_change) and
+                   (ci is None or ci[0] > 0 or ci[1] < 0))
+    # Without a relative change, e.g. if the base median is 0, the direction
+    # of the change is that of the effect size.
+    decreased = (comparison['cliffs_delta'] if change is None else change) < 0
+    if not significant:
+      comparison['verdict'] = NO_CHANGE
+    elif decreased == comparison['lower_is_better']:
+      comparison['verdict'] = IMPROVEMENT
+    else:
+      comparison['verdict'] = REGRESSION
+  return comparisons
@@ -19,6 +19,12 @@
 Given a pair of revisions (e.g., 'dev', 'master') and command-line arguments,
 this tool runs 'pkb.py' with for each and creates a report showing the
 differences in the results between the two runs.
+
+Each revision can be run several times (--repetitions), with runs of the two
+revisions interleaved, and optionally run concurrently (--parallel), so that
+both are measured under the same conditions. The samples are then compared
+statistically (see comparison.py), and significant regressions are flagged in
+the JSON and HTML output.
 """
 
 import argparse
@@ -33,10 +39,14 @@ import pprint
 import shlex
 import shutil
 import subprocess
+import sys
 import tempfile
 
+from concurrent import futures
 import jinja2
 
+import comparison
+
 
 DEFAULT_FLAGS = ('--cloud=GCP', '--machine_type=n1-standard-4',
                  '--benchmarks=netperf')
@@ -130,6 +140,15 @@ def PerfKitBenchmarkerCheckout(revision):
     yield td
 
 
+def _RunInCheckout(checkout_dir, flags):
+  """Runs perfkitbenchmarker in a checkout, returning its samples."""
+  with tempfile.NamedTemporaryFile(suffix='.json') as tf:
+    cmd = ['./pkb.py'] + flags + ['--json_path=' + tf.name]
+    logging.info('Running %s in %s', cmd, checkout_dir)
+    subprocess.check_call(cmd, cwd=checkout_dir)
+    return [json.loads(line) for line in tf]
+
+
 def RunPerfKitBenchmarker(revision, flags):
   """Runs perfkitbenchmarker, returning the results as parsed JSON.
 
@@ -145,33 +164,43 @@ def RunPerfKitBenchmarker(revision, flags):
   sha1 = _GitRevParse(revision)
   description = _GitDescribe(revision)
   with PerfKitBenchmarkerCheckout(revision) as td:
-    with tempfile.NamedTemporaryFile(suffix='.json') as tf:
-      flags = flags + ['--json_path=' + tf.name]
-      cmd = ['./pkb.py'] + flags
-      logging.info('Running %s in %s', cmd, td)
-      subprocess.check_call(cmd, cwd=td)
-      samples = [json.loads(line) for line in tf]
-      return PerfKitBenchmarkerResult(name=revision, sha1=sha1, flags=flags,
-                                      samples=samples, description=description)
+    samples = _RunInCheckout(td, flags)
+    return PerfKitBenchmarkerResult(name=revision, sha1=sha1, flags=flags,
+                                    samples=samples, description=description)
 
 
-def _SplitLabels(labels):
-  """Parse the 'labels' key from a PerfKitBenchmarker record.
+def RunSideBySide(base, base_flags, head, head_flags, repetitions=1,
+                  max_concurrent_runs=1):
+  """Runs perfkitbenchmarker at two revisions, interleaving their runs.
 
-  Labels are recorded in '|key:value|,|key:value|' form.
-  This function transforms them to a dict.
+  Runs are started in the order base, head, base, head..., up to
+  'max_concurrent_runs' at a time.
 
   Args:
-    labels: string. labels to parse.
+    base: string. git commit identifier of the base revision.
+    base_flags: list of strings. Arguments to pass to `pkb.py` at 'base'.
+    head: string. git commit identifier of the head revision.
+    head_flags: list of strings. Arguments to pass to `pkb.py` at 'head'.
+    repetitions: int. Number of times to run each revision.
+    max_concurrent_runs: int. Maximum number of runs at once.
 
   Returns:
-    dict. Parsed 'labels'.
+    (base PerfKitBenchmarkerResult, head PerfKitBenchmarkerResult) tuple.
   """
-  result = {}
-  for item in labels.strip('|').split('|,|'):
-    k, v = item.split(':', 1)
-    result[k] = v
-  return result
+  with PerfKitBenchmarkerCheckout(base) as base_dir, \
+          PerfKitBenchmarkerCheckout(head) as head_dir:
+    runs = [(base_dir, base_flags), (head_dir, head_flags)] * repetitions
+    with futures.ThreadPoolExecutor(max_workers=max_concurrent_runs) as e:
+      run_futures = [e.submit(_RunInCheckout, *run) for run in runs]
+      run_samples = [f.result() for f in run_futures]
+  results = []
+  for i, (revision, flags) in enumerate(((base, base_flags),
+                                         (head, head_flags))):
+    results.append(PerfKitBenchmarkerResult(
+        name=revision, sha1=_GitRevParse(revision), flags=flags,
+        samples=list(itertools.chain.from_iterable(run_samples[i::2])),
+        description=_GitDescribe(revision)))
+  return tuple(results)
 
 
 def _CompareSamples(a, b, context=True, numlines=1):
@@ -188,8 +217,10 @@ def _CompareSamples(a, b, context=True, numlines=1):
   """
   a = a.copy()
   b = b.copy()
-  a['metadata'] = _SplitLabels(a.pop('labels', ''))
-  b['metadata'] = _SplitLabels(b.pop('labels', ''))
+  a['metadata'] = comparison.GetMetadata(a)
+  b['metadata'] = comparison.GetMetadata(b)
+  a.pop('labels', None)
+  b.pop('labels', None)
 
   # Prune the keys in VARYING_KEYS prior to comparison to make the diff more
   # informative.
@@ -206,50 +237,8 @@ def _CompareSamples(a, b, context=True, numlines=1):
   return differ.make_table(astr, bstr, context=context, numlines=numlines)
 
 
-def _MatchSamples(base_samples, head_samples):
-  """Match items from base_samples with items from head_samples.
-
-  Rows are matched using 'test', 'metric', and 'unit' fields.
-
-  Args:
-    base_samples: List of dicts.
-    head_samples: List of dicts.
-
-  Returns:
-    List of pairs, each item of the pair containing either a dict or None.
-  """
-  def ExtractKeys(samples):
-    return [(i['test'], i['metric'], i['unit']) for i in samples]
-
-  base_keys = ExtractKeys(base_samples)
-  head_keys = ExtractKeys(head_samples)
-
-  sm = difflib.SequenceMatcher('', base_keys, head_keys)
-
-  result = []
-
-  for opcode, base_begin, base_end, head_begin, head_end in sm.get_opcodes():
-    if opcode == 'equal':
-      result.extend(zip(base_samples[base_begin:base_end],
-                        head_samples[head_begin:head_end]))
-    elif opcode == 'replace':
-      result.extend(zip(base_samples[base_begin:base_end],
-                        [None] * (base_end - base_begin)))
-      result.extend(zip([None] * (head_end - head_begin),
-                        head_samples[head_begin:head_end]))
-    elif opcode == 'delete':
-      result.extend(zip(base_samples[base_begin:base_end],
-                        [None] * (base_end - base_begin)))
-    elif opcode == 'insert':
-      result.extend(zip([None] * (head_end - head_begin),
-                        head_samples[head_begin:head_end]))
-    else:
-      raise AssertionError('Unknown op: ' + opcode)
-  return result
-
-
-def RenderResults(base_result, head_result, template_name=TEMPLATE,
-                  **kwargs):
+def RenderResults(base_result, head_result, comparisons,
+                  template_name=TEMPLATE, **kwargs):
   """Render the results of a comparison as an HTML page.
 
   Args:
@@ -257,6 +246,8 @@ def RenderResults(base_result, head_result, template_name=TEMPLATE,
       revision.
     head_result: PerfKitBenchmarkerResult. Result of running against head
       revision.
+    comparisons: list of dicts. Output of comparison.Compare for the samples
+      of the results.
     template_name: string. The filename of the template.
     kwargs: Additional arguments to Template.render.
 
@@ -298,20 +289,30 @@ def RenderResults(base_result, head_result, template_name=TEMPLATE,
 
   template = env.get_template('side_by_side.html.j2')
 
-  matched = _MatchSamples(base_result.samples,
-                          head_result.samples)
-
-  # Generate sample diffs
+  # The first sample of each side of each comparison, with the median value.
+  matched = []
+  for c in comparisons:
+    pair = []
+    for side in ('base', 'head'):
+      sample = c[side + '_sample']
+      if sample:
+        sample = dict(sample, value=c[side]['median'])
+      pair.append(sample)
+    matched.append(pair)
+
+  # Generate sample diffs. Only samples whose other keys differ get a full
+  # diff, which keeps reports of many samples small.
   sample_context_diffs = []
   sample_diffs = []
   for base_sample, head_sample in matched:
     if not base_sample or not head_sample:
       # Sample inserted or deleted.
       continue
-    sample_context_diffs.append(
-        _CompareSamples(base_sample, head_sample))
-    sample_diffs.append(
-        _CompareSamples(base_sample, head_sample, context=False))
+    context_diff = _CompareSamples(base_sample, head_sample)
+    sample_context_diffs.append(context_diff)
+    sample_diffs.append(context_diff and
+                        _CompareSamples(base_sample, head_sample,
+                                        context=False))
 
   # Generate flag diffs
   flag_diffs = difflib.HtmlDiff().make_table(
@@ -324,8 +325,12 @@ def RenderResults(base_result, head_result, template_name=TEMPLATE,
       .replace(u'&', u'\\u0026') \
       .replace(u"'", u'\\u0027')
 
+  verdicts = collections.Counter(c['verdict'] for c in comparisons)
+
   return template.render(base=base_result,
                          head=head_result,
+                         comparisons=comparisons,
+                         verdicts=verdicts,
                          matched_samples=matched,
                          matched_samples_json=matched_json,
                          sample_diffs=sample_diffs,
@@ -335,6 +340,16 @@ def RenderResults(base_result, head_result, template_name=TEMPLATE,
                          **kwargs)
 
 
+def _CompareResults(base_res, head_res, a):
+  """Compares the samples of two results with the options of the command."""
+  return comparison.Compare(
+      base_res.samples, head_res.samples, alpha=a.alpha,
+      min_change=a.min_change / 100.0, confidence=a.confidence,
+      bootstrap_iterations=a.bootstrap_iterations,
+      ignored_metadata_keys=a.ignore_metadata,
+      lower_is_better=a.lower_is_better)
+
+
 def main():
   p = argparse.ArgumentParser(
       formatter_class=argparse.ArgumentDefaultsHelpFormatter,
@@ -352,8 +367,37 @@ def main():
   p.add_argument('-f', '--flags', type=shlex.split,
                  help="""Command line flags (Default: {0})""".format(
                      ' '.join(DEFAULT_FLAGS)))
+  p.add_argument('-n', '--repetitions', type=int, default=1,
+                 help="""Number of runs of each revision. At least 5 are
+                 needed to detect significant changes reliably.""")
   p.add_argument('-p', '--parallel', default=False, action='store_true',
-                 help="""Run concurrently""")
+                 help="""Run concurrently: two runs at once, unless
+                 --max-concurrent-runs is given.""")
+  p.add_argument('--max-concurrent-runs', type=int,
+                 help="""Maximum number of runs at once. Runs of the two
+                 revisions are interleaved. Defaults to 2 with --parallel,
+                 and to 1, i.e. sequential runs, otherwise.""")
+  p.add_argument('--alpha', type=float, default=0.05,
+                 help="""Adjusted p-value below which changes are
+                 significant.""")
+  p.add_argument('--min-change', type=float, default=1.0,
+                 help="""Minimum change of the median, in percent, of
+                 significant changes.""")
+  p.add_argument('--confidence', type=float, default=0.95,
+                 help="""Confidence level of the bootstrap intervals.""")
+  p.add_argument('--bootstrap-iterations', type=int, default=1000,
+                 help="""Number of bootstrap resamples per comparison.""")
+  p.add_argument('--ignore-metadata',
+                 default=list(comparison.DEFAULT_IGNORED_METADATA_KEYS),
+                 type=lambda value: value.split(','),
+                 help="""Comma separated metadata keys not used to match
+                 samples.""")
+  p.add_argument('--lower-is-better',
+                 default=comparison.DEFAULT_LOWER_IS_BETTER,
+                 help="""Regular expression matching the metrics that are
+                 better when lower. Metrics in units of time are too.""")
+  p.add_argument('--fail-on-regression', default=False, action='store_true',
+                 help="""Exit with status 1 if a regression is found.""")
   p.add_argument('--rerender', help="""Re-render the HTML report from a JSON
                  file [for developers].""", action='store_true')
   p.add_argument('json_output', help="""JSON output path.""")
@@ -374,27 +418,28 @@ def main():
     a.base_flags = a.flags or list(DEFAULT_FLAGS)
     a.head_flags = a.flags or list(DEFAULT_FLAGS)
 
+  if a.max_concurrent_runs is None:
+    a.max_concurrent_runs = 2 if a.parallel else 1
+  elif a.max_concurrent_runs < 1:
+    p.error('--max-concurrent-runs must be at least 1.')
+
   if not a.rerender:
-    if a.parallel:
-      from concurrent import futures
-      with futures.ThreadPoolExecutor(max_workers=2) as executor:
-        base_res_fut = executor.submit(RunPerfKitBenchmarker, a.base,
-                                       a.base_flags)
-        head_res_fut = executor.submit(RunPerfKitBenchmarker, a.head,
-                                       a.head_flags)
-        base_res = base_res_fut.result()
-        head_res = head_res_fut.result()
-    else:
-      base_res = RunPerfKitBenchmarker(a.base, a.base_flags)
-      head_res = RunPerfKitBenchmarker(a.head, a.head_flags)
+    base_res, head_res = RunSideBySide(
+        a.base, a.base_flags, a.head, a.head_flags,
+        repetitions=a.repetitions, max_concurrent_runs=a.max_concurrent_runs)
 
     logging.info('Base result: %s', base_res)
     logging.info('Head result: %s', head_res)
+    comparisons = _CompareResults(base_res, head_res, a)
 
     with argparse.FileType('w')(a.json_output) as json_fp:
       logging.info('Writing JSON to %s', a.json_output)
       json.dump({'head': head_res._asdict(),
-                 'base': base_res._asdict()},
+                 'base': base_res._asdict(),
+                 'comparison': [
+                     {k: v for k, v in c.iteritems()
+                      if k not in ('base_sample', 'head_sample')}
+                     for c in comparisons]},
                 json_fp,
                 indent=2)
       json_fp.write('\n')
@@ -404,15 +449,31 @@ def main():
       d = json.load(json_fp)
       base_res = PerfKitBenchmarkerResult(**d['base'])
       head_res = PerfKitBenchmarkerResult(**d['head'])
+    comparisons = _CompareResults(base_res, head_res, a)
+
+  regressions = [c for c in comparisons
+                 if c['verdict'] == comparison.REGRESSION]
+  for c in regressions:
+    change = c['relative_change']
+    logging.warning('Regression: %s %s (%s): median %s -> %s %s (%s, '
+                    'adjusted p=%.3g)', c['test'], c['metric'],
+                    ', '.join('%s=%s' % item
+                              for item in sorted(c['labels'].items())),
+                    c['base']['median'], c['head']['median'], c['unit'],
+                    'n/a' if change is None else '%+.1f%%' % (change * 100),
+                    c['adjusted_p_value'])
 
   with argparse.FileType('w')(a.html_output) as html_fp:
     logging.info('Writing HTML to %s', a.html_output)
     html_fp.write(RenderResults(base_result=base_res,
                                 head_result=head_res,
+                                comparisons=comparisons,
                                 varying_keys=VARYING_KEYS,
                                 title=a.title))
 
+  return 1 if regressions and a.fail_on_regression else 0
+
 
 if __name__ == '__main__':
   logging.basicConfig(level=logging.INFO)
-  main()
+  sys.exit(main())